@@ -119,6 +119,14 @@ class Settings(BaseSettings):
     # 缓存配置
     CACHE_TTL: int = Field(default=3600)  # 1小时
     SCREENING_CACHE_TTL: int = Field(default=1800)  # 30分钟
+    KLINE_CACHE_TTL_SECONDS: int = Field(default=15, description="K线接口热点内存缓存TTL（秒）")
+    KLINE_CACHE_MAX_ENTRIES: int = Field(default=2000, description="K线接口内存缓存最大条目数")
+
+    # 批量写入配置（操作日志 / Token 使用记录）
+    BATCH_WRITER_ENABLED: bool = Field(default=True, description="启用进程内缓冲批量写入")
+    BATCH_WRITER_MAX_BATCH: int = Field(default=200, ge=1, description="单批最大文档数（达到即刷写）")
+    BATCH_WRITER_FLUSH_INTERVAL_SECONDS: float = Field(default=1.0, gt=0, description="最长刷写间隔（秒）")
+    BATCH_WRITER_MAX_BUFFER: int = Field(default=10000, ge=1, description="缓冲区上限，超出后丢弃并计数")
 
     # 安全配置
     BCRYPT_ROUNDS: int = Field(default=12)
@@ -181,6 +189,10 @@ class Settings(BaseSettings):
         default=True,
         description="自动检测Tushare rt_k接口权限，付费用户自动切换到高频模式（5秒）"
     )
+    # 分钟K线聚合（由行情采集快照生成，粒度受 QUOTES_INGEST_INTERVAL_SECONDS 限制）
+    INTRADAY_BARS_ENABLED: bool = Field(default=False, description="由行情快照聚合分钟K线并落库（需将行情采集间隔调到分钟级，否则 bar 稀疏且只有单笔快照）")
+    INTRADAY_BARS_PERSIST_MINUTES: str = Field(default="5,15,30,60", description="落库的分钟周期（逗号分隔，可含1）")
+    INTRADAY_BARS_RETENTION_DAYS: int = Field(default=30, ge=1, description="分钟K线保留天数（TTL索引）")
 
     # Tushare基础配置
     TUSHARE_TOKEN: str = Field(default="", description="Tushare API Token")
@@ -275,6 +287,16 @@ class Settings(BaseSettings):
     NEWS_SYNC_CRON: str = Field(default="0 */2 * * *")  # 每2小时
     NEWS_SYNC_HOURS_BACK: int = Field(default=24)
     NEWS_SYNC_MAX_PER_SOURCE: int = Field(default=50)
+    NEWS_CLUSTER_LOOKBACK_HOURS: int = Field(default=72, ge=0, description="近似重复聚类时与库中最近N小时入库的新闻比较（0 表示只在本批内聚类）")
+    NEWS_CLUSTER_LOOKBACK_LIMIT: int = Field(default=5000, ge=0, description="近似重复聚类时最多加载的已入库新闻条数")
+
+    # ===== 新闻全文检索（本地倒排索引，中文 2-gram + BM25） =====
+    NEWS_SEARCH_INDEX_ENABLED: bool = Field(default=True, description="新闻搜索使用本地倒排索引（关闭时回退到 MongoDB $text）")
+    NEWS_SEARCH_INDEX_DIR: str = Field(default="./data/news_search_index", description="新闻检索索引快照与日志目录")
+
+    # ===== Token 使用量预聚合对账 =====
+    USAGE_ROLLUP_RECONCILE_CRON: str = Field(default="20 3 * * *", description="使用量预聚合夜间对账CRON表达式")  # 每日凌晨3:20
+    USAGE_ROLLUP_RECONCILE_DAYS: int = Field(default=2, ge=1, description="夜间对账重算最近N天的预聚合")
 
     @property
     def is_production(self) -> bool:
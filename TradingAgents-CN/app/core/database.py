@@ -362,6 +362,15 @@ async def create_database_indexes(db):
         await market_quotes.create_index([("amount", -1)])
         await market_quotes.create_index([("updated_at", -1)])
 
+        # stock_intraday_bars 的索引（行情快照聚合的分钟K线）
+        from app.core.config import settings
+        from app.services.intraday_bar_service import ensure_intraday_bar_indexes
+        await ensure_intraday_bar_indexes(db, settings.INTRADAY_BARS_RETENTION_DAYS)
+
+        # analysis_reports 的索引（游标分页 + 关键词 2-gram 检索）
+        from app.services.report_search_service import ensure_report_indexes
+        await ensure_report_indexes(db)
+
         logger.info("✅ 数据库索引创建完成")
 
     except Exception as e:
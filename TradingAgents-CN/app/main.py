@@ -26,7 +26,7 @@ import asyncio
 from pathlib import Path
 
 from app.core.config import settings
-from app.core.database import init_db, close_db
+from app.core.database import init_db, close_db, get_mongo_db
 from app.core.logging_config import setup_logging
 from app.routers import auth_db as auth, analysis, screening, queue, sse, health, favorites, config, reports, database, operation_logs, tags, tushare_init, akshare_init, baostock_init, historical_data, multi_period_sync, financial_data, news_data, social_media, internal_messages, usage_statistics, model_capabilities, cache, logs
 from app.routers import sync as sync_router, multi_source_sync
@@ -267,6 +267,46 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Startup backfill failed (ignored): {e}")
 
+    # 在批量写入器开始 $inc 之前认领使用量预聚合的首次回填（回填本身在后台执行）
+    rollup_backfill_claimed = False
+    try:
+        from app.services.usage_statistics_service import usage_statistics_service
+        rollup_backfill_claimed = await usage_statistics_service.claim_rollup_backfill()
+    except Exception as e:
+        logger.warning(f"Usage rollup backfill claim failed (ignored): {e}")
+
+    # 启动操作日志 / Token 使用记录的批量写入器
+    try:
+        from app.services.batch_writer import start_batch_writers
+        await start_batch_writers()
+    except Exception as e:
+        logger.warning(f"Batch writer startup failed (ignored, falling back to direct writes): {e}")
+
+    # 加载股票搜索内存索引（后台执行，不阻塞启动）
+    try:
+        from app.services.stock_search_index import get_stock_search_index
+        asyncio.create_task(get_stock_search_index().refresh_all())
+    except Exception as e:
+        logger.warning(f"Stock search index warmup failed (ignored): {e}")
+
+    # 为历史报告补齐关键词检索字段（后台执行，仅处理缺失字段的文档）
+    try:
+        from app.services.report_search_service import backfill_search_grams
+        asyncio.create_task(backfill_search_grams(get_mongo_db()))
+    except Exception as e:
+        logger.warning(f"Report search_grams backfill failed (ignored): {e}")
+
+    # 新闻检索索引为空或过期时从 stock_news 全量构建（后台执行）
+    try:
+        from app.services.news_search_index import rebuild_news_search_index
+        asyncio.create_task(rebuild_news_search_index(get_mongo_db(), only_if_stale=True))
+    except Exception as e:
+        logger.warning(f"News search index warmup failed (ignored): {e}")
+
+    # 首次部署时从原始 token_usage 记录回填使用量预聚合（后台执行）
+    if rollup_backfill_claimed:
+        asyncio.create_task(usage_statistics_service.run_rollup_backfill())
+
     # 启动每日定时任务：可配置
     scheduler: AsyncIOScheduler | None = None
     try:
@@ -569,6 +609,17 @@ async def lifespan(app: FastAPI):
         else:
             logger.info(f"📰 新闻数据同步已配置（仅自选股）: {settings.NEWS_SYNC_CRON}")
 
+        # 使用量预聚合夜间对账：用原始记录重算最近几天的小时/天桶，修正写入时可能遗漏的增量
+        from app.services.usage_statistics_service import usage_statistics_service
+        scheduler.add_job(
+            usage_statistics_service.rebuild_rollups,
+            CronTrigger.from_crontab(settings.USAGE_ROLLUP_RECONCILE_CRON, timezone=settings.TIMEZONE),
+            kwargs={"days": settings.USAGE_ROLLUP_RECONCILE_DAYS},
+            id="usage_rollup_reconcile",
+            name="Token使用量预聚合对账"
+        )
+        logger.info(f"📈 使用量预聚合对账已配置: {settings.USAGE_ROLLUP_RECONCILE_CRON}")
+
         scheduler.start()
 
         # 设置调度器实例到服务中，以便API可以管理任务
@@ -596,6 +647,13 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"UserService cleanup error: {e}")
 
+        # 刷写批量写入器中剩余的文档（需在关闭数据库连接之前）
+        try:
+            from app.services.batch_writer import stop_batch_writers
+            await stop_batch_writers()
+        except Exception as e:
+            logger.warning(f"Batch writer cleanup error: {e}")
+
         await close_db()
         logger.info("TradingAgents FastAPI backend stopped")
 
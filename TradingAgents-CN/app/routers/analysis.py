@@ -16,6 +16,7 @@ from app.routers.auth_db import get_current_user
 from app.services.queue_service import get_queue_service, QueueService
 from app.services.analysis_service import get_analysis_service
 from app.services.simple_analysis_service import get_simple_analysis_service
+from tradingagents.dataflows.batch_context import release_batch_context
 from app.services.websocket_manager import get_websocket_manager
 from app.models.analysis import (
     SingleAnalysisRequest, BatchAnalysisRequest, AnalysisParameters,
@@ -838,7 +839,7 @@ async def submit_batch_analysis(
                 async def run_single_analysis(tid: str, req: SingleAnalysisRequest, uid: str):
                     try:
                         logger.info(f"🚀 [并发任务] 开始执行: {tid} - {req.stock_code}")
-                        await simple_service.execute_analysis_background(tid, uid, req)
+                        await simple_service.execute_analysis_background(tid, uid, req, batch_id=batch_id)
                         logger.info(f"✅ [并发任务] 执行完成: {tid}")
                     except Exception as e:
                         logger.error(f"❌ [并发任务] 执行失败: {tid}, 错误: {e}", exc_info=True)
@@ -850,7 +851,9 @@ async def submit_batch_analysis(
 
             # 等待所有任务完成（不阻塞响应）
             await asyncio.gather(*tasks, return_exceptions=True)
-            logger.info(f"🎉 [批量分析] 所有任务执行完成: batch_id={batch_id}")
+            # 结束批次共享上下文，输出与逐股独立执行对比的耗时/调用次数报告
+            report = release_batch_context(batch_id)
+            logger.info(f"🎉 [批量分析] 所有任务执行完成: batch_id={batch_id}, 共享报告={report}")
 
         # 在后台启动并发任务（不等待完成）
         asyncio.create_task(run_concurrent_analysis())
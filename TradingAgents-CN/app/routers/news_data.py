@@ -230,6 +230,8 @@ async def search_news(
     query: str = Query(..., description="搜索关键词"),
     symbol: Optional[str] = Query(None, description="股票代码过滤"),
     limit: int = Query(20, description="返回数量限制"),
+    start_time: Optional[datetime] = Query(None, description="发布时间下限"),
+    end_time: Optional[datetime] = Query(None, description="发布时间上限"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -239,6 +241,8 @@ async def search_news(
         query: 搜索关键词
         symbol: 股票代码过滤
         limit: 返回数量限制
+        start_time: 发布时间下限
+        end_time: 发布时间上限
         
     Returns:
         dict: 搜索结果列表
@@ -250,7 +254,9 @@ async def search_news(
         news_list = await service.search_news(
             query_text=query,
             symbol=symbol,
-            limit=limit
+            limit=limit,
+            start_time=start_time,
+            end_time=end_time
         )
         
         return ok(data={
@@ -125,25 +125,26 @@ async def get_reports_list(
     start_date: Optional[str] = Query(None, description="开始日期"),
     end_date: Optional[str] = Query(None, description="结束日期"),
     stock_code: Optional[str] = Query(None, description="股票代码"),
+    cursor: Optional[str] = Query(None, description="游标（上一页返回的 next_cursor），提供时忽略 page"),
     user: dict = Depends(get_current_user)
 ):
-    """获取分析报告列表"""
+    """获取分析报告列表
+
+    - 按 (created_at, _id) 倒序；提供 cursor 时使用 keyset 分页，否则按 page 跳页
+    - 返回 next_cursor 供顺序翻页使用；total 可能为估算/缓存值（total_approximate）
+    """
+    from ..services.report_search_service import (
+        build_keyword_query, combine_queries, count_reports, decode_cursor, encode_cursor,
+    )
+
     try:
-        logger.info(f"🔍 获取报告列表: 用户={user['id']}, 页码={page}, 每页={page_size}, 市场={market_filter}")
+        logger.info(f"🔍 获取报告列表: 用户={user['id']}, 页码={page}, 每页={page_size}, 市场={market_filter}, 游标={'是' if cursor else '否'}")
 
         db = get_mongo_db()
 
         # 构建查询条件
         query = {}
 
-        # 搜索关键词
-        if search_keyword:
-            query["$or"] = [
-                {"stock_symbol": {"$regex": search_keyword, "$options": "i"}},
-                {"analysis_id": {"$regex": search_keyword, "$options": "i"}},
-                {"summary": {"$regex": search_keyword, "$options": "i"}}
-            ]
-
         # 市场筛选
         if market_filter:
             query["market_type"] = market_filter
@@ -161,17 +162,34 @@ async def get_reports_list(
                 date_query["$lte"] = end_date
             query["analysis_date"] = date_query
 
+        # 搜索关键词（search_grams 索引 + 正则校验）
+        if search_keyword and search_keyword.strip():
+            query = combine_queries(query, build_keyword_query(search_keyword))
+
         logger.info(f"📊 查询条件: {query}")
 
-        # 计算总数
-        total = await db.analysis_reports.count_documents(query)
+        # 计算总数（无筛选时估算，有筛选时短TTL缓存）
+        total, total_approximate = await count_reports(db.analysis_reports, query)
 
-        # 分页查询
-        skip = (page - 1) * page_size
-        cursor = db.analysis_reports.find(query).sort("created_at", -1).skip(skip).limit(page_size)
+        # 分页查询：游标优先（keyset），否则 skip
+        sort_spec = [("created_at", -1), ("_id", -1)]
+        if cursor:
+            try:
+                page_query = combine_queries(query, decode_cursor(cursor))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            db_cursor = db.analysis_reports.find(page_query).sort(sort_spec).limit(page_size + 1)
+        else:
+            skip = (page - 1) * page_size
+            db_cursor = db.analysis_reports.find(query).sort(sort_spec).skip(skip).limit(page_size + 1)
+
+        docs = await db_cursor.to_list(length=page_size + 1)
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1]) if has_more and docs else None
 
         reports = []
-        async for doc in cursor:
+        for doc in docs:
             # 转换为前端需要的格式
             stock_code = doc.get("stock_symbol", "")
             # 🔥 优先使用MongoDB中保存的股票名称，如果没有则查询
@@ -225,12 +243,17 @@ async def get_reports_list(
             "data": {
                 "reports": reports,
                 "total": total,
+                "total_approximate": total_approximate,
                 "page": page,
-                "page_size": page_size
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "has_more": has_more
             },
             "message": "报告列表获取成功"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ 获取报告列表失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -412,6 +435,9 @@ async def delete_report(
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="报告不存在")
 
+        from ..services.report_search_service import invalidate_count_cache
+        invalidate_count_cache()
+
         logger.info(f"✅ 报告删除成功: {report_id}")
 
         return {
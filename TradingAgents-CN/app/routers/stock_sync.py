@@ -96,6 +96,9 @@ async def _sync_latest_to_market_quotes(symbol: str) -> None:
         {"$set": quote_data},
         upsert=True
     )
+    # 绕过行情入库任务写入，需使其差量快照失效
+    from app.services.quotes_ingestion_service import mark_quotes_written_externally
+    await mark_quotes_written_externally(db, [symbol6])
 
 
 class SingleStockSyncRequest(BaseModel):
@@ -63,6 +63,58 @@ def _detect_market_and_code(code: str) -> Tuple[str, str]:
     return ('CN', _zfill_code(code))
 
 
+@router.get("/quotes/batch", response_model=dict)
+async def get_foreign_quotes_batch(
+    codes: str = Query(..., description="逗号分隔的港股/美股代码，如 AAPL,TSLA,0700.HK"),
+    force_refresh: bool = Query(False, description="是否强制刷新（跳过缓存）"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    批量获取港股/美股实时行情（A股请使用 market_quotes 批量查询）
+
+    同一市场的代码合并为一次多代码请求（yfinance 多代码下载 / AKShare 全市场快照），
+    结果逐只写入与 /{code}/quote 相同的缓存。
+
+    返回: {items: {原始代码: 行情}, failed: [未取到的代码], unsupported: [非港股/美股代码]}
+    """
+    import asyncio
+    from app.services.foreign_stock_service import ForeignStockService
+
+    raw_codes = [c.strip() for c in codes.split(",") if c.strip()]
+    if len(raw_codes) > 500:
+        raise HTTPException(status_code=400, detail="单次最多查询500只股票")
+
+    by_market: Dict[str, Dict[str, str]] = {"HK": {}, "US": {}}
+    unsupported = []
+    for raw in raw_codes:
+        market, normalized_code = _detect_market_and_code(raw)
+        if market in by_market:
+            by_market[market][normalized_code] = raw
+        else:
+            unsupported.append(raw)
+
+    service = ForeignStockService(db=get_mongo_db())
+    markets = [m for m in by_market if by_market[m]]
+    results = await asyncio.gather(
+        *[service.get_quotes(m, list(by_market[m]), force_refresh) for m in markets],
+        return_exceptions=True
+    )
+
+    items: Dict[str, Any] = {}
+    failed = []
+    for market, result in zip(markets, results):
+        if isinstance(result, Exception):
+            logger.error(f"批量获取{market}行情失败: {result}")
+            result = {}
+        for normalized_code, raw in by_market[market].items():
+            if normalized_code in result:
+                items[raw] = result[normalized_code]
+            else:
+                failed.append(raw)
+
+    return ok(data={"items": items, "failed": failed, "unsupported": unsupported})
+
+
 @router.get("/{code}/quote", response_model=dict)
 async def get_quote(
     code: str,
@@ -425,6 +477,7 @@ async def get_kline(
     limit: int = 120,
     adj: str = "none",
     force_refresh: bool = Query(False, description="是否强制刷新（跳过缓存）"),
+    compact: bool = Query(False, description="紧凑列式输出（columns 并行数组代替 items）"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -433,191 +486,36 @@ async def get_kline(
     period: day/week/month/5m/15m/30m/60m
     adj: none/qfq/hfq
     force_refresh: 是否强制刷新（跳过缓存）
+    compact: 是否返回列式数据 {fields, columns: {time: [...], open: [...], ...}}
 
     🔥 新增功能：当天实时K线数据
     - 交易时间内（09:30-15:00）：从 market_quotes 获取实时数据
     - 收盘后：检查历史数据是否有当天数据，没有则从 market_quotes 获取
+
+    ⚡ 全异步查询 + 热点股票短TTL内存缓存，见 app/services/kline_service.py
     """
-    import logging
-    from datetime import datetime, timedelta, time as dtime
-    from zoneinfo import ZoneInfo
-    logger = logging.getLogger(__name__)
+    import asyncio
+    from app.services.kline_service import VALID_PERIODS, get_kline_service
 
-    valid_periods = {"day","week","month","5m","15m","30m","60m"}
-    if period not in valid_periods:
+    if period not in VALID_PERIODS:
         raise HTTPException(status_code=400, detail=f"不支持的period: {period}")
 
     # 检测市场类型
     market, normalized_code = _detect_market_and_code(code)
 
-    # 港股和美股：使用新服务
-    if market in ['HK', 'US']:
-        from app.services.foreign_stock_service import ForeignStockService
-
-        db = get_mongo_db()  # 不需要 await，直接返回数据库对象
-        service = ForeignStockService(db=db)
-
-        try:
-            kline_data = await service.get_kline(market, normalized_code, period, limit, force_refresh)
-            return ok(data={
-                'code': normalized_code,
-                'period': period,
-                'items': kline_data,
-                'source': 'cache_or_api'
-            })
-        except Exception as e:
-            logger.error(f"获取{market}股票{code}K线数据失败: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"获取K线数据失败: {str(e)}"
-            )
-
-    # A股：使用现有逻辑
-    code_padded = normalized_code
-    adj_norm = None if adj in (None, "none", "", "null") else adj
-    items = None
-    source = None
-
-    # 周期映射：前端 -> MongoDB
-    period_map = {
-        "day": "daily",
-        "week": "weekly",
-        "month": "monthly",
-        "5m": "5min",
-        "15m": "15min",
-        "30m": "30min",
-        "60m": "60min"
-    }
-    mongodb_period = period_map.get(period, "daily")
-
-    # 获取当前时间（北京时间）
-    from app.core.config import settings
-    tz = ZoneInfo(settings.TIMEZONE)
-    now = datetime.now(tz)
-    today_str_yyyymmdd = now.strftime("%Y%m%d")  # 格式：20251028（用于查询）
-    today_str_formatted = now.strftime("%Y-%m-%d")  # 格式：2025-10-28（用于返回）
-
-    # 1. 优先从 MongoDB 缓存获取
     try:
-        from tradingagents.dataflows.cache.mongodb_cache_adapter import get_mongodb_cache_adapter
-        adapter = get_mongodb_cache_adapter()
-
-        # 计算日期范围
-        end_date = now.strftime("%Y-%m-%d")
-        start_date = (now - timedelta(days=limit * 2)).strftime("%Y-%m-%d")
-
-        logger.info(f"🔍 尝试从 MongoDB 获取 K 线数据: {code_padded}, period={period} (MongoDB: {mongodb_period}), limit={limit}")
-        df = adapter.get_historical_data(code_padded, start_date, end_date, period=mongodb_period)
-
-        if df is not None and not df.empty:
-            # 转换 DataFrame 为列表格式
-            items = []
-            for _, row in df.tail(limit).iterrows():
-                items.append({
-                    "time": row.get("trade_date", row.get("date", "")),  # 前端期望 time 字段
-                    "open": float(row.get("open", 0)),
-                    "high": float(row.get("high", 0)),
-                    "low": float(row.get("low", 0)),
-                    "close": float(row.get("close", 0)),
-                    "volume": float(row.get("volume", row.get("vol", 0))),
-                    "amount": float(row.get("amount", 0)) if "amount" in row else None,
-                })
-            source = "mongodb"
-            logger.info(f"✅ 从 MongoDB 获取到 {len(items)} 条 K 线数据")
+        data = await get_kline_service().get_kline(
+            market, normalized_code, period, limit, adj, force_refresh=force_refresh, compact=compact
+        )
+    except asyncio.TimeoutError:
+        logger.error(f"❌ 外部 API 获取 K 线超时（10秒）: {code}")
+        raise HTTPException(status_code=504, detail="获取K线数据超时，请稍后重试")
     except Exception as e:
-        logger.warning(f"⚠️ MongoDB 获取 K 线失败: {e}")
-
-    # 2. 如果 MongoDB 没有数据，降级到外部 API（带超时保护）
-    if not items:
-        logger.info(f"📡 MongoDB 无数据，降级到外部 API")
-        try:
-            import asyncio
-            from app.services.data_sources.manager import DataSourceManager
-
-            mgr = DataSourceManager()
-            # 添加 10 秒超时保护
-            items, source = await asyncio.wait_for(
-                asyncio.to_thread(mgr.get_kline_with_fallback, code_padded, period, limit, adj_norm),
-                timeout=10.0
-            )
-        except asyncio.TimeoutError:
-            logger.error(f"❌ 外部 API 获取 K 线超时（10秒）")
-            raise HTTPException(status_code=504, detail="获取K线数据超时，请稍后重试")
-        except Exception as e:
-            logger.error(f"❌ 外部 API 获取 K 线失败: {e}")
-            raise HTTPException(status_code=500, detail=f"获取K线数据失败: {str(e)}")
-
-    # 🔥 3. 检查是否需要添加当天实时数据（仅针对日线）
-    if period == "day" and items:
-        try:
-            # 检查历史数据中是否已有当天的数据（支持两种日期格式）
-            has_today_data = any(
-                item.get("time") in [today_str_yyyymmdd, today_str_formatted]
-                for item in items
-            )
-
-            # 判断是否在交易时间内或收盘后缓冲期
-            current_time = now.time()
-            is_weekday = now.weekday() < 5  # 周一到周五
-
-            # 交易时间：9:30-11:30, 13:00-15:00
-            # 收盘后缓冲期：15:00-15:30（确保获取到收盘价）
-            is_trading_time = (
-                is_weekday and (
-                    (dtime(9, 30) <= current_time <= dtime(11, 30)) or
-                    (dtime(13, 0) <= current_time <= dtime(15, 30))
-                )
-            )
-
-            # 🔥 只在交易时间或收盘后缓冲期内才添加实时数据
-            # 非交易日（周末、节假日）不添加实时数据
-            should_fetch_realtime = is_trading_time
-
-            if should_fetch_realtime:
-                logger.info(f"🔥 尝试从 market_quotes 获取当天实时数据: {code_padded} (交易时间: {is_trading_time}, 已有当天数据: {has_today_data})")
-
-                db = get_mongo_db()
-                market_quotes_coll = db["market_quotes"]
-
-                # 查询当天的实时行情
-                realtime_quote = await market_quotes_coll.find_one({"code": code_padded})
-
-                if realtime_quote:
-                    # 🔥 构造当天的K线数据（使用统一的日期格式 YYYY-MM-DD）
-                    today_kline = {
-                        "time": today_str_formatted,  # 🔥 使用 YYYY-MM-DD 格式，与历史数据保持一致
-                        "open": float(realtime_quote.get("open", 0)),
-                        "high": float(realtime_quote.get("high", 0)),
-                        "low": float(realtime_quote.get("low", 0)),
-                        "close": float(realtime_quote.get("close", 0)),
-                        "volume": float(realtime_quote.get("volume", 0)),
-                        "amount": float(realtime_quote.get("amount", 0)),
-                    }
-
-                    # 如果历史数据中已有当天数据，替换；否则追加
-                    if has_today_data:
-                        # 替换最后一条数据（假设最后一条是当天的）
-                        items[-1] = today_kline
-                        logger.info(f"✅ 替换当天K线数据: {code_padded}")
-                    else:
-                        # 追加到末尾
-                        items.append(today_kline)
-                        logger.info(f"✅ 追加当天K线数据: {code_padded}")
-
-                    source = f"{source}+market_quotes"
-                else:
-                    logger.warning(f"⚠️ market_quotes 中未找到当天数据: {code_padded}")
-        except Exception as e:
-            logger.warning(f"⚠️ 获取当天实时数据失败（忽略）: {e}")
-
-    data = {
-        "code": code_padded,
-        "period": period,
-        "limit": limit,
-        "adj": adj if adj else "none",
-        "source": source,
-        "items": items or []
-    }
+        logger.error(f"获取{market}股票{code}K线数据失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取K线数据失败: {str(e)}"
+        )
     return ok(data)
 
 
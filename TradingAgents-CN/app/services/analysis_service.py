@@ -22,6 +22,7 @@ init_logging()
 
 from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.dataflows.batch_context import batch_scope
 from app.services.simple_analysis_service import create_analysis_config, get_provider_by_model_name
 from app.models.analysis import (
     AnalysisParameters, AnalysisResult, AnalysisTask, AnalysisBatch,
@@ -202,7 +203,8 @@ class AnalysisService:
                 progress_tracker.update_progress(message)
 
             # 调用现有的分析方法（同步调用，传递进度回调）
-            _, decision = trading_graph.propagate(task.symbol, analysis_date, progress_callback)
+            with batch_scope(task.batch_id):
+                _, decision = trading_graph.propagate(task.symbol, analysis_date, progress_callback)
 
             execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
 
@@ -317,7 +319,8 @@ class AnalysisService:
             analysis_date = task.parameters.analysis_date or datetime.now().strftime("%Y-%m-%d")
 
             # 调用现有的分析方法（同步调用）
-            _, decision = trading_graph.propagate(task.symbol, analysis_date)
+            with batch_scope(task.batch_id):
+                _, decision = trading_graph.propagate(task.symbol, analysis_date)
 
             execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
 
@@ -687,7 +690,8 @@ class AnalysisService:
             analysis_date = task.parameters.analysis_date or datetime.now().strftime("%Y-%m-%d")
             
             # 调用现有的分析方法
-            _, decision = trading_graph.propagate(task.symbol, analysis_date)
+            with batch_scope(task.batch_id):
+                _, decision = trading_graph.propagate(task.symbol, analysis_date)
             
             execution_time = (datetime.utcnow() - start_time).total_seconds()
             
@@ -127,6 +127,14 @@ class BasicsSyncService:
         await db[STATUS_COLLECTION].update_one({"job": JOB_KEY}, {"$set": stats}, upsert=True)
         self._last_status = {k: v for k, v in stats.items() if k != "_id"}
 
+    async def _refresh_search_index(self) -> None:
+        """基础信息写入完成后刷新A股搜索内存索引"""
+        try:
+            from app.services.stock_search_index import get_stock_search_index
+            await get_stock_search_index().refresh("CN")
+        except Exception as e:
+            logger.warning(f"Failed to refresh stock search index: {e}")
+
     async def _execute_bulk_write_with_retry(
         self,
         db: AsyncIOMotorDatabase,
@@ -344,6 +352,7 @@ class BasicsSyncService:
             logger.info(
                 f"Stock basics sync finished: total={stats.total} inserted={inserted} updated={updated} errors={errors} trade_date={latest_trade_date}"
             )
+            await self._refresh_search_index()
             return stats.__dict__
 
         except Exception as e:
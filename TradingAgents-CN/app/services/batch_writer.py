@@ -0,0 +1,280 @@
+"""
+BufferedBatchWriter: 进程内缓冲批量写入（操作日志、Token 使用记录等追加型文档）
+- 请求路径只做内存入队，后台任务按数量阈值或时间阈值用 insert_many 批量落库
+- 缓冲区有上限：满时先唤醒刷写并短暂等待（背压），仍无空间则丢弃并计数
+- 写入失败的批次在缓冲区有余量时放回队首重试一次，否则计入丢弃
+- 应用关闭时刷写剩余文档；写入器未启动时调用方应回退到直接 insert_one
+- paused() 刷写后暂停落库，供需要与写入互斥的对账任务使用
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("webapi")
+
+FlushHook = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class BufferedBatchWriter:
+    def __init__(
+        self,
+        collection_name: str,
+        max_batch: int = 200,
+        flush_interval: float = 1.0,
+        max_buffer: int = 10000,
+        backpressure_timeout: float = 0.05,
+        on_flush: Optional[FlushHook] = None,
+        collection_getter: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        self.collection_name = collection_name
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.max_batch, max_buffer)
+        self.backpressure_timeout = backpressure_timeout
+        self._on_flush = on_flush
+        self._collection_getter = collection_getter
+
+        # (文档, 已失败次数)
+        self._buffer: Deque[Tuple[Dict[str, Any], int]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._last_reported_drops = 0
+        self._stopping = False
+
+        self.stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped_full": 0,
+            "dropped_error": 0,
+            "retried": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            f"🧺 批量写入器已启动: {self.collection_name} "
+            f"(batch={self.max_batch}, interval={self.flush_interval}s, buffer={self.max_buffer})"
+        )
+
+    async def stop(self) -> None:
+        """停止后台任务并刷写剩余文档"""
+        task, self._task = self._task, None
+        if task is not None:
+            # 不取消正在进行的刷写，等待后台任务在当前批次结束后自行退出
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self._stopping = False
+        while self._buffer:
+            if await self._flush_once() == 0:
+                break
+        logger.info(f"🛑 批量写入器已停止: {self.collection_name} stats={self.stats}")
+
+    async def put(self, doc: Dict[str, Any]) -> bool:
+        """入队一条文档；返回 False 表示因缓冲区已满被丢弃"""
+        if len(self._buffer) >= self.max_buffer:
+            # 背压：唤醒刷写并短暂等待空间
+            self._wakeup.set()
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=self.backpressure_timeout)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._buffer) >= self.max_buffer:
+                self.stats["dropped_full"] += 1
+                return False
+
+        self._buffer.append((doc, 0))
+        self.stats["enqueued"] += 1
+        if len(self._buffer) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """立即刷写缓冲区中的全部文档，返回写入条数"""
+        total = 0
+        while self._buffer:
+            written = await self._flush_once()
+            if written == 0:
+                break
+            total += written
+        return total
+
+    @asynccontextmanager
+    async def paused(self) -> AsyncIterator[None]:
+        """刷写缓冲区后暂停落库：持有期间不会有批次写入，也不会有 on_flush 后置处理在执行
+
+        期间入队的文档留在缓冲区，退出后照常刷写
+        """
+        if self._flush_lock is None:
+            yield
+            return
+        await self.flush()
+        async with self._flush_lock:
+            yield
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                # 数量阈值触发时可能积压多批，一次排空
+                while self._buffer:
+                    if await self._flush_once() == 0:
+                        break
+                    if len(self._buffer) < self.max_batch:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pragma: no cover - _flush_once 已兜底
+                logger.error(f"❌ 批量写入器后台任务异常 ({self.collection_name}): {e}")
+
+    async def _flush_once(self) -> int:
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            items = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+            batch = [doc for doc, _ in items]
+            self._space.set()
+
+            start = time.perf_counter()
+            try:
+                collection = self._get_collection()
+                await collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                # 仅主键冲突：重试批次中上次已写入的文档，其余文档本次已写入成功
+                if not _only_duplicate_keys(e):
+                    return self._handle_failure(items, e)
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], round(elapsed_ms, 2))
+
+            # 后置处理（如预聚合 $inc）与落库同在锁内，paused() 期间不会只完成一半
+            if self._on_flush is not None:
+                try:
+                    await self._on_flush(batch)
+                except Exception as e:
+                    logger.warning(f"⚠️ 批量写入后置处理失败 ({self.collection_name}): {e}")
+
+        self._report_drops()
+        return len(batch)
+
+    def _handle_failure(self, items: List[Tuple[Dict[str, Any], int]], error: Exception) -> int:
+        # 失败批次只重试一次；insert_many 已为文档回填 _id，重试时已写入的部分按主键冲突跳过
+        retry = all(attempts == 0 for _, attempts in items) and \
+            len(self._buffer) + len(items) <= self.max_buffer
+        if retry:
+            for doc, attempts in reversed(items):
+                self._buffer.appendleft((doc, attempts + 1))
+            self.stats["retried"] += len(items)
+        else:
+            self.stats["dropped_error"] += len(items)
+        logger.error(
+            f"❌ 批量写入失败 ({self.collection_name}, {len(items)} 条, "
+            f"{'稍后重试' if retry else '已丢弃'}): {error}"
+        )
+        return 0
+
+    def _get_collection(self):
+        if self._collection_getter is not None:
+            return self._collection_getter(self.collection_name)
+        from app.core.database import get_mongo_db
+        return get_mongo_db()[self.collection_name]
+
+    def _report_drops(self) -> None:
+        drops = self.stats["dropped_full"] + self.stats["dropped_error"]
+        if drops > self._last_reported_drops:
+            logger.warning(
+                f"⚠️ 批量写入器 {self.collection_name} 累计丢弃 {drops} 条 "
+                f"(缓冲区满 {self.stats['dropped_full']}, 写入失败 {self.stats['dropped_error']})"
+            )
+            self._last_reported_drops = drops
+
+
+def _only_duplicate_keys(error: Exception) -> bool:
+    details = getattr(error, "details", None) or {}
+    write_errors = details.get("writeErrors") or []
+    return bool(write_errors) and not details.get("writeConcernErrors") and \
+        all(err.get("code") == 11000 for err in write_errors)
+
+
+_writers: Dict[str, BufferedBatchWriter] = {}
+
+
+def register_batch_writer(writer: BufferedBatchWriter) -> BufferedBatchWriter:
+    _writers[writer.collection_name] = writer
+    return writer
+
+
+def get_batch_writer(collection_name: str) -> Optional[BufferedBatchWriter]:
+    """返回已启动的写入器；未注册或未启动时返回 None（调用方回退到直接写入）"""
+    writer = _writers.get(collection_name)
+    if writer is not None and writer.running:
+        return writer
+    return None
+
+
+def get_batch_writer_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: {**w.stats, "buffered": w.buffered, "running": w.running} for name, w in _writers.items()}
+
+
+async def start_batch_writers() -> None:
+    """按配置注册并启动操作日志 / Token 使用记录写入器（应用启动时调用）"""
+    from app.core.config import settings
+
+    if not settings.BATCH_WRITER_ENABLED:
+        logger.info("⏸️ 批量写入器已禁用，操作日志与使用记录将逐条写入")
+        return
+
+    from app.services.usage_statistics_service import update_rollups_for_records
+
+    common = dict(
+        max_batch=settings.BATCH_WRITER_MAX_BATCH,
+        flush_interval=settings.BATCH_WRITER_FLUSH_INTERVAL_SECONDS,
+        max_buffer=settings.BATCH_WRITER_MAX_BUFFER,
+    )
+    register_batch_writer(BufferedBatchWriter("operation_logs", **common)).start()
+    register_batch_writer(BufferedBatchWriter("token_usage", on_flush=update_rollups_for_records, **common)).start()
+
+
+async def stop_batch_writers() -> None:
+    """刷写并停止所有写入器（应用关闭时、关闭数据库连接之前调用）"""
+    for writer in list(_writers.values()):
+        try:
+            await writer.stop()
+        except Exception as e:
+            logger.warning(f"Batch writer shutdown error ({writer.collection_name}): {e}")
@@ -10,6 +10,7 @@ import logging
 import json
 import re
 import asyncio
+import functools
 from collections import defaultdict
 
 # 复用现有缓存系统
@@ -38,6 +39,40 @@ class ForeignStockService:
         }
     }
 
+    # 行情缓存键（get_quote 与 get_quotes 共用）
+    QUOTE_CACHE_SOURCES = {"HK": "hk_realtime_quote", "US": "us_realtime_quote"}
+
+    # 支持多代码请求的数据源：{数据源名: (handler_name, 批量方法名)}
+    BATCH_QUOTE_SOURCES = {
+        "HK": {
+            'yahoo_finance': ('yfinance', '_get_hk_quotes_from_yfinance_batch'),
+            'akshare': ('akshare', '_get_hk_quotes_from_akshare_batch'),
+        },
+        "US": {
+            'yahoo_finance': ('yfinance', '_get_us_quotes_from_yfinance_batch'),
+        },
+    }
+    BATCH_KLINE_SOURCES = {
+        "HK": {
+            'yahoo_finance': ('yfinance', '_get_hk_klines_from_yfinance_batch'),
+        },
+        "US": {
+            'yahoo_finance': ('yfinance', '_get_us_klines_from_yfinance_batch'),
+        },
+    }
+    DEFAULT_SOURCE_ORDER = {
+        "HK": ('yahoo_finance', 'akshare', 'finnhub'),
+        "US": ('yahoo_finance', 'alpha_vantage', 'finnhub'),
+    }
+    YF_INTERVALS = {
+        'day': '1d', 'week': '1wk', 'month': '1mo',
+        '5m': '5m', '15m': '15m', '30m': '30m', '60m': '60m'
+    }
+    # 单次多代码请求的最大代码数
+    BATCH_CHUNK_SIZE = 100
+    # 不支持多代码的数据源逐只请求时的并发数
+    BATCH_SINGLE_CONCURRENCY = 4
+
     def __init__(self, db=None):
         # 使用统一缓存系统（自动选择 MongoDB/Redis/File）
         self.cache = get_cache()
@@ -122,6 +157,334 @@ class ForeignStockService:
         else:
             raise ValueError(f"不支持的市场类型: {market}")
     
+    async def get_quotes(self, market: str, codes: List[str], force_refresh: bool = False) -> Dict[str, Dict]:
+        """
+        批量获取实时行情（自选股、批量分析等多代码场景）
+
+        Args:
+            market: 市场类型 (HK/US)
+            codes: 股票代码列表
+            force_refresh: 是否强制刷新（跳过缓存）
+
+        Returns:
+            {code: 行情数据}，所有数据源均失败的代码不在结果中
+
+        流程：
+        1. 逐只检查缓存（与 get_quote 共用缓存键）
+        2. 未命中的代码按数据源优先级获取：支持多代码的数据源一次请求一批
+           （yfinance 多代码下载、AKShare 全市场快照），其余数据源逐只并发获取
+        3. 结果逐只写回缓存，之后的 get_quote 可直接命中
+        """
+        if market not in self.BATCH_QUOTE_SOURCES:
+            raise ValueError(f"不支持的市场类型: {market}")
+
+        codes = list(dict.fromkeys(c for c in codes if c))
+        cache_source = self.QUOTE_CACHE_SOURCES[market]
+        results = {}
+        missing = []
+        for code in codes:
+            cached = None if force_refresh else self._load_cached(code, cache_source)
+            quote = self._parse_cached_data(cached, market, code) if cached else None
+            if quote:
+                results[code] = quote
+            else:
+                missing.append(code)
+
+        if missing:
+            logger.info(f"🔄 批量获取{market}行情: 缓存命中 {len(results)}，需请求 {len(missing)}")
+            fetched = await self._fetch_batch(
+                market, missing,
+                batch_handlers={
+                    name: (handler_name, getattr(self, method))
+                    for name, (handler_name, method) in self.BATCH_QUOTE_SOURCES[market].items()
+                },
+                single_handlers=self._single_quote_handlers(market),
+                format_func=self._format_hk_quote if market == 'HK' else self._format_us_quote,
+            )
+            for code, quote in fetched.items():
+                self.cache.save_stock_data(
+                    symbol=code,
+                    data=json.dumps(quote, ensure_ascii=False),
+                    data_source=cache_source
+                )
+                results[code] = quote
+            failed = [c for c in missing if c not in fetched]
+            if failed:
+                logger.warning(f"⚠️ 批量获取{market}行情失败 {len(failed)} 只: {failed[:10]}")
+
+        return {code: results[code] for code in codes if code in results}
+
+    async def get_klines(self, market: str, codes: List[str], period: str = 'day',
+                         limit: int = 120, force_refresh: bool = False) -> Dict[str, List[Dict]]:
+        """
+        批量获取K线数据
+
+        Args:
+            market: 市场类型 (HK/US)
+            codes: 股票代码列表
+            period: 周期 (day/week/month)
+            limit: 数据条数
+            force_refresh: 是否强制刷新
+
+        Returns:
+            {code: K线数据列表}，所有数据源均失败的代码不在结果中
+        """
+        if market not in self.BATCH_QUOTE_SOURCES:
+            raise ValueError(f"不支持的市场类型: {market}")
+
+        codes = list(dict.fromkeys(c for c in codes if c))
+        cache_source = f"{market.lower()}_kline_{period}_{limit}"
+        results = {}
+        missing = []
+        for code in codes:
+            cached = None if force_refresh else self._load_cached(code, cache_source)
+            kline = self._parse_cached_kline(cached) if cached else None
+            if kline:
+                results[code] = kline
+            else:
+                missing.append(code)
+
+        if missing:
+            logger.info(f"🔄 批量获取{market}K线: 缓存命中 {len(results)}，需请求 {len(missing)}")
+            fetched = await self._fetch_batch(
+                market, missing,
+                batch_handlers={
+                    name: (handler_name, functools.partial(getattr(self, method), period=period, limit=limit))
+                    for name, (handler_name, method) in self.BATCH_KLINE_SOURCES[market].items()
+                },
+                single_handlers={
+                    name: (handler_name, functools.partial(handler, period=period, limit=limit))
+                    for name, (handler_name, handler) in self._single_kline_handlers(market).items()
+                },
+            )
+            for code, kline in fetched.items():
+                self.cache.save_stock_data(
+                    symbol=code,
+                    data=json.dumps(kline, ensure_ascii=False),
+                    data_source=cache_source
+                )
+                results[code] = kline
+
+        return {code: results[code] for code in codes if code in results}
+
+    def _load_cached(self, code: str, cache_source: str):
+        cache_key = self.cache.find_cached_stock_data(symbol=code, data_source=cache_source)
+        return self.cache.load_stock_data(cache_key) if cache_key else None
+
+    async def _fetch_batch(self, market: str, codes: List[str], batch_handlers: Dict,
+                           single_handlers: Dict, format_func=None) -> Dict[str, object]:
+        """
+        按数据源优先级为一组代码获取数据
+
+        - batch_handlers: {数据源名: (handler_name, func(codes) -> {code: data})}，一次请求多只
+        - single_handlers: {数据源名: (handler_name, func(code) -> data)}，逐只请求（限制并发）
+        - 每个数据源只处理上一数据源未取到的代码
+        """
+        source_priority = await self._get_source_priority(market)
+        known = set(batch_handlers) | set(single_handlers)
+        valid_priority = list(dict.fromkeys(s.lower() for s in source_priority if s.lower() in known))
+        if not valid_priority:
+            valid_priority = list(self.DEFAULT_SOURCE_ORDER[market])
+
+        remaining = list(codes)
+        results = {}
+        for source_name in valid_priority:
+            if not remaining:
+                break
+            if source_name in batch_handlers:
+                handler_name, handler_func = batch_handlers[source_name]
+                got = {}
+                for start in range(0, len(remaining), self.BATCH_CHUNK_SIZE):
+                    chunk = remaining[start:start + self.BATCH_CHUNK_SIZE]
+                    try:
+                        got.update(await asyncio.to_thread(handler_func, chunk) or {})
+                    except Exception as e:
+                        logger.warning(f"⚠️ {source_name}批量获取失败 ({len(chunk)} 只): {e}")
+            elif source_name in single_handlers:
+                handler_name, handler_func = single_handlers[source_name]
+                got = await self._fetch_each(handler_func, remaining, source_name)
+            else:
+                continue
+
+            for code, data in got.items():
+                if data:
+                    results[code] = format_func(data, code, handler_name) if format_func else data
+            logger.info(f"✅ {handler_name}获取{market}数据 {len(got)}/{len(remaining)} 只")
+            remaining = [c for c in remaining if c not in results]
+
+        return results
+
+    async def _fetch_each(self, handler_func, codes: List[str], source_name: str) -> Dict[str, object]:
+        """不支持多代码的数据源：逐只请求，限制并发避免触发限流"""
+        semaphore = asyncio.Semaphore(self.BATCH_SINGLE_CONCURRENCY)
+
+        async def _one(code: str):
+            async with semaphore:
+                try:
+                    return code, await asyncio.to_thread(handler_func, code)
+                except Exception as e:
+                    logger.debug(f"{source_name}获取失败 ({code}): {e}")
+                    return code, None
+
+        pairs = await asyncio.gather(*[_one(code) for code in codes])
+        return {code: data for code, data in pairs if data}
+
+    def _single_quote_handlers(self, market: str) -> Dict:
+        if market == 'HK':
+            return {
+                'yahoo_finance': ('yfinance', self._get_hk_quote_from_yfinance),
+                'akshare': ('akshare', self._get_hk_quote_from_akshare),
+            }
+        return {
+            'alpha_vantage': ('alpha_vantage', self._get_us_quote_from_alpha_vantage),
+            'yahoo_finance': ('yfinance', self._get_us_quote_from_yfinance),
+            'finnhub': ('finnhub', self._get_us_quote_from_finnhub),
+        }
+
+    def _single_kline_handlers(self, market: str) -> Dict:
+        if market == 'HK':
+            return {
+                'akshare': ('akshare', self._get_hk_kline_from_akshare),
+                'yahoo_finance': ('yfinance', self._get_hk_kline_from_yfinance),
+                'finnhub': ('finnhub', self._get_hk_kline_from_finnhub),
+            }
+        return {
+            'alpha_vantage': ('alpha_vantage', self._get_us_kline_from_alpha_vantage),
+            'yahoo_finance': ('yfinance', self._get_us_kline_from_yfinance),
+            'finnhub': ('finnhub', self._get_us_kline_from_finnhub),
+        }
+
+    def _yfinance_download(self, tickers: List[str], **kwargs):
+        """yfinance 多代码下载（一次 HTTP 批量请求，按代码分组列）"""
+        import yfinance as yf
+
+        return yf.download(
+            tickers=tickers, group_by='ticker', auto_adjust=False,
+            threads=True, progress=False, **kwargs
+        )
+
+    @staticmethod
+    def _frame_for_ticker(df, ticker: str, single: bool):
+        """从多代码下载结果中取出单只股票的数据（去掉全空行）"""
+        import pandas as pd
+
+        if df is None or df.empty:
+            return None
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker not in df.columns.get_level_values(0):
+                return None
+            sub = df[ticker]
+        elif single:
+            sub = df
+        else:
+            return None
+        sub = sub.dropna(subset=['Close'])
+        return sub if not sub.empty else None
+
+    @staticmethod
+    def _frame_to_kline(frame, limit: int) -> List[Dict]:
+        kline_data = []
+        for date, row in frame.iterrows():
+            date_str = date.strftime('%Y-%m-%d')
+            volume = row['Volume']
+            kline_data.append({
+                'date': date_str,
+                'trade_date': date_str,  # 前端需要这个字段
+                'open': float(row['Open']),
+                'high': float(row['High']),
+                'low': float(row['Low']),
+                'close': float(row['Close']),
+                'volume': int(volume) if volume == volume else 0
+            })
+        return kline_data[-limit:]
+
+    def _get_us_quotes_from_yfinance_batch(self, codes: List[str]) -> Dict[str, Dict]:
+        """yfinance 批量获取美股行情（名称取自已缓存的基础信息，避免逐只请求 info）"""
+        tickers = [code.upper() for code in codes]
+        df = self._yfinance_download(tickers, period='5d', interval='1d')
+        results = {}
+        for code, ticker in zip(codes, tickers):
+            frame = self._frame_for_ticker(df, ticker, single=len(tickers) == 1)
+            if frame is None:
+                continue
+            latest = frame.iloc[-1]
+            volume = latest['Volume']
+            results[code] = {
+                'name': self._cached_name(code, 'us_basic_info'),
+                'price': float(latest['Close']),
+                'open': float(latest['Open']),
+                'high': float(latest['High']),
+                'low': float(latest['Low']),
+                'volume': int(volume) if volume == volume else 0,
+                'change_percent': round(((latest['Close'] - latest['Open']) / latest['Open'] * 100), 2),
+                'trade_date': frame.index[-1].strftime('%Y-%m-%d'),
+                'currency': 'USD'
+            }
+        return results
+
+    def _get_hk_quotes_from_yfinance_batch(self, codes: List[str]) -> Dict[str, Dict]:
+        """yfinance 批量获取港股行情"""
+        tickers = [self.hk_provider._normalize_hk_symbol(code) for code in codes]
+        df = self._yfinance_download(tickers, period='5d', interval='1d')
+        results = {}
+        for code, ticker in zip(codes, tickers):
+            frame = self._frame_for_ticker(df, ticker, single=len(tickers) == 1)
+            if frame is None:
+                continue
+            latest = frame.iloc[-1]
+            results[code] = {
+                'symbol': ticker,
+                'name': self._cached_name(code, 'hk_basic_info'),
+                'price': float(latest['Close']),
+                'open': float(latest['Open']),
+                'high': float(latest['High']),
+                'low': float(latest['Low']),
+                'volume': latest['Volume'],
+                'timestamp': frame.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
+                'currency': 'HKD'
+            }
+        return results
+
+    def _get_hk_quotes_from_akshare_batch(self, codes: List[str]) -> Dict[str, Dict]:
+        """AKShare 全市场港股快照：一次请求覆盖所有代码"""
+        from tradingagents.dataflows.providers.hk.improved_hk import get_hk_stock_infos_akshare
+
+        infos = get_hk_stock_infos_akshare(codes)
+        return {code: info for code, info in infos.items() if info.get('price')}
+
+    def _get_us_klines_from_yfinance_batch(self, codes: List[str], period: str, limit: int) -> Dict[str, List[Dict]]:
+        """yfinance 批量获取美股K线"""
+        tickers = [code.upper() for code in codes]
+        df = self._yfinance_download(tickers, period=f'{limit}d', interval=self.YF_INTERVALS.get(period, '1d'))
+        results = {}
+        for code, ticker in zip(codes, tickers):
+            frame = self._frame_for_ticker(df, ticker, single=len(tickers) == 1)
+            if frame is not None:
+                results[code] = self._frame_to_kline(frame, limit)
+        return results
+
+    def _get_hk_klines_from_yfinance_batch(self, codes: List[str], period: str, limit: int) -> Dict[str, List[Dict]]:
+        """yfinance 批量获取港股K线"""
+        tickers = [self.hk_provider._normalize_hk_symbol(code) for code in codes]
+        df = self._yfinance_download(tickers, period=f'{limit}d', interval=self.YF_INTERVALS.get(period, '1d'))
+        results = {}
+        for code, ticker in zip(codes, tickers):
+            frame = self._frame_for_ticker(df, ticker, single=len(tickers) == 1)
+            if frame is not None:
+                results[code] = self._frame_to_kline(frame, limit)
+        return results
+
+    def _cached_name(self, code: str, info_source: str) -> Optional[str]:
+        """从已缓存的基础信息中取股票名称（没有则返回 None，由格式化函数补默认名）"""
+        try:
+            cached = self._load_cached(code, info_source)
+            if cached:
+                data = json.loads(cached) if isinstance(cached, str) else cached
+                return data.get('name')
+        except Exception:
+            pass
+        return None
+
     async def _get_hk_quote(self, code: str, force_refresh: bool = False) -> Dict:
         """
         获取港股实时行情（带请求去重）
@@ -395,21 +758,7 @@ class ForeignStockService:
                 raise Exception(f"无法获取美股{code}的行情数据：所有数据源均失败")
 
             # 5. 格式化数据
-            formatted_data = {
-                'code': code,
-                'name': quote_data.get('name', f'美股{code}'),
-                'market': 'US',
-                'price': quote_data.get('price'),
-                'open': quote_data.get('open'),
-                'high': quote_data.get('high'),
-                'low': quote_data.get('low'),
-                'volume': quote_data.get('volume'),
-                'change_percent': quote_data.get('change_percent'),
-                'trade_date': quote_data.get('trade_date'),
-                'currency': quote_data.get('currency', 'USD'),
-                'source': data_source,
-                'updated_at': datetime.now().isoformat()
-            }
+            formatted_data = self._format_us_quote(quote_data, code, data_source)
 
             # 6. 保存到缓存
             self.cache.save_stock_data(
@@ -866,7 +1215,7 @@ class ForeignStockService:
         """格式化港股行情数据"""
         return {
             'code': code,
-            'name': data.get('name', f'港股{code}'),
+            'name': data.get('name') or f'港股{code}',
             'market': 'HK',
             'price': data.get('price') or data.get('close'),
             'open': data.get('open'),
@@ -879,12 +1228,30 @@ class ForeignStockService:
             'updated_at': datetime.now().isoformat()
         }
 
+    def _format_us_quote(self, data: Dict, code: str, source: str) -> Dict:
+        """格式化美股行情数据"""
+        return {
+            'code': code,
+            'name': data.get('name') or f'美股{code}',
+            'market': 'US',
+            'price': data.get('price'),
+            'open': data.get('open'),
+            'high': data.get('high'),
+            'low': data.get('low'),
+            'volume': data.get('volume'),
+            'change_percent': data.get('change_percent'),
+            'trade_date': data.get('trade_date'),
+            'currency': data.get('currency', 'USD'),
+            'source': source,
+            'updated_at': datetime.now().isoformat()
+        }
+
     def _format_hk_info(self, data: Dict, code: str, source: str) -> Dict:
         """格式化港股基础信息"""
         market_cap = data.get('market_cap')
         return {
             'code': code,
-            'name': data.get('name', f'港股{code}'),
+            'name': data.get('name') or f'港股{code}',
             'market': 'HK',
             'industry': data.get('industry'),
             'sector': data.get('sector'),
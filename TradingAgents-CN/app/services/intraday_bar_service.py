@@ -0,0 +1,338 @@
+"""
+IntradayBarService: 由行情快照聚合分钟K线（A股）
+- 行情采集每次 tick 把全市场快照喂给聚合器：价格更新 1 分钟 bar 的 OHLC，
+  累计成交量/成交额取相邻快照差值作为 bar 内的量/额
+- 1 分钟 bar 收盘后降采样合并到 5/15/30/60 分钟 bar（按交易时段对齐：
+  60 分钟 bar 为 10:30 / 11:30 / 14:00 / 15:00）
+- 到达 bar 结束时间（时段末 bar 额外等待 SESSION_END_GRACE 以取到收盘快照）后，
+  本次 tick 内所有收盘的 bar 一次 bulk_write 落库到 stock_intraday_bars
+- bar 的粒度受采集间隔限制：两次 tick 之间无快照的分钟不会产生 bar；每根 bar 记录合并的快照数 ticks，
+  KlineService 只在请求窗口内 bar 连续且每根至少 MIN_TICKS_PER_BAR 笔快照时才直接使用本地分钟K线
+- 累计量/额的差值基准按股票跨数据源保留（接口轮换时各数据源交替出现，按数据源分别保留会重复计量）；
+  累计值回落或切换数据源后放大超过 CROSS_SOURCE_MAX_RATIO 倍（单位不一致）时只重置基准，不计入成交量
+"""
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTRADAY_BARS_COLLECTION = "stock_intraday_bars"
+
+# 分钟数 -> K线周期名（与 stock_daily_quotes.period / KlineService.PERIOD_MAP 一致）
+PERIOD_NAMES = {1: "1min", 5: "5min", 15: "15min", 30: "30min", 60: "60min"}
+DOWNSAMPLE_MINUTES = (5, 15, 30, 60)
+
+SESSIONS = ((dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0)))
+# 开盘前集合竞价快照并入第一根 bar
+PRE_OPEN_START = dtime(9, 25)
+# 时段结束后仍接收快照（并入最后一根 bar）的宽限时间
+SESSION_END_GRACE = timedelta(minutes=2)
+# 本地分钟K线可直接对外提供时，每根已收盘 bar 至少合并的快照数（单笔快照的 bar 只有一个价格）
+MIN_TICKS_PER_BAR = 2
+# 切换数据源后累计值放大超过该倍数视为单位不一致（手/股、元/千元等），不计算差值
+CROSS_SOURCE_MAX_RATIO = 10.0
+
+
+def _at(ts: datetime, t: dtime) -> datetime:
+    return ts.replace(hour=t.hour, minute=t.minute, second=0, microsecond=0)
+
+
+def minute_bar_end(ts: datetime) -> Optional[datetime]:
+    """快照时间 -> 所属 1 分钟 bar 的结束时间（非交易时段返回 None）"""
+    for start_t, end_t in SESSIONS:
+        start, end = _at(ts, start_t), _at(ts, end_t)
+        if start_t == SESSIONS[0][0] and _at(ts, PRE_OPEN_START) <= ts < start:
+            return start + timedelta(minutes=1)
+        if start <= ts < end:
+            return ts.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        if end <= ts < end + SESSION_END_GRACE:
+            return end
+    return None
+
+
+def bucket_end(minute_end: datetime, minutes: int) -> datetime:
+    """1 分钟 bar 结束时间 -> N 分钟 bar 结束时间（按所在交易时段起点对齐）"""
+    for start_t, end_t in SESSIONS:
+        start, end = _at(minute_end, start_t), _at(minute_end, end_t)
+        if start < minute_end <= end:
+            elapsed = (minute_end - start).total_seconds() / 60
+            return min(end, start + timedelta(minutes=math.ceil(elapsed / minutes) * minutes))
+    return minute_end
+
+
+def next_bucket_end(end: datetime, minutes: int) -> Optional[datetime]:
+    """N 分钟 bar 结束时间 -> 同一交易日下一根 bar 的结束时间；当日收盘 bar 之后返回 None"""
+    for start_t, end_t in SESSIONS:
+        start, session_end = _at(end, start_t), _at(end, end_t)
+        if end < session_end:
+            return bucket_end(max(end, start) + timedelta(minutes=1), minutes)
+    return None
+
+
+def window_covered(bars: List[Dict[str, Any]], minutes: int, limit: int) -> bool:
+    """
+    bars（按时间升序，含 end / ticks）是否完整覆盖最近 limit 根 N 分钟 bar：
+    数量足够、相邻 bar 之间没有缺口、已收盘 bar 至少 MIN_TICKS_PER_BAR 笔快照（最后一根可为未收盘 bar）。
+    跨日只要求下一根是之后某日的首根 bar（不校验交易日历）
+    """
+    window = bars[-limit:] if limit > 0 else []
+    if len(window) < limit or not window:
+        return False
+    for i, bar in enumerate(window):
+        if bar.get("ticks", 0) < (1 if i == len(window) - 1 else MIN_TICKS_PER_BAR):
+            return False
+        if i == 0:
+            continue
+        prev_end = window[i - 1]["end"]
+        expected = next_bucket_end(prev_end, minutes)
+        if expected is None:
+            first = bucket_end(_at(bar["end"], SESSIONS[0][0]) + timedelta(minutes=1), minutes)
+            if bar["end"].date() <= prev_end.date() or bar["end"] != first:
+                return False
+        elif bar["end"] != expected:
+            return False
+    return True
+
+
+def is_session_end(ts: datetime) -> bool:
+    return any(ts == _at(ts, end_t) for _, end_t in SESSIONS)
+
+
+def _close_due(end: datetime, now: datetime) -> bool:
+    return now >= (end + SESSION_END_GRACE if is_session_end(end) else end)
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) else f
+
+
+def _cum_delta(cur: Optional[float], prev: Optional[float], same_source: bool) -> float:
+    """相邻两笔累计值的差；回落或疑似单位不一致时返回 0"""
+    if cur is None or prev is None or cur < prev:
+        return 0.0
+    if not same_source and prev > 0 and cur > prev * CROSS_SOURCE_MAX_RATIO:
+        return 0.0
+    return cur - prev
+
+
+class MinuteBarAggregator:
+    """纯内存聚合器（不做 IO，便于测试）；由单一协程调用，无需加锁"""
+
+    def __init__(self, downsample: Iterable[int] = DOWNSAMPLE_MINUTES) -> None:
+        self.downsample = tuple(downsample)
+        self._day: Optional[str] = None
+        # code -> {"volume", "amount", "source"}：上一笔快照（不区分数据源）的累计量/额
+        self._last: Dict[str, Dict[str, Any]] = {}
+        # (code, minutes) -> 未收盘的 bar
+        self._open: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+    def update(self, code: str, quote: Dict[str, Any], ts: datetime, source: Optional[str] = None) -> None:
+        """喂入一笔快照（code 为 6 位代码）"""
+        price = _to_float(quote.get("close"))
+        end = minute_bar_end(ts)
+        if price is None or price <= 0 or end is None:
+            return
+
+        day = ts.strftime("%Y%m%d")
+        if day != self._day:
+            self._day = day
+            self._last.clear()
+            self._open.clear()
+
+        cum_volume = _to_float(quote.get("volume"))
+        cum_amount = _to_float(quote.get("amount"))
+        last = self._last.get(code)
+        d_volume = d_amount = 0.0
+        if last is not None:
+            same_source = last["source"] == source
+            d_volume = _cum_delta(cum_volume, last["volume"], same_source)
+            d_amount = _cum_delta(cum_amount, last["amount"], same_source)
+        self._last[code] = {"volume": cum_volume, "amount": cum_amount, "source": source}
+
+        bar = self._open.get((code, 1))
+        if bar is not None and bar["end"] != end:
+            # 上一根 bar 未经 close_due 收盘（调用方未先收盘），直接合并到降采样周期
+            self._roll_up(self._open.pop((code, 1)))
+            bar = None
+        if bar is None:
+            self._open[(code, 1)] = {
+                "code": code, "minutes": 1, "end": end,
+                "open": price, "high": price, "low": price, "close": price,
+                "volume": d_volume, "amount": d_amount, "ticks": 1,
+            }
+            return
+        bar["high"] = max(bar["high"], price)
+        bar["low"] = min(bar["low"], price)
+        bar["close"] = price
+        bar["volume"] += d_volume
+        bar["amount"] += d_amount
+        bar["ticks"] += 1
+
+    def close_due(self, now: datetime) -> List[Dict[str, Any]]:
+        """收盘所有已到结束时间的 bar；返回收盘的 bar（含 1 分钟与降采样周期）"""
+        closed: List[Dict[str, Any]] = []
+        for key in [k for k, b in self._open.items() if k[1] == 1 and _close_due(b["end"], now)]:
+            bar = self._open.pop(key)
+            closed.append(bar)
+            self._roll_up(bar)
+        for key in [k for k, b in self._open.items() if k[1] != 1 and _close_due(b["end"], now)]:
+            closed.append(self._open.pop(key))
+        return closed
+
+    def peek(self, code: str, minutes: int) -> Optional[Dict[str, Any]]:
+        """当前未收盘的 bar（用于K线末尾的实时 bar）"""
+        bar = self._open.get((code, minutes))
+        if minutes == 1:
+            return dict(bar) if bar else None
+        # 合并尚未收盘的 1 分钟 bar
+        minute = self._open.get((code, 1))
+        if minute is None or (bar is not None and bucket_end(minute["end"], minutes) != bar["end"]):
+            return dict(bar) if bar else None
+        if bar is None:
+            return {**minute, "minutes": minutes, "end": bucket_end(minute["end"], minutes)}
+        return _merge(dict(bar), minute)
+
+    def _roll_up(self, minute_bar: Dict[str, Any]) -> None:
+        for n in self.downsample:
+            end = bucket_end(minute_bar["end"], n)
+            key = (minute_bar["code"], n)
+            bar = self._open.get(key)
+            if bar is not None and bar["end"] != end:
+                # 理论上上一周期 bar 已由 close_due 收盘；保险起见丢弃旧 bar 避免跨周期合并
+                bar = None
+            if bar is None:
+                self._open[key] = {**minute_bar, "minutes": n, "end": end}
+            else:
+                _merge(bar, minute_bar)
+
+
+def _merge(bar: Dict[str, Any], minute: Dict[str, Any]) -> Dict[str, Any]:
+    bar["high"] = max(bar["high"], minute["high"])
+    bar["low"] = min(bar["low"], minute["low"])
+    bar["close"] = minute["close"]
+    bar["volume"] += minute["volume"]
+    bar["amount"] += minute["amount"]
+    bar["ticks"] = bar.get("ticks", 0) + minute.get("ticks", 0)
+    return bar
+
+
+def bar_to_item(bar: Dict[str, Any]) -> Dict[str, Any]:
+    """bar -> 前端K线条目（time 为 bar 结束时间，与分钟K线接口一致）"""
+    return {
+        "time": bar["end"].strftime("%Y-%m-%d %H:%M:%S"),
+        "open": bar["open"],
+        "high": bar["high"],
+        "low": bar["low"],
+        "close": bar["close"],
+        "volume": bar["volume"],
+        "amount": bar["amount"],
+    }
+
+
+class IntradayBarService:
+    def __init__(self, persist_minutes: Iterable[int] = DOWNSAMPLE_MINUTES) -> None:
+        self.persist_minutes = set(persist_minutes)
+        self.aggregator = MinuteBarAggregator()
+        self.stats = {"ticks": 0, "bars_written": 0}
+
+    async def ingest(self, quotes: Dict[str, Dict[str, Any]], ts: datetime, source: Optional[str] = None) -> int:
+        """喂入一次 tick 的全市场快照（code 已标准化为 6 位），落库本次收盘的 bar，返回写入条数"""
+        # 先收盘已到期的 bar，再把本次快照计入新的 bar
+        closed = [b for b in self.aggregator.close_due(ts) if b["minutes"] in self.persist_minutes]
+        for code, quote in quotes.items():
+            self.aggregator.update(code, quote, ts, source)
+        self.stats["ticks"] += 1
+        if not closed:
+            return 0
+        written = await self._persist(closed)
+        self.stats["bars_written"] += written
+        return written
+
+    async def _persist(self, bars: List[Dict[str, Any]]) -> int:
+        from pymongo import UpdateOne
+        from app.core.database import get_mongo_db
+
+        ops = []
+        for bar in bars:
+            period = PERIOD_NAMES[bar["minutes"]]
+            item = bar_to_item(bar)
+            ops.append(UpdateOne(
+                {"code": bar["code"], "period": period, "time": item["time"]},
+                {"$set": {
+                    **item,
+                    "code": bar["code"],
+                    "period": period,
+                    "trade_date": bar["end"].strftime("%Y%m%d"),
+                    "bar_end": bar["end"].replace(tzinfo=None),
+                    "ticks": bar.get("ticks", 0),
+                    "source": "market_quotes",
+                }},
+                upsert=True,
+            ))
+        try:
+            await get_mongo_db()[INTRADAY_BARS_COLLECTION].bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.warning(f"⚠️ 分钟K线落库失败（{len(ops)} 条）: {e}")
+            return 0
+        logger.info(f"🕯️ 分钟K线已落库 {len(ops)} 条")
+        return len(ops)
+
+    async def get_bars(self, code: str, minutes: int, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        本地分钟K线（历史已收盘 bar + 当前未收盘 bar），按时间升序；
+        返回 (items, covered)，covered 表示 items 完整覆盖请求窗口（见 window_covered）
+        """
+        from app.core.database import get_mongo_db
+
+        period = PERIOD_NAMES.get(minutes)
+        if period is None or limit <= 0:
+            return [], False
+        cursor = get_mongo_db()[INTRADAY_BARS_COLLECTION].find(
+            {"code": code, "period": period},
+            {"_id": 0, "time": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1, "amount": 1,
+             "bar_end": 1, "ticks": 1},
+        ).sort("bar_end", -1).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        docs.reverse()
+        bars = [{**d, "end": d.pop("bar_end", None), "ticks": d.pop("ticks", 0)} for d in docs]
+        bars = [b for b in bars if b["end"] is not None]
+
+        live = self.aggregator.peek(code, minutes)
+        if live is not None:
+            live_bar = {**bar_to_item(live), "end": live["end"].replace(tzinfo=None), "ticks": live.get("ticks", 0)}
+            if bars and bars[-1]["time"] == live_bar["time"]:
+                bars[-1] = live_bar
+            else:
+                bars.append(live_bar)
+        bars = bars[-limit:]
+        covered = window_covered(bars, minutes, limit)
+        items = [{k: v for k, v in b.items() if k not in ("end", "ticks")} for b in bars]
+        return items, covered
+
+
+async def ensure_intraday_bar_indexes(db, retention_days: int) -> None:
+    coll = db[INTRADAY_BARS_COLLECTION]
+    await coll.create_index([("code", 1), ("period", 1), ("time", 1)], unique=True, name="code_period_time_unique")
+    await coll.create_index([("code", 1), ("period", 1), ("bar_end", -1)], name="code_period_bar_end")
+    await coll.create_index("bar_end", expireAfterSeconds=retention_days * 86400, name="bar_end_ttl")
+
+
+_intraday_bar_service: Optional[IntradayBarService] = None
+
+
+def get_intraday_bar_service() -> IntradayBarService:
+    global _intraday_bar_service
+    if _intraday_bar_service is None:
+        from app.core.config import settings
+
+        minutes = [int(x) for x in str(settings.INTRADAY_BARS_PERSIST_MINUTES).split(",") if x.strip()]
+        _intraday_bar_service = IntradayBarService(persist_minutes=minutes)
+    return _intraday_bar_service
@@ -0,0 +1,384 @@
+"""
+KlineService: K线查询服务（全异步 + 热点股票短TTL内存缓存）
+- A股：Motor 直接查询 stock_daily_quotes（不再经由同步的 MongoDBCacheAdapter 阻塞事件循环）
+- A股分钟周期：优先使用行情快照聚合的本地分钟K线（stock_intraday_bars）
+- A股降级：DataSourceManager.get_kline_with_fallback 放到线程执行（10秒超时）
+- 港股/美股：委托 ForeignStockService.get_kline
+- A股 MongoDB 查询限定 trade_date 下界（约 limit 根K线对应的自然日 ×2），只扫描最近的数据
+- 缓存键：(market, code, period, adj, limit)，并发未命中的同键请求只查询一次（single-flight）；
+  查询在独立任务中执行，发起请求被取消（客户端断开）时不会连带取消等待同一结果的其他请求
+- 可选紧凑列式输出：columns = {"time": [...], "open": [...], ...}
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+from app.core.database import get_mongo_db
+
+logger = logging.getLogger(__name__)
+
+# 前端周期 -> stock_daily_quotes.period
+PERIOD_MAP = {
+    "day": "daily",
+    "week": "weekly",
+    "month": "monthly",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "60m": "60min",
+}
+
+VALID_PERIODS = set(PERIOD_MAP.keys())
+
+# 可由本地分钟K线（stock_intraday_bars）提供的周期
+INTRADAY_PERIOD_MINUTES = {"5m": 5, "15m": 15, "30m": 30, "60m": 60}
+
+# 列式输出的字段顺序
+KLINE_FIELDS = ("time", "open", "high", "low", "close", "volume", "amount")
+
+_DEFAULT_SOURCE_PRIORITY = ["tushare", "akshare", "baostock"]
+_SOURCE_PRIORITY_TTL = 60.0
+_FALLBACK_TIMEOUT = 10.0
+# 每根K线对应的自然日数（已留出周末/节假日余量），用于限定 trade_date 下界；分钟周期按日线计
+_LOOKBACK_DAYS_PER_BAR = {"weekly": 14, "monthly": 62}
+_DEFAULT_LOOKBACK_DAYS_PER_BAR = 2
+
+_KLINE_PROJECTION = {
+    "_id": 0,
+    "trade_date": 1,
+    "date": 1,
+    "open": 1,
+    "high": 1,
+    "low": 1,
+    "close": 1,
+    "volume": 1,
+    "vol": 1,
+    "amount": 1,
+}
+
+
+def _to_float(v: Any) -> float:
+    try:
+        return float(v) if v is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _doc_to_item(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """stock_daily_quotes 文档 -> 前端K线条目（字段语义与原 iterrows 转换保持一致）"""
+    amount = doc.get("amount")
+    return {
+        "time": doc.get("trade_date", doc.get("date", "")),
+        "open": _to_float(doc.get("open")),
+        "high": _to_float(doc.get("high")),
+        "low": _to_float(doc.get("low")),
+        "close": _to_float(doc.get("close")),
+        "volume": _to_float(doc.get("volume", doc.get("vol"))),
+        "amount": _to_float(amount) if "amount" in doc else None,
+    }
+
+
+def to_columnar(items: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """行式K线 -> 并行数组（列式），显著减少 JSON 体积"""
+    return {field: [it.get(field) for it in items] for field in KLINE_FIELDS}
+
+
+class KlineService:
+    def __init__(self, ttl_seconds: int = 15, max_entries: int = 2000) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        # key -> (expire_ts, data, columnar_data)
+        self._cache: "OrderedDict[Tuple, List[Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._source_priority: Optional[List[str]] = None
+        self._source_priority_ts: float = 0.0
+        self._manager = None
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    async def get_kline(
+        self,
+        market: str,
+        code: str,
+        period: str = "day",
+        limit: int = 120,
+        adj: str = "none",
+        force_refresh: bool = False,
+        compact: bool = False,
+    ) -> Dict[str, Any]:
+        """获取K线数据
+
+        Returns:
+            与 /stocks/{code}/kline 原响应一致的 data 字典；
+            compact=True 时以 columns（并行数组）替代 items。
+        """
+        key = (market, code, period, adj or "none", int(limit))
+
+        if not force_refresh:
+            entry = self._cache_get(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return self._render(entry, compact)
+
+            # 同键并发未命中：等待正在进行的查询
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.stats["coalesced"] += 1
+                return self._render(await asyncio.shield(pending), compact)
+
+        self.stats["misses"] += 1
+        # 查询放在独立任务中，所有请求都通过 shield 等待：任一请求被取消只影响它自己
+        task = asyncio.ensure_future(self._load_entry(key, market, code, period, limit, adj, force_refresh))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._load_done(key, t))
+        return self._render(await asyncio.shield(task), compact)
+
+    async def _load_entry(self, key: Tuple, market: str, code: str, period: str, limit: int, adj: str,
+                          force_refresh: bool) -> List[Any]:
+        data = await self._load(market, code, period, limit, adj, force_refresh)
+        entry = [time.monotonic() + self._ttl, data, None]
+        if data.get("items"):
+            self._cache_put(key, entry)
+        return entry
+
+    def _load_done(self, key: Tuple, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 所有请求都已取消时没人读取结果，避免 "Task exception was never retrieved" 警告
+            task.exception()
+
+    def invalidate(self, code: Optional[str] = None) -> None:
+        """清空缓存；指定 code 时仅清除该股票"""
+        if code is None:
+            self._cache.clear()
+            return
+        for key in [k for k in self._cache if k[1] == code]:
+            self._cache.pop(key, None)
+
+    # ------------------------------------------------------------------
+    # 缓存
+    # ------------------------------------------------------------------
+    def _cache_get(self, key: Tuple) -> Optional[List[Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._cache.pop(key, None)
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: Tuple, entry: List[Any]) -> None:
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _render(entry: List[Any], compact: bool) -> Dict[str, Any]:
+        data = entry[1]
+        if not compact:
+            return dict(data)
+        if entry[2] is None:
+            out = {k: v for k, v in data.items() if k != "items"}
+            out["fields"] = list(KLINE_FIELDS)
+            out["columns"] = to_columnar(data.get("items") or [])
+            entry[2] = out
+        return dict(entry[2])
+
+    # ------------------------------------------------------------------
+    # 数据加载
+    # ------------------------------------------------------------------
+    async def _load(self, market: str, code: str, period: str, limit: int, adj: str,
+                    force_refresh: bool) -> Dict[str, Any]:
+        if market in ("HK", "US"):
+            from app.services.foreign_stock_service import ForeignStockService
+
+            service = ForeignStockService(db=get_mongo_db())
+            items = await service.get_kline(market, code, period, limit, force_refresh)
+            return {
+                "code": code,
+                "period": period,
+                "items": items,
+                "source": "cache_or_api",
+            }
+        return await self._load_cn(code, period, limit, adj)
+
+    async def _load_cn(self, code: str, period: str, limit: int, adj: str) -> Dict[str, Any]:
+        adj_norm = None if adj in (None, "none", "", "null") else adj
+        items: Optional[List[Dict[str, Any]]] = None
+        source: Optional[str] = None
+
+        # 1. 优先从 MongoDB 获取（异步）
+        try:
+            items, source = await self._query_mongodb(code, PERIOD_MAP.get(period, "daily"), limit)
+        except Exception as e:
+            logger.warning(f"⚠️ MongoDB 获取 K 线失败: {e}")
+
+        # 2. 分钟周期：行情快照聚合的本地分钟K线完整覆盖请求窗口（无缺口、非单笔快照 bar）时直接返回
+        #    （复权参数不适用于本地 bar）
+        local_bars: List[Dict[str, Any]] = []
+        if not items and period in INTRADAY_PERIOD_MINUTES and adj_norm is None:
+            local_bars, covered = await self._query_intraday_bars(code, period, limit)
+            if covered:
+                items, source = local_bars, "intraday_bars"
+
+        # 3. 本地无数据，降级到外部 API（线程执行 + 超时保护）；失败时退回不足 limit 的本地分钟K线
+        if not items:
+            logger.info(f"📡 MongoDB 无数据，降级到外部 API: {code}")
+            try:
+                items, source = await asyncio.wait_for(
+                    asyncio.to_thread(self._get_manager().get_kline_with_fallback, code, period, limit, adj_norm),
+                    timeout=_FALLBACK_TIMEOUT,
+                )
+            except Exception:
+                if not local_bars:
+                    raise
+                items = None
+            if not items and local_bars:
+                items, source = local_bars, "intraday_bars"
+
+        # 4. 日线在交易时段叠加当天实时数据
+        if period == "day" and items:
+            source = await self._merge_realtime_bar(code, items, source)
+
+        return {
+            "code": code,
+            "period": period,
+            "limit": limit,
+            "adj": adj if adj else "none",
+            "source": source,
+            "items": items or [],
+        }
+
+    async def _query_mongodb(self, code: str, mongodb_period: str,
+                             limit: int) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        from tradingagents.config.runtime_settings import use_app_cache_enabled
+
+        if not use_app_cache_enabled(False):
+            return None, None
+
+        coll = get_mongo_db()["stock_daily_quotes"]
+        # 只扫描最近的数据（日线与原 MongoDBCacheAdapter 查询一致：limit×2 个自然日），避免在整段历史上排序
+        days = limit * _LOOKBACK_DAYS_PER_BAR.get(mongodb_period, _DEFAULT_LOOKBACK_DAYS_PER_BAR)
+        start_date = (datetime.now(ZoneInfo(settings.TIMEZONE)) - timedelta(days=days)).strftime("%Y-%m-%d")
+        for data_source in await self._get_source_priority():
+            cursor = coll.find(
+                {"symbol": code, "period": mongodb_period, "data_source": data_source,
+                 "trade_date": {"$gte": start_date}},
+                _KLINE_PROJECTION,
+            ).sort("trade_date", -1).limit(limit)
+            docs = await cursor.to_list(length=limit)
+            if docs:
+                docs.reverse()
+                logger.info(f"✅ 从 MongoDB-{data_source} 获取到 {len(docs)} 条 K 线数据: {code}")
+                return [_doc_to_item(d) for d in docs], "mongodb"
+        return None, None
+
+    async def _query_intraday_bars(self, code: str, period: str, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        if not settings.INTRADAY_BARS_ENABLED:
+            return [], False
+        try:
+            from app.services.intraday_bar_service import get_intraday_bar_service
+
+            return await get_intraday_bar_service().get_bars(code, INTRADAY_PERIOD_MINUTES[period], limit)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取本地分钟K线失败: {e}")
+            return [], False
+
+    async def _get_source_priority(self) -> List[str]:
+        """与 MongoDBCacheAdapter 相同的优先级规则（system_configs.data_source_configs），带短TTL缓存"""
+        now = time.monotonic()
+        if self._source_priority is not None and now - self._source_priority_ts < _SOURCE_PRIORITY_TTL:
+            return self._source_priority
+
+        result: List[str] = []
+        try:
+            config_data = await get_mongo_db()["system_configs"].find_one(
+                {"is_active": True}, sort=[("version", -1)]
+            )
+            configs = (config_data or {}).get("data_source_configs") or []
+            enabled = [
+                ds for ds in configs
+                if ds.get("enabled", True)
+                and ds.get("type")
+                and (not ds.get("market_categories") or "a_shares" in ds.get("market_categories"))
+            ]
+            enabled.sort(key=lambda x: x.get("priority", 0), reverse=True)
+            result = [ds["type"].lower() for ds in enabled]
+        except Exception as e:
+            logger.warning(f"⚠️ 读取数据源优先级失败，使用默认顺序: {e}")
+
+        self._source_priority = result or list(_DEFAULT_SOURCE_PRIORITY)
+        self._source_priority_ts = now
+        return self._source_priority
+
+    async def _merge_realtime_bar(self, code: str, items: List[Dict[str, Any]],
+                                  source: Optional[str]) -> Optional[str]:
+        """交易时段（含收盘后30分钟缓冲）用 market_quotes 快照补齐/替换当天K线"""
+        try:
+            now = datetime.now(ZoneInfo(settings.TIMEZONE))
+            current_time = now.time()
+            is_trading_time = now.weekday() < 5 and (
+                (dtime(9, 30) <= current_time <= dtime(11, 30))
+                or (dtime(13, 0) <= current_time <= dtime(15, 30))
+            )
+            if not is_trading_time:
+                return source
+
+            today_yyyymmdd = now.strftime("%Y%m%d")
+            today_formatted = now.strftime("%Y-%m-%d")
+            has_today_data = any(it.get("time") in (today_yyyymmdd, today_formatted) for it in items)
+
+            quote = await get_mongo_db()["market_quotes"].find_one({"code": code})
+            if not quote:
+                logger.warning(f"⚠️ market_quotes 中未找到当天数据: {code}")
+                return source
+
+            today_bar = {
+                "time": today_formatted,
+                "open": _to_float(quote.get("open")),
+                "high": _to_float(quote.get("high")),
+                "low": _to_float(quote.get("low")),
+                "close": _to_float(quote.get("close")),
+                "volume": _to_float(quote.get("volume")),
+                "amount": _to_float(quote.get("amount")),
+            }
+            if has_today_data:
+                items[-1] = today_bar
+            else:
+                items.append(today_bar)
+            return f"{source}+market_quotes"
+        except Exception as e:
+            logger.warning(f"⚠️ 获取当天实时数据失败（忽略）: {e}")
+            return source
+
+    def _get_manager(self):
+        if self._manager is None:
+            from app.services.data_sources.manager import DataSourceManager
+
+            self._manager = DataSourceManager()
+        return self._manager
+
+
+_kline_service: Optional[KlineService] = None
+
+
+def get_kline_service() -> KlineService:
+    global _kline_service
+    if _kline_service is None:
+        _kline_service = KlineService(
+            ttl_seconds=settings.KLINE_CACHE_TTL_SECONDS,
+            max_entries=settings.KLINE_CACHE_MAX_ENTRIES,
+        )
+    return _kline_service
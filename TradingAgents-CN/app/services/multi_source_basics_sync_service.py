@@ -95,6 +95,14 @@ class MultiSourceBasicsSyncService:
 
         self._last_status = {k: v for k, v in stats.items() if k != "_id"}
 
+    async def _refresh_search_index(self) -> None:
+        """基础信息写入完成后刷新A股搜索内存索引"""
+        try:
+            from app.services.stock_search_index import get_stock_search_index
+            await get_stock_search_index().refresh("CN")
+        except Exception as e:
+            logger.warning(f"Failed to refresh stock search index: {e}")
+
     async def _execute_bulk_write_with_retry(
         self,
         db: AsyncIOMotorDatabase,
@@ -318,6 +326,7 @@ class MultiSourceBasicsSyncService:
                 f"✅ Multi-source sync finished: total={stats.total} inserted={inserted} "
                 f"updated={updated} errors={errors} sources={stats.data_sources_used}"
             )
+            await self._refresh_search_index()
             return stats.__dict__
 
         except Exception as e:
@@ -5,12 +5,17 @@
 from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, timedelta
 from dataclasses import dataclass
+import asyncio
 import logging
+import re
 from pymongo import ReplaceOne
 from pymongo.errors import BulkWriteError
 from bson import ObjectId
 
+from app.core.config import settings
 from app.core.database import get_database
+from tradingagents.dataflows.news.near_dedup import cluster_news_dicts, collapse_clusters
+from app.services.news_search_index import get_news_search_index, normalize_publish_time, query_needs_fallback
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +58,7 @@ class NewsQueryParams:
     skip: int = 0
     sort_by: str = "publish_time"
     sort_order: int = -1  # -1 for desc, 1 for asc
+    collapse_duplicates: bool = True  # 近似重复新闻只返回每簇代表（cluster_rep）
 
 
 @dataclass
@@ -130,6 +136,9 @@ class NewsDataService:
             # 10. 更新时间索引（数据维护）
             await collection.create_index([("updated_at", -1)], name="updated_at_index", background=True)
 
+            # 11. 近似重复簇索引（读取时折叠）
+            await collection.create_index([("cluster_id", 1)], name="cluster_id_index", background=True)
+
             self._indexes_ensured = True
             self.logger.info("✅ 新闻数据索引检查完成")
         except Exception as e:
@@ -175,15 +184,22 @@ class NewsDataService:
             
             if not news_list:
                 return 0
+
+            # 标注不同来源转载的近似重复新闻（全部保存，读取时按簇折叠），与库中近期新闻一起比较
+            existing = await self._load_recent_clusters(collection, news_list, now)
+            clusters = self._cluster_near_duplicates(news_list, data_source, existing)
             
             # 准备批量操作
             operations = []
+            standardized_list = []
 
             for i, news in enumerate(news_list):
                 # 标准化新闻数据
                 standardized_news = self._standardize_news_data(
                     news, data_source, market, now
                 )
+                standardized_news["cluster_id"], standardized_news["cluster_rep"] = clusters[i]
+                standardized_list.append(standardized_news)
 
                 # 🔍 记录前3条数据的详细信息
                 if i < 3:
@@ -212,6 +228,7 @@ class NewsDataService:
             if operations:
                 result = await collection.bulk_write(operations)
                 saved_count = result.upserted_count + result.modified_count
+                await asyncio.to_thread(self._index_for_search, standardized_list)
                 
                 self.logger.info(f"💾 新闻数据保存完成: {saved_count}条记录 (数据源: {data_source})")
                 return saved_count
@@ -230,6 +247,9 @@ class NewsDataService:
                 error_code = error.get('code', 'N/A')
                 self.logger.warning(f"   错误 {i}: [Code {error_code}] {error_msg}")
 
+            # 索引命中时会回查 stock_news，写入失败的条目不会出现在结果中
+            await asyncio.to_thread(self._index_for_search, standardized_list)
+
             # 计算成功保存的数量
             success_count = len(operations) - error_count
             if success_count > 0:
@@ -276,14 +296,21 @@ class NewsDataService:
             if not news_list:
                 return 0
 
+            # 标注不同来源转载的近似重复新闻（全部保存，读取时按簇折叠），与库中近期新闻一起比较
+            existing = self._load_recent_clusters_sync(collection, news_list, now)
+            clusters = self._cluster_near_duplicates(news_list, data_source, existing)
+
             # 准备批量操作
             operations = []
+            standardized_list = []
 
             self.logger.info(f"📝 开始标准化 {len(news_list)} 条新闻数据...")
 
             for i, news in enumerate(news_list, 1):
                 # 标准化新闻数据
                 standardized_news = self._standardize_news_data(news, data_source, market, now)
+                standardized_news["cluster_id"], standardized_news["cluster_rep"] = clusters[i - 1]
+                standardized_list.append(standardized_news)
 
                 # 记录前3条新闻的详细信息
                 if i <= 3:
@@ -313,6 +340,7 @@ class NewsDataService:
             if operations:
                 result = collection.bulk_write(operations)
                 saved_count = result.upserted_count + result.modified_count
+                self._index_for_search(standardized_list)
 
                 self.logger.info(f"💾 新闻数据保存完成: {saved_count}条记录 (数据源: {data_source})")
                 return saved_count
@@ -331,6 +359,8 @@ class NewsDataService:
                 error_code = error.get('code', 'N/A')
                 self.logger.warning(f"   错误 {i}: [Code {error_code}] {error_msg}")
 
+            self._index_for_search(standardized_list)
+
             # 计算成功保存的数量
             success_count = len(operations) - error_count
             if success_count > 0:
@@ -344,6 +374,74 @@ class NewsDataService:
             self.logger.error(traceback.format_exc())
             return 0
 
+    @staticmethod
+    def _recent_clusters_query(news_list: List[Dict[str, Any]], now: datetime) -> Optional[Dict[str, Any]]:
+        """本批涉及股票最近入库且已标注簇的新闻；关闭回看时返回 None"""
+        if settings.NEWS_CLUSTER_LOOKBACK_HOURS <= 0 or settings.NEWS_CLUSTER_LOOKBACK_LIMIT <= 0:
+            return None
+        symbols = sorted({news.get("symbol") for news in news_list}, key=lambda s: s or "")
+        return {
+            "symbol": {"$in": symbols},
+            "updated_at": {"$gte": now - timedelta(hours=settings.NEWS_CLUSTER_LOOKBACK_HOURS)},
+            "cluster_id": {"$ne": None},
+        }
+
+    _RECENT_CLUSTER_FIELDS = {"_id": 0, "symbol": 1, "title": 1, "url": 1, "cluster_id": 1, "cluster_rep": 1}
+
+    async def _load_recent_clusters(self, collection, news_list: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        query = self._recent_clusters_query(news_list, now)
+        if query is None:
+            return []
+        try:
+            cursor = collection.find(query, self._RECENT_CLUSTER_FIELDS).sort("updated_at", -1)
+            return await cursor.limit(settings.NEWS_CLUSTER_LOOKBACK_LIMIT).to_list(length=None)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 加载近期新闻簇失败，只在本批内聚类: {e}")
+            return []
+
+    def _load_recent_clusters_sync(self, collection, news_list: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        query = self._recent_clusters_query(news_list, now)
+        if query is None:
+            return []
+        try:
+            cursor = collection.find(query, self._RECENT_CLUSTER_FIELDS).sort("updated_at", -1)
+            return list(cursor.limit(settings.NEWS_CLUSTER_LOOKBACK_LIMIT))
+        except Exception as e:
+            self.logger.warning(f"⚠️ 加载近期新闻簇失败，只在本批内聚类: {e}")
+            return []
+
+    def _cluster_near_duplicates(
+        self,
+        news_list: List[Dict[str, Any]],
+        data_source: str,
+        existing: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[tuple]:
+        """按股票代码分区、按标题做近似重复聚类，返回与 news_list 对齐的 (cluster_id, cluster_rep)；失败时不标注
+
+        existing 为库中近期已标注的新闻：后续批次的转载沿用已有 cluster_id，不会另起一簇
+        """
+        try:
+            clusters, dedup_stats = cluster_news_dicts(news_list, existing=existing)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 新闻近似重复聚类失败，按独立新闻保存: {e}")
+            return [(None, True)] * len(news_list)
+        if dedup_stats.removed_count:
+            self.logger.info(
+                f"🧹 新闻近似重复聚类 (数据源: {data_source}): {dedup_stats.input_count} 条归为 "
+                f"{dedup_stats.kept_count} 簇，读取时折叠 {dedup_stats.removed_count} 条"
+                f"（约 {dedup_stats.estimated_tokens_saved} tokens）"
+            )
+        return clusters
+
+    def _index_for_search(self, standardized_list: List[Dict[str, Any]]) -> None:
+        """写库成功后增量更新本地检索索引，失败不影响保存结果"""
+        try:
+            index = get_news_search_index()
+            if index is not None:
+                index.add_documents(standardized_list)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 更新新闻检索索引失败: {e}")
+
     def _standardize_news_data(
         self,
         news_data: Dict[str, Any],
@@ -511,6 +609,10 @@ class NewsDataService:
                 query["$text"] = {"$search": " ".join(params.keywords)}
                 self.logger.info(f"   添加查询条件: text search={params.keywords}")
 
+            if params.collapse_duplicates:
+                # 近似重复簇只返回代表；未标注的历史数据 cluster_rep 不存在，同样返回
+                query["cluster_rep"] = {"$ne": False}
+
             self.logger.info(f"   最终查询条件: {query}")
 
             # 先统计总数
@@ -701,6 +803,10 @@ class NewsDataService:
             
             deleted_count = result.deleted_count
             self.logger.info(f"🗑️ 删除过期新闻: {deleted_count}条记录")
+
+            index = get_news_search_index()
+            if index is not None:
+                await asyncio.to_thread(index.remove_before, cutoff_date)
             
             return deleted_count
             
@@ -712,36 +818,38 @@ class NewsDataService:
         self,
         query_text: str,
         symbol: str = None,
-        limit: int = 20
+        limit: int = 20,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
     ) -> List[Dict[str, Any]]:
         """
         全文搜索新闻
 
+        优先使用本地倒排索引（中文 2-gram + BM25）；索引关闭或尚未构建时回退到 MongoDB $text。
+        单个汉字的查询在索引和 $text 中都无法命中，改用转义后的正则匹配标题/正文/摘要（按发布时间倒序）。
+        同一近似重复簇（cluster_id）只返回得分最高的一条。
+
         Args:
             query_text: 搜索文本
             symbol: 股票代码过滤
             limit: 返回数量限制
+            start_time: 发布时间下限
+            end_time: 发布时间上限
 
         Returns:
-            搜索结果列表
+            搜索结果列表（score 为相关性得分）
         """
         try:
-            collection = self._get_collection()
-
-            # 构建查询条件
-            query = {"$text": {"$search": query_text}}
-
-            if symbol:
-                query["symbol"] = symbol
-
-            # 执行搜索，按相关性排序
-            cursor = collection.find(
-                query,
-                {"score": {"$meta": "textScore"}}
-            ).sort([("score", {"$meta": "textScore"})])
-
-            cursor = cursor.limit(limit)
-            results = await cursor.to_list(length=None)
+            # 近似重复簇在结果中折叠为得分最高的一条，多取一些候选以补足 limit
+            fetch_limit = limit * 2
+            index = get_news_search_index()
+            if query_needs_fallback(query_text):
+                results = await self._search_with_regex(query_text, symbol, fetch_limit, start_time, end_time)
+            elif index is not None and index.doc_count:
+                results = await self._search_with_index(index, query_text, symbol, fetch_limit, start_time, end_time)
+            else:
+                results = await self._search_with_text(query_text, symbol, fetch_limit, start_time, end_time)
+            results = collapse_clusters(results)[:limit]
 
             # 🔧 转换 ObjectId 为字符串，避免 JSON 序列化错误
             results = convert_objectid_to_str(results)
@@ -753,6 +861,107 @@ class NewsDataService:
             self.logger.error(f"❌ 全文搜索失败: {e}")
             return []
 
+    async def _search_with_index(
+        self,
+        index,
+        query_text: str,
+        symbol: Optional[str],
+        limit: int,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
+        """倒排索引取得排序后的命中，再按 (url, title, publish_time) 回查完整文档
+
+        publish_time 两侧都规范化为 naive UTC 毫秒精度（与 MongoDB 存储一致），时区/微秒差异不会导致漏查。
+        """
+        hits = await asyncio.to_thread(index.search, query_text, symbol, start_time, end_time, limit)
+        if not hits:
+            return []
+
+        def _lookup_key(url, title, publish_time):
+            return url or "", title or "", normalize_publish_time(publish_time)
+
+        collection = self._get_collection()
+        cursor = collection.find({"$or": [
+            {"url": hit["url"], "title": hit["title"], "publish_time": normalize_publish_time(hit["publish_time"])}
+            for hit in hits
+        ]})
+        docs = {
+            _lookup_key(doc.get("url"), doc.get("title"), doc.get("publish_time")): doc
+            for doc in await cursor.to_list(length=None)
+        }
+
+        results = []
+        for hit in hits:
+            doc = docs.get(_lookup_key(hit["url"], hit["title"], hit["publish_time"]))
+            if doc is not None:
+                doc["score"] = hit["score"]
+                results.append(doc)
+        return results
+
+    async def _search_with_regex(
+        self,
+        query_text: str,
+        symbol: Optional[str],
+        limit: int,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
+        """正则包含匹配（单字查询；倒排索引只有 2-gram，$text 不切分中文）"""
+        collection = self._get_collection()
+        pattern = re.escape(query_text.strip())
+        query: Dict[str, Any] = {"$or": [
+            {"title": {"$regex": pattern, "$options": "i"}},
+            {"content": {"$regex": pattern, "$options": "i"}},
+            {"summary": {"$regex": pattern, "$options": "i"}},
+        ]}
+        if symbol:
+            query["symbol"] = symbol
+        if start_time or end_time:
+            time_query = {}
+            if start_time:
+                time_query["$gte"] = start_time
+            if end_time:
+                time_query["$lte"] = end_time
+            query["publish_time"] = time_query
+
+        cursor = collection.find(query).sort("publish_time", -1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def _search_with_text(
+        self,
+        query_text: str,
+        symbol: Optional[str],
+        limit: int,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> List[Dict[str, Any]]:
+        """MongoDB $text 搜索（按 textScore 排序）"""
+        collection = self._get_collection()
+
+        # 构建查询条件
+        query = {"$text": {"$search": query_text}}
+
+        if symbol:
+            query["symbol"] = symbol
+
+        if start_time or end_time:
+            time_query = {}
+            if start_time:
+                time_query["$gte"] = start_time
+            if end_time:
+                time_query["$lte"] = end_time
+            query["publish_time"] = time_query
+
+        # 执行搜索，按相关性排序
+        cursor = collection.find(
+            query,
+            {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})])
+
+        cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
 
 # 全局服务实例
 _service_instance = None
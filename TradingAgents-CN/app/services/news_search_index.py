@@ -0,0 +1,516 @@
+"""
+NewsSearchIndex: 新闻全文检索的本地倒排索引（替代 MongoDB $text）
+- 分词：连续汉字切成字符 2-gram（单字保留 1-gram），英文/数字按词小写；$text 不切分中文，中文查询基本无法命中
+- 索引字段：标题（权重 ×2）、正文、关键词；BM25 排序（k1=1.2, b=0.75）
+- 增量维护：save_news_data / save_news_data_sync 写库后追加；delete_old_news 按发布时间裁剪
+- 持久化：快照（pickle）+ 追加写日志（JSONL），日志达到阈值后合并为新快照；启动时加载快照并重放日志
+- 多进程：多个 uvicorn worker / CLI 进程共用同一目录，写日志与合并快照持有目录文件锁（合并前先追上其他进程的日志）；
+  每次写入/检索前检查快照是否被替换、日志是否变长，被替换时重新加载，变长时只重放新增部分
+- 单个汉字的查询没有 2-gram 可查（query_needs_fallback），由调用方回退到正则匹配
+- 启动时索引为空、快照格式过旧或落后于 stock_news 的最新 updated_at 时，后台从 stock_news 全量重建
+- 过滤：symbol（主代码或关联代码）与发布时间区间；命中结果按 (url, title, publish_time) 回查 stock_news，
+  publish_time 统一为 MongoDB 实际存储的形式（naive UTC、毫秒精度），保证回查能命中
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("webapi")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2
+# 参与索引的正文长度（字符），过长的正文对排序帮助不大，只会放大索引
+CONTENT_INDEX_CHARS = 2000
+# 日志条数达到该值后合并为新快照
+JOURNAL_COMPACT_EVERY = 200
+# 索引条目格式版本（key / publish_time 的规范化方式变化时递增，旧快照启动时丢弃并重建）
+INDEX_FORMAT_VERSION = 2
+
+SNAPSHOT_FILE = "index.pkl"
+JOURNAL_FILE = "journal.jsonl"
+LOCK_FILE = "index.lock"
+
+_TOKEN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按字符 2-gram，英文/数字按词（小写），保留重复以计算词频"""
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_needs_fallback(query: str) -> bool:
+    """查询只含单个汉字（没有可命中倒排表的 2-gram 或英文词），需要回退到正则匹配"""
+    tokens = tokenize(query)
+    return bool(tokens) and all(len(t) == 1 and not t.isascii() for t in tokens)
+
+
+@contextlib.contextmanager
+def _file_lock(path: str, exclusive: bool):
+    """跨进程的目录锁（POSIX 用 flock 区分共享/独占；Windows 下 msvcrt 只有独占锁）"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _to_epoch(value: Any) -> Optional[float]:
+    """publish_time -> 秒级时间戳；naive datetime 按 UTC 处理（入库时使用 utcnow）"""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def normalize_publish_time(value: Any) -> Any:
+    """datetime -> MongoDB 读回的形式：naive UTC，截断到毫秒（BSON datetime 只有毫秒精度）；其他值原样返回"""
+    if not isinstance(value, datetime):
+        return value
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def doc_key(url: Any, title: Any, publish_time: Any) -> str:
+    """与 stock_news 的 upsert 条件一致：url + title + publish_time（规范化后）"""
+    publish_time = normalize_publish_time(publish_time)
+    stamp = publish_time.isoformat() if isinstance(publish_time, datetime) else str(publish_time or "")
+    return hashlib.sha1(f"{url or ''}\x00{title or ''}\x00{stamp}".encode("utf-8")).hexdigest()
+
+
+def _index_entry(news: Dict[str, Any]) -> Dict[str, Any]:
+    """标准化新闻 -> 索引条目（仅保留排序、过滤与回查所需字段）"""
+    tokens = tokenize(news.get("title") or "") * TITLE_WEIGHT
+    tokens += tokenize(str(news.get("content") or news.get("summary") or "")[:CONTENT_INDEX_CHARS])
+    keywords = news.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    for keyword in keywords:
+        tokens += tokenize(str(keyword))
+
+    publish_time = normalize_publish_time(news.get("publish_time"))
+    symbols = [s for s in (news.get("symbols") or []) if s]
+    if news.get("symbol") and news["symbol"] not in symbols:
+        symbols.insert(0, news["symbol"])
+    return {
+        "key": doc_key(news.get("url"), news.get("title"), publish_time),
+        "url": news.get("url") or "",
+        "title": news.get("title") or "",
+        "publish_time": publish_time.isoformat() if isinstance(publish_time, datetime) else None,
+        "symbols": symbols,
+        "updated_ts": _to_epoch(news.get("updated_at")),
+        "tf": dict(Counter(tokens)),
+    }
+
+
+class NewsSearchIndex:
+    """线程安全的 BM25 倒排索引；index_dir 为 None 时只在内存中维护"""
+
+    def __init__(self, index_dir: Optional[str] = None) -> None:
+        self._dir = index_dir
+        self._lock = threading.RLock()
+        # key -> {"url", "title", "publish_time", "ts", "symbols", "length", "terms"}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # term -> {key: tf}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        # 已索引新闻中最新的 updated_at（秒级时间戳），用于判断索引是否落后于 stock_news
+        self._max_updated_ts: Optional[float] = None
+        # 加载到旧格式快照（已丢弃），需要全量重建
+        self.format_outdated = False
+        self._journal_entries = 0
+        # 已加载的快照文件标识 (inode, mtime_ns, size) 与已重放到的日志字节偏移，用于发现其他进程的写入
+        self._snapshot_stamp: Optional[Tuple[int, int, int]] = None
+        self._journal_offset = 0
+        if index_dir:
+            self._load()
+
+    @property
+    def doc_count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._docs)
+
+    @property
+    def max_updated_ts(self) -> Optional[float]:
+        with self._lock:
+            self._refresh()
+            return self._max_updated_ts
+
+    # ---------------- 写入 ----------------
+
+    def add_documents(self, news_list: Iterable[Dict[str, Any]]) -> int:
+        """索引标准化后的新闻（同 key 的旧条目被替换），返回索引条数"""
+        entries = [_index_entry(news) for news in news_list if news.get("title") or news.get("content")]
+        if not entries:
+            return 0
+        with self._lock, self._dir_locked(exclusive=True):
+            self._sync()
+            for entry in entries:
+                self._apply_add(entry)
+            self._journal({"op": "add", "docs": entries})
+        return len(entries)
+
+    def remove_before(self, cutoff: datetime) -> int:
+        """删除发布时间早于 cutoff 的条目（与 delete_old_news 同步），返回删除条数"""
+        cutoff_ts = _to_epoch(cutoff)
+        if cutoff_ts is None:
+            return 0
+        with self._lock, self._dir_locked(exclusive=True):
+            self._sync()
+            removed = self._apply_remove_before(cutoff_ts)
+            if removed:
+                self._journal({"op": "remove_before", "ts": cutoff_ts})
+        return removed
+
+    def clear(self) -> None:
+        with self._lock, self._dir_locked(exclusive=True):
+            self._docs.clear()
+            self._postings.clear()
+            self._total_length = 0
+            self._max_updated_ts = None
+            self.format_outdated = False
+            self._write_snapshot()
+
+    def _apply_add(self, entry: Dict[str, Any]) -> None:
+        key = entry["key"]
+        if key in self._docs:
+            self._remove_key(key)
+        publish_time = entry.get("publish_time")
+        publish_dt = datetime.fromisoformat(publish_time) if publish_time else None
+        tf = entry["tf"]
+        length = sum(tf.values())
+        self._docs[key] = {
+            "url": entry["url"],
+            "title": entry["title"],
+            "publish_time": publish_dt,
+            "ts": _to_epoch(publish_dt),
+            "symbols": entry["symbols"],
+            "length": length,
+            "terms": list(tf),
+        }
+        self._total_length += length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[key] = count
+        updated_ts = entry.get("updated_ts")
+        if updated_ts is not None and (self._max_updated_ts is None or updated_ts > self._max_updated_ts):
+            self._max_updated_ts = updated_ts
+
+    def _remove_key(self, key: str) -> None:
+        doc = self._docs.pop(key)
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _apply_remove_before(self, cutoff_ts: float) -> int:
+        expired = [k for k, d in self._docs.items() if d["ts"] is not None and d["ts"] < cutoff_ts]
+        for key in expired:
+            self._remove_key(key)
+        return len(expired)
+
+    # ---------------- 查询 ----------------
+
+    def search(
+        self,
+        query: str,
+        symbol: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """BM25 检索，返回 [{"url", "title", "publish_time", "score"}]（按得分降序）"""
+        terms = set(tokenize(query))
+        if not terms or limit <= 0:
+            return []
+        start_ts = _to_epoch(start_time)
+        end_ts = _to_epoch(end_time)
+
+        with self._lock:
+            self._refresh()
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            docs = self._docs
+            length_scale = BM25_K1 * BM25_B * n_docs / self._total_length
+            length_base = BM25_K1 * (1 - BM25_B)
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = idf * (BM25_K1 + 1)
+                for key, tf in postings.items():
+                    norm = tf + length_base + length_scale * docs[key]["length"]
+                    scores[key] = scores.get(key, 0.0) + weight * tf / norm
+
+            filtered = bool(symbol or start_ts is not None or end_ts is not None)
+            ranked = (sorted(scores.items(), key=itemgetter(1), reverse=True) if filtered
+                      else heapq.nlargest(limit, scores.items(), key=itemgetter(1)))
+            hits: List[Dict[str, Any]] = []
+            for key, score in ranked:
+                doc = docs[key]
+                if symbol and symbol not in doc["symbols"]:
+                    continue
+                if start_ts is not None and (doc["ts"] is None or doc["ts"] < start_ts):
+                    continue
+                if end_ts is not None and (doc["ts"] is None or doc["ts"] > end_ts):
+                    continue
+                hits.append({
+                    "url": doc["url"],
+                    "title": doc["title"],
+                    "publish_time": doc["publish_time"],
+                    "score": round(score, 4),
+                })
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    # ---------------- 持久化 ----------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _dir_locked(self, exclusive: bool):
+        if not self._dir:
+            return contextlib.nullcontext()
+        os.makedirs(self._dir, exist_ok=True)
+        return _file_lock(self._path(LOCK_FILE), exclusive)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self._path(SNAPSHOT_FILE))
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _journal_size(self) -> int:
+        try:
+            return os.path.getsize(self._path(JOURNAL_FILE))
+        except OSError:
+            return 0
+
+    def _refresh(self) -> None:
+        """其他进程替换了快照或追加了日志时同步到内存（调用方持有 self._lock）"""
+        if not self._dir:
+            return
+        if self._file_stamp() == self._snapshot_stamp and self._journal_size() == self._journal_offset:
+            return
+        with self._dir_locked(exclusive=False):
+            self._sync()
+
+    def _sync(self) -> None:
+        """追上磁盘上的状态（调用方持有目录锁）：快照被替换则整体重新加载，否则只重放日志新增部分"""
+        if not self._dir:
+            return
+        if self._file_stamp() != self._snapshot_stamp:
+            self._docs, self._postings, self._total_length, self._max_updated_ts = {}, {}, 0, None
+            self._read_snapshot()
+            self._journal_offset = 0
+            self._journal_entries = 0
+            if self.format_outdated:
+                return
+        self._replay_journal()
+
+    def _journal(self, op: Dict[str, Any]) -> None:
+        """追加一条日志（调用方持有独占目录锁且已 _sync，内存状态包含所有进程的写入）"""
+        if not self._dir:
+            return
+        try:
+            with open(self._path(JOURNAL_FILE), "ab") as f:
+                if self._journal_size() > self._journal_offset:
+                    # 其他进程中断时留下的半行：去掉，避免与本条日志拼成一行
+                    f.truncate(self._journal_offset)
+                f.write((json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8"))
+                self._journal_offset = f.tell()
+            self._journal_entries += 1
+            if self._journal_entries >= JOURNAL_COMPACT_EVERY:
+                self._write_snapshot()
+        except Exception as e:
+            logger.warning(f"⚠️ 新闻检索索引日志写入失败: {e}")
+
+    def _write_snapshot(self) -> None:
+        """写入新快照并清空日志（先写临时文件再原子替换）"""
+        if not self._dir:
+            return
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            tmp_path = self._path(SNAPSHOT_FILE + ".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"version": INDEX_FORMAT_VERSION, "docs": self._docs, "postings": self._postings,
+                             "total_length": self._total_length, "max_updated_ts": self._max_updated_ts},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(SNAPSHOT_FILE))
+            open(self._path(JOURNAL_FILE), "w").close()
+            self._journal_entries = 0
+            self._journal_offset = 0
+            self._snapshot_stamp = self._file_stamp()
+        except Exception as e:
+            logger.warning(f"⚠️ 新闻检索索引快照写入失败: {e}")
+
+    def _read_snapshot(self) -> None:
+        """加载快照到内存；格式过旧时不加载并标记 format_outdated（由 _load 在独占锁下丢弃）"""
+        snapshot_path = self._path(SNAPSHOT_FILE)
+        self._snapshot_stamp = self._file_stamp()
+        if not os.path.exists(snapshot_path):
+            return
+        try:
+            with open(snapshot_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != INDEX_FORMAT_VERSION:
+                self.format_outdated = True
+                return
+            self._docs = state["docs"]
+            self._postings = state["postings"]
+            self._total_length = state["total_length"]
+            self._max_updated_ts = state.get("max_updated_ts")
+        except Exception as e:
+            logger.warning(f"⚠️ 新闻检索索引快照损坏，将从日志重建: {e}")
+            self._docs, self._postings, self._total_length = {}, {}, 0
+
+    def _replay_journal(self) -> None:
+        """从 _journal_offset 起重放日志；只消费完整的行（其他进程写了一半的行留到下次）"""
+        try:
+            with open(self._path(JOURNAL_FILE), "rb") as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except OSError:
+            return
+        consumed = 0
+        for raw in data.splitlines(keepends=True):
+            if not raw.endswith(b"\n"):
+                break
+            consumed += len(raw)
+            try:
+                op = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                continue  # 进程中断留下的半行
+            if op.get("op") == "add":
+                for entry in op["docs"]:
+                    self._apply_add(entry)
+            elif op.get("op") == "remove_before":
+                self._apply_remove_before(op["ts"])
+            self._journal_entries += 1
+        self._journal_offset += consumed
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        with self._lock, self._dir_locked(exclusive=True):
+            self._read_snapshot()
+            if self.format_outdated:
+                # 旧格式的 key 与回查条件不一致，日志也是旧格式：全部丢弃，由启动任务从 stock_news 重建
+                logger.info("🔎 新闻检索索引快照格式已过期，将从 stock_news 重建")
+                self._write_snapshot()
+            else:
+                self._replay_journal()
+                if self._journal_entries:
+                    self._write_snapshot()
+
+        if self._docs:
+            logger.info(
+                f"🔎 新闻检索索引已加载: {len(self._docs)} 条新闻，{len(self._postings)} 个词项，"
+                f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+            )
+
+
+async def _index_stale(db, index: NewsSearchIndex) -> bool:
+    """索引为空、格式过旧，或 stock_news 中有比索引更新的写入（如索引关闭期间或其他进程写入）"""
+    if not index.doc_count or index.format_outdated:
+        return True
+    try:
+        newest = await db.stock_news.find_one({}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", -1)])
+    except Exception as e:
+        logger.warning(f"⚠️ 检查新闻检索索引是否过期失败（沿用现有索引）: {e}")
+        return False
+    newest_ts = _to_epoch((newest or {}).get("updated_at"))
+    if newest_ts is None:
+        return False
+    indexed_ts = index.max_updated_ts
+    # stock_news 的 updated_at 为毫秒精度，留 1 秒余量
+    return indexed_ts is None or newest_ts > indexed_ts + 1
+
+
+async def rebuild_news_search_index(db, batch_size: int = 1000, only_if_stale: bool = False) -> int:
+    """从 stock_news 全量重建索引（首次启用、索引目录丢失、格式升级或索引过期时），返回索引条数"""
+    import asyncio
+
+    index = await asyncio.to_thread(get_news_search_index)
+    if index is None or (only_if_stale and not await _index_stale(db, index)):
+        return 0
+
+    start = time.perf_counter()
+    projection = {"_id": 0, "url": 1, "title": 1, "publish_time": 1, "content": 1,
+                  "summary": 1, "keywords": 1, "symbol": 1, "symbols": 1, "updated_at": 1}
+    await asyncio.to_thread(index.clear)
+    total = 0
+    batch: List[Dict[str, Any]] = []
+    async for doc in db.stock_news.find({}, projection):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            total += await asyncio.to_thread(index.add_documents, batch)
+            batch = []
+    if batch:
+        total += await asyncio.to_thread(index.add_documents, batch)
+    logger.info(f"🔎 新闻检索索引重建完成: {total} 条，耗时 {time.perf_counter() - start:.1f}s")
+    return total
+
+
+_news_search_index: Optional[NewsSearchIndex] = None
+_news_search_index_lock = threading.Lock()
+
+
+def get_news_search_index() -> Optional[NewsSearchIndex]:
+    """获取进程内的新闻检索索引；配置关闭时返回 None（调用方回退到 $text）"""
+    global _news_search_index
+    from app.core.config import settings
+
+    if not settings.NEWS_SEARCH_INDEX_ENABLED:
+        return None
+    if _news_search_index is None:
+        with _news_search_index_lock:
+            if _news_search_index is None:
+                _news_search_index = NewsSearchIndex(settings.NEWS_SEARCH_INDEX_DIR)
+    return _news_search_index
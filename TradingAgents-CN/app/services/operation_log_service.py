@@ -8,6 +8,7 @@ from typing import Dict, Any, List, Optional, Tuple
 from bson import ObjectId
 
 from app.core.database import get_mongo_db
+from app.services.batch_writer import get_batch_writer
 from app.models.operation_log import (
     OperationLogCreate,
     OperationLogResponse,
@@ -58,7 +59,14 @@ class OperationLogService:
                 "created_at": current_time  # naive datetime，MongoDB 按原样存储
             }
             
-            # 插入数据库
+            # 优先进入批量写入缓冲区（不占用请求路径的数据库往返），未启动时直接插入
+            writer = get_batch_writer(self.collection_name)
+            if writer is not None:
+                log_doc["_id"] = ObjectId()
+                await writer.put(log_doc)
+                logger.debug(f"📝 操作日志已入队: {username} - {log_data.action}")
+                return str(log_doc["_id"])
+
             result = await db[self.collection_name].insert_one(log_doc)
             
             logger.info(f"📝 操作日志已记录: {username} - {log_data.action}")
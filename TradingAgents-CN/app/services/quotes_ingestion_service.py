@@ -1,4 +1,6 @@
+import asyncio
 import logging
+import time
 from datetime import datetime, time as dtime, timedelta
 from typing import Dict, Optional, Tuple, List
 from zoneinfo import ZoneInfo
@@ -12,6 +14,26 @@ from app.services.data_sources.manager import DataSourceManager
 
 logger = logging.getLogger(__name__)
 
+# 其他写入方（单股刷新、手动同步、AKShare worker）直接更新 market_quotes 时，在状态集合中登记被改写的代码，
+# 行情入库任务写入前取出并从快照中剔除，避免差量比较认为“未变化”而漏写（支持跨进程）
+STATUS_COLLECTION_NAME = "quotes_ingestion_status"
+EXTERNAL_WRITES_DOC_ID = "market_quotes_external_writes"
+
+
+async def mark_quotes_written_externally(db, codes) -> None:
+    """登记绕过 QuotesIngestionService 写入 market_quotes 的股票代码，使其快照失效"""
+    codes6 = sorted({QuotesIngestionService._normalize_stock_code(c) for c in codes if c} - {""})
+    if not codes6:
+        return
+    try:
+        await db[STATUS_COLLECTION_NAME].update_one(
+            {"_id": EXTERNAL_WRITES_DOC_ID},
+            {"$addToSet": {"codes": {"$each": codes6}}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except Exception as e:
+        logger.warning(f"登记 market_quotes 外部写入失败（行情快照可能短暂过期）: {e}")
+
 
 class QuotesIngestionService:
     """
@@ -23,13 +45,20 @@ class QuotesIngestionService:
     - 智能限流：Tushare免费用户每小时最多2次，付费用户自动切换到高频模式（5秒）
     - 休市时间：跳过任务，保持上次收盘数据；必要时执行一次性兜底补数
     - 字段：code(6位)、close、pct_chg、amount、open、high、low、pre_close、trade_date、updated_at
+    - 增量写入：内存中保留上次写入的快照，只 upsert 发生变化的股票（updated_at 即该股票行情最后变化时间）；
+      其他写入方须调用 mark_quotes_written_externally 使对应快照失效
+    - 数据源调用在线程池中执行，不阻塞事件循环；每次运行记录写入放大与耗时指标
     """
 
+    # 参与变化比较的字段（与写入字段一致，不含 updated_at）
+    SNAPSHOT_FIELDS = ("close", "pct_chg", "amount", "volume", "open", "high", "low", "pre_close", "trade_date")
+    TRADE_DATE_CACHE_SECONDS = 600
+
     def __init__(self, collection_name: str = "market_quotes") -> None:
         from collections import deque
 
         self.collection_name = collection_name
-        self.status_collection_name = "quotes_ingestion_status"  # 状态记录集合
+        self.status_collection_name = STATUS_COLLECTION_NAME  # 状态记录集合
         self.tz = ZoneInfo(settings.TIMEZONE)
 
         # Tushare 权限检测相关属性
@@ -44,6 +73,15 @@ class QuotesIngestionService:
         self._rotation_sources = ["tushare", "akshare_eastmoney", "akshare_sina"]
         self._rotation_index = 0  # 当前轮换索引
 
+        # 复用的数据源管理器与交易日缓存
+        self._manager: Optional[DataSourceManager] = None
+        self._trade_date_cache: Optional[Tuple[float, str]] = None
+
+        # 上次写入的行情快照：code6 -> SNAPSHOT_FIELDS 对应的值元组
+        self._last_snapshot: Dict[str, tuple] = {}
+        self._snapshot_loaded = False
+        self.last_run_metrics: Dict[str, any] = {}
+
     @staticmethod
     def _normalize_stock_code(code: str) -> str:
         """
@@ -98,7 +136,8 @@ class QuotesIngestionService:
         success: bool,
         source: Optional[str] = None,
         records_count: int = 0,
-        error_msg: Optional[str] = None
+        error_msg: Optional[str] = None,
+        metrics: Optional[Dict[str, any]] = None
     ) -> None:
         """
         记录同步状态
@@ -108,6 +147,7 @@ class QuotesIngestionService:
             source: 数据源名称
             records_count: 记录数量
             error_msg: 错误信息
+            metrics: 本次运行指标（写入放大、各阶段耗时）
         """
         try:
             db = get_mongo_db()
@@ -126,6 +166,8 @@ class QuotesIngestionService:
                 "error_message": error_msg,
                 "updated_at": now,
             }
+            if metrics is not None:
+                status_doc["last_run_metrics"] = metrics
 
             await status_coll.update_one(
                 {"job": "quotes_ingestion"},
@@ -364,11 +406,70 @@ class QuotesIngestionService:
         except Exception:
             return True
 
-    async def _bulk_upsert(self, quotes_map: Dict[str, Dict], trade_date: str, source: Optional[str] = None) -> None:
-        db = get_mongo_db()
-        coll = db[self.collection_name]
-        ops = []
-        updated_at = datetime.now(self.tz)
+    def _get_manager(self) -> DataSourceManager:
+        """复用同一个 DataSourceManager（避免每次采集重新初始化各适配器）"""
+        if self._manager is None:
+            self._manager = DataSourceManager()
+        return self._manager
+
+    async def _get_trade_date(self) -> str:
+        """最新交易日（线程池中查询，短时缓存）"""
+        now_ts = time.monotonic()
+        if self._trade_date_cache and now_ts - self._trade_date_cache[0] < self.TRADE_DATE_CACHE_SECONDS:
+            return self._trade_date_cache[1]
+        try:
+            trade_date = await asyncio.to_thread(self._get_manager().find_latest_trade_date_with_fallback)
+        except Exception:
+            trade_date = None
+        if not trade_date:
+            return datetime.now(self.tz).strftime("%Y%m%d")
+        self._trade_date_cache = (now_ts, trade_date)
+        return trade_date
+
+    async def _ensure_snapshot_loaded(self, coll) -> None:
+        """首次写入前从 market_quotes 加载已有数据作为快照，避免重启后整表重写"""
+        if self._snapshot_loaded:
+            return
+        self._snapshot_loaded = True
+        try:
+            projection = {"_id": 0, "code": 1, **{f: 1 for f in self.SNAPSHOT_FIELDS}}
+            docs = await coll.find({}, projection).to_list(length=None)
+            self._last_snapshot = {
+                d["code"]: tuple(d.get(f) for f in self.SNAPSHOT_FIELDS) for d in docs if d.get("code")
+            }
+            logger.info(f"📥 已加载行情快照 {len(self._last_snapshot)} 条，用于增量写入比较")
+        except Exception as e:
+            logger.warning(f"加载行情快照失败（本次按全量写入）: {e}")
+            self._last_snapshot = {}
+
+    def invalidate_snapshot(self) -> None:
+        """清空快照（下次写入为全量写入）"""
+        self._last_snapshot = {}
+        self._snapshot_loaded = True
+
+    async def _drop_externally_written(self, db) -> int:
+        """取出其他写入方登记的代码并从快照中剔除，返回剔除数量"""
+        try:
+            doc = await db[self.status_collection_name].find_one_and_update(
+                {"_id": EXTERNAL_WRITES_DOC_ID, "codes.0": {"$exists": True}},
+                {"$set": {"codes": []}},
+            )
+        except Exception as e:
+            # 无法确认外部写入时保守处理：整表重新比较
+            logger.warning(f"读取 market_quotes 外部写入登记失败，本次按全量写入: {e}")
+            self.invalidate_snapshot()
+            return 0
+        codes = (doc or {}).get("codes") or []
+        for code6 in codes:
+            self._last_snapshot.pop(code6, None)
+        if codes:
+            logger.info(f"🔄 {len(codes)} 只股票已被其他写入方更新，从行情快照中剔除")
+        return len(codes)
+
+    def _diff_quotes(self, quotes_map: Dict[str, Dict], trade_date: str) -> Tuple[Dict[str, tuple], int]:
+        """返回 (有变化的 code6 -> 新值元组, 有效股票数)"""
+        changed: Dict[str, tuple] = {}
+        valid = 0
         for code, q in quotes_map.items():
             if not code:
                 continue
@@ -376,11 +477,50 @@ class QuotesIngestionService:
             code6 = self._normalize_stock_code(code)
             if not code6:
                 continue
+            valid += 1
+            row = (
+                q.get("close"), q.get("pct_chg"), q.get("amount"), q.get("volume"), q.get("open"),
+                q.get("high"), q.get("low"), q.get("pre_close"), trade_date,
+            )
+            if self._last_snapshot.get(code6) != row:
+                changed[code6] = row
+        return changed, valid
+
+    async def _feed_intraday_bars(self, quotes_map: Dict[str, Dict], tick_time: datetime, source: Optional[str]) -> int:
+        if not settings.INTRADAY_BARS_ENABLED:
+            return 0
+        try:
+            from app.services.intraday_bar_service import get_intraday_bar_service
+
+            quotes = {}
+            for code, q in quotes_map.items():
+                code6 = self._normalize_stock_code(code)
+                if code6:
+                    quotes[code6] = q
+            return await get_intraday_bar_service().ingest(quotes, tick_time, source)
+        except Exception as e:
+            logger.warning(f"分钟K线聚合失败（忽略）: {e}")
+            return 0
+
+    async def _bulk_upsert(self, quotes_map: Dict[str, Dict], trade_date: str, source: Optional[str] = None) -> Dict[str, any]:
+        """只写入与上次快照相比发生变化的行情，返回本次写入统计"""
+        db = get_mongo_db()
+        coll = db[self.collection_name]
+        await self._ensure_snapshot_loaded(coll)
+        await self._drop_externally_written(db)
+
+        changed, valid = self._diff_quotes(quotes_map, trade_date)
+        stats = {"received": valid, "changed": len(changed), "skipped": valid - len(changed),
+                 "matched": 0, "modified": 0, "upserted": 0}
+
+        ops = []
+        updated_at = datetime.now(self.tz)
+        for code6, row in changed.items():
+            doc = dict(zip(self.SNAPSHOT_FIELDS, row))
 
             # 🔥 日志：记录写入的成交量值
-            volume = q.get("volume")
             if code6 in ["300750", "000001", "600000"]:  # 只记录几个示例股票
-                logger.info(f"📊 [写入market_quotes] {code6} - volume={volume}, amount={q.get('amount')}, source={source}")
+                logger.info(f"📊 [写入market_quotes] {code6} - volume={doc['volume']}, amount={doc['amount']}, source={source}")
 
             ops.append(
                 UpdateOne(
@@ -388,27 +528,27 @@ class QuotesIngestionService:
                     {"$set": {
                         "code": code6,
                         "symbol": code6,  # 添加 symbol 字段，与 code 保持一致
-                        "close": q.get("close"),
-                        "pct_chg": q.get("pct_chg"),
-                        "amount": q.get("amount"),
-                        "volume": volume,
-                        "open": q.get("open"),
-                        "high": q.get("high"),
-                        "low": q.get("low"),
-                        "pre_close": q.get("pre_close"),
-                        "trade_date": trade_date,
+                        **doc,
                         "updated_at": updated_at,
                     }},
                     upsert=True,
                 )
             )
         if not ops:
-            logger.info("无可写入的数据，跳过")
-            return
+            logger.info(f"行情无变化（{valid} 条），跳过写入 source={source}")
+            return stats
         result = await coll.bulk_write(ops, ordered=False)
+        # 写入成功后再更新快照；写入失败时抛出异常，下次仍会重试这些股票
+        self._last_snapshot.update(changed)
+
+        stats["matched"] = result.matched_count
+        stats["modified"] = result.modified_count
+        stats["upserted"] = len(result.upserted_ids) if result.upserted_ids else 0
         logger.info(
-            f"✅ 行情入库完成 source={source}, matched={result.matched_count}, upserted={len(result.upserted_ids) if result.upserted_ids else 0}, modified={result.modified_count}"
+            f"✅ 行情入库完成 source={source}, 收到={valid}, 变化={len(changed)}, matched={stats['matched']}, "
+            f"upserted={stats['upserted']}, modified={stats['modified']}"
         )
+        return stats
 
     async def backfill_from_historical_data(self) -> None:
         """
@@ -429,11 +569,11 @@ class QuotesIngestionService:
             logger.info("📊 market_quotes 集合为空，开始从历史数据导入")
 
             db = get_mongo_db()
-            manager = DataSourceManager()
+            manager = self._get_manager()
 
             # 获取最新交易日
             try:
-                latest_trade_date = manager.find_latest_trade_date_with_fallback()
+                latest_trade_date = await asyncio.to_thread(manager.find_latest_trade_date_with_fallback)
                 if not latest_trade_date:
                     logger.warning("⚠️ 无法获取最新交易日，跳过历史数据导入")
                     return
@@ -500,16 +640,13 @@ class QuotesIngestionService:
     async def backfill_last_close_snapshot(self) -> None:
         """一次性补齐上一笔收盘快照（用于冷启动或数据陈旧）。允许在休市期调用。"""
         try:
-            manager = DataSourceManager()
+            manager = self._get_manager()
             # 使用近实时快照作为兜底，休市期返回的即为最后收盘数据
-            quotes_map, source = manager.get_realtime_quotes_with_fallback()
+            quotes_map, source = await asyncio.to_thread(manager.get_realtime_quotes_with_fallback)
             if not quotes_map:
                 logger.warning("backfill: 未获取到行情数据，跳过")
                 return
-            try:
-                trade_date = manager.find_latest_trade_date_with_fallback() or datetime.now(self.tz).strftime("%Y%m%d")
-            except Exception:
-                trade_date = datetime.now(self.tz).strftime("%Y%m%d")
+            trade_date = await self._get_trade_date()
             await self._bulk_upsert(quotes_map, trade_date, source)
         except Exception as e:
             logger.error(f"❌ backfill 行情补数失败: {e}")
@@ -526,8 +663,8 @@ class QuotesIngestionService:
                 return
 
             # 如果集合不为空但数据陈旧，使用实时接口更新
-            manager = DataSourceManager()
-            latest_td = manager.find_latest_trade_date_with_fallback()
+            manager = self._get_manager()
+            latest_td = await asyncio.to_thread(manager.find_latest_trade_date_with_fallback)
             if await self._collection_stale(latest_td):
                 logger.info("🔁 触发休市期/启动期 backfill 以填充最新收盘数据")
                 await self.backfill_last_close_snapshot()
@@ -627,11 +764,14 @@ class QuotesIngestionService:
                         f"当前采集间隔: {settings.QUOTES_INGEST_INTERVAL_SECONDS} 秒"
                     )
 
+            run_start = time.perf_counter()
+
             # 获取下一个数据源
             source_type, akshare_api = self._get_next_source()
 
-            # 尝试获取行情
-            quotes_map, source_name = self._fetch_quotes_from_source(source_type, akshare_api)
+            # 尝试获取行情（同步网络调用，放到线程池执行）
+            quotes_map, source_name = await asyncio.to_thread(self._fetch_quotes_from_source, source_type, akshare_api)
+            fetch_ms = (time.perf_counter() - run_start) * 1000
 
             if not quotes_map:
                 logger.warning(f"⚠️ {source_name or source_type} 未获取到行情数据，跳过本次入库")
@@ -645,21 +785,40 @@ class QuotesIngestionService:
                 return
 
             # 获取交易日
-            try:
-                manager = DataSourceManager()
-                trade_date = manager.find_latest_trade_date_with_fallback() or datetime.now(self.tz).strftime("%Y%m%d")
-            except Exception:
-                trade_date = datetime.now(self.tz).strftime("%Y%m%d")
-
-            # 入库
-            await self._bulk_upsert(quotes_map, trade_date, source_name)
+            tick_time = datetime.now(self.tz)
+            trade_date = await self._get_trade_date()
+
+            # 入库（仅写入有变化的股票）
+            write_start = time.perf_counter()
+            write_stats = await self._bulk_upsert(quotes_map, trade_date, source_name)
+            write_ms = (time.perf_counter() - write_start) * 1000
+
+            # 快照喂给分钟K线聚合器（到达收盘时间的 bar 批量落库）
+            bars_written = await self._feed_intraday_bars(quotes_map, tick_time, source_name)
+
+            metrics = {
+                **write_stats,
+                # 写入放大：实际写入文档数 / 收到的行情数（全量重写时为 1.0）
+                "write_ratio": round(write_stats["changed"] / write_stats["received"], 4) if write_stats["received"] else 0.0,
+                "fetch_ms": round(fetch_ms, 1),
+                "write_ms": round(write_ms, 1),
+                "total_ms": round((time.perf_counter() - run_start) * 1000, 1),
+                "bars_written": bars_written,
+            }
+            self.last_run_metrics = metrics
+            logger.info(
+                f"⏱️ 行情采集完成 source={source_name}: 写入 {metrics['changed']}/{metrics['received']} "
+                f"(ratio={metrics['write_ratio']}), fetch={metrics['fetch_ms']}ms, "
+                f"write={metrics['write_ms']}ms, total={metrics['total_ms']}ms"
+            )
 
             # 记录成功状态
             await self._record_sync_status(
                 success=True,
                 source=source_name,
                 records_count=len(quotes_map),
-                error_msg=None
+                error_msg=None,
+                metrics=metrics
             )
 
         except Exception as e:
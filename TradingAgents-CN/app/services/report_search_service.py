@@ -0,0 +1,170 @@
+"""
+分析报告列表查询辅助
+- 关键词检索：search_grams 字段（stock_symbol / analysis_id / 完整 summary 的小写字符 2-gram）+ 多键索引，
+  用 $all 命中索引缩小范围后再用原 $regex 校验，结果与原包含语义一致（中文无需分词）；
+  不足 2 个字符的关键词没有 2-gram 可查，只走 $regex；
+  还没有 search_grams_v 的文档（旧数据 / 其他写入路径，等待后台补齐）直接走 $regex，不会漏
+- 游标分页：按 (created_at, _id) 倒序的 keyset 分页，深页延迟与页码无关
+- 总数：无筛选时使用 estimated_document_count（元数据，O(1)）；有筛选时短TTL缓存 count_documents 结果
+"""
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("webapi")
+
+REPORTS_COLLECTION = "analysis_reports"
+
+# search_grams 的生成规则版本；规则变化时加一，后台补齐会重算所有缺少当前版本标记的文档
+SEARCH_GRAMS_VERSION = 2
+_COUNT_CACHE_TTL = 60.0
+_COUNT_CACHE_MAX = 512
+
+_count_cache: Dict[str, Tuple[float, int]] = {}
+
+
+def _bigrams(text: str) -> List[str]:
+    text = (text or "").lower()
+    if len(text) == 1:
+        return [text]
+    return [text[i:i + 2] for i in range(len(text) - 1) if not text[i:i + 2].isspace()]
+
+
+def build_search_grams(doc: Dict[str, Any]) -> List[str]:
+    """为报告文档生成 search_grams（写入 analysis_reports 时调用）"""
+    grams = set()
+    for field in ("stock_symbol", "analysis_id"):
+        grams.update(_bigrams(str(doc.get(field) or "")))
+    grams.update(_bigrams(str(doc.get("summary") or "")))
+    return sorted(grams)
+
+
+def build_search_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """写入/替换报告文档时需要一并保存的检索字段"""
+    return {"search_grams": build_search_grams(doc), "search_grams_v": SEARCH_GRAMS_VERSION}
+
+
+def build_keyword_query(keyword: str) -> Dict[str, Any]:
+    """关键词 -> 可走索引的查询条件"""
+    escaped = re.escape(keyword)
+    regex_or = {
+        "$or": [
+            {"stock_symbol": {"$regex": escaped, "$options": "i"}},
+            {"analysis_id": {"$regex": escaped, "$options": "i"}},
+            {"summary": {"$regex": escaped, "$options": "i"}},
+        ]
+    }
+    if len(keyword.strip()) < 2:
+        # 文档只保存 2-gram，单字关键词用 $all 查不到任何文档
+        return regex_or
+    grams = sorted(set(_bigrams(keyword.strip())))
+    if not grams:
+        return regex_or
+    indexed_or_pending = {
+        "$or": [
+            {"search_grams": {"$all": grams}},
+            {"search_grams_v": {"$exists": False}},
+        ]
+    }
+    return {"$and": [indexed_or_pending, regex_or]}
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    created_at = doc.get("created_at")
+    payload = {
+        "t": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "id": str(doc["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """游标 -> keyset 查询条件；游标非法时抛出 ValueError"""
+    from bson import ObjectId
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        oid = ObjectId(payload["id"])
+        created_at = datetime.fromisoformat(payload["t"]) if payload.get("t") else None
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": oid}}
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]
+    }
+
+
+def combine_queries(*queries: Dict[str, Any]) -> Dict[str, Any]:
+    parts = [q for q in queries if q]
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    return {"$and": parts}
+
+
+async def count_reports(collection, query: Dict[str, Any]) -> Tuple[int, bool]:
+    """返回 (total, is_approximate)"""
+    if not query:
+        return await collection.estimated_document_count(), True
+
+    key = json.dumps(query, sort_keys=True, default=str)
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and now - cached[0] < _COUNT_CACHE_TTL:
+        return cached[1], True
+
+    total = await collection.count_documents(query)
+    if len(_count_cache) >= _COUNT_CACHE_MAX:
+        _count_cache.clear()
+    _count_cache[key] = (now, total)
+    return total, False
+
+
+def invalidate_count_cache() -> None:
+    _count_cache.clear()
+
+
+async def ensure_report_indexes(db) -> None:
+    coll = db[REPORTS_COLLECTION]
+    await coll.create_index([("created_at", -1), ("_id", -1)], name="created_at_id_desc")
+    await coll.create_index([("stock_symbol", 1), ("created_at", -1)], name="stock_symbol_created_at")
+    await coll.create_index([("market_type", 1), ("created_at", -1)], name="market_type_created_at")
+    await coll.create_index([("search_grams", 1)], name="search_grams")
+    await coll.create_index([("search_grams_v", 1)], name="search_grams_v")
+
+
+async def backfill_search_grams(db, batch_size: int = 500) -> int:
+    """为缺少当前版本 search_grams 的报告补齐字段（历史数据、旧规则生成的截断 gram），返回处理条数"""
+    from pymongo import UpdateOne
+
+    coll = db[REPORTS_COLLECTION]
+    cursor = coll.find(
+        {"search_grams_v": {"$exists": False}},
+        {"_id": 1, "stock_symbol": 1, "analysis_id": 1, "summary": 1},
+    )
+    ops = []
+    total = 0
+    async for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": build_search_fields(doc)}))
+        if len(ops) >= batch_size:
+            await coll.bulk_write(ops, ordered=False)
+            total += len(ops)
+            ops = []
+    if ops:
+        await coll.bulk_write(ops, ordered=False)
+        total += len(ops)
+    if total:
+        logger.info(f"✅ analysis_reports.search_grams 补齐完成: {total} 条")
+    return total
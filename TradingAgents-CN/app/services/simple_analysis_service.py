@@ -21,6 +21,7 @@ init_logging()
 
 from tradingagents.graph.trading_graph import TradingAgentsGraph
 from tradingagents.default_config import DEFAULT_CONFIG
+from tradingagents.dataflows.batch_context import batch_scope
 from app.models.analysis import (
     AnalysisTask, AnalysisStatus, SingleAnalysisRequest, AnalysisParameters
 )
@@ -810,9 +811,10 @@ class SimpleAnalysisService:
         self,
         task_id: str,
         user_id: str,
-        request: SingleAnalysisRequest
+        request: SingleAnalysisRequest,
+        batch_id: Optional[str] = None
     ):
-        """在后台执行分析任务"""
+        """在后台执行分析任务（batch_id 不为空时与同批次任务共享市场级数据）"""
         # 🔧 使用 get_symbol() 方法获取股票代码（兼容 symbol 和 stock_code 字段）
         stock_code = request.get_symbol()
 
@@ -959,7 +961,7 @@ class SimpleAnalysisService:
             await self._update_task_status(task_id, AnalysisStatus.PROCESSING, 20)
 
             # 执行实际的分析
-            result = await self._execute_analysis_sync(task_id, user_id, request, progress_tracker)
+            result = await self._execute_analysis_sync(task_id, user_id, request, progress_tracker, batch_id)
 
             # 标记进度跟踪器完成（在线程中执行）
             await asyncio.to_thread(progress_tracker.mark_completed)
@@ -1065,7 +1067,8 @@ class SimpleAnalysisService:
         task_id: str,
         user_id: str,
         request: SingleAnalysisRequest,
-        progress_tracker: Optional[RedisProgressTracker] = None
+        progress_tracker: Optional[RedisProgressTracker] = None,
+        batch_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """同步执行分析（在共享线程池中运行）"""
         # 🔧 使用共享线程池，支持多个任务并发执行
@@ -1078,7 +1081,8 @@ class SimpleAnalysisService:
             task_id,
             user_id,
             request,
-            progress_tracker
+            progress_tracker,
+            batch_id
         )
         logger.info(f"✅ [线程池] 分析任务执行完成: {task_id}")
         return result
@@ -1088,7 +1092,8 @@ class SimpleAnalysisService:
         task_id: str,
         user_id: str,
         request: SingleAnalysisRequest,
-        progress_tracker: Optional[RedisProgressTracker] = None
+        progress_tracker: Optional[RedisProgressTracker] = None,
+        batch_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """同步执行分析的具体实现"""
         try:
@@ -1498,13 +1503,14 @@ class SimpleAnalysisService:
 
             logger.info(f"🚀 准备调用 trading_graph.propagate，progress_callback={graph_progress_callback}")
 
-            # 执行实际分析，传递进度回调和task_id
-            state, decision = trading_graph.propagate(
-                request.stock_code,
-                analysis_date,
-                progress_callback=graph_progress_callback,
-                task_id=task_id
-            )
+            # 执行实际分析，传递进度回调和task_id（批量分析时在批次上下文中共享市场级数据）
+            with batch_scope(batch_id):
+                state, decision = trading_graph.propagate(
+                    request.stock_code,
+                    analysis_date,
+                    progress_callback=graph_progress_callback,
+                    task_id=task_id
+                )
 
             logger.info(f"✅ trading_graph.propagate 执行完成")
 
@@ -2621,8 +2627,13 @@ class SimpleAnalysisService:
                 "performance_metrics": result.get("performance_metrics", {})
             }
 
+            # 关键词检索用的 2-gram 字段（见 report_search_service）
+            from app.services.report_search_service import build_search_fields, invalidate_count_cache
+            document.update(build_search_fields(document))
+
             # 保存到analysis_reports集合（与web目录保持一致）
             result_insert = await db.analysis_reports.insert_one(document)
+            invalidate_count_cache()
 
             if result_insert.inserted_id:
                 logger.info(f"✅ 分析报告已保存到MongoDB analysis_reports: {analysis_id}")
@@ -264,6 +264,9 @@ class StockDataService:
                 {"$set": quote_data},
                 upsert=True
             )
+            # 绕过行情入库任务写入，需使其差量快照失效
+            from app.services.quotes_ingestion_service import mark_quotes_written_externally
+            await mark_quotes_written_externally(db, [symbol6])
 
             return result.modified_count > 0 or result.upserted_id is not None
 
@@ -0,0 +1,210 @@
+"""
+StockSearchIndex: 股票搜索内存索引（CN/HK/US）
+- 启动时加载，基础信息同步完成后刷新；港股/美股按需缓存，索引过期后后台刷新
+- 每个 code 只保留优先级最高的数据源记录（加载时预先去重）
+- 前缀匹配：代码 / 名称 / 拼音首字母 / 英文名，使用有序词表 + bisect
+- 子串匹配：取最短的字符 1/2-gram 倒排表逐条校验，兼容原 $regex 的包含语义
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # 拼音首字母为可选能力，缺少依赖时仅跳过该字段
+    from pypinyin import Style, lazy_pinyin
+except Exception:  # pragma: no cover
+    lazy_pinyin = None
+    Style = None
+
+logger = logging.getLogger("webapi")
+
+# 前缀命中的字段顺序（越小越靠前）
+_RANK_CODE = 0
+_RANK_NAME = 1
+_RANK_INITIALS = 2
+_RANK_NAME_EN = 3
+_PREFIX_RANKS = (_RANK_CODE, _RANK_NAME, _RANK_INITIALS, _RANK_NAME_EN)
+
+
+def pinyin_initials(text: str) -> str:
+    """中文名称 -> 拼音首字母（贵州茅台 -> gzmt）；非中文字符原样保留（小写）"""
+    if not text or lazy_pinyin is None:
+        return ""
+    try:
+        parts = lazy_pinyin(text, style=Style.FIRST_LETTER, errors="default")
+        return "".join(p for p in parts if p and not p.isspace()).lower()
+    except Exception:
+        return ""
+
+
+def _grams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class _MarketIndex:
+    """单个市场的不可变索引快照（整体替换，读写无需加锁）"""
+
+    __slots__ = ("docs", "terms", "texts", "postings", "built_at")
+
+    def __init__(self, docs: List[Dict[str, Any]]) -> None:
+        self.docs = docs
+        self.terms: Dict[int, List[Tuple[str, int]]] = {r: [] for r in _PREFIX_RANKS}
+        self.texts: List[str] = []
+        postings: Dict[str, List[int]] = {}
+
+        for idx, doc in enumerate(docs):
+            code = str(doc.get("code") or "").lower()
+            name = str(doc.get("name") or "").lower()
+            name_en = str(doc.get("name_en") or "").lower()
+            initials = pinyin_initials(doc.get("name") or "")
+
+            for term, rank in ((code, _RANK_CODE), (name, _RANK_NAME),
+                               (initials, _RANK_INITIALS), (name_en, _RANK_NAME_EN)):
+                if term:
+                    self.terms[rank].append((term, idx))
+
+            text = "\x00".join(t for t in (code, name, name_en) if t)
+            self.texts.append(text)
+            for g in _grams(text):
+                if "\x00" not in g:
+                    postings.setdefault(g, []).append(idx)
+
+        for terms in self.terms.values():
+            terms.sort()
+        self.postings = postings
+        self.built_at = time.monotonic()
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        q = query.strip().lower()
+        if not q or limit <= 0:
+            return []
+
+        hits: List[int] = []
+        seen = set()
+
+        # 1. 前缀匹配：按 代码 → 名称 → 拼音首字母 → 英文名 依次取，够 limit 即停止
+        for rank in _PREFIX_RANKS:
+            terms = self.terms[rank]
+            pos = bisect_left(terms, (q,))
+            while pos < len(terms) and len(hits) < limit:
+                term, idx = terms[pos]
+                if not term.startswith(q):
+                    break
+                if idx not in seen:
+                    seen.add(idx)
+                    hits.append(idx)
+                pos += 1
+            if len(hits) >= limit:
+                break
+
+        # 2. 不足 limit 时补充子串匹配（与原 $regex 包含语义一致）
+        if len(hits) < limit:
+            for idx in self._substring_candidates(q):
+                if idx not in seen and q in self.texts[idx]:
+                    seen.add(idx)
+                    hits.append(idx)
+                    if len(hits) >= limit:
+                        break
+
+        return [self.docs[i] for i in hits]
+
+    def _substring_candidates(self, q: str) -> List[int]:
+        """返回最短的 gram 倒排表作为候选（由调用方逐条校验，凑够 limit 即停止）"""
+        keys = {q} if len(q) == 1 else {q[i:i + 2] for i in range(len(q) - 1)}
+        shortest: Optional[List[int]] = None
+        for k in keys:
+            p = self.postings.get(k)
+            if not p:
+                return []
+            if shortest is None or len(p) < len(shortest):
+                shortest = p
+        return shortest or []
+
+
+class StockSearchIndex:
+    def __init__(self, max_age_seconds: int = 600) -> None:
+        self._max_age = max_age_seconds
+        self._indexes: Dict[str, _MarketIndex] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    def is_ready(self, market: str) -> bool:
+        return market in self._indexes
+
+    def search(self, market: str, query: str, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """查询索引；索引未加载时返回 None（调用方应回退到数据库查询）。
+        索引过期时在后台刷新，本次仍返回旧快照。
+        """
+        index = self._indexes.get(market)
+        if index is None:
+            self.schedule_refresh(market)
+            return None
+        if time.monotonic() - index.built_at > self._max_age:
+            self.schedule_refresh(market)
+        return index.search(query, limit)
+
+    def schedule_refresh(self, market: str) -> None:
+        """后台刷新（同一市场同时只允许一个刷新任务）"""
+        task = self._refreshing.get(market)
+        if task is not None and not task.done():
+            return
+        try:
+            self._refreshing[market] = asyncio.get_running_loop().create_task(self.refresh(market))
+        except RuntimeError:
+            pass
+
+    async def refresh_all(self) -> None:
+        for market in ("CN", "HK", "US"):
+            await self.refresh(market)
+
+    async def refresh(self, market: str) -> int:
+        """从 basic_info 集合重建某个市场的索引，返回索引的股票数"""
+        from app.core.database import get_mongo_db
+        from app.services.unified_stock_service import UnifiedStockService
+
+        start = time.perf_counter()
+        try:
+            db = get_mongo_db()
+            service = UnifiedStockService(db)
+            collection = db[service.collection_map[market]["basic_info"]]
+            source_priority = await service._get_source_priority(market)
+            docs = await collection.find({}, {"_id": 0}).to_list(length=None)
+        except Exception as e:
+            logger.warning(f"⚠️ 加载 {market} 股票搜索索引失败: {e}")
+            return 0
+
+        index = await asyncio.to_thread(_build_index, docs, source_priority)
+        self._indexes[market] = index
+        logger.info(
+            f"🔎 {market} 股票搜索索引已刷新: {len(index.docs)} 只股票（原始 {len(docs)} 条），"
+            f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return len(index.docs)
+
+
+def _build_index(docs: List[Dict[str, Any]], source_priority: List[str]) -> _MarketIndex:
+    """按 code 去重（保留优先级最高的数据源），构建索引快照"""
+    rank = {src: i for i, src in enumerate(source_priority)}
+    best: Dict[str, Dict[str, Any]] = {}
+    for doc in docs:
+        code = doc.get("code")
+        if not code:
+            continue
+        current = best.get(code)
+        if current is None or rank.get(doc.get("source"), len(rank)) < rank.get(current.get("source"), len(rank)):
+            best[code] = doc
+    return _MarketIndex([best[c] for c in sorted(best)])
+
+
+_stock_search_index: Optional[StockSearchIndex] = None
+
+
+def get_stock_search_index() -> StockSearchIndex:
+    global _stock_search_index
+    if _stock_search_index is None:
+        _stock_search_index = StockSearchIndex()
+    return _stock_search_index
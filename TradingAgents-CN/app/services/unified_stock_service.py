@@ -173,6 +173,15 @@ class UnifiedStockService:
         Returns:
             股票列表
         """
+        # ⚡ 优先使用内存搜索索引（前缀/拼音首字母/子串，已按数据源优先级去重）
+        from app.services.stock_search_index import get_stock_search_index
+
+        indexed = get_stock_search_index().search(market, query, limit)
+        if indexed is not None:
+            logger.debug(f"🔍 搜索 {market} 市场(索引): '{query}' -> {len(indexed)} 条结果")
+            return indexed
+
+        # 索引尚未加载（已在后台触发加载）：回退到数据库查询
         collection_name = self.collection_map[market]["basic_info"]
         collection = self.db[collection_name]
 
@@ -4,16 +4,118 @@
 """
 
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from collections import defaultdict
 
 from app.core.database import get_mongo_db
 from app.models.config import UsageRecord, UsageStatistics
+from app.services.batch_writer import get_batch_writer
+from tradingagents.config.usage_rollups import (
+    BACKFILL_CLAIM_TTL_SECONDS,
+    BACKFILL_DONE,
+    BACKFILL_RUNNING,
+    BACKFILL_STATE_ID,
+    GRANULARITY_DAY,
+    GRANULARITY_HOUR,
+    ROLLUP_COLLECTION,
+    ROLLUP_METRICS,
+    ROLLUP_STATE_COLLECTION,
+    build_rollup_updates,
+    day_bucket,
+    hour_bucket,
+    hourly_backfill_pipeline,
+    rollup_index_specs,
+    rollup_key,
+)
 
 logger = logging.getLogger("app.services.usage_statistics_service")
 
 
+def build_rollup_window_query(start_iso: str, end_iso: str, dims: Dict[str, Any]) -> Dict[str, Any]:
+    """时间窗口 -> 预聚合查询：起始日用小时桶（从起始小时开始），之后的完整天用天桶"""
+    start_hour = hour_bucket(start_iso)
+    start_day = day_bucket(start_iso)
+    end_hour = hour_bucket(end_iso)
+    end_day = day_bucket(end_iso)
+
+    if start_day == end_day:
+        return {"granularity": GRANULARITY_HOUR, "bucket": {"$gte": start_hour, "$lte": end_hour}, **dims}
+
+    return {
+        "$or": [
+            {"granularity": GRANULARITY_HOUR, "bucket": {"$gte": start_hour, "$lte": f"{start_day}T23"}, **dims},
+            {"granularity": GRANULARITY_DAY, "bucket": {"$gt": start_day, "$lte": end_day}, **dims},
+        ]
+    }
+
+
+def build_usage_statistics(docs: List[Dict[str, Any]]) -> UsageStatistics:
+    """预聚合桶 -> UsageStatistics（输出结构与逐条统计一致）"""
+    def _bucket():
+        return {
+            "requests": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cost": 0.0,
+            "cost_by_currency": defaultdict(float)
+        }
+
+    stats = UsageStatistics()
+    cost_by_currency = defaultdict(float)
+    by_provider = defaultdict(_bucket)
+    by_model = defaultdict(_bucket)
+    by_date = defaultdict(_bucket)
+
+    for doc in docs:
+        requests = doc.get("requests", 0)
+        input_tokens = doc.get("input_tokens", 0)
+        output_tokens = doc.get("output_tokens", 0)
+        cost = doc.get("cost", 0.0)
+        currency = doc.get("currency", "CNY")
+        provider_key = doc.get("provider", "unknown")
+        model_key = f"{provider_key}/{doc.get('model_name', 'unknown')}"
+        date_key = str(doc.get("bucket", ""))[:10]  # YYYY-MM-DD
+
+        stats.total_requests += requests
+        stats.total_input_tokens += input_tokens
+        stats.total_output_tokens += output_tokens
+        stats.total_cost += cost  # 保留向后兼容
+        cost_by_currency[currency] += cost
+
+        for key, target in ((provider_key, by_provider), (model_key, by_model), (date_key, by_date)):
+            if not key:
+                continue
+            target[key]["requests"] += requests
+            target[key]["input_tokens"] += input_tokens
+            target[key]["output_tokens"] += output_tokens
+            target[key]["cost"] += cost
+            target[key]["cost_by_currency"][currency] += cost
+
+    # 转换 defaultdict 为普通 dict（包括嵌套的 cost_by_currency）
+    stats.cost_by_currency = dict(cost_by_currency)
+    stats.by_provider = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_provider.items()}
+    stats.by_model = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_model.items()}
+    stats.by_date = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in sorted(by_date.items())}
+    return stats
+
+
+async def update_rollups_for_records(records: List[Dict[str, Any]]) -> None:
+    """增量更新小时/天预聚合（失败不影响原始记录，夜间对账任务会修正）"""
+    try:
+        ops = [op for r in records for op in build_rollup_updates(r)]
+        if ops:
+            await get_mongo_db()[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+    except Exception as e:
+        logger.warning(f"⚠️ 更新使用量预聚合失败: {e}")
+
+
+async def ensure_rollup_indexes(db) -> None:
+    for spec in rollup_index_specs():
+        await db[ROLLUP_COLLECTION].create_index(spec["keys"], **spec["kwargs"])
+
+
 class UsageStatisticsService:
     """使用统计服务"""
     
@@ -28,7 +130,18 @@ class UsageStatisticsService:
             collection = db[self.collection_name]
 
             record_dict = record.model_dump(exclude={"id"})
-            result = await collection.insert_one(record_dict)
+
+            # 优先进入批量写入缓冲区（预聚合在批次落库后统一更新），未启动时直接插入
+            writer = get_batch_writer(self.collection_name)
+            if writer is not None:
+                if not await writer.put(record_dict):
+                    logger.warning(f"⚠️ 使用记录缓冲区已满，记录被丢弃: {record.provider}/{record.model_name}")
+                    return False
+                logger.debug(f"✅ 使用记录已入队: {record.provider}/{record.model_name}")
+                return True
+
+            await collection.insert_one(record_dict)
+            await update_rollups_for_records([record_dict])
 
             logger.info(f"✅ 添加使用记录成功: {record.provider}/{record.model_name}")
             return True
@@ -82,110 +195,182 @@ class UsageStatisticsService:
         provider: Optional[str] = None,
         model_name: Optional[str] = None
     ) -> UsageStatistics:
-        """获取使用统计"""
+        """获取使用统计（从小时/天预聚合读取，时间窗口按小时对齐）"""
         try:
             db = get_mongo_db()
-            collection = db[self.collection_name]
-            
+
             # 计算时间范围
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
-            
-            # 构建查询条件
-            query = {
-                "timestamp": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }
+
+            dims = {}
             if provider:
-                query["provider"] = provider
+                dims["provider"] = provider
             if model_name:
-                query["model_name"] = model_name
-            
-            # 获取所有记录
-            cursor = collection.find(query)
-            records = []
-            async for doc in cursor:
-                records.append(doc)
-            
-            # 统计数据
-            stats = UsageStatistics()
-            stats.total_requests = len(records)
-
-            # 按货币统计成本
-            cost_by_currency = defaultdict(float)
-
-            by_provider = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
-            by_model = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
-            by_date = defaultdict(lambda: {
-                "requests": 0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "cost_by_currency": defaultdict(float)
-            })
+                dims["model_name"] = model_name
 
-            for record in records:
-                cost = record.get("cost", 0.0)
-                currency = record.get("currency", "CNY")
-
-                # 总计
-                stats.total_input_tokens += record.get("input_tokens", 0)
-                stats.total_output_tokens += record.get("output_tokens", 0)
-                stats.total_cost += cost  # 保留向后兼容
-                cost_by_currency[currency] += cost
-
-                # 按供应商统计
-                provider_key = record.get("provider", "unknown")
-                by_provider[provider_key]["requests"] += 1
-                by_provider[provider_key]["input_tokens"] += record.get("input_tokens", 0)
-                by_provider[provider_key]["output_tokens"] += record.get("output_tokens", 0)
-                by_provider[provider_key]["cost"] += cost
-                by_provider[provider_key]["cost_by_currency"][currency] += cost
-
-                # 按模型统计
-                model_key = f"{record.get('provider', 'unknown')}/{record.get('model_name', 'unknown')}"
-                by_model[model_key]["requests"] += 1
-                by_model[model_key]["input_tokens"] += record.get("input_tokens", 0)
-                by_model[model_key]["output_tokens"] += record.get("output_tokens", 0)
-                by_model[model_key]["cost"] += cost
-                by_model[model_key]["cost_by_currency"][currency] += cost
-
-                # 按日期统计
-                timestamp = record.get("timestamp", "")
-                if timestamp:
-                    date_key = timestamp[:10]  # YYYY-MM-DD
-                    by_date[date_key]["requests"] += 1
-                    by_date[date_key]["input_tokens"] += record.get("input_tokens", 0)
-                    by_date[date_key]["output_tokens"] += record.get("output_tokens", 0)
-                    by_date[date_key]["cost"] += cost
-                    by_date[date_key]["cost_by_currency"][currency] += cost
-
-            # 转换 defaultdict 为普通 dict（包括嵌套的 cost_by_currency）
-            stats.cost_by_currency = dict(cost_by_currency)
-            stats.by_provider = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_provider.items()}
-            stats.by_model = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_model.items()}
-            stats.by_date = {k: {**v, "cost_by_currency": dict(v["cost_by_currency"])} for k, v in by_date.items()}
-            
-            logger.info(f"✅ 获取使用统计成功: {stats.total_requests} 条记录")
+            rollups = db[ROLLUP_COLLECTION]
+            if await self._rollups_ready(db):
+                query = build_rollup_window_query(start_date.isoformat(), end_date.isoformat(), dims)
+                docs = await rollups.find(query, {"_id": 0}).to_list(length=None)
+            else:
+                # 预聚合尚未回填：直接在数据库端按小时聚合原始记录
+                match = {
+                    "timestamp": {
+                        "$gte": start_date.isoformat(),
+                        "$lte": end_date.isoformat()
+                    },
+                    **dims,
+                }
+                docs = [
+                    {**d["_id"], **{k: d[k] for k in ROLLUP_METRICS}}
+                    async for d in db[self.collection_name].aggregate(hourly_backfill_pipeline(match))
+                ]
+
+            stats = build_usage_statistics(docs)
+            logger.info(f"✅ 获取使用统计成功: {stats.total_requests} 条记录（{len(docs)} 个聚合桶）")
             return stats
         except Exception as e:
             logger.error(f"❌ 获取使用统计失败: {e}")
             return UsageStatistics()
-    
+
+    async def rebuild_rollups(self, days: Optional[int] = None) -> Dict[str, int]:
+        """从原始记录回填/对账预聚合（幂等，$set 覆盖）
+
+        - 小时桶：重算当前小时之前的所有小时
+        - 天桶：重算今天之前的所有天（今天的天桶由写入时的 $inc 维护）
+        - days 为空时处理全部历史数据，否则只处理最近 days 天
+        - 执行期间暂停批量写入器：先刷写缓冲区，再阻止新批次落库及其 $inc，
+          避免同一条记录既被原始记录聚合 $set 又被写入时的 $inc 重复计入
+        """
+        async with self._rollup_writes_paused():
+            return await self._rebuild_rollups(days)
+
+    async def _rebuild_rollups(self, days: Optional[int]) -> Dict[str, int]:
+        from pymongo import UpdateOne
+
+        db = get_mongo_db()
+        raw = db[self.collection_name]
+        rollups = db[ROLLUP_COLLECTION]
+
+        now = datetime.now()
+        current_hour = hour_bucket(now.isoformat())
+        today = day_bucket(now.isoformat())
+        since = day_bucket((now - timedelta(days=days)).isoformat()) if days else None
+
+        await ensure_rollup_indexes(db)
+
+        ts_range = {"$lt": current_hour}
+        if since:
+            ts_range["$gte"] = since
+
+        hour_ops = []
+        async for d in raw.aggregate(hourly_backfill_pipeline({"timestamp": ts_range}), allowDiskUse=True):
+            key = d["_id"]
+            hour_ops.append(UpdateOne(
+                rollup_key(GRANULARITY_HOUR, key["bucket"], key["provider"], key["model_name"], key["currency"]),
+                {"$set": {k: d[k] for k in ROLLUP_METRICS}},
+                upsert=True,
+            ))
+        hours = await self._bulk_write(rollups, hour_ops)
+
+        bucket_range = {"$lt": today}
+        if since:
+            bucket_range["$gte"] = since
+        day_pipeline = [
+            {"$match": {"granularity": GRANULARITY_HOUR, "bucket": bucket_range}},
+            {
+                "$group": {
+                    "_id": {
+                        "bucket": {"$substrCP": ["$bucket", 0, 10]},
+                        "provider": "$provider",
+                        "model_name": "$model_name",
+                        "currency": "$currency",
+                    },
+                    **{k: {"$sum": f"${k}"} for k in ROLLUP_METRICS},
+                }
+            },
+        ]
+        day_ops = []
+        async for d in rollups.aggregate(day_pipeline, allowDiskUse=True):
+            key = d["_id"]
+            day_ops.append(UpdateOne(
+                rollup_key(GRANULARITY_DAY, key["bucket"], key["provider"], key["model_name"], key["currency"]),
+                {"$set": {k: d[k] for k in ROLLUP_METRICS}},
+                upsert=True,
+            ))
+        days_written = await self._bulk_write(rollups, day_ops)
+
+        logger.info(f"✅ 使用量预聚合回填完成: 小时桶 {hours} 个, 天桶 {days_written} 个 (since={since or '全部'})")
+        return {"hour_buckets": hours, "day_buckets": days_written}
+
+    async def claim_rollup_backfill(self) -> bool:
+        """启动时、批量写入器启动之前调用：认领首次回填
+
+        是否需要回填由状态标记决定，而不是预聚合集合是否为空——写入器启动后的 $inc
+        可能先于回填落库，使集合“非空”而永远跳过回填。标记的 _id 唯一，多进程只有一个能认领成功；
+        已完成或他人认领中时返回 False
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            db = get_mongo_db()
+            await ensure_rollup_indexes(db)
+            now = datetime.now()
+            stale = now - timedelta(seconds=BACKFILL_CLAIM_TTL_SECONDS)
+            await db[ROLLUP_STATE_COLLECTION].find_one_and_update(
+                {
+                    "_id": BACKFILL_STATE_ID,
+                    "status": {"$ne": BACKFILL_DONE},
+                    "$or": [{"claimed_at": {"$lt": stale}}, {"claimed_at": None}],
+                },
+                {"$set": {"status": BACKFILL_RUNNING, "claimed_at": now}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            logger.error(f"❌ 认领使用量预聚合回填失败: {e}")
+            return False
+
+    async def run_rollup_backfill(self) -> None:
+        """执行已认领的全量回填并标记完成；失败时释放认领，下次启动重试"""
+        state = get_mongo_db()[ROLLUP_STATE_COLLECTION]
+        try:
+            await self.rebuild_rollups()
+            await state.update_one(
+                {"_id": BACKFILL_STATE_ID},
+                {"$set": {"status": BACKFILL_DONE, "finished_at": datetime.now()}},
+            )
+        except Exception as e:
+            logger.error(f"❌ 使用量预聚合回填失败: {e}")
+            try:
+                await state.update_one({"_id": BACKFILL_STATE_ID}, {"$set": {"claimed_at": None}})
+            except Exception:
+                pass
+
+    @staticmethod
+    async def _rollups_ready(db) -> bool:
+        """回填完成前预聚合只含写入时的增量，统计仍从原始记录聚合"""
+        state = await db[ROLLUP_STATE_COLLECTION].find_one({"_id": BACKFILL_STATE_ID}, {"status": 1})
+        return bool(state) and state.get("status") == BACKFILL_DONE
+
+    @asynccontextmanager
+    async def _rollup_writes_paused(self) -> AsyncIterator[None]:
+        writer = get_batch_writer(self.collection_name)
+        if writer is None:
+            yield
+            return
+        async with writer.paused():
+            yield
+
+    @staticmethod
+    async def _bulk_write(collection, ops: List[Any], batch_size: int = 1000) -> int:
+        for i in range(0, len(ops), batch_size):
+            await collection.bulk_write(ops[i:i + batch_size], ordered=False)
+        return len(ops)
+
     async def get_cost_by_provider(self, days: int = 7) -> Dict[str, float]:
         """获取按供应商的成本统计"""
         stats = await self.get_usage_statistics(days=days)
@@ -225,6 +410,12 @@ class UsageStatisticsService:
             })
             
             deleted_count = result.deleted_count
+
+            # 同步清理预聚合桶（按截止日期所在天对齐，保留截止日当天的桶）
+            await db[ROLLUP_COLLECTION].delete_many({
+                "bucket": {"$lt": day_bucket(cutoff_date.isoformat())}
+            })
+
             logger.info(f"✅ 删除旧记录成功: {deleted_count} 条")
             return deleted_count
         except Exception as e:
@@ -10,6 +10,7 @@ from typing import Dict, Any, List, Optional
 from app.core.database import get_mongo_db
 from app.services.historical_data_service import get_historical_data_service
 from app.services.news_data_service import get_news_data_service
+from app.services.quotes_ingestion_service import mark_quotes_written_externally
 from tradingagents.dataflows.providers.china.akshare import get_akshare_provider
 
 logger = logging.getLogger(__name__)
@@ -322,6 +323,7 @@ class AKShareSyncService:
 
                     for i in range(0, len(symbols), self.batch_size):
                         batch = symbols[i:i + self.batch_size]
+                        written = []
 
                         # 从全市场数据中提取当前批次的数据并保存
                         for symbol in batch:
@@ -348,6 +350,7 @@ class AKShareSyncService:
                                         {"$set": quotes_data},
                                         upsert=True
                                     )
+                                    written.append(symbol)
                                     stats["success_count"] += 1
                                 else:
                                     stats["error_count"] += 1
@@ -364,6 +367,8 @@ class AKShareSyncService:
                                     "context": "sync_realtime_quotes"
                                 })
 
+                        await mark_quotes_written_externally(self.db, written)
+
                         # 进度日志
                         progress = min(i + self.batch_size, len(symbols))
                         logger.info(f"📈 行情保存进度: {progress}/{len(symbols)} "
@@ -405,6 +410,7 @@ class AKShareSyncService:
                 return await self._process_quotes_batch_fallback(batch)
 
             # 批量保存到数据库
+            written = []
             for symbol in batch:
                 try:
                     quotes = quotes_map.get(symbol)
@@ -429,6 +435,7 @@ class AKShareSyncService:
                             {"$set": quotes_data},
                             upsert=True
                         )
+                        written.append(symbol)
                         batch_stats["success_count"] += 1
                     else:
                         batch_stats["error_count"] += 1
@@ -445,6 +452,7 @@ class AKShareSyncService:
                         "context": "_process_quotes_batch"
                     })
 
+            await mark_quotes_written_externally(self.db, written)
             return batch_stats
 
         except Exception as e:
@@ -521,6 +529,7 @@ class AKShareSyncService:
                     {"$set": quotes_data},
                     upsert=True
                 )
+                await mark_quotes_written_externally(self.db, [symbol])
 
                 logger.info(f"✅ {symbol} 行情已保存到数据库 (matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id})")
                 return True
@@ -417,7 +417,7 @@ class NewsDataSyncService:
         return keywords[:10]  # 最多返回10个关键词
     
     def _deduplicate_news(self, news_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """去重新闻"""
+        """去重新闻：按标题+URL精确去重（近似重复由 NewsDataService 入库时标注 cluster_id，读取时折叠）"""
         seen = set()
         unique_news = []
         
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+从 token_usage 原始记录回填/重算 token_usage_rollups 预聚合
+
+用法：
+    python scripts/backfill_usage_rollups.py            # 全量重算
+    python scripts/backfill_usage_rollups.py --days 7   # 只重算最近7天
+
+重算是幂等的（$set 覆盖），可以随时重复执行。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import init_database
+from app.services.usage_statistics_service import usage_statistics_service
+
+
+async def main(days):
+    await init_database()
+    result = await usage_statistics_service.rebuild_rollups(days=days)
+    print(f"✅ 回填完成: 小时桶 {result['hour_buckets']} 个, 天桶 {result['day_buckets']} 个")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填 Token 使用量预聚合")
+    parser.add_argument("--days", type=int, default=None, help="只重算最近N天（默认全部）")
+    args = parser.parse_args()
+    asyncio.run(main(args.days))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+港股/美股批量行情压测：对比 逐只 get_quote/get_kline 与 批量 get_quotes/get_klines
+
+两种模式都使用 force_refresh=True（跳过缓存，真实请求上游），统计耗时、成功数与上游请求次数
+（多代码请求计 1 次）。不连接数据库时使用默认数据源优先级。
+
+用法：
+    python scripts/benchmark_foreign_batch.py --market US --sizes 10,50,200
+    python scripts/benchmark_foreign_batch.py --market HK --sizes 10,50 --kind kline
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.foreign_stock_service import ForeignStockService
+
+US_CODES = [
+    "AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "BRK-B", "AVGO", "JPM",
+    "LLY", "V", "UNH", "XOM", "MA", "JNJ", "PG", "HD", "COST", "ABBV",
+    "MRK", "CVX", "ADBE", "CRM", "PEP", "KO", "WMT", "BAC", "NFLX", "AMD",
+    "TMO", "MCD", "CSCO", "ACN", "LIN", "ABT", "ORCL", "DHR", "INTC", "DIS",
+    "WFC", "VZ", "TXN", "CMCSA", "PM", "NEE", "INTU", "QCOM", "IBM", "AMGN",
+]
+HK_CODES = [
+    "00700", "09988", "03690", "01810", "00941", "01299", "00005", "02318", "00388", "01211",
+    "09618", "02020", "00883", "00939", "01398", "03988", "00016", "00001", "00002", "00003",
+    "00011", "00027", "00066", "00175", "00267", "00288", "00386", "00669", "00688", "00762",
+    "00823", "00857", "00868", "00960", "00968", "00981", "00992", "01038", "01044", "01093",
+    "01109", "01113", "01177", "01928", "01997", "02007", "02269", "02313", "02319", "02331",
+]
+
+_UPSTREAM_METHODS = {
+    "quote": [
+        "_get_hk_quote_from_yfinance", "_get_hk_quote_from_akshare",
+        "_get_us_quote_from_yfinance", "_get_us_quote_from_alpha_vantage", "_get_us_quote_from_finnhub",
+        "_get_hk_quotes_from_yfinance_batch", "_get_hk_quotes_from_akshare_batch",
+        "_get_us_quotes_from_yfinance_batch",
+    ],
+    "kline": [
+        "_get_hk_kline_from_akshare", "_get_hk_kline_from_yfinance", "_get_hk_kline_from_finnhub",
+        "_get_us_kline_from_yfinance", "_get_us_kline_from_alpha_vantage", "_get_us_kline_from_finnhub",
+        "_get_hk_klines_from_yfinance_batch", "_get_us_klines_from_yfinance_batch",
+    ],
+}
+
+
+def _instrument(service: ForeignStockService, kind: str) -> Counter:
+    """包装上游请求方法以统计调用次数"""
+    calls: Counter = Counter()
+    for name in _UPSTREAM_METHODS[kind]:
+        method = getattr(service, name)
+
+        def _wrapped(*args, __method=method, __name=name, **kwargs):
+            calls[__name] += 1
+            return __method(*args, **kwargs)
+
+        setattr(service, name, _wrapped)
+    return calls
+
+
+def _load_pool(market: str, codes_file: Optional[str]) -> List[str]:
+    """代码池：--codes-file（每行一个代码）优先；港股可用 AKShare 全市场快照补足"""
+    if codes_file:
+        with open(codes_file, encoding="utf-8") as f:
+            return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    if market == "HK":
+        try:
+            from tradingagents.dataflows.providers.hk.improved_hk import get_hk_spot_snapshot
+            snapshot = get_hk_spot_snapshot()
+            return list(dict.fromkeys(HK_CODES + [str(c) for c in snapshot["代码"].tolist()]))
+        except Exception as e:
+            print(f"⚠️ 获取港股代码池失败，使用内置代码: {e}")
+        return HK_CODES
+    return US_CODES
+
+
+async def _run_single(service: ForeignStockService, market: str, codes: List[str], kind: str, concurrency: int) -> int:
+    sem = asyncio.Semaphore(concurrency)
+    ok_count = 0
+
+    async def _one(code: str):
+        nonlocal ok_count
+        async with sem:
+            try:
+                if kind == "quote":
+                    await service.get_quote(market, code, force_refresh=True)
+                else:
+                    await service.get_kline(market, code, "day", 120, force_refresh=True)
+                ok_count += 1
+            except Exception:
+                pass
+
+    await asyncio.gather(*[_one(c) for c in codes])
+    return ok_count
+
+
+async def _run_batch(service: ForeignStockService, market: str, codes: List[str], kind: str) -> int:
+    if kind == "quote":
+        result = await service.get_quotes(market, codes, force_refresh=True)
+    else:
+        result = await service.get_klines(market, codes, "day", 120, force_refresh=True)
+    return len(result)
+
+
+async def main(args) -> None:
+    sizes = [int(x) for x in args.sizes.split(",")]
+    pool = _load_pool(args.market, args.codes_file)
+    if max(sizes) > len(pool):
+        print(f"⚠️ 代码池只有 {len(pool)} 只，超出部分按代码池大小计（可用 --codes-file 提供更多代码）")
+
+    print("=" * 80)
+    print(f"📊 {args.market} {args.kind} 批量获取压测  逐只并发={args.concurrency}")
+    print("=" * 80)
+    print(f"{'mode':<10}{'symbols':>9}{'ok':>6}{'upstream':>10}{'wall(s)':>10}{'ms/symbol':>11}")
+
+    for size in sizes:
+        codes = pool[:size]
+        for mode in ("single", "batch"):
+            service = ForeignStockService(db=None)
+            calls = _instrument(service, args.kind)
+            start = time.perf_counter()
+            if mode == "single":
+                ok_count = await _run_single(service, args.market, codes, args.kind, args.concurrency)
+            else:
+                ok_count = await _run_batch(service, args.market, codes, args.kind)
+            wall = time.perf_counter() - start
+            per_symbol = wall * 1000 / max(1, len(codes))
+            print(f"{mode:<10}{len(codes):>9}{ok_count:>6}{sum(calls.values()):>10}{wall:>10.2f}{per_symbol:>11.1f}")
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="港股/美股批量行情压测")
+    parser.add_argument("--market", choices=["HK", "US"], default="US")
+    parser.add_argument("--kind", choices=["quote", "kline"], default="quote")
+    parser.add_argument("--sizes", default="10,50,200", help="每轮的股票数量")
+    parser.add_argument("--codes-file", default=None, help="代码池文件（每行一个代码）")
+    parser.add_argument("--concurrency", type=int, default=1, help="逐只模式的并发数（1 即原有顺序调用）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+K线接口并发压测：对比旧接口与异步缓存版接口的吞吐与延迟
+
+用法示例：
+    # 新版本（当前服务）各模式对比：无缓存(force_refresh) / 缓存命中 / 紧凑列式
+    python scripts/benchmark_kline_concurrency.py --token <JWT> --codes 000001,600519,300750
+
+    # 与旧版本部署（例如另一个端口上的旧镜像）对比
+    python scripts/benchmark_kline_concurrency.py --token <JWT> \\
+        --base-url http://localhost:8000 --baseline-url http://localhost:8001
+
+输出每种模式在各并发度下的 QPS、p50/p95/p99 延迟、平均响应体大小与失败数。
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))
+    return values[idx]
+
+
+async def _run_mode(client: httpx.AsyncClient, base_url: str, codes: List[str], params: Dict,
+                    concurrency: int, total: int) -> Dict:
+    latencies: List[float] = []
+    sizes: List[int] = []
+    failures = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(i: int):
+        nonlocal failures
+        code = codes[i % len(codes)]
+        async with sem:
+            start = time.perf_counter()
+            try:
+                resp = await client.get(f"{base_url}/api/stocks/{code}/kline", params=params)
+                elapsed = time.perf_counter() - start
+                if resp.status_code == 200:
+                    latencies.append(elapsed)
+                    sizes.append(len(resp.content))
+                else:
+                    failures += 1
+            except Exception:
+                failures += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[_one(i) for i in range(total)])
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "qps": len(latencies) / wall if wall > 0 else 0.0,
+        "p50": _percentile(latencies, 50) * 1000,
+        "p95": _percentile(latencies, 95) * 1000,
+        "p99": _percentile(latencies, 99) * 1000,
+        "avg_bytes": statistics.mean(sizes) if sizes else 0,
+        "failures": failures,
+    }
+
+
+async def main(args) -> None:
+    codes = [c.strip() for c in args.codes.split(",") if c.strip()]
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    base_params = {"period": args.period, "limit": args.limit}
+
+    modes = []
+    if args.baseline_url:
+        modes.append(("baseline(旧接口)", args.baseline_url, dict(base_params)))
+    modes.extend([
+        ("no-cache(force_refresh)", args.base_url, dict(base_params, force_refresh="true")),
+        ("cached(rows)", args.base_url, dict(base_params)),
+        ("cached(compact)", args.base_url, dict(base_params, compact="true")),
+    ])
+
+    levels = [int(x) for x in args.concurrency.split(",")]
+
+    print("=" * 100)
+    print(f"📊 K线接口并发压测  codes={codes} period={args.period} limit={args.limit} requests/level={args.requests}")
+    print("=" * 100)
+    print(f"{'mode':<26}{'conc':>6}{'QPS':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'bytes':>10}{'fail':>6}")
+
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(headers=headers, timeout=args.timeout, limits=limits) as client:
+        for name, url, params in modes:
+            # 预热一次（让缓存版本进入命中状态）
+            await _run_mode(client, url, codes, params, 1, len(codes))
+            for level in levels:
+                r = await _run_mode(client, url, codes, params, level, args.requests)
+                print(f"{name:<26}{level:>6}{r['qps']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+                      f"{r['p99']:>10.1f}{r['avg_bytes']:>10.0f}{r['failures']:>6}")
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="K线接口并发压测")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="新版本服务地址")
+    parser.add_argument("--baseline-url", default="", help="旧版本服务地址（可选）")
+    parser.add_argument("--token", default=os.getenv("TA_API_TOKEN", ""), help="Bearer Token（或环境变量 TA_API_TOKEN）")
+    parser.add_argument("--codes", default="000001,600519,300750,000858,601318")
+    parser.add_argument("--period", default="day")
+    parser.add_argument("--limit", type=int, default=120)
+    parser.add_argument("--concurrency", default="1,10,50,100")
+    parser.add_argument("--requests", type=int, default=500, help="每个并发度的请求总数")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
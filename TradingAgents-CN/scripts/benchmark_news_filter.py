@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+增强新闻过滤器 CPU 吞吐压测：对比 逐条编码（旧实现：每条新闻 encode([text]) + Python 循环余弦）
+与 批量编码 + 矩阵相似度，输出每秒处理的新闻条数
+
+模型加载时间单独统计，不计入吞吐。可用 NEWS_FILTER_EMBEDDING_BACKEND=onnx / int8 对比推理后端。
+
+用法：
+    python scripts/benchmark_news_filter.py --sizes 50,200,1000
+    NEWS_FILTER_EMBEDDING_BACKEND=int8 python scripts/benchmark_news_filter.py --sizes 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tradingagents.utils import enhanced_news_filter as module
+
+TITLES = [
+    "{name}发布2024年第三季度业绩报告，净利润同比增长{n}%",
+    "{name}与某科技公司签署战略合作协议",
+    "银行ETF指数(512730)多只成分股上涨，{name}领涨",
+    "上证180ETF指数基金自带杠铃策略，前十大权重股包括{name}",
+    "北向资金今日净买入{n}亿元，白酒板块获加仓",
+    "央行开展{n}亿元逆回购操作，市场流动性合理充裕",
+]
+
+
+def _make_news(size: int, name: str) -> pd.DataFrame:
+    rng = random.Random(size)
+    rows = []
+    for i in range(size):
+        title = rng.choice(TITLES).format(name=name, n=rng.randint(1, 99))
+        rows.append({"新闻标题": f"{title}（{i}）", "新闻内容": f"{title}。" * rng.randint(2, 6)})
+    return pd.DataFrame(rows)
+
+
+def _per_item_scores(news_filter, news: pd.DataFrame) -> None:
+    """旧实现：逐条编码并在 Python 循环中计算余弦相似度"""
+    model = news_filter.sentence_model
+    company = model.encode([news_filter.company_name, f"{news_filter.company_name}股票"])
+    for _, row in news.iterrows():
+        embedding = model.encode([f"{row['新闻标题']} {row['新闻内容'][:200]}"])[0]
+        max(np.dot(embedding, c) / (np.linalg.norm(embedding) * np.linalg.norm(c)) for c in company)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="增强新闻过滤器吞吐压测")
+    parser.add_argument("--sizes", default="50,200,1000", help="每轮新闻条数，逗号分隔")
+    parser.add_argument("--code", default="600036")
+    parser.add_argument("--name", default="招商银行")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = module.get_sentence_model()
+    if model is None:
+        print("❌ 语义模型不可用（需要 sentence-transformers）")
+        return
+    print(f"模型加载: {time.perf_counter() - start:.2f}s (后端: {module.EMBEDDING_BACKEND})")
+
+    news_filter = module.EnhancedNewsFilter(args.code, args.name, use_semantic=True)
+    print(f"{'条数':>6} | {'逐条 条/秒':>12} | {'批量 条/秒':>12} | {'加速比':>6}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        news = _make_news(size, args.name)
+
+        start = time.perf_counter()
+        _per_item_scores(news_filter, news)
+        per_item = size / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        news_filter.filter_news_enhanced(news, min_score=0)
+        batched = size / (time.perf_counter() - start)
+
+        print(f"{size:>6} | {per_item:>12.1f} | {batched:>12.1f} | {batched / per_item:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+新闻全文检索对比：本地倒排索引（中文 2-gram + BM25）vs MongoDB $text
+
+以 $regex 对 标题/正文 的字面包含匹配作为标准答案，统计每个查询的延迟与 recall@limit
+（recall = 返回结果中命中标准答案的条数 / min(limit, 标准答案条数)）。
+
+用法：
+    python scripts/benchmark_news_search.py --rebuild
+    python scripts/benchmark_news_search.py --queries 茅台,新能源汽车,降准,earnings --limit 20 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_mongo_db, init_database
+from app.services.news_data_service import NewsDataService
+from app.services.news_search_index import get_news_search_index, rebuild_news_search_index
+
+DEFAULT_QUERIES = "茅台,新能源汽车,降准,业绩预告,北向资金,半导体,earnings,AI"
+
+
+async def _regex_truth(db, query: str) -> Set[str]:
+    escaped = re.escape(query)
+    cursor = db.stock_news.find(
+        {"$or": [{"title": {"$regex": escaped, "$options": "i"}},
+                 {"content": {"$regex": escaped, "$options": "i"}}]},
+        {"_id": 1},
+    )
+    return {str(doc["_id"]) for doc in await cursor.to_list(length=None)}
+
+
+async def _timed(search, rounds: int):
+    results: List[Dict] = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await search()
+    return results, (time.perf_counter() - start) / rounds * 1000
+
+
+def _recall(results: List[Dict], truth: Set[str], limit: int) -> float:
+    if not truth:
+        return 1.0
+    return len({str(doc["_id"]) for doc in results} & truth) / min(limit, len(truth))
+
+
+async def main(args: argparse.Namespace) -> None:
+    await init_database()
+    db = get_mongo_db()
+    service = NewsDataService()
+
+    index = get_news_search_index()
+    if index is None:
+        print("❌ NEWS_SEARCH_INDEX_ENABLED=false，无法对比")
+        return
+    if args.rebuild or not index.doc_count:
+        start = time.perf_counter()
+        total = await rebuild_news_search_index(db)
+        print(f"索引重建: {total} 条，耗时 {time.perf_counter() - start:.1f}s")
+
+    print(f"{'查询':<12} | {'标准答案':>8} | {'索引 ms':>8} | {'索引召回':>8} | {'$text ms':>8} | {'$text召回':>8}")
+    for query in [q.strip() for q in args.queries.split(",") if q.strip()]:
+        truth = await _regex_truth(db, query)
+
+        index_results, index_ms = await _timed(
+            lambda: service._search_with_index(index, query, None, args.limit, None, None), args.rounds)
+        try:
+            text_results, text_ms = await _timed(
+                lambda: service._search_with_text(query, None, args.limit, None, None), args.rounds)
+            text_cols = f"{text_ms:>8.1f} | {_recall(text_results, truth, args.limit):>8.2f}"
+        except Exception as e:  # 缺少文本索引时 $text 直接报错
+            text_cols = f"{'-':>8} | {'-':>8}  ({e.__class__.__name__})"
+
+        print(f"{query:<12} | {len(truth):>8} | {index_ms:>8.1f} | "
+              f"{_recall(index_results, truth, args.limit):>8.2f} | {text_cols}")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="新闻全文检索：倒排索引 vs $text")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="查询词，逗号分隔")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5, help="每个查询重复次数（取平均延迟）")
+    parser.add_argument("--rebuild", action="store_true", help="先从 stock_news 全量重建索引")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
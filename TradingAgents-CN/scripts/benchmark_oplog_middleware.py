@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+操作日志中间件延迟压测：对比 无中间件 / 中间件逐条写入 / 中间件批量写入 的请求延迟
+
+在进程内构造一个最小 FastAPI 应用（httpx ASGITransport，无网络开销），
+每个请求都是需要记录操作日志的已认证 POST 请求，日志写入真实 MongoDB。
+
+用法：
+    python scripts/benchmark_oplog_middleware.py --requests 2000 --concurrency 1,20,100
+
+输出每种模式在各并发度下的 QPS、p50/p95/p99 延迟，以及批量写入器的写入/丢弃统计。
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.database import get_mongo_db, init_database
+from app.middleware.operation_log_middleware import OperationLogMiddleware
+from app.services.batch_writer import BufferedBatchWriter, register_batch_writer
+
+BENCH_PATH = "/api/config/benchmark-oplog"
+
+
+class _FakeAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request.state.user = {"id": "benchmark", "username": "benchmark"}
+        return await call_next(request)
+
+
+def _build_app(with_oplog: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.post(BENCH_PATH)
+    async def _endpoint():
+        return {"ok": True}
+
+    if with_oplog:
+        app.add_middleware(OperationLogMiddleware)
+    app.add_middleware(_FakeAuthMiddleware)  # 最外层，先于操作日志中间件执行
+    return app
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values))) - 1))
+    return values[idx]
+
+
+async def _run(app: FastAPI, concurrency: int, total: int) -> Dict:
+    latencies: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def _one():
+            async with sem:
+                start = time.perf_counter()
+                resp = await client.post(BENCH_PATH)
+                if resp.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*[_one() for _ in range(total)])
+        wall = time.perf_counter() - wall_start
+
+    return {
+        "qps": len(latencies) / wall if wall > 0 else 0.0,
+        "p50": _percentile(latencies, 50) * 1000,
+        "p95": _percentile(latencies, 95) * 1000,
+        "p99": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(args) -> None:
+    await init_database()
+    levels = [int(x) for x in args.concurrency.split(",")]
+
+    print("=" * 80)
+    print(f"📊 操作日志中间件延迟压测  requests/level={args.requests}")
+    print("=" * 80)
+    print(f"{'mode':<26}{'conc':>6}{'QPS':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+
+    writer: Optional[BufferedBatchWriter] = None
+    modes = [("no-middleware", False, False), ("oplog(insert_one)", True, False), ("oplog(batched)", True, True)]
+    for name, with_oplog, batched in modes:
+        if batched:
+            writer = register_batch_writer(BufferedBatchWriter(
+                "operation_logs", max_batch=args.batch, flush_interval=args.interval))
+            writer.start()
+        app = _build_app(with_oplog)
+        for level in levels:
+            r = await _run(app, level, args.requests)
+            print(f"{name:<26}{level:>6}{r['qps']:>10.1f}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}")
+
+    if writer is not None:
+        await writer.stop()
+        print(f"\n🧺 批量写入器统计: {writer.stats}")
+
+    result = await get_mongo_db()["operation_logs"].delete_many({"username": "benchmark"})
+    print(f"🧹 已清理压测日志 {result.deleted_count} 条")
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="操作日志中间件延迟压测")
+    parser.add_argument("--requests", type=int, default=2000, help="每个并发度的请求总数")
+    parser.add_argument("--concurrency", default="1,20,100")
+    parser.add_argument("--batch", type=int, default=200, help="批量写入器单批大小")
+    parser.add_argument("--interval", type=float, default=1.0, help="批量写入器刷写间隔（秒）")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
@@ -0,0 +1,74 @@
+"""
+测试批量分析共享上下文
+"""
+import threading
+import time
+
+from tradingagents.dataflows.batch_context import (
+    batch_scope,
+    batch_shared,
+    release_batch_context,
+)
+
+
+def test_batch_shared_fetches_once_per_batch():
+    calls = []
+
+    @batch_shared("global_news")
+    def get_global_news(curr_date, look_back_days=7):
+        calls.append(curr_date)
+        time.sleep(0.05)
+        return f"news {curr_date}"
+
+    results = []
+
+    def run_ticker():
+        with batch_scope("batch-1"):
+            results.append(get_global_news("2024-05-20"))
+            results.append(get_global_news(curr_date="2024-05-20", look_back_days=7))
+
+    threads = [threading.Thread(target=run_ticker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["2024-05-20"]
+    assert results == ["news 2024-05-20"] * 8
+
+    report = release_batch_context("batch-1")
+    assert report["tickers"] == 4
+    assert report["shared_fetches"] == 1 and report["shared_hits"] == 7
+    assert report["calls_independent_mode"] == 8
+    assert report["seconds_saved"] > 0
+    assert release_batch_context("batch-1") is None
+
+
+def test_batch_shared_outside_batch_and_failures_are_not_cached():
+    calls = []
+
+    @batch_shared("latest_trade_date")
+    def latest_trade_date(market="CN"):
+        calls.append(market)
+        if len(calls) == 1:
+            raise RuntimeError("上游超时")
+        return "20240520"
+
+    # 不在批次中：每次都直接调用
+    try:
+        latest_trade_date()
+    except RuntimeError:
+        pass
+    assert latest_trade_date() == "20240520"
+    assert len(calls) == 2
+
+    calls.clear()
+    with batch_scope("batch-2"):
+        try:
+            latest_trade_date()
+        except RuntimeError:
+            pass
+        assert latest_trade_date() == "20240520"
+        assert latest_trade_date() == "20240520"
+    assert len(calls) == 2
+    release_batch_context("batch-2")
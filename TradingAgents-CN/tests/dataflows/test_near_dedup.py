@@ -0,0 +1,98 @@
+"""
+测试新闻近似重复聚类（MinHash + LSH）
+"""
+import time
+
+from tradingagents.dataflows.news.near_dedup import (
+    cluster_news_dicts,
+    collapse_clusters,
+    near_duplicate_clusters,
+)
+
+
+def test_syndicated_headlines_cluster_together():
+    texts = [
+        "贵州茅台一季度净利润同比增长15%，高端酒需求稳健",
+        "宁德时代发布新一代麒麟电池",
+        "贵州茅台：一季度净利润同比增长15%！高端酒需求稳健",
+        "Apple beats quarterly earnings estimates",
+        "Apple beats quarterly earnings estimates.",
+    ]
+
+    labels = near_duplicate_clusters(texts)
+
+    assert labels[0] == labels[2] == 0
+    assert labels[3] == labels[4] == 3
+    assert len(set(labels)) == 3
+
+
+def test_related_announcements_stay_separate():
+    texts = [
+        "平安银行：关于召开2024年第一次临时股东大会的通知",
+        "平安银行：关于2024年第一次临时股东大会决议的公告",
+    ]
+
+    assert len(set(near_duplicate_clusters(texts))) == 2
+
+
+def test_partitions_are_never_merged():
+    texts = ["关于召开2024年第一次临时股东大会的通知"] * 2
+
+    assert near_duplicate_clusters(texts, partitions=["000001", "600000"]) == [0, 1]
+
+
+def test_cluster_news_dicts_keeps_every_row_and_marks_representative():
+    disclaimer = "本公司及董事会全体成员保证信息披露的内容真实、准确、完整，没有虚假记载、误导性陈述或重大遗漏。"
+    news = [
+        {"symbol": "600519", "title": "贵州茅台一季度净利润同比增长15%", "content": "公司公告显示，一季度实现营业收入464亿元", "url": "a"},
+        {"symbol": "600519", "title": "贵州茅台：一季度净利润同比增长15%", "content": "公司公告显示，一季度实现营业收入464亿元，同比增长18%", "url": "b"},
+        {"symbol": "000001", "title": "平安银行关于回购股份进展的公告", "content": disclaimer, "url": "c"},
+        {"symbol": "000001", "title": "平安银行关于董事辞职的公告", "content": disclaimer, "url": "d"},
+    ]
+
+    clusters, stats = cluster_news_dicts(news)
+
+    assert len(clusters) == 4
+    assert clusters[0][0] == clusters[1][0] and (clusters[0][1], clusters[1][1]) == (False, True)
+    assert clusters[2][0] != clusters[3][0] and clusters[2][1] and clusters[3][1]
+    assert stats.input_count == 4 and stats.removed_count == 1
+    assert stats.estimated_tokens_saved > 0
+
+    docs = [{**n, "cluster_id": c} for n, (c, _) in zip(news, clusters)] + [{"title": "历史数据"}]
+    assert [d["url"] for d in collapse_clusters(docs)[:3]] == ["a", "c", "d"]
+    assert len(collapse_clusters(docs)) == 4
+
+
+def test_clustering_scales_linearly():
+    texts = [f"第{i}号公司公告：{i * 7919 % 100003}号项目中标，合同金额{i * 31}万元" for i in range(3000)]
+
+    start = time.monotonic()
+    labels = near_duplicate_clusters(texts)
+
+    assert time.monotonic() - start < 5
+    assert len(labels) == 3000
+
+
+def test_reprint_in_later_batch_joins_stored_cluster():
+    first = [
+        {"symbol": "600519", "title": "贵州茅台一季度净利润同比增长15%", "content": "一季度实现营业收入464亿元", "url": "a"},
+        {"symbol": "000001", "title": "平安银行关于回购股份进展的公告", "content": "回购进展", "url": "c"},
+    ]
+    first_clusters, _ = cluster_news_dicts(first)
+    stored = [{**n, "cluster_id": c, "cluster_rep": rep} for n, (c, rep) in zip(first, first_clusters)]
+
+    # 下一次同步：另一来源的转载（正文更长也不抢已入库的代表）、重复同步的同一条、以及一条新新闻
+    second = [
+        {"symbol": "600519", "title": "贵州茅台：一季度净利润同比增长15%！", "content": "一季度实现营业收入464亿元，同比增长18%", "url": "b"},
+        {"symbol": "000001", "title": "平安银行关于回购股份进展的公告", "content": "回购进展", "url": "c"},
+        {"symbol": "600000", "title": "贵州茅台一季度净利润同比增长15%", "content": "不同股票分区", "url": "e"},
+    ]
+    clusters, stats = cluster_news_dicts(second, existing=stored)
+
+    assert clusters[0] == (first_clusters[0][0], False)
+    assert clusters[1] == first_clusters[1]
+    assert clusters[2][0] not in {c for c, _ in first_clusters} and clusters[2][1]
+    assert stats.input_count == 3 and stats.removed_count == 1
+
+    docs = [{**n, "cluster_id": c} for n, (c, _) in zip(first + second, first_clusters + clusters)]
+    assert [d["url"] for d in collapse_clusters(docs)] == ["a", "c", "e"]
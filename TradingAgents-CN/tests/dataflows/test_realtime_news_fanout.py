@@ -0,0 +1,67 @@
+"""
+测试实时新闻聚合器的并发获取、单源截止时间与提前返回
+"""
+import time
+from datetime import datetime, timedelta
+
+from tradingagents.dataflows.news.realtime_news import NewsItem, RealtimeNewsAggregator
+
+
+def _item(title, source, relevance=1.0, minutes_ago=0):
+    return NewsItem(
+        title=title, content="", source=source,
+        publish_time=datetime.now() - timedelta(minutes=minutes_ago),
+        url="", urgency="low", relevance_score=relevance,
+    )
+
+
+class FakeAggregator(RealtimeNewsAggregator):
+    def __init__(self, sources, **kwargs):
+        super().__init__(**kwargs)
+        self._fake_sources = sources
+
+    def _news_sources(self, ticker, hours_back):
+        return self._fake_sources
+
+
+def _delayed(seconds, items):
+    def fetch():
+        time.sleep(seconds)
+        return items
+    return fetch
+
+
+def test_sources_run_concurrently_and_slow_source_hits_deadline():
+    aggregator = FakeAggregator({
+        "FinnHub": _delayed(0.2, [_item("Apple beats earnings estimates", "Reuters", minutes_ago=5)]),
+        "Alpha Vantage": _delayed(0.2, [_item("Apple launches new iPhone lineup", "Bloomberg", relevance=0.3)]),
+        "中文财经": _delayed(3, [_item("苹果公司发布最新季度财报数据", "东方财富")]),
+    }, source_timeouts={"中文财经": 0.5}, total_budget=5)
+
+    start = time.monotonic()
+    news = aggregator.get_realtime_stock_news("AAPL", max_news=10)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 1.5
+    assert [n.title for n in news] == ["Apple launches new iPhone lineup", "Apple beats earnings estimates"]
+    stats = aggregator.last_source_stats
+    assert stats["FinnHub"]["status"] == "ok" and stats["FinnHub"]["contributed"] == 1
+    assert stats["中文财经"]["status"] == "timeout" and stats["中文财经"]["contributed"] == 0
+
+
+def test_returns_early_once_enough_high_relevance_news():
+    aggregator = FakeAggregator({
+        "FinnHub": _delayed(0.05, [
+            _item("Apple beats earnings estimates", "Reuters"),
+            _item("Apple unveils Vision Pro headset", "Bloomberg", minutes_ago=1),
+            _item("Apple faces EU antitrust fine", "FT", minutes_ago=2),
+        ]),
+        "NewsAPI": _delayed(3, [_item("Apple late headline", "CNBC")]),
+    }, total_budget=5)
+
+    start = time.monotonic()
+    news = aggregator.get_realtime_stock_news("AAPL", max_news=3)
+
+    assert time.monotonic() - start < 1
+    assert len(news) == 3
+    assert aggregator.last_source_stats["NewsAPI"]["status"] == "skipped"
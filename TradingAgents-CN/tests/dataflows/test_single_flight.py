@@ -0,0 +1,117 @@
+"""
+测试 single-flight 请求合并
+"""
+import threading
+import time
+
+from tradingagents.dataflows.single_flight import SingleFlight, make_key
+
+
+class FakeRedis:
+    """最小 Redis 替身：get / set(nx, px) / eval(compare-and-delete)"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode() if isinstance(value, str) else value
+            return True
+
+    def eval(self, script, numkeys, key, token):
+        with self.lock:
+            if self.data.get(key) == token.encode():
+                del self.data[key]
+                return 1
+            return 0
+
+
+def test_make_key_normalizes_params():
+    a = make_key("stock_data", {"symbol": " 600519 ", "start_date": "2024-01-01"})
+    b = make_key("stock_data", {"symbol": "600519", "start_date": "20240101"})
+    c = make_key("stock_data", {"symbol": "aapl", "start_date": "2024/01/01"})
+    d = make_key("stock_data", {"symbol": "AAPL", "start_date": "20240101"})
+    assert a == b
+    assert c == d
+    assert a != make_key("news", {"symbol": "600519", "start_date": "20240101"})
+
+
+def test_concurrent_calls_in_process_share_one_fetch():
+    sf = SingleFlight(redis_client_getter=lambda: None, enabled=True)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"rows": [1, 2, 3]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sf.do("k", fetch))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(r == {"rows": [1, 2, 3]} for r in results)
+    # 跟随者拿到的是副本
+    assert len({id(r) for r in results}) == 5
+    assert sf.stats["leader"] == 1 and sf.stats["shared_local"] == 4
+
+
+def test_second_process_reads_shared_result_from_redis():
+    redis = FakeRedis()
+    node_a = SingleFlight(redis_client_getter=lambda: redis, enabled=True)
+    node_b = SingleFlight(redis_client_getter=lambda: redis, enabled=True, poll_interval=0.01)
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "data"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(node_a.do("k", fetch)))
+    leader.start()
+    started.wait(1)
+    results.append(node_b.do("k", fetch))
+    leader.join()
+
+    assert results == ["data", "data"]
+    assert len(calls) == 1
+    assert node_b.stats["shared_remote"] == 1
+    # 租约已释放
+    assert "k:lease" not in redis.data
+
+
+def test_leader_failure_propagates_and_reentrant_call_runs_directly():
+    sf = SingleFlight(redis_client_getter=lambda: None, enabled=True)
+
+    def fallback():
+        return "fallback"
+
+    def outer():
+        # 同一线程内用同一键再次调用（降级路径）不会死锁
+        return sf.do("k", fallback)
+
+    assert sf.do("k", outer) == "fallback"
+
+    def boom():
+        raise ValueError("upstream down")
+
+    try:
+        sf.do("k2", boom)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+    assert "k2" not in sf._calls
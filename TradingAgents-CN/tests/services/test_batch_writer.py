@@ -0,0 +1,119 @@
+import asyncio
+
+from app.services.batch_writer import BufferedBatchWriter
+
+
+class _FakeCollection:
+    def __init__(self, fail_times: int = 0, delay: float = 0.0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.delay = delay
+
+    async def insert_many(self, docs, ordered=False):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("mongo unavailable")
+        self.batches.append(list(docs))
+
+
+def _writer(coll, **kwargs):
+    return BufferedBatchWriter("operation_logs", collection_getter=lambda name: coll, **kwargs)
+
+
+def test_flushes_on_size_threshold_and_on_stop():
+    async def _run():
+        coll = _FakeCollection()
+        flushed = []
+
+        async def _hook(docs):
+            flushed.extend(docs)
+
+        w = _writer(coll, max_batch=3, flush_interval=60, on_flush=_hook)
+        w.start()
+        for i in range(4):
+            assert await w.put({"i": i})
+        await asyncio.sleep(0.01)
+        assert [len(b) for b in coll.batches] == [3]
+
+        await w.stop()
+        assert [len(b) for b in coll.batches] == [3, 1]
+        assert [d["i"] for d in flushed] == [0, 1, 2, 3]
+        assert w.stats["written"] == 4
+
+    asyncio.run(_run())
+
+
+def test_flushes_on_time_threshold():
+    async def _run():
+        coll = _FakeCollection()
+        w = _writer(coll, max_batch=100, flush_interval=0.02)
+        w.start()
+        await w.put({"i": 1})
+        await asyncio.sleep(0.08)
+        assert len(coll.batches) == 1
+        await w.stop()
+
+    asyncio.run(_run())
+
+
+def test_full_buffer_drops_with_accounting():
+    async def _run():
+        coll = _FakeCollection(delay=0.2)
+        w = _writer(coll, max_batch=2, flush_interval=60, max_buffer=2, backpressure_timeout=0.01)
+        w.start()
+        results = [await w.put({"i": i}) for i in range(6)]
+        assert results.count(False) >= 1
+        assert w.stats["dropped_full"] == results.count(False)
+        assert w.buffered <= 2
+        await w.stop()
+        assert w.stats["written"] + w.stats["dropped_full"] == 6
+
+    asyncio.run(_run())
+
+
+def test_failed_batch_is_retried_once_then_dropped():
+    async def _run():
+        coll = _FakeCollection(fail_times=1)
+        w = _writer(coll, max_batch=10, flush_interval=60)
+        w.start()
+        await w.put({"i": 1})
+        await w.flush()
+        assert w.stats["retried"] == 1 and w.buffered == 1
+        await w.flush()
+        assert w.stats["written"] == 1
+
+        coll.fail_times = 2
+        await w.put({"i": 2})
+        await w.flush()
+        await w.flush()
+        assert w.stats["dropped_error"] == 1 and w.buffered == 0
+        await w.stop()
+
+    asyncio.run(_run())
+
+
+def test_paused_flushes_first_and_blocks_batches_until_exit():
+    async def _run():
+        coll = _FakeCollection()
+        hooked = []
+
+        async def _hook(docs):
+            await asyncio.sleep(0.01)
+            hooked.extend(docs)
+
+        w = _writer(coll, max_batch=1, flush_interval=60, on_flush=_hook)
+        w.start()
+        await w.put({"i": 1})
+        async with w.paused():
+            # 进入时缓冲区已刷写，且后置处理已完成
+            assert [d["i"] for d in hooked] == [1] and w.buffered == 0
+            await w.put({"i": 2})
+            await asyncio.sleep(0.03)
+            assert len(coll.batches) == 1 and w.buffered == 1
+        await asyncio.sleep(0.03)
+        assert [d["i"] for d in hooked] == [1, 2]
+        await w.stop()
+
+    asyncio.run(_run())
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from app.services.foreign_stock_service import ForeignStockService
+
+
+class FakeCache:
+    def __init__(self):
+        self.data = {}
+
+    def find_cached_stock_data(self, symbol, data_source):
+        key = (symbol, data_source)
+        return key if key in self.data else None
+
+    def load_stock_data(self, key):
+        return self.data.get(key)
+
+    def save_stock_data(self, symbol, data, data_source):
+        self.data[(symbol, data_source)] = data
+
+
+def _make_service():
+    service = ForeignStockService.__new__(ForeignStockService)
+    service.cache = FakeCache()
+    service.db = None
+    return service
+
+
+async def _default_priority(market):
+    return ["yahoo_finance", "alpha_vantage", "finnhub"]
+
+
+def test_get_quotes_batches_misses_and_fans_out_to_cache():
+    service = _make_service()
+    service._get_source_priority = _default_priority
+    service.cache.save_stock_data("AAPL", json.dumps({"code": "AAPL", "price": 1.0}), "us_realtime_quote")
+
+    batch_calls = []
+
+    def fake_batch(codes):
+        batch_calls.append(list(codes))
+        return {c: {"price": 10.0, "trade_date": "2024-01-02"} for c in codes if c != "BAD"}
+
+    single_calls = []
+
+    def fake_single(code):
+        single_calls.append(code)
+        if code == "BAD":
+            raise Exception("无数据")
+        return {"price": 2.0}
+
+    service._get_us_quotes_from_yfinance_batch = fake_batch
+    service._get_us_quote_from_alpha_vantage = fake_single
+    service._get_us_quote_from_finnhub = fake_single
+
+    result = asyncio.run(service.get_quotes("US", ["AAPL", "MSFT", "TSLA", "BAD", "MSFT"]))
+
+    # 缓存命中的不请求上游，重复代码只请求一次
+    assert batch_calls == [["MSFT", "TSLA", "BAD"]]
+    # 批量源未取到的代码降级到逐只数据源
+    assert single_calls == ["BAD", "BAD"]
+    assert list(result) == ["AAPL", "MSFT", "TSLA"]
+    assert result["AAPL"]["price"] == 1.0
+    assert result["MSFT"]["source"] == "yfinance"
+    # 结果逐只写回缓存，与 get_quote 共用缓存键
+    cached = json.loads(service.cache.data[("TSLA", "us_realtime_quote")])
+    assert cached["price"] == 10.0 and cached["market"] == "US"
+
+
+def test_get_klines_chunks_batch_requests(monkeypatch):
+    service = _make_service()
+    service._get_source_priority = _default_priority
+    monkeypatch.setattr(ForeignStockService, "BATCH_CHUNK_SIZE", 2)
+
+    chunks = []
+
+    def fake_batch(codes, period, limit):
+        chunks.append((list(codes), period, limit))
+        return {c: [{"date": "2024-01-02", "close": 1.0}] for c in codes}
+
+    service._get_us_klines_from_yfinance_batch = fake_batch
+
+    result = asyncio.run(service.get_klines("US", ["A", "B", "C"], period="week", limit=30))
+
+    assert chunks == [(["A", "B"], "week", 30), (["C"], "week", 30)]
+    assert set(result) == {"A", "B", "C"}
+    assert ("C", "us_kline_week_30") in service.cache.data
+
+
+def test_hk_quote_name_falls_back_when_batch_name_missing():
+    service = _make_service()
+
+    # 批量 yfinance 路径缓存里没有名称时 name 为 None
+    quote = service._format_hk_quote({"name": None, "price": 320.0}, "00700", "yfinance")
+    assert quote["name"] == "港股00700"
+    assert service._format_hk_quote({"name": "腾讯控股", "price": 320.0}, "00700", "yfinance")["name"] == "腾讯控股"
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+
+def _ts(hh, mm, ss=0):
+    return datetime(2025, 10, 17, hh, mm, ss)
+
+
+def test_bucket_alignment_follows_trading_sessions():
+    from app.services.intraday_bar_service import bucket_end, minute_bar_end
+
+    assert minute_bar_end(_ts(9, 26)) == _ts(9, 31)
+    assert minute_bar_end(_ts(10, 0, 30)) == _ts(10, 1)
+    assert minute_bar_end(_ts(15, 1)) == _ts(15, 0)
+    assert minute_bar_end(_ts(12, 0)) is None
+
+    assert bucket_end(_ts(9, 31), 60) == _ts(10, 30)
+    assert bucket_end(_ts(11, 30), 60) == _ts(11, 30)
+    assert bucket_end(_ts(13, 1), 60) == _ts(14, 0)
+    assert bucket_end(_ts(10, 1), 5) == _ts(10, 5)
+    assert bucket_end(_ts(10, 5), 5) == _ts(10, 5)
+
+
+def test_snapshots_roll_into_minute_and_downsampled_bars():
+    from app.services.intraday_bar_service import MinuteBarAggregator
+
+    agg = MinuteBarAggregator(downsample=(5,))
+    ticks = [
+        (_ts(10, 0, 10), 10.0, 1000, 1.0e4),
+        (_ts(10, 0, 40), 10.4, 1200, 1.2e4),
+        (_ts(10, 1, 5), 9.8, 1500, 1.5e4),
+        (_ts(10, 4, 50), 10.1, 1600, 1.6e4),
+    ]
+    closed = []
+    for ts, price, vol, amt in ticks:
+        closed += agg.close_due(ts)
+        agg.update("000001", {"close": price, "volume": vol, "amount": amt}, ts, "akshare")
+
+    minute_bars = [b for b in closed if b["minutes"] == 1]
+    assert [b["end"] for b in minute_bars] == [_ts(10, 1), _ts(10, 2)]
+    first = minute_bars[0]
+    assert (first["open"], first["high"], first["low"], first["close"]) == (10.0, 10.4, 10.0, 10.4)
+    assert first["volume"] == 200  # 首笔快照只作为差值基准
+
+    live = agg.peek("000001", 5)
+    assert live["end"] == _ts(10, 5)
+    assert (live["open"], live["high"], live["low"], live["close"]) == (10.0, 10.4, 9.8, 10.1)
+    assert live["volume"] == 600
+
+    closed = agg.close_due(_ts(10, 5, 1))
+    five = [b for b in closed if b["minutes"] == 5]
+    assert len(five) == 1 and five[0]["close"] == 10.1 and five[0]["volume"] == 600
+
+
+def test_source_switch_resets_volume_baseline_and_session_end_waits_for_grace():
+    from app.services.intraday_bar_service import MinuteBarAggregator
+
+    agg = MinuteBarAggregator(downsample=(60,))
+    agg.update("600000", {"close": 9.0, "volume": 5000}, _ts(14, 59, 0), "tushare")
+    agg.update("600000", {"close": 9.1, "volume": 50}, _ts(14, 59, 30), "akshare_sina")
+    assert agg.peek("600000", 1)["volume"] == 0
+
+    assert agg.close_due(_ts(15, 0, 30)) == []  # 15:00 bar 等待收盘快照
+    agg.update("600000", {"close": 9.2, "volume": 60}, _ts(15, 0, 30), "akshare_sina")
+    closed = agg.close_due(_ts(15, 2, 0))
+    assert {b["minutes"] for b in closed} == {1, 60}
+    assert all(b["close"] == 9.2 and b["end"] == _ts(15, 0) for b in closed)
+
+
+def test_rotating_sources_keep_cumulative_volume_baseline():
+    from app.services.intraday_bar_service import MinuteBarAggregator
+
+    agg = MinuteBarAggregator(downsample=(5,))
+    agg.update("000001", {"close": 10.0, "volume": 1000, "amount": 1.0e4}, _ts(10, 0, 5), "tushare")
+    agg.update("000001", {"close": 10.1, "volume": 1300, "amount": 1.3e4}, _ts(10, 0, 25), "akshare_eastmoney")
+    agg.update("000001", {"close": 10.2, "volume": 1500, "amount": 1.5e4}, _ts(10, 0, 45), "akshare_sina")
+    bar = agg.peek("000001", 1)
+    assert bar["volume"] == 500 and bar["amount"] == 5.0e3 and bar["ticks"] == 3
+
+    # 单位不一致（手 vs 股）的切换不计量
+    agg.update("000001", {"close": 10.2, "volume": 160000}, _ts(10, 0, 55), "other")
+    assert agg.peek("000001", 1)["volume"] == 500
+
+
+def test_window_covered_requires_contiguous_multi_tick_bars():
+    from datetime import timedelta
+    from app.services.intraday_bar_service import window_covered
+
+    def bars(*ends, ticks=3):
+        return [{"end": e, "ticks": ticks} for e in ends]
+
+    assert window_covered(bars(_ts(11, 25), _ts(11, 30), _ts(13, 5)), 5, 3)
+    assert not window_covered(bars(_ts(10, 5), _ts(10, 15), _ts(10, 20)), 5, 3)  # 缺 10:10
+    assert not window_covered(bars(_ts(10, 5), _ts(10, 10)), 5, 3)  # 数量不足
+    assert not window_covered(bars(_ts(10, 5), _ts(10, 10), _ts(10, 15), ticks=1), 5, 3)  # 单笔快照
+
+    next_day = _ts(10, 30) + timedelta(days=3)
+    assert window_covered(bars(_ts(14, 0), _ts(15, 0), next_day), 60, 3)
+    assert not window_covered(bars(_ts(14, 0), _ts(15, 0), next_day + timedelta(hours=1)), 60, 3)
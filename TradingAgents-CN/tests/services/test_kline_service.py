@@ -0,0 +1,207 @@
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from typing import Any, Dict, List
+
+
+class _FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+
+    def sort(self, key, direction):
+        self._docs = sorted(self._docs, key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._docs)
+
+
+class _FakeColl:
+    def __init__(self, docs):
+        self._docs = docs
+        self.find_calls = 0
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        self.last_query = query
+
+        def _match(value, cond):
+            if isinstance(cond, dict):
+                return value is not None and value >= cond["$gte"]
+            return value == cond
+
+        return _FakeCursor([d for d in self._docs if all(_match(d.get(k), v) for k, v in query.items())])
+
+    async def find_one(self, *args, **kwargs):
+        return None
+
+
+class _FakeDB:
+    def __init__(self, docs):
+        self.daily = _FakeColl(docs)
+        self.other = _FakeColl([])
+
+    def __getitem__(self, name):
+        return self.daily if name == "stock_daily_quotes" else self.other
+
+
+def _day(offset):
+    """今天（服务配置的时区）往前 offset 天：trade_date 下界按当前日期计算"""
+    from app.core.config import settings
+
+    return (datetime.now(ZoneInfo(settings.TIMEZONE)) - timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+def _docs():
+    return [
+        {"symbol": "000001", "period": "daily", "data_source": "akshare",
+         "trade_date": _day(10 - d), "open": 10.0 + d, "high": 11.0 + d, "low": 9.0 + d,
+         "close": 10.5 + d, "vol": 1000.0 * d, "amount": 1e6 * d}
+        for d in range(1, 11)
+    ]
+
+
+def _setup(monkeypatch, docs):
+    import app.services.kline_service as ks_mod
+    import tradingagents.config.runtime_settings as rs_mod
+
+    fake_db = _FakeDB(docs)
+    monkeypatch.setattr(ks_mod, "get_mongo_db", lambda: fake_db, raising=True)
+    monkeypatch.setattr(rs_mod, "use_app_cache_enabled", lambda default=False: True, raising=True)
+    return ks_mod, fake_db
+
+
+def test_kline_service_reads_mongodb_tail_and_caches(monkeypatch):
+    ks_mod, fake_db = _setup(monkeypatch, _docs())
+
+    async def _run():
+        svc = ks_mod.KlineService(ttl_seconds=60)
+        monkeypatch.setattr(svc, "_merge_realtime_bar", _no_realtime)
+        data = await svc.get_kline("CN", "000001", "day", limit=3)
+        assert data["source"] == "mongodb"
+        assert [it["time"] for it in data["items"]] == [_day(2), _day(1), _day(0)]
+        assert data["items"][-1]["volume"] == 10000.0
+        calls = fake_db.daily.find_calls
+
+        # 命中缓存：不再查询数据库
+        again = await svc.get_kline("CN", "000001", "day", limit=3)
+        assert again["items"] == data["items"]
+        assert fake_db.daily.find_calls == calls
+        assert svc.stats["hits"] == 1
+
+        # 强制刷新：跳过缓存
+        await svc.get_kline("CN", "000001", "day", limit=3, force_refresh=True)
+        assert fake_db.daily.find_calls > calls
+
+    asyncio.run(_run())
+
+
+async def _no_realtime(code, items, source):
+    return source
+
+
+def test_kline_service_compact_columns(monkeypatch):
+    ks_mod, _ = _setup(monkeypatch, _docs())
+
+    async def _run():
+        svc = ks_mod.KlineService(ttl_seconds=60)
+        monkeypatch.setattr(svc, "_merge_realtime_bar", _no_realtime)
+        data = await svc.get_kline("CN", "000001", "day", limit=2, compact=True)
+        assert "items" not in data
+        assert data["fields"] == list(ks_mod.KLINE_FIELDS)
+        assert data["columns"]["time"] == [_day(1), _day(0)]
+        assert data["columns"]["close"] == [19.5, 20.5]
+
+    asyncio.run(_run())
+
+
+def test_kline_service_coalesces_concurrent_misses(monkeypatch):
+    ks_mod, _ = _setup(monkeypatch, [])
+    calls = {"n": 0}
+
+    def _slow_fallback(code, period, limit, adj):
+        import time
+        calls["n"] += 1
+        time.sleep(0.05)
+        return [{"time": "2024-09-01", "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+                 "volume": 1.0, "amount": 1.0}], "tushare"
+
+    class _FakeManager:
+        get_kline_with_fallback = staticmethod(_slow_fallback)
+
+    async def _run():
+        svc = ks_mod.KlineService(ttl_seconds=60)
+        svc._manager = _FakeManager()
+        monkeypatch.setattr(svc, "_merge_realtime_bar", _no_realtime)
+        results = await asyncio.gather(*[svc.get_kline("CN", "000002", "day", limit=1) for _ in range(10)])
+        assert calls["n"] == 1
+        assert all(r["source"] == "tushare" for r in results)
+        assert svc.stats["coalesced"] == 9
+
+    asyncio.run(_run())
+
+
+def test_kline_service_bounds_trade_date(monkeypatch):
+    ks_mod, fake_db = _setup(monkeypatch, _docs())
+
+    async def _run():
+        svc = ks_mod.KlineService(ttl_seconds=60)
+        monkeypatch.setattr(svc, "_merge_realtime_bar", _no_realtime)
+
+        class _NoFallback:
+            @staticmethod
+            def get_kline_with_fallback(code, period, limit, adj):
+                return [], None
+
+        svc._manager = _NoFallback()
+        # limit=2 → 只查最近 4 个自然日
+        data = await svc.get_kline("CN", "000001", "day", limit=2)
+        assert fake_db.daily.last_query["trade_date"] == {"$gte": _day(4)}
+        assert [it["time"] for it in data["items"]] == [_day(1), _day(0)]
+
+        await svc.get_kline("CN", "000001", "week", limit=2)
+        assert fake_db.daily.last_query["trade_date"] == {"$gte": _day(28)}
+
+    asyncio.run(_run())
+
+
+def test_kline_service_waiters_survive_leader_cancellation(monkeypatch):
+    ks_mod, _ = _setup(monkeypatch, [])
+    calls = {"n": 0}
+
+    def _slow_fallback(code, period, limit, adj):
+        import time
+        calls["n"] += 1
+        time.sleep(0.1)
+        return [{"time": "2024-09-01", "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+                 "volume": 1.0, "amount": 1.0}], "tushare"
+
+    class _FakeManager:
+        get_kline_with_fallback = staticmethod(_slow_fallback)
+
+    async def _run():
+        svc = ks_mod.KlineService(ttl_seconds=60)
+        svc._manager = _FakeManager()
+        monkeypatch.setattr(svc, "_merge_realtime_bar", _no_realtime)
+        leader = asyncio.ensure_future(svc.get_kline("CN", "000003", "day", limit=1))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(svc.get_kline("CN", "000003", "day", limit=1)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        # 发起请求的客户端断开：只取消它自己，等待者照常拿到结果
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        assert all(r["source"] == "tushare" for r in results)
+        assert calls["n"] == 1 and svc.stats["coalesced"] == 3
+        assert not svc._inflight
+
+        # 查询结果照常写入缓存
+        await svc.get_kline("CN", "000003", "day", limit=1)
+        assert calls["n"] == 1 and svc.stats["hits"] == 1
+
+    asyncio.run(_run())
@@ -0,0 +1,199 @@
+import time
+from datetime import datetime, timedelta
+
+
+def _news():
+    now = datetime(2025, 6, 1, 8, 0)
+    return [
+        {"symbol": "600519", "symbols": ["600519"], "title": "贵州茅台一季度净利增长15%",
+         "content": "高端白酒需求稳健，茅台直营渠道占比提升", "url": "u1", "publish_time": now,
+         "keywords": ["白酒"]},
+        {"symbol": "300750", "symbols": ["300750"], "title": "宁德时代发布新一代麒麟电池",
+         "content": "新能源汽车续航提升，电池能量密度创新高", "url": "u2", "publish_time": now - timedelta(days=3)},
+        {"symbol": "000858", "symbols": ["000858", "600519"], "title": "白酒板块集体走强",
+         "content": "五粮液、贵州茅台领涨，北向资金净买入", "url": "u3", "publish_time": now - timedelta(days=10)},
+        {"symbol": "AAPL", "symbols": ["AAPL"], "title": "Apple beats earnings estimates",
+         "content": "iPhone revenue rises", "url": "u4", "publish_time": now - timedelta(days=1)},
+    ]
+
+
+def _index(index_dir=None):
+    from app.services.news_search_index import NewsSearchIndex
+
+    index = NewsSearchIndex(index_dir)
+    index.add_documents(_news())
+    return index
+
+
+def test_chinese_query_matches_bigrams_and_ranks_by_bm25():
+    index = _index()
+
+    # $text 不切分中文，"茅台" 无法命中正文中的 "贵州茅台领涨"
+    assert [h["url"] for h in index.search("茅台")] == ["u1", "u3"]
+    assert [h["url"] for h in index.search("麒麟电池")] == ["u2"]
+    assert [h["url"] for h in index.search("EARNINGS")] == ["u4"]
+    assert index.search("光伏") == []
+
+
+def test_symbol_and_time_range_filters():
+    index = _index()
+
+    assert [h["url"] for h in index.search("白酒", symbol="600519")] == ["u3", "u1"]
+    assert [h["url"] for h in index.search("白酒", symbol="000858")] == ["u3"]
+    recent = index.search("茅台", start_time=datetime(2025, 5, 25), end_time=datetime(2025, 6, 2))
+    assert [h["url"] for h in recent] == ["u1"]
+
+
+def test_resave_replaces_entry_and_remove_before_prunes():
+    index = _index()
+    updated = dict(_news()[1], content="固态电池量产时间表公布")
+    index.add_documents([updated])
+
+    assert index.doc_count == 4
+    assert index.search("新能源") == []
+    assert [h["url"] for h in index.search("固态电池")] == ["u2"]
+
+    assert index.remove_before(datetime(2025, 5, 30)) == 2
+    assert {h["url"] for h in index.search("白酒 电池")} == {"u1"}
+
+
+def test_index_persists_across_restart_via_snapshot_and_journal(tmp_path):
+    from app.services.news_search_index import NewsSearchIndex
+
+    index = _index(str(tmp_path))
+    index.remove_before(datetime(2025, 5, 25))
+
+    reloaded = NewsSearchIndex(str(tmp_path))
+    assert reloaded.doc_count == 3
+    assert [h["url"] for h in reloaded.search("茅台")] == ["u1"]
+    assert reloaded.search("茅台")[0]["publish_time"] == datetime(2025, 6, 1, 8, 0)
+
+
+def test_search_latency_on_large_index():
+    from app.services.news_search_index import NewsSearchIndex
+
+    base = datetime(2025, 1, 1)
+    index = NewsSearchIndex()
+    index.add_documents([
+        {"symbol": f"{i % 500:06d}", "title": f"测试公司{i}发布第{i % 4 + 1}季度业绩公告",
+         "content": f"营业收入{i * 7 % 1000}亿元，净利润同比增长{i % 50}%", "url": f"u{i}",
+         "publish_time": base + timedelta(minutes=i)}
+        for i in range(20000)
+    ])
+    start = time.perf_counter()
+    for q in ("业绩公告", "净利润增长", "测试公司1999"):
+        for _ in range(10):
+            index.search(q, limit=20)
+    avg_ms = (time.perf_counter() - start) / 30 * 1000
+    assert avg_ms < 100
+
+
+def test_publish_time_is_normalized_to_mongo_storage_form():
+    from datetime import timezone
+    from zoneinfo import ZoneInfo
+    from app.services.news_search_index import NewsSearchIndex, doc_key
+
+    aware = datetime(2025, 6, 1, 16, 0, 0, 123456, tzinfo=ZoneInfo("Asia/Shanghai"))
+    stored = datetime(2025, 6, 1, 8, 0, 0, 123000)  # MongoDB 读回：naive UTC，毫秒精度
+    index = NewsSearchIndex()
+    index.add_documents([{"symbol": "600519", "title": "贵州茅台发布年报", "url": "u1", "publish_time": aware}])
+
+    hit = index.search("年报")[0]
+    assert hit["publish_time"] == stored
+    assert doc_key("u1", "贵州茅台发布年报", aware) == doc_key("u1", "贵州茅台发布年报", stored)
+    assert doc_key("u1", "t", aware.astimezone(timezone.utc)) == doc_key("u1", "t", stored)
+
+
+def test_startup_rebuilds_outdated_or_lagging_index(tmp_path):
+    import asyncio
+    import pickle
+    from app.services import news_search_index as nsi
+
+    class _FakeNews:
+        def __init__(self, updated_at):
+            self.updated_at = updated_at
+
+        async def find_one(self, query, projection=None, sort=None):
+            return {"updated_at": self.updated_at}
+
+    class _FakeDB:
+        def __init__(self, updated_at):
+            self.stock_news = _FakeNews(updated_at)
+
+    saved_at = datetime(2025, 6, 1, 8, 0)
+    index = nsi.NewsSearchIndex(str(tmp_path))
+    index.add_documents([dict(n, updated_at=saved_at) for n in _news()])
+    index._write_snapshot()
+
+    async def _stale(idx, updated_at):
+        return await nsi._index_stale(_FakeDB(updated_at), idx)
+
+    reloaded = nsi.NewsSearchIndex(str(tmp_path))
+    assert not asyncio.run(_stale(reloaded, saved_at))
+    assert asyncio.run(_stale(reloaded, saved_at + timedelta(minutes=5)))
+
+    # 旧格式快照：启动时丢弃并标记需要重建
+    with open(tmp_path / nsi.SNAPSHOT_FILE, "rb") as f:
+        state = pickle.load(f)
+    state.pop("version")
+    with open(tmp_path / nsi.SNAPSHOT_FILE, "wb") as f:
+        pickle.dump(state, f)
+    outdated = nsi.NewsSearchIndex(str(tmp_path))
+    assert outdated.doc_count == 0 and outdated.format_outdated
+    assert asyncio.run(_stale(outdated, saved_at))
+
+
+def test_instances_sharing_a_directory_see_each_others_writes(tmp_path, monkeypatch):
+    from app.services import news_search_index as nsi
+
+    monkeypatch.setattr(nsi, "JOURNAL_COMPACT_EVERY", 3)
+    news = _news()
+    # 两个实例模拟共用 NEWS_SEARCH_INDEX_DIR 的两个进程
+    first = nsi.NewsSearchIndex(str(tmp_path))
+    second = nsi.NewsSearchIndex(str(tmp_path))
+
+    first.add_documents([news[0]])
+    second.add_documents([news[1]])
+    assert [h["url"] for h in first.search("麒麟电池")] == ["u2"]
+
+    # 第三条日志触发 first 合并快照：合并前先追上 second 的写入，second 随后整体重新加载
+    first.add_documents([news[2]])
+    assert not (tmp_path / nsi.JOURNAL_FILE).read_text(encoding="utf-8")
+    second.add_documents([news[3]])
+    assert {h["url"] for h in second.search("茅台")} == {"u1", "u3"}
+    assert first.doc_count == second.doc_count == nsi.NewsSearchIndex(str(tmp_path)).doc_count == 4
+
+
+def _add_from_process(index_dir, worker, count):
+    from app.services import news_search_index as nsi
+
+    nsi.JOURNAL_COMPACT_EVERY = 5
+    index = nsi.NewsSearchIndex(index_dir)
+    for i in range(count):
+        index.add_documents([{"symbol": "600519", "title": f"进程{worker}写入第{i}条公告", "url": f"w{worker}-{i}",
+                              "publish_time": datetime(2025, 6, 1) + timedelta(minutes=i)}])
+
+
+def test_concurrent_processes_do_not_lose_writes(tmp_path):
+    import multiprocessing
+
+    from app.services.news_search_index import NewsSearchIndex
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_from_process, args=(str(tmp_path), w, 30)) for w in range(3)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(60)
+        assert p.exitcode == 0
+
+    assert NewsSearchIndex(str(tmp_path)).doc_count == 90
+
+
+def test_single_cjk_char_query_needs_fallback():
+    from app.services.news_search_index import query_needs_fallback
+
+    # 索引只有 2-gram，单字查询不会命中
+    assert _index().search("茅") == []
+    assert query_needs_fallback("茅") and query_needs_fallback(" 茅 ")
+    assert not query_needs_fallback("茅台") and not query_needs_fallback("a") and not query_needs_fallback("茅 AAPL")
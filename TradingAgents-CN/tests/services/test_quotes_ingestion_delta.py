@@ -0,0 +1,128 @@
+import asyncio
+
+
+class _FakeResult:
+    def __init__(self, ops):
+        self.matched_count = 0
+        self.modified_count = len(ops)
+        self.upserted_ids = {}
+
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs
+
+
+class _FakeColl:
+    def __init__(self, existing=None):
+        self.existing = existing or []
+        self.writes = []
+        self.marked = []
+
+    async def update_one(self, query, update, upsert=False):
+        for code in update["$addToSet"]["codes"]["$each"]:
+            if code not in self.marked:
+                self.marked.append(code)
+
+    async def find_one_and_update(self, query, update):
+        if not self.marked:
+            return None
+        doc = {"_id": query["_id"], "codes": self.marked}
+        self.marked = []
+        return doc
+
+    def find(self, query, projection=None):
+        return _FakeCursor(self.existing)
+
+    async def bulk_write(self, ops, ordered=False):
+        self.writes.append(ops)
+        return _FakeResult(ops)
+
+
+def _patch_db(monkeypatch, coll):
+    import app.services.quotes_ingestion_service as qis_mod
+
+    class _FakeDB:
+        def __getitem__(self, name):
+            return coll
+
+    monkeypatch.setattr(qis_mod, "get_mongo_db", lambda: _FakeDB(), raising=True)
+
+
+def test_only_changed_quotes_are_upserted(monkeypatch):
+    from app.services.quotes_ingestion_service import QuotesIngestionService
+
+    coll = _FakeColl()
+    _patch_db(monkeypatch, coll)
+
+    async def _run():
+        svc = QuotesIngestionService()
+        quotes = {
+            "sz000001": {"close": 10.1, "pct_chg": 0.1, "amount": 1.0e8},
+            "600000": {"close": 9.8, "pct_chg": -0.3, "amount": 7.5e7},
+        }
+        first = await svc._bulk_upsert(quotes, "20251017", "fake")
+        assert first["changed"] == 2 and len(coll.writes[-1]) == 2
+
+        second = await svc._bulk_upsert(quotes, "20251017", "fake")
+        assert second["changed"] == 0 and second["skipped"] == 2
+        assert len(coll.writes) == 1
+
+        quotes["600000"] = {"close": 9.9, "pct_chg": 0.7, "amount": 8.0e7}
+        third = await svc._bulk_upsert(quotes, "20251017", "fake")
+        assert third["changed"] == 1
+        assert [op._filter["code"] for op in coll.writes[-1]] == ["600000"]
+
+        # 交易日变化时全部重写
+        fourth = await svc._bulk_upsert(quotes, "20251020", "fake")
+        assert fourth["changed"] == 2
+
+    asyncio.run(_run())
+
+
+def test_snapshot_is_warmed_from_existing_collection(monkeypatch):
+    from app.services.quotes_ingestion_service import QuotesIngestionService
+
+    existing = [{"code": "000001", "close": 10.1, "pct_chg": 0.1, "amount": 1.0e8, "volume": None,
+                 "open": None, "high": None, "low": None, "pre_close": None, "trade_date": "20251017"}]
+    coll = _FakeColl(existing)
+    _patch_db(monkeypatch, coll)
+
+    async def _run():
+        svc = QuotesIngestionService()
+        stats = await svc._bulk_upsert({"000001": {"close": 10.1, "pct_chg": 0.1, "amount": 1.0e8}}, "20251017", "fake")
+        assert stats == {"received": 1, "changed": 0, "skipped": 1, "matched": 0, "modified": 0, "upserted": 0}
+        assert coll.writes == []
+
+    asyncio.run(_run())
+
+
+def test_external_writes_invalidate_snapshot(monkeypatch):
+    import app.services.quotes_ingestion_service as qis_mod
+    from app.services.quotes_ingestion_service import QuotesIngestionService, mark_quotes_written_externally
+
+    coll = _FakeColl()
+    _patch_db(monkeypatch, coll)
+
+    async def _run():
+        svc = QuotesIngestionService()
+        quotes = {
+            "000001": {"close": 10.1, "pct_chg": 0.1, "amount": 1.0e8},
+            "600000": {"close": 9.8, "pct_chg": -0.3, "amount": 7.5e7},
+        }
+        await svc._bulk_upsert(quotes, "20251017", "fake")
+
+        # 其他写入方改写了 000001，行情源数据未变也必须重新写回
+        await mark_quotes_written_externally(qis_mod.get_mongo_db(), ["sz000001"])
+        stats = await svc._bulk_upsert(quotes, "20251017", "fake")
+        assert stats["changed"] == 1
+        assert [op._filter["code"] for op in coll.writes[-1]] == ["000001"]
+
+        # 登记只消费一次
+        stats = await svc._bulk_upsert(quotes, "20251017", "fake")
+        assert stats["changed"] == 0
+
+    asyncio.run(_run())
@@ -0,0 +1,107 @@
+import asyncio
+import re
+from datetime import datetime
+
+import pytest
+
+
+def _grams_match(doc_grams, query):
+    """模拟 MongoDB 的 {"$or": [{"search_grams": {"$all": [...]}}, {"search_grams_v": {"$exists": False}}]}（文档已带 gram）"""
+    return set(query["$or"][0]["search_grams"]["$all"]).issubset(doc_grams)
+
+
+def _matches(doc, query):
+    """按 MongoDB 语义求值关键词查询用到的操作符（$and / $or / $all / $exists / $regex）"""
+    if "$and" in query:
+        return all(_matches(doc, q) for q in query["$and"])
+    if "$or" in query:
+        return any(_matches(doc, q) for q in query["$or"])
+    (field, cond), = query.items()
+    value = doc.get(field)
+    if "$all" in cond:
+        return value is not None and set(cond["$all"]).issubset(value)
+    if "$exists" in cond:
+        return (field in doc) == cond["$exists"]
+    flags = re.IGNORECASE if "i" in cond.get("$options", "") else 0
+    return value is not None and re.search(cond["$regex"], str(value), flags) is not None
+
+
+def test_keyword_grams_cover_substring_of_summary():
+    from app.services.report_search_service import build_keyword_query, build_search_grams
+
+    doc = {"stock_symbol": "600519", "analysis_id": "600519_20250101_093000",
+           "summary": "贵州茅台估值回落，建议逢低买入"}
+    grams = set(build_search_grams(doc))
+
+    for keyword in ("估值", "逢低买入", "0051", "20250101"):
+        query = build_keyword_query(keyword)
+        assert _grams_match(grams, query["$and"][0]), keyword
+
+    assert not _grams_match(grams, build_keyword_query("卖出")["$and"][0])
+
+
+def test_keyword_query_escapes_regex_and_matches_single_char():
+    from app.services.report_search_service import build_keyword_query, build_search_fields
+
+    q = build_keyword_query("a.b")
+    regex = q["$and"][1]["$or"][0]["stock_symbol"]["$regex"]
+    assert re.search(regex, "a.b") and not re.search(regex, "axb")
+
+    # 已建索引的文档只有 2-gram：单字关键词只走正则，仍能命中
+    doc = {"stock_symbol": "600519", "analysis_id": "600519_20250101_093000", "summary": "建议逢低买入"}
+    doc.update(build_search_fields(doc))
+    assert _matches(doc, build_keyword_query("买"))
+    assert _matches(doc, build_keyword_query("逢低"))
+    assert not _matches(doc, build_keyword_query("卖"))
+    assert not _matches(doc, build_keyword_query("卖出"))
+
+
+def test_documents_without_grams_fall_back_to_regex_and_full_summary_is_indexed():
+    from app.services.report_search_service import SEARCH_GRAMS_VERSION, build_keyword_query, build_search_fields
+
+    # 其他写入路径保存、尚未补齐的文档：没有 search_grams_v，由 $or 第二支放行给正则校验
+    pending = build_keyword_query("估值")["$and"][0]["$or"][1]
+    assert pending == {"search_grams_v": {"$exists": False}}
+
+    # 长摘要末尾的关键词同样能命中
+    fields = build_search_fields({"stock_symbol": "600519", "summary": "甲" * 6000 + "尾部关键词"})
+    assert fields["search_grams_v"] == SEARCH_GRAMS_VERSION
+    assert _grams_match(set(fields["search_grams"]), build_keyword_query("尾部关键词")["$and"][0])
+
+
+def test_cursor_roundtrip_builds_keyset_condition():
+    from bson import ObjectId
+    from app.services.report_search_service import decode_cursor, encode_cursor
+
+    oid = ObjectId()
+    ts = datetime(2025, 1, 2, 3, 4, 5, 123000)
+    cond = decode_cursor(encode_cursor({"_id": oid, "created_at": ts}))
+    assert cond == {"$or": [{"created_at": {"$lt": ts}}, {"created_at": ts, "_id": {"$lt": oid}}]}
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_count_reports_estimates_unfiltered_and_caches_filtered():
+    from app.services import report_search_service as rss
+
+    class _FakeColl:
+        def __init__(self):
+            self.count_calls = 0
+
+        async def estimated_document_count(self):
+            return 1_000_000
+
+        async def count_documents(self, query):
+            self.count_calls += 1
+            return 42
+
+    async def _run():
+        rss.invalidate_count_cache()
+        coll = _FakeColl()
+        assert await rss.count_reports(coll, {}) == (1_000_000, True)
+        assert await rss.count_reports(coll, {"market_type": "A股"}) == (42, False)
+        assert await rss.count_reports(coll, {"market_type": "A股"}) == (42, True)
+        assert coll.count_calls == 1
+
+    asyncio.run(_run())
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+
+def _docs():
+    return [
+        {"code": "600519", "name": "贵州茅台", "source": "akshare"},
+        {"code": "600519", "name": "贵州茅台(旧)", "source": "tushare"},
+        {"code": "000001", "name": "平安银行", "source": "tushare"},
+        {"code": "601318", "name": "中国平安", "source": "tushare"},
+        {"code": "000858", "name": "五粮液", "source": "baostock"},
+        {"code": "AAPL", "name": "苹果", "name_en": "Apple Inc.", "source": "yfinance_us"},
+    ]
+
+
+def _build():
+    from app.services.stock_search_index import _build_index
+    return _build_index(_docs(), ["tushare", "akshare", "baostock"])
+
+
+def test_index_dedupes_by_source_priority():
+    index = _build()
+    by_code = {d["code"]: d for d in index.docs}
+    assert len(by_code) == 5
+    assert by_code["600519"]["source"] == "tushare"
+
+
+def test_code_prefix_ranks_before_name_and_substring():
+    index = _build()
+    codes = [d["code"] for d in index.search("6", 10)]
+    assert codes[:2] == ["600519", "601318"]
+
+    # 子串匹配（与原 $regex 包含语义一致）
+    assert [d["code"] for d in index.search("平安", 10)] == ["000001", "601318"]
+    assert [d["code"] for d in index.search("51", 10)] == ["600519"]
+
+
+def test_english_name_prefix_is_case_insensitive():
+    index = _build()
+    assert [d["code"] for d in index.search("app", 10)] == ["AAPL"]
+    assert [d["code"] for d in index.search("INC", 10)] == ["AAPL"]
+
+
+def test_pinyin_initials_prefix():
+    pytest.importorskip("pypinyin")
+    index = _build()
+    assert [d["code"] for d in index.search("gzmt", 10)] == ["600519"]
+    assert [d["code"] for d in index.search("wl", 10)] == ["000858"]
+
+
+def test_search_latency_on_large_index():
+    from app.services.stock_search_index import _MarketIndex
+
+    docs = [{"code": f"{i:06d}", "name": f"测试股份{i}", "name_en": f"Test Corp {i}"} for i in range(20000)]
+    index = _MarketIndex(docs)
+    queries = ("00012", "测试股份1999", "test corp 42", "份19")
+
+    def avg_ms(search, rounds):
+        start = time.perf_counter()
+        for q in queries:
+            for _ in range(rounds):
+                search(q)
+        return (time.perf_counter() - start) / (len(queries) * rounds) * 1000
+
+    # 不用绝对耗时断言（CI 机器快慢不一）：与同进程内的全量线性扫描对比，索引应明显更快
+    def linear_scan(q):
+        return [d for d in docs if q in d["code"] or q in d["name"] or q in d["name_en"].lower()][:20]
+
+    index_ms = avg_ms(lambda q: index.search(q, 20), 50)
+    scan_ms = avg_ms(linear_scan, 5)
+    assert index_ms < scan_ms / 2, f"index {index_ms:.3f}ms vs scan {scan_ms:.3f}ms"
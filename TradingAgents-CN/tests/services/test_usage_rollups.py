@@ -0,0 +1,262 @@
+from collections import defaultdict
+
+
+def _records():
+    return [
+        {"timestamp": "2026-10-16T09:15:00+08:00", "provider": "dashscope", "model_name": "qwen-plus",
+         "input_tokens": 100, "output_tokens": 50, "cost": 0.01, "currency": "CNY"},
+        {"timestamp": "2026-10-16T09:45:00+08:00", "provider": "dashscope", "model_name": "qwen-plus",
+         "input_tokens": 200, "output_tokens": 80, "cost": 0.02, "currency": "CNY"},
+        {"timestamp": "2026-10-17T14:00:00+08:00", "provider": "openai", "model_name": "gpt-4o",
+         "input_tokens": 300, "output_tokens": 120, "cost": 0.5, "currency": "USD"},
+    ]
+
+
+def _apply(updates, store):
+    """在内存里模拟 $inc upsert"""
+    for op in updates:
+        doc = op._doc["$inc"]
+        key = tuple(sorted(op._filter.items()))
+        for k, v in doc.items():
+            store[key][k] += v
+
+
+def test_rollup_updates_cover_hour_and_day_buckets():
+    from tradingagents.config.usage_rollups import build_rollup_updates
+
+    ops = build_rollup_updates(_records()[0])
+    filters = [op._filter for op in ops]
+    assert [f["granularity"] for f in filters] == ["hour", "day"]
+    assert [f["bucket"] for f in filters] == ["2026-10-16T09", "2026-10-16"]
+    assert all(op._upsert for op in ops)
+    assert ops[0]._doc["$inc"] == {"requests": 1, "input_tokens": 100, "output_tokens": 50, "cost": 0.01}
+    assert build_rollup_updates({"timestamp": ""}) == []
+
+
+def test_statistics_from_rollups_match_per_record_totals():
+    from app.services.usage_statistics_service import build_usage_statistics
+    from tradingagents.config.usage_rollups import build_rollup_updates
+
+    store = defaultdict(lambda: defaultdict(float))
+    for r in _records():
+        _apply(build_rollup_updates(r), store)
+    day_docs = [{**dict(k), **v} for k, v in store.items() if dict(k)["granularity"] == "day"]
+
+    stats = build_usage_statistics(day_docs)
+    assert stats.total_requests == 3
+    assert stats.total_input_tokens == 600
+    assert abs(stats.cost_by_currency["CNY"] - 0.03) < 1e-9
+    assert stats.cost_by_currency["USD"] == 0.5
+    assert stats.by_provider["dashscope"]["requests"] == 2
+    assert stats.by_model["openai/gpt-4o"]["cost_by_currency"] == {"USD": 0.5}
+    assert list(stats.by_date) == ["2026-10-16", "2026-10-17"]
+
+
+def test_window_query_uses_hours_for_first_day_and_days_after():
+    from app.services.usage_statistics_service import build_rollup_window_query
+
+    q = build_rollup_window_query("2026-10-11T10:30:00", "2026-10-18T10:30:00", {"provider": "openai"})
+    hour_q, day_q = q["$or"]
+    assert hour_q == {"granularity": "hour", "bucket": {"$gte": "2026-10-11T10", "$lte": "2026-10-11T23"},
+                      "provider": "openai"}
+    assert day_q["bucket"] == {"$gt": "2026-10-11", "$lte": "2026-10-18"}
+
+    same_day = build_rollup_window_query("2026-10-18T01:00:00", "2026-10-18T10:30:00", {})
+    assert same_day == {"granularity": "hour", "bucket": {"$gte": "2026-10-18T01", "$lte": "2026-10-18T10"}}
+
+
+class _FakeStateCollection:
+    """只实现回填状态标记用到的 find_one / find_one_and_update(upsert) / update_one"""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _match(doc, flt):
+        for k, cond in flt.items():
+            if k == "$or":
+                if not any(_FakeStateCollection._match(doc, c) for c in cond):
+                    return False
+            elif isinstance(cond, dict):
+                v = doc.get(k)
+                if "$ne" in cond and v == cond["$ne"]:
+                    return False
+                if "$lt" in cond and not (v is not None and v < cond["$lt"]):
+                    return False
+            elif doc.get(k) != cond:
+                return False
+        return True
+
+    async def find_one(self, flt, projection=None):
+        doc = self.docs.get(flt["_id"])
+        return dict(doc) if doc else None
+
+    async def find_one_and_update(self, flt, update, upsert=False):
+        from pymongo.errors import DuplicateKeyError
+
+        doc = self.docs.get(flt["_id"])
+        if doc is not None and self._match(doc, flt):
+            doc.update(update["$set"])
+            return doc
+        if doc is not None:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.docs[flt["_id"]] = {"_id": flt["_id"], **update["$set"]}
+        return None
+
+    async def update_one(self, flt, update):
+        self.docs[flt["_id"]].update(update["$set"])
+
+
+class _FakeRollupDb:
+    """原始记录 + 预聚合（按 UpdateOne 的 $inc/$set 语义落在内存里）"""
+
+    def __init__(self):
+        from tradingagents.config.usage_rollups import ROLLUP_COLLECTION, ROLLUP_STATE_COLLECTION
+
+        self.raw = []
+        self.rollups = defaultdict(lambda: defaultdict(float))
+        self.during_aggregate = None
+        self.state = _FakeStateCollection()
+        self._names = {ROLLUP_COLLECTION: "rollups", ROLLUP_STATE_COLLECTION: "state"}
+
+    def __getitem__(self, name):
+        return {"rollups": _FakeRollups(self), "state": self.state}.get(self._names.get(name), _FakeRaw(self))
+
+
+class _FakeRaw:
+    def __init__(self, db):
+        self.db = db
+
+    async def insert_many(self, docs, ordered=False):
+        self.db.raw.extend(docs)
+
+    async def aggregate(self, pipeline, allowDiskUse=False):
+        ts_range = pipeline[0]["$match"]["timestamp"]
+        if self.db.during_aggregate:
+            await self.db.during_aggregate()
+        groups = defaultdict(lambda: defaultdict(float))
+        for r in list(self.db.raw):
+            if ts_range.get("$gte", "") <= r["timestamp"] < ts_range["$lt"]:
+                g = groups[(r["timestamp"][:13], r["provider"], r["model_name"], r["currency"])]
+                g["requests"] += 1
+                for k in ("input_tokens", "output_tokens", "cost"):
+                    g[k] += r[k]
+        for (bucket, provider, model, currency), metrics in groups.items():
+            yield {"_id": {"bucket": bucket, "provider": provider, "model_name": model, "currency": currency},
+                   **metrics}
+
+
+class _FakeRollups:
+    def __init__(self, db):
+        self.db = db
+
+    async def create_index(self, keys, **kwargs):
+        pass
+
+    async def bulk_write(self, ops, ordered=False):
+        for op in ops:
+            key = tuple(sorted(op._filter.items()))
+            for k, v in op._doc.get("$inc", {}).items():
+                self.db.rollups[key][k] += v
+            if "$set" in op._doc:
+                self.db.rollups[key].update(op._doc["$set"])
+
+    async def aggregate(self, pipeline, allowDiskUse=False):
+        bucket_range = pipeline[0]["$match"]["bucket"]
+        groups = defaultdict(lambda: defaultdict(float))
+        for key, metrics in list(self.db.rollups.items()):
+            k = dict(key)
+            if k["granularity"] == "hour" and bucket_range.get("$gte", "") <= k["bucket"] < bucket_range["$lt"]:
+                g = groups[(k["bucket"][:10], k["provider"], k["model_name"], k["currency"])]
+                for m, v in metrics.items():
+                    g[m] += v
+        for (bucket, provider, model, currency), metrics in groups.items():
+            yield {"_id": {"bucket": bucket, "provider": provider, "model_name": model, "currency": currency},
+                   **metrics}
+
+
+def _hour_total(db, bucket):
+    return sum(m["requests"] for k, m in db.rollups.items() if dict(k)["bucket"] == bucket)
+
+
+def test_backfill_is_claimed_by_marker_even_after_worker_increments(monkeypatch):
+    import asyncio
+    from app.services import usage_statistics_service as mod
+
+    db = _FakeRollupDb()
+    monkeypatch.setattr(mod, "get_mongo_db", lambda: db)
+    service = mod.UsageStatisticsService()
+    records = [dict(r, timestamp="2026-10-16T09:15:00") for r in _records()[:2]]
+
+    async def _run():
+        db.raw.extend(records[:1])
+        assert await service.claim_rollup_backfill()
+        # 另一个进程 / 重复启动：认领中不能再次认领
+        assert not await service.claim_rollup_backfill()
+        assert not await service._rollups_ready(db)
+
+        # 写入器的 $inc 先于回填落库：集合已非空，回填仍要执行
+        db.raw.extend(records[1:])
+        await mod.update_rollups_for_records(records[1:])
+        await service.run_rollup_backfill()
+        assert _hour_total(db, "2026-10-16T09") == 2
+        assert await service._rollups_ready(db)
+        assert not await service.claim_rollup_backfill()
+
+    asyncio.run(_run())
+
+
+def test_backfill_claim_is_released_on_failure(monkeypatch):
+    import asyncio
+    from app.services import usage_statistics_service as mod
+
+    db = _FakeRollupDb()
+    monkeypatch.setattr(mod, "get_mongo_db", lambda: db)
+    service = mod.UsageStatisticsService()
+
+    async def _boom(days=None):
+        raise RuntimeError("mongo unavailable")
+
+    async def _run():
+        assert await service.claim_rollup_backfill()
+        monkeypatch.setattr(service, "rebuild_rollups", _boom)
+        await service.run_rollup_backfill()
+        assert not await service._rollups_ready(db)
+        assert await service.claim_rollup_backfill()
+
+    asyncio.run(_run())
+
+
+def test_reconcile_does_not_race_buffered_records(monkeypatch):
+    import asyncio
+    from app.services import batch_writer
+    from app.services import usage_statistics_service as mod
+
+    db = _FakeRollupDb()
+    monkeypatch.setattr(mod, "get_mongo_db", lambda: db)
+    service = mod.UsageStatisticsService()
+    writer = batch_writer.BufferedBatchWriter(
+        "token_usage", max_batch=1, flush_interval=60,
+        on_flush=mod.update_rollups_for_records, collection_getter=lambda name: db[name],
+    )
+    monkeypatch.setitem(batch_writer._writers, "token_usage", writer)
+    late = [dict(r, timestamp="2026-10-16T09:15:00") for r in _records()[:2]]
+
+    async def _put_during_aggregate():
+        # 对账读取原始记录期间又有一批（同一历史小时的）记录到达
+        await writer.put(dict(late[1]))
+        await asyncio.sleep(0.02)
+        assert len(db.raw) == 1
+
+    async def _run():
+        writer.start()
+        await writer.put(dict(late[0]))
+        db.during_aggregate = _put_during_aggregate
+        await service.rebuild_rollups(days=None)
+        db.during_aggregate = None
+        await writer.stop()
+        # 进入对账前缓冲记录已落库并 $inc；对账期间到达的记录在对账后才落库并 $inc，各计一次
+        assert len(db.raw) == 2
+        assert _hour_total(db, "2026-10-16T09") == 2
+
+    asyncio.run(_run())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+测试多日回测执行器
+
+测试场景：
+1. 价格面板切片不包含交易日之后的数据，实际收益按后续交易日收盘价计算
+2. 回测运行中分析看到的时点数据截止于交易日，决策按方向换算收益并反馈给 reflect_and_remember
+3. 检查点续跑：已完成的 (股票, 日期) 不再重复分析
+4. 反思推迟到收益确定日及之前的分析全部完成后，按日期顺序执行；多只股票的累计收益不互相连乘
+5. LLM 传入非 YYYY-MM-DD 格式的 end_date 时按日期比较截止日
+"""
+
+import json
+
+import pandas as pd
+
+
+def _panel(ticker="600519"):
+    from tradingagents.backtest import PricePanel
+
+    data = pd.DataFrame({
+        "date": ["2024-05-06", "2024-05-07", "2024-05-08", "2024-05-09", "2024-05-10"],
+        "close": [100.0, 110.0, 99.0, 99.0, 120.0],
+    })
+    return PricePanel(ticker, data)
+
+
+class FakeGraph:
+    """记录调用的假图：决策取决于交易日，并记录分析时可见的最新数据日期"""
+
+    def __init__(self, calls, reflections=None):
+        self.calls = calls
+        self.reflections = reflections if reflections is not None else []
+        self.curr_state = None
+
+    def propagate(self, ticker, date):
+        from tradingagents.backtest.point_in_time import _backtest_context
+
+        panels, as_of = _backtest_context.get()
+        visible = panels[ticker].slice(date)
+        self.calls.append((ticker, date, visible["date"].max().strftime("%Y-%m-%d")))
+        action = "买入" if date in ("2024-05-06", "2024-05-09") else "卖出"
+        return {"ticker": ticker, "date": date}, {"action": action, "target_price": 100.0, "confidence": 0.7}
+
+    def reflect_and_remember(self, returns_losses, background=None):
+        # 记录反思的条目、收益以及此时已分析过的交易日
+        self.reflections.append((self.curr_state, returns_losses, sorted({c[1] for c in self.calls})))
+
+
+def test_price_panel_slice_has_no_lookahead():
+    panel = _panel()
+
+    assert panel.slice("2024-05-07")["close"].tolist() == [100.0, 110.0]
+    assert panel.trading_dates("2024-05-07", "2024-05-09") == ["2024-05-07", "2024-05-08", "2024-05-09"]
+    assert round(panel.forward_return("2024-05-06"), 4) == 0.1
+    assert panel.forward_return("2024-05-10") is None
+
+
+def test_runner_scores_decisions_and_reflects(tmp_path):
+    from tradingagents.backtest import BacktestRunner
+
+    calls = []
+    reflections = []
+    runner = BacktestRunner(
+        graph_factory=lambda: FakeGraph(calls, reflections), tickers=["600519"], start_date="2024-05-06", end_date="2024-05-08",
+        max_concurrency=1, checkpoint_path=str(tmp_path / "bt.jsonl"),
+        panel_loader=lambda ticker, start, end, **kwargs: _panel(ticker),
+    )
+    report = runner.run()
+
+    assert sorted(calls) == [
+        ("600519", "2024-05-06", "2024-05-06"),
+        ("600519", "2024-05-07", "2024-05-07"),
+        ("600519", "2024-05-08", "2024-05-08"),
+    ]
+    assert report["total"] == 3 and report["evaluated"] == 3
+    # 05-06 买入 +10%，05-07 卖出（实际 -10%）→ +10%，05-08 卖出（实际 0%）→ 0
+    assert round(report["hit_rate"], 4) == round(2 / 3, 4)
+    assert round(report["cumulative_return"], 4) == 0.21
+    assert [(state["date"], round(r, 4)) for state, r, _ in reflections] == [
+        ("2024-05-06", 0.1), ("2024-05-07", 0.1), ("2024-05-08", 0.0),
+    ]
+
+
+def test_runner_resumes_from_checkpoint(tmp_path):
+    from tradingagents.backtest import BacktestRunner
+
+    checkpoint = tmp_path / "bt.jsonl"
+    checkpoint.write_text(json.dumps({
+        "ticker": "600519", "date": "2024-05-06", "action": "买入",
+        "realized_return": 0.1, "position_return": 0.1,
+    }, ensure_ascii=False) + "\n{\"ticker\": \"600519\", \"da", encoding="utf-8")
+
+    calls = []
+    runner = BacktestRunner(
+        graph_factory=lambda: FakeGraph(calls), tickers=["600519"], start_date="2024-05-06", end_date="2024-05-07",
+        max_concurrency=2, checkpoint_path=str(checkpoint), reflect=False,
+        panel_loader=lambda ticker, start, end, **kwargs: _panel(ticker),
+    )
+    report = runner.run()
+
+    assert [c[1] for c in calls] == ["2024-05-07"]
+    assert report["total"] == 2
+    assert len(runner.load_checkpoint()) == 2
+
+
+def test_runner_defers_reflection_and_keeps_tickers_separate(tmp_path):
+    from tradingagents.backtest import BacktestRunner
+
+    calls = []
+    reflections = []
+    runner = BacktestRunner(
+        graph_factory=lambda: FakeGraph(calls, reflections), tickers=["600519", "000001"],
+        start_date="2024-05-06", end_date="2024-05-09", max_concurrency=3, horizon_days=2,
+        panel_loader=lambda ticker, start, end, **kwargs: _panel(ticker),
+    )
+    report = runner.run()
+
+    assert len(calls) == 8
+    reflected = [(state["date"], state["ticker"]) for state, _, _ in reflections]
+    assert reflected == sorted(reflected)
+    # 交易日 D 的收益在第 2 个交易日后才确定：反思时截至该日的交易日必须都已分析完
+    panel = _panel()
+    for state, _, analyzed in reflections:
+        realized_on = panel.forward_date(state["date"], 2)
+        assert all(d in analyzed for d in panel.trading_dates("2024-05-06", realized_on) if d <= "2024-05-09")
+
+    # 两只股票走势相同：整体累计收益等于单只股票的累计收益，而不是两者连乘
+    per_ticker = report["by_ticker"]
+    assert set(per_ticker) == {"600519", "000001"}
+    assert per_ticker["600519"]["cumulative_return"] == per_ticker["000001"]["cumulative_return"]
+    assert report["cumulative_return"] == per_ticker["600519"]["cumulative_return"]
+
+
+def test_point_in_time_cutoff_compares_dates():
+    from tradingagents.backtest import get_point_in_time_market_data, point_in_time
+
+    captured = []
+
+    class Panel:
+        empty = False
+
+        def slice(self, as_of, lookback_days=None):
+            captured.append(as_of)
+            return _panel().slice(as_of).iloc[0:0]
+
+    with point_in_time({"600519": Panel()}, "2024-05-08"):
+        get_point_in_time_market_data("600519", "20240507")
+        get_point_in_time_market_data("600519", "2024-5-10")
+
+    # "20240507" 按字符串比较会大于 "2024-05-08"；按日期比较截止到 05-07
+    assert captured == ["2024-05-07", "2024-05-08"]
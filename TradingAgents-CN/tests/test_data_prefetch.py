@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+测试分析师数据预取
+
+测试场景：
+1. 各分析师的数据按与分析师相同的参数并发获取
+2. 单个数据源失败不影响其他分析师，失败/过短的数据视为不可用
+3. 分析师只在首轮且数据可用时使用预取数据
+"""
+
+import time
+
+
+class FakeTool:
+    """模拟 langchain 工具：记录调用参数"""
+
+    def __init__(self, result, delay=0.0, error=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def invoke(self, args):
+        self.calls.append(args)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class FakeToolkit:
+    def __init__(self):
+        self.get_stock_market_data_unified = FakeTool("行情数据" * 50, delay=0.2)
+        self.get_stock_fundamentals_unified = FakeTool("财务数据" * 50, delay=0.2)
+        self.get_stock_sentiment_unified = FakeTool(None, error=RuntimeError("情绪接口不可用"))
+
+
+def test_prefetch_runs_concurrently_and_reports_stats():
+    from tradingagents.agents.utils.data_prefetch import prefetch_analyst_data
+
+    toolkit = FakeToolkit()
+    result = prefetch_analyst_data(
+        toolkit, llm=None, ticker="600519", trade_date="2024-05-20",
+        analyst_types=["market", "fundamentals", "social"],
+    )
+
+    assert toolkit.get_stock_market_data_unified.calls == [
+        {"ticker": "600519", "start_date": "2024-05-20", "end_date": "2024-05-20"}
+    ]
+    assert toolkit.get_stock_fundamentals_unified.calls[0]["start_date"] == "2024-05-10"
+
+    stats = result["prefetch_stats"]
+    assert set(result["prefetched_data"]) == {"market", "fundamentals"}
+    assert stats["usable"] == ["market", "fundamentals"]
+    assert stats["llm_round_trips_saved"] == 2
+    # 两个 0.2 秒的数据源并发执行
+    assert stats["fetch_wall_seconds"] < stats["fetch_sequential_seconds"]
+
+
+def test_get_prefetched_data_rejects_unusable_data():
+    from tradingagents.agents.utils.data_prefetch import get_prefetched_data
+
+    state = {
+        "prefetched_data": {
+            "market": "行情数据" * 50,
+            "news": "❌ 新闻获取失败" + "。" * 200,
+            "social": "数据过短",
+        }
+    }
+
+    assert get_prefetched_data(state, "market") == "行情数据" * 50
+    assert get_prefetched_data(state, "news") is None
+    assert get_prefetched_data(state, "social") is None
+    assert get_prefetched_data(state, "fundamentals") is None
+    assert get_prefetched_data({}, "market") is None
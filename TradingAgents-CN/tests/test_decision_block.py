@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+测试风险经理结构化决策块的本地解析
+
+测试场景：
+1. 标准决策块解析并标准化（英文动作、货币符号、百分数置信度）
+2. 多个代码块时取最后一个通过校验的决策块
+3. 不符合 schema 的决策块返回 None（回退 LLM 提取）
+"""
+
+
+def test_parse_decision_block_normalizes_fields():
+    from tradingagents.agents.utils.decision_block import parse_decision_block
+
+    text = """# 最终决策
+
+综合三位分析师的观点，建议买入。
+
+```json
+{"action": "BUY", "target_price": "¥45.50", "confidence": 80, "risk_score": 0.35, "reasoning": "业绩超预期"}
+```"""
+
+    assert parse_decision_block(text) == {
+        "action": "买入",
+        "target_price": 45.5,
+        "confidence": 0.8,
+        "risk_score": 0.35,
+        "reasoning": "业绩超预期",
+    }
+
+
+def test_parse_decision_block_uses_last_valid_block():
+    from tradingagents.agents.utils.decision_block import parse_decision_block
+
+    text = """交易员计划：
+```json
+{"action": "持有", "target_price": 10}
+```
+最终决策：
+```json
+{"action": "卖出", "target_price": 9.2, "confidence": 0.6}
+```
+```json
+{"note": "不是决策块"}
+```"""
+
+    result = parse_decision_block(text)
+    assert result["action"] == "卖出"
+    assert result["target_price"] == 9.2
+    assert result["risk_score"] == 0.5
+
+
+def test_parse_decision_block_rejects_invalid_schema():
+    from tradingagents.agents.utils.decision_block import parse_decision_block
+
+    assert parse_decision_block("建议买入，目标价45元") is None
+    assert parse_decision_block('```json\n{"action": "观望", "target_price": 45}\n```') is None
+    assert parse_decision_block('```json\n{"action": "买入", "target_price": null}\n```') is None
+    assert parse_decision_block('```json\n{"action": "买入", "target_price": 45, "confidence": 150}\n```') is None
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+测试增强新闻过滤器的共享模型与批量打分
+
+测试场景：
+1. 多个过滤器实例共享同一个进程级语义模型，模型只加载一次
+2. filter_news_enhanced 对全部候选新闻只调用一次 encode（批量编码）
+3. 批量打分与逐条打分（calculate_enhanced_relevance_score）结果一致
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class FakeSentenceModel:
+    """按关键词生成向量的假模型，记录每次 encode 的批大小"""
+
+    KEYWORDS = ["招商银行", "财报", "ETF", "科技"]
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(len(texts))
+        return np.array([[1.0 + text.count(k) for k in self.KEYWORDS] for text in texts])
+
+
+def _news():
+    return pd.DataFrame([
+        {'新闻标题': '招商银行发布2024年第三季度业绩报告', '新闻内容': '招商银行今日发布第三季度财报，净利润同比增长8%'},
+        {'新闻标题': '上证180ETF指数基金（530280）自带杠铃策略', '新闻内容': '前十大权重股分别为贵州茅台、招商银行600036'},
+        {'新闻标题': '招商银行与某科技公司签署战略合作协议', '新闻内容': '招商银行宣布与知名科技公司达成战略合作'},
+    ])
+
+
+def test_filters_share_model_and_encode_in_one_batch(monkeypatch):
+    from tradingagents.utils import enhanced_news_filter as module
+
+    model = FakeSentenceModel()
+    monkeypatch.setattr(module, "_sentence_model", model)
+    monkeypatch.setattr(module, "_sentence_model_loaded", True)
+
+    first = module.EnhancedNewsFilter('600036', '招商银行', use_semantic=True)
+    second = module.EnhancedNewsFilter('600000', '浦发银行', use_semantic=True)
+    assert first.sentence_model is second.sentence_model is model
+
+    model.batches.clear()
+    result = first.filter_news_enhanced(_news(), min_score=0)
+
+    assert model.batches == [3]
+    assert len(result) == 3
+    assert list(result['final_score']) == sorted(result['final_score'], reverse=True)
+
+
+def test_batch_scores_match_single_item_scores(monkeypatch):
+    from tradingagents.utils import enhanced_news_filter as module
+
+    monkeypatch.setattr(module, "_sentence_model", FakeSentenceModel())
+    monkeypatch.setattr(module, "_sentence_model_loaded", True)
+    news_filter = module.EnhancedNewsFilter('600036', '招商银行', use_semantic=True)
+
+    result = news_filter.filter_news_enhanced(_news(), min_score=0).set_index('新闻标题')
+    for _, row in _news().iterrows():
+        single = news_filter.calculate_enhanced_relevance_score(row['新闻标题'], row['新闻内容'])
+        assert abs(result.loc[row['新闻标题'], 'final_score'] - single['final_score']) < 1e-4
+        assert abs(result.loc[row['新闻标题'], 'semantic_score'] - single['semantic_score']) < 1e-4
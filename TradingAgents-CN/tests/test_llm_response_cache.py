@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试 LLM 响应缓存
+
+测试场景：
+1. readwrite 模式：首次调用模型并写入，相同请求命中缓存并统计节省的 token
+2. 消息/工具调用 ID 不影响缓存键，工具 schema 变化会产生不同的键
+3. replay 模式只读，record 模式总是调用模型
+4. 磁盘后端超过大小上限时淘汰最久未使用的条目
+"""
+
+import os
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from tradingagents.llm_adapters.response_cache import (
+    DiskCacheBackend,
+    LLMResponseCache,
+    llm_cache_mode,
+    make_cache_key,
+)
+
+
+class FakeLLM:
+    provider_name = "deepseek"
+    model_name = "deepseek-chat"
+    temperature = 0.1
+
+
+def _result(text):
+    message = AIMessage(content=text, usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120})
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _make_cache(tmp_path, max_bytes=10 * 1024 * 1024):
+    return LLMResponseCache(DiskCacheBackend(str(tmp_path), max_bytes=max_bytes))
+
+
+def test_readwrite_mode_hits_cache_and_tracks_savings(tmp_path):
+    cache = _make_cache(tmp_path)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return _result("分析报告")
+
+    messages = [HumanMessage(content="分析 600519")]
+    with llm_cache_mode("readwrite"):
+        first, first_entry = cache.generate(FakeLLM(), messages, None, {}, generate)
+        second, second_entry = cache.generate(FakeLLM(), messages, None, {"session_id": "other"}, generate)
+
+    assert len(calls) == 1
+    assert first_entry is None and second_entry is not None
+    assert second.generations[0].message.content == "分析报告"
+    assert second.generations[0].message.id is None
+    assert cache.stats["hits"] == 1 and cache.stats["tokens_saved"] == 120
+
+
+def test_cache_key_ignores_ids_but_not_tools():
+    llm = FakeLLM()
+    call_a = [AIMessage(content="", tool_calls=[{"name": "get_news", "args": {"ticker": "AAPL"}, "id": "call_1"}])]
+    call_b = [AIMessage(content="", tool_calls=[{"name": "get_news", "args": {"ticker": "AAPL"}, "id": "call_2"}])]
+    key = lambda messages, kwargs: make_cache_key(llm.provider_name, llm.model_name, llm.temperature, messages, None, kwargs)
+
+    assert key(call_a, {}) == key(call_b, {})
+    tools_v1 = [{"type": "function", "function": {"name": "get_news", "parameters": {}}}]
+    tools_v2 = [{"type": "function", "function": {"name": "get_news", "parameters": {"max_news": {}}}}]
+    assert key(call_a, {"tools": tools_v1}) != key(call_a, {"tools": tools_v2})
+
+
+def test_replay_is_read_only_and_record_always_calls(tmp_path):
+    cache = _make_cache(tmp_path)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return _result(f"第{len(calls)}次")
+
+    messages = [HumanMessage(content="分析 AAPL")]
+    with llm_cache_mode("replay"):
+        cache.generate(FakeLLM(), messages, None, {}, generate)
+    assert cache.stats["writes"] == 0
+
+    with llm_cache_mode("record"):
+        cache.generate(FakeLLM(), messages, None, {}, generate)
+        cache.generate(FakeLLM(), messages, None, {}, generate)
+    assert len(calls) == 3
+
+    with llm_cache_mode("replay"):
+        result, entry = cache.generate(FakeLLM(), messages, None, {}, generate)
+    assert entry is not None and result.generations[0].message.content == "第3次"
+
+
+def test_disk_backend_evicts_least_recently_used(tmp_path):
+    backend = DiskCacheBackend(str(tmp_path), max_bytes=2500)
+    backend.set("llmcache:aa01", b"x" * 1000)
+    backend.set("llmcache:bb02", b"x" * 1000)
+    # 让 aa01 成为最近使用的条目
+    old = time.time() - 100
+    os.utime(backend._path("llmcache:bb02"), (old, old))
+    os.utime(backend._path("llmcache:aa01"), (old - 50, old - 50))
+    assert backend.get("llmcache:aa01") is not None
+
+    backend.set("llmcache:cc03", b"x" * 1000)
+
+    assert backend.get("llmcache:bb02") is None
+    assert backend.get("llmcache:aa01") is not None
+    assert backend.get("llmcache:cc03") is not None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+测试并发反思与记忆批量写入
+
+测试场景：
+1. 五个组件的反思并发执行，各自写入对应的记忆库
+2. 所有记忆库共用一次 situation 向量计算
+3. 未启用的记忆（None）被跳过
+4. 反思线程继承调用方的 contextvar（LLM 缓存模式）
+5. 后台反思：等待超时的反思留在队列中，close() 关闭后台线程
+"""
+
+import threading
+import time
+
+
+class FakeLLM:
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.1)
+        with self.lock:
+            self.active -= 1
+
+        class _Result:
+            content = f"反思: {messages[1][1][:20]}"
+
+        return _Result()
+
+
+class FakeMemory:
+    embedding_calls = 0
+
+    def __init__(self):
+        self.llm_provider = "openai"
+        self.embedding = "text-embedding-3-small"
+        self.added = []
+
+    def get_embeddings(self, texts):
+        FakeMemory.embedding_calls += 1
+        return [[0.1, 0.2] for _ in texts]
+
+    def add_situations(self, situations_and_advice, embeddings=None):
+        self.added.append((situations_and_advice, embeddings))
+
+
+def _state():
+    return {
+        "market_report": "市场", "sentiment_report": "情绪", "news_report": "新闻", "fundamentals_report": "基本面",
+        "investment_debate_state": {"bull_history": "看涨", "bear_history": "看跌", "judge_decision": "研究经理"},
+        "trader_investment_plan": "交易计划",
+        "risk_debate_state": {"judge_decision": "风险经理"},
+    }
+
+
+def test_reflect_all_runs_concurrently_and_shares_embedding():
+    from tradingagents.graph.reflection import Reflector
+
+    llm = FakeLLM()
+    reflector = Reflector(llm)
+    memories = {name: FakeMemory() for name in ["bull", "bear", "trader", "invest_judge", "risk_manager"]}
+    memories["bear"] = None
+    FakeMemory.embedding_calls = 0
+
+    results = reflector.reflect_all(_state(), 1000, memories)
+
+    assert set(results) == {"bull", "trader", "invest_judge", "risk_manager"}
+    assert llm.max_active == 4
+    assert FakeMemory.embedding_calls == 1
+    for name in results:
+        (situation, advice), = memories[name].added[0][0]
+        assert advice == results[name]
+        assert memories[name].added[0][1] == [[0.1, 0.2]]
+
+
+def test_reflect_all_threads_see_llm_cache_mode():
+    from tradingagents.graph.reflection import Reflector
+    from tradingagents.llm_adapters import response_cache
+
+    seen = []
+
+    class ModeLLM(FakeLLM):
+        def invoke(self, messages):
+            seen.append(response_cache._run_mode.get())
+            return super().invoke(messages)
+
+    memories = {name: FakeMemory() for name in ["bull", "bear"]}
+    with response_cache.llm_cache_mode("replay"):
+        Reflector(ModeLLM()).reflect_all(_state(), 1000, memories)
+
+    assert seen == ["replay", "replay"]
+
+
+def _background_graph(reflect_all):
+    from types import SimpleNamespace
+    from tradingagents.graph.trading_graph import TradingAgentsGraph
+
+    # 只验证后台反思队列，不构建完整的图
+    graph = TradingAgentsGraph.__new__(TradingAgentsGraph)
+    graph.config = {"reflection_async": True}
+    graph.reflector = SimpleNamespace(reflect_all=reflect_all)
+    graph.curr_state = _state()
+    graph.bull_memory = graph.bear_memory = graph.trader_memory = FakeMemory()
+    graph.invest_judge_memory = graph.risk_manager_memory = FakeMemory()
+    graph._reflection_executor = None
+    graph._pending_reflections = []
+    return graph
+
+
+def test_background_reflections_keep_unfinished_futures_and_close():
+    from tradingagents.llm_adapters import response_cache
+
+    release = threading.Event()
+    modes = []
+
+    def reflect_all(state, returns_losses, memories):
+        modes.append(response_cache._run_mode.get())
+        if returns_losses == "slow":
+            release.wait(5)
+        if returns_losses == "bad":
+            raise RuntimeError("llm down")
+        return {"bull": "ok"}
+
+    graph = _background_graph(reflect_all)
+    with response_cache.llm_cache_mode("replay"):
+        first = graph.reflect_and_remember("slow")
+    second = graph.reflect_and_remember("bad")
+
+    # 超时：第一条仍在执行，两条都留在队列里
+    assert graph.wait_for_reflections(timeout=0.05) == 0
+    assert graph._pending_reflections == [first, second]
+
+    release.set()
+    assert graph.wait_for_reflections(timeout=5) == 2
+    assert graph._pending_reflections == []
+    assert first.result() == {"bull": "ok"} and modes == ["replay", None]
+
+    executor = graph._reflection_executor
+    graph.close()
+    assert graph._reflection_executor is None and executor._shutdown
+
+
+def test_close_without_wait_cancels_queued_reflections():
+    release = threading.Event()
+    graph = _background_graph(lambda state, returns_losses, memories: release.wait(5))
+
+    running = graph.reflect_and_remember(1)
+    queued = graph.reflect_and_remember(2)
+    time.sleep(0.05)
+    graph.close(wait=False)
+
+    assert queued.cancelled() and not running.done()
+    assert graph._pending_reflections == [running]
+    release.set()
+    assert graph.wait_for_reflections(timeout=5) == 1
@@ -1,6 +1,7 @@
 from .utils.agent_utils import Toolkit, create_msg_delete
 from .utils.agent_states import AgentState, InvestDebateState, RiskDebateState
 from .utils.memory import FinancialSituationMemory
+from .utils.data_prefetch import create_data_prefetch
 
 from .analysts.fundamentals_analyst import create_fundamentals_analyst
 from .analysts.market_analyst import create_market_analyst
@@ -28,6 +29,7 @@ __all__ = [
     "Toolkit",
     "AgentState",
     "create_msg_delete",
+    "create_data_prefetch",
     "InvestDebateState",
     "RiskDebateState",
     "create_bear_researcher",
@@ -15,6 +15,7 @@ logger = get_logger("default")
 
 # 导入Google工具调用处理器
 from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
+from tradingagents.agents.utils.data_prefetch import get_prefetched_data
 
 
 def _get_company_name_for_fundamentals(ticker: str, market_info: dict) -> str:
@@ -95,6 +96,28 @@ def _get_company_name_for_fundamentals(ticker: str, market_info: dict) -> str:
         return f"股票{ticker}"
 
 
+def _build_fundamentals_analysis_prompt(company_name: str, ticker: str, currency_info: str, combined_data) -> str:
+    """基于已获取的基本面数据生成分析报告的提示词（强制工具调用 / 使用预取数据时共用）"""
+    return f"""基于以下真实数据，对{company_name}（股票代码：{ticker}）进行详细的基本面分析：
+
+{combined_data}
+
+请提供：
+1. 公司基本信息分析（{company_name}，股票代码：{ticker}）
+2. 财务状况评估
+3. 盈利能力分析
+4. 估值分析（使用{currency_info}）
+5. 投资建议（买入/持有/卖出）
+
+要求：
+- 基于提供的真实数据进行分析
+- 正确使用公司名称"{company_name}"和股票代码"{ticker}"
+- 价格使用{currency_info}
+- 投资建议使用中文
+- 分析要详细且专业"""
+
+
+
 def create_fundamentals_analyst(llm, toolkit):
     @log_analyst_module("fundamentals")
     def fundamentals_analyst_node(state):
@@ -277,6 +300,29 @@ def create_fundamentals_analyst(llm, toolkit):
         else:
             fresh_llm = llm
 
+        # ⚡ 数据预取节点已获取基本面数据：直接基于数据生成报告，只需一次 LLM 调用
+        prefetched = get_prefetched_data(state, "fundamentals") if tool_call_count == 0 else None
+        if prefetched is not None:
+            logger.info(f"📊 [基本面分析师] ⚡ 使用预取数据生成报告，数据长度: {len(prefetched)}")
+            try:
+                currency_info = f"{market_info['currency_name']}（{market_info['currency_symbol']}）"
+                analysis_prompt_template = ChatPromptTemplate.from_messages([
+                    ("system", "你是专业的股票基本面分析师，基于提供的真实数据进行分析。"),
+                    ("human", "{analysis_request}")
+                ])
+                analysis_result = (analysis_prompt_template | fresh_llm).invoke({
+                    "analysis_request": _build_fundamentals_analysis_prompt(company_name, ticker, currency_info, prefetched)
+                })
+                report = analysis_result.content if hasattr(analysis_result, 'content') else str(analysis_result)
+                logger.info(f"📊 [基本面分析师] 基于预取数据的报告完成，长度: {len(report)}")
+                return {
+                    "messages": [AIMessage(content=report)],
+                    "fundamentals_report": report,
+                    "fundamentals_tool_call_count": tool_call_count + 1
+                }
+            except Exception as e:
+                logger.error(f"❌ [基本面分析师] 基于预取数据生成报告失败，回退到工具调用流程: {e}")
+
         logger.debug(f"📊 [DEBUG] 创建LLM链，工具数量: {len(tools)}")
         # 安全地获取工具名称用于调试
         debug_tool_names = []
@@ -631,23 +677,7 @@ def create_fundamentals_analyst(llm, toolkit):
                 currency_info = f"{market_info['currency_name']}（{market_info['currency_symbol']}）"
                 
                 # 生成基于真实数据的分析报告
-                analysis_prompt = f"""基于以下真实数据，对{company_name}（股票代码：{ticker}）进行详细的基本面分析：
-
-{combined_data}
-
-请提供：
-1. 公司基本信息分析（{company_name}，股票代码：{ticker}）
-2. 财务状况评估
-3. 盈利能力分析
-4. 估值分析（使用{currency_info}）
-5. 投资建议（买入/持有/卖出）
-
-要求：
-- 基于提供的真实数据进行分析
-- 正确使用公司名称"{company_name}"和股票代码"{ticker}"
-- 价格使用{currency_info}
-- 投资建议使用中文
-- 分析要详细且专业"""
+                analysis_prompt = _build_fundamentals_analysis_prompt(company_name, ticker, currency_info, combined_data)
 
                 try:
                     # 创建简单的分析链
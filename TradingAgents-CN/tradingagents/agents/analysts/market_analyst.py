@@ -12,6 +12,7 @@ logger = get_logger("default")
 
 # 导入Google工具调用处理器
 from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
+from tradingagents.agents.utils.data_prefetch import get_prefetched_data
 
 
 def _get_company_name(ticker: str, market_info: dict) -> str:
@@ -92,6 +93,125 @@ def _get_company_name(ticker: str, market_info: dict) -> str:
         return f"股票{ticker}"
 
 
+def _build_market_analysis_prompt(company_name: str, ticker: str, market_info: dict) -> str:
+    """基于已获取的市场数据生成技术分析报告的提示词（工具调用后 / 使用预取数据时共用）"""
+    return f"""现在请基于上述工具获取的数据，生成详细的技术分析报告。
+
+**分析对象：**
+- 公司名称：{company_name}
+- 股票代码：{ticker}
+- 所属市场：{market_info['market_name']}
+- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
+
+**输出格式要求（必须严格遵守）：**
+
+请按照以下专业格式输出报告，不要使用emoji符号（如📊📈📉💭等），使用纯文本标题：
+
+# **{company_name}（{ticker}）技术分析报告**
+**分析日期：[当前日期]**
+
+---
+
+## 一、股票基本信息
+
+- **公司名称**：{company_name}
+- **股票代码**：{ticker}
+- **所属市场**：{market_info['market_name']}
+- **当前价格**：[从工具数据中获取] {market_info['currency_symbol']}
+- **涨跌幅**：[从工具数据中获取]
+- **成交量**：[从工具数据中获取]
+
+---
+
+## 二、技术指标分析
+
+### 1. 移动平均线（MA）分析
+
+[分析MA5、MA10、MA20、MA60等均线系统，包括：]
+- 当前各均线数值
+- 均线排列形态（多头/空头）
+- 价格与均线的位置关系
+- 均线交叉信号
+
+### 2. MACD指标分析
+
+[分析MACD指标，包括：]
+- DIF、DEA、MACD柱状图当前数值
+- 金叉/死叉信号
+- 背离现象
+- 趋势强度判断
+
+### 3. RSI相对强弱指标
+
+[分析RSI指标，包括：]
+- RSI当前数值
+- 超买/超卖区域判断
+- 背离信号
+- 趋势确认
+
+### 4. 布林带（BOLL）分析
+
+[分析布林带指标，包括：]
+- 上轨、中轨、下轨数值
+- 价格在布林带中的位置
+- 带宽变化趋势
+- 突破信号
+
+---
+
+## 三、价格趋势分析
+
+### 1. 短期趋势（5-10个交易日）
+
+[分析短期价格走势，包括支撑位、压力位、关键价格区间]
+
+### 2. 中期趋势（20-60个交易日）
+
+[分析中期价格走势，结合均线系统判断趋势方向]
+
+### 3. 成交量分析
+
+[分析成交量变化，量价配合情况]
+
+---
+
+## 四、投资建议
+
+### 1. 综合评估
+
+[基于上述技术指标，给出综合评估]
+
+### 2. 操作建议
+
+- **投资评级**：买入/持有/卖出
+- **目标价位**：[给出具体价格区间] {market_info['currency_symbol']}
+- **止损位**：[给出止损价格] {market_info['currency_symbol']}
+- **风险提示**：[列出主要风险因素]
+
+### 3. 关键价格区间
+
+- **支撑位**：[具体价格]
+- **压力位**：[具体价格]
+- **突破买入价**：[具体价格]
+- **跌破卖出价**：[具体价格]
+
+---
+
+**重要提醒：**
+- 必须严格按照上述格式输出，使用标准的Markdown标题（#、##、###）
+- 不要使用emoji符号（📊📈📉💭等）
+- 所有价格数据使用{market_info['currency_name']}（{market_info['currency_symbol']}）表示
+- 确保在分析中正确使用公司名称"{company_name}"和股票代码"{ticker}"
+- 报告标题必须是：# **{company_name}（{ticker}）技术分析报告**
+- 报告必须基于工具返回的真实数据进行分析
+- 包含具体的技术指标数值和专业分析
+- 提供明确的投资建议和风险提示
+- 报告长度不少于800字
+- 使用中文撰写
+- 使用表格展示数据时，确保格式规范"""
+
+
+
 def create_market_analyst(llm, toolkit):
 
     def market_analyst_node(state):
@@ -120,6 +240,27 @@ def create_market_analyst(llm, toolkit):
         company_name = _get_company_name(ticker, market_info)
         logger.debug(f"📈 [DEBUG] 公司名称: {ticker} -> {company_name}")
 
+        # ⚡ 数据预取节点已获取市场数据：直接基于数据生成报告，只需一次 LLM 调用
+        prefetched = get_prefetched_data(state, "market") if tool_call_count == 0 else None
+        if prefetched is not None:
+            logger.info(f"📊 [市场分析师] ⚡ 使用预取数据生成报告，数据长度: {len(prefetched)}")
+            try:
+                from langchain_core.messages import HumanMessage
+
+                data_message = HumanMessage(content=(
+                    f"以下是系统已获取的 {ticker} 市场数据，无需再调用工具：\n\n{prefetched}\n\n"
+                    + _build_market_analysis_prompt(company_name, ticker, market_info)
+                ))
+                final_result = llm.invoke(state["messages"] + [data_message])
+                logger.info(f"📊 [市场分析师] 生成完整分析报告，长度: {len(final_result.content)}")
+                return {
+                    "messages": [final_result],
+                    "market_report": final_result.content,
+                    "market_tool_call_count": tool_call_count + 1
+                }
+            except Exception as e:
+                logger.error(f"❌ [市场分析师] 基于预取数据生成报告失败，回退到工具调用流程: {e}")
+
         # 统一使用 get_stock_market_data_unified 工具
         # 该工具内部会自动识别股票类型（A股/港股/美股）并调用相应的数据源
         logger.info(f"📊 [市场分析师] 使用统一市场数据工具，自动识别股票类型")
@@ -351,120 +492,7 @@ def create_market_analyst(llm, toolkit):
 
                     # 基于工具结果生成完整分析报告
                     # 🔥 重要：这里必须包含公司名称和输出格式要求，确保LLM生成正确的报告标题
-                    analysis_prompt = f"""现在请基于上述工具获取的数据，生成详细的技术分析报告。
-
-**分析对象：**
-- 公司名称：{company_name}
-- 股票代码：{ticker}
-- 所属市场：{market_info['market_name']}
-- 计价货币：{market_info['currency_name']}（{market_info['currency_symbol']}）
-
-**输出格式要求（必须严格遵守）：**
-
-请按照以下专业格式输出报告，不要使用emoji符号（如📊📈📉💭等），使用纯文本标题：
-
-# **{company_name}（{ticker}）技术分析报告**
-**分析日期：[当前日期]**
-
----
-
-## 一、股票基本信息
-
-- **公司名称**：{company_name}
-- **股票代码**：{ticker}
-- **所属市场**：{market_info['market_name']}
-- **当前价格**：[从工具数据中获取] {market_info['currency_symbol']}
-- **涨跌幅**：[从工具数据中获取]
-- **成交量**：[从工具数据中获取]
-
----
-
-## 二、技术指标分析
-
-### 1. 移动平均线（MA）分析
-
-[分析MA5、MA10、MA20、MA60等均线系统，包括：]
-- 当前各均线数值
-- 均线排列形态（多头/空头）
-- 价格与均线的位置关系
-- 均线交叉信号
-
-### 2. MACD指标分析
-
-[分析MACD指标，包括：]
-- DIF、DEA、MACD柱状图当前数值
-- 金叉/死叉信号
-- 背离现象
-- 趋势强度判断
-
-### 3. RSI相对强弱指标
-
-[分析RSI指标，包括：]
-- RSI当前数值
-- 超买/超卖区域判断
-- 背离信号
-- 趋势确认
-
-### 4. 布林带（BOLL）分析
-
-[分析布林带指标，包括：]
-- 上轨、中轨、下轨数值
-- 价格在布林带中的位置
-- 带宽变化趋势
-- 突破信号
-
----
-
-## 三、价格趋势分析
-
-### 1. 短期趋势（5-10个交易日）
-
-[分析短期价格走势，包括支撑位、压力位、关键价格区间]
-
-### 2. 中期趋势（20-60个交易日）
-
-[分析中期价格走势，结合均线系统判断趋势方向]
-
-### 3. 成交量分析
-
-[分析成交量变化，量价配合情况]
-
----
-
-## 四、投资建议
-
-### 1. 综合评估
-
-[基于上述技术指标，给出综合评估]
-
-### 2. 操作建议
-
-- **投资评级**：买入/持有/卖出
-- **目标价位**：[给出具体价格区间] {market_info['currency_symbol']}
-- **止损位**：[给出止损价格] {market_info['currency_symbol']}
-- **风险提示**：[列出主要风险因素]
-
-### 3. 关键价格区间
-
-- **支撑位**：[具体价格]
-- **压力位**：[具体价格]
-- **突破买入价**：[具体价格]
-- **跌破卖出价**：[具体价格]
-
----
-
-**重要提醒：**
-- 必须严格按照上述格式输出，使用标准的Markdown标题（#、##、###）
-- 不要使用emoji符号（📊📈📉💭等）
-- 所有价格数据使用{market_info['currency_name']}（{market_info['currency_symbol']}）表示
-- 确保在分析中正确使用公司名称"{company_name}"和股票代码"{ticker}"
-- 报告标题必须是：# **{company_name}（{ticker}）技术分析报告**
-- 报告必须基于工具返回的真实数据进行分析
-- 包含具体的技术指标数值和专业分析
-- 提供明确的投资建议和风险提示
-- 报告长度不少于800字
-- 使用中文撰写
-- 使用表格展示数据时，确保格式规范"""
+                    analysis_prompt = _build_market_analysis_prompt(company_name, ticker, market_info)
 
                     # 构建完整的消息序列
                     messages = state["messages"] + [result] + tool_messages + [HumanMessage(content=analysis_prompt)]
@@ -12,6 +12,7 @@ from tradingagents.tools.unified_news_tool import create_unified_news_tool
 from tradingagents.utils.stock_utils import StockUtils
 # 导入Google工具调用处理器
 from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
+from tradingagents.agents.utils.data_prefetch import get_prefetched_data
 
 logger = get_logger("analysts.news")
 
@@ -199,19 +200,26 @@ def create_news_analyst(llm, toolkit):
         
         logger.info(f"[新闻分析师] 准备调用LLM进行新闻分析，模型: {model_info}")
         
+        # ⚡ 数据预取节点已获取新闻时直接使用（跳过工具选择的 LLM 调用）
+        pre_fetched_news = get_prefetched_data(state, "news") if tool_call_count == 0 else None
+
         # 🚨 DashScope/DeepSeek/Zhipu预处理：强制获取新闻数据
-        pre_fetched_news = None
-        if ('DashScope' in llm.__class__.__name__ 
+        if (pre_fetched_news is not None
+            or 'DashScope' in llm.__class__.__name__
             or 'DeepSeek' in llm.__class__.__name__
             or 'Zhipu' in llm.__class__.__name__
             ):
-            logger.warning(f"[新闻分析师] 🚨 检测到{llm.__class__.__name__}模型，启动预处理强制新闻获取...")
+            if pre_fetched_news is not None:
+                logger.info(f"[新闻分析师] ⚡ 使用预取节点的新闻数据: {len(pre_fetched_news)} 字符")
+            else:
+                logger.warning(f"[新闻分析师] 🚨 检测到{llm.__class__.__name__}模型，启动预处理强制新闻获取...")
             try:
-                # 强制预先获取新闻数据
-                logger.info(f"[新闻分析师] 🔧 预处理：强制调用统一新闻工具...")
-                logger.info(f"[新闻分析师] 📊 调用参数: stock_code={ticker}, max_news=10, model_info={model_info}")
+                if pre_fetched_news is None:
+                    # 强制预先获取新闻数据
+                    logger.info(f"[新闻分析师] 🔧 预处理：强制调用统一新闻工具...")
+                    logger.info(f"[新闻分析师] 📊 调用参数: stock_code={ticker}, max_news=10, model_info={model_info}")
 
-                pre_fetched_news = unified_news_tool(stock_code=ticker, max_news=10, model_info=model_info)
+                    pre_fetched_news = unified_news_tool(stock_code=ticker, max_news=10, model_info=model_info)
 
                 logger.info(f"[新闻分析师] 📋 预处理返回结果长度: {len(pre_fetched_news) if pre_fetched_news else 0} 字符")
                 logger.info(f"[新闻分析师] 📄 预处理返回结果预览 (前500字符): {pre_fetched_news[:500] if pre_fetched_news else 'None'}")
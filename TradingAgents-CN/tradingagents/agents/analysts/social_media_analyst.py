@@ -9,6 +9,7 @@ logger = get_logger("analysts.social_media")
 
 # 导入Google工具调用处理器
 from tradingagents.agents.utils.google_tool_handler import GoogleToolCallHandler
+from tradingagents.agents.utils.data_prefetch import get_prefetched_data
 
 
 def _get_company_name_for_social_media(ticker: str, market_info: dict) -> str:
@@ -155,6 +156,28 @@ def create_social_media_analyst(llm, toolkit):
 注意：由于中国社交媒体API限制，如果数据获取受限，请明确说明并提供替代分析建议。"""
         )
 
+        # ⚡ 数据预取节点已获取情绪数据：直接基于数据生成报告，只需一次 LLM 调用
+        prefetched = get_prefetched_data(state, "social") if tool_call_count == 0 else None
+        if prefetched is not None:
+            logger.info(f"📊 [社交媒体分析师] ⚡ 使用预取数据生成报告，数据长度: {len(prefetched)}")
+            try:
+                result = llm.invoke([
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": (
+                        f"当前日期是{current_date}，分析对象是{company_name}（{ticker}）。"
+                        f"以下是系统已获取的情绪数据，无需再调用工具：\n\n{prefetched}\n\n"
+                        f"请基于上述数据撰写详细的中文情绪分析报告。"
+                    )}
+                ])
+                logger.info(f"📊 [社交媒体分析师] 基于预取数据的报告完成，长度: {len(result.content)}")
+                return {
+                    "messages": [result],
+                    "sentiment_report": result.content,
+                    "sentiment_tool_call_count": tool_call_count + 1
+                }
+            except Exception as e:
+                logger.error(f"❌ [社交媒体分析师] 基于预取数据生成报告失败，回退到工具调用流程: {e}")
+
         prompt = ChatPromptTemplate.from_messages(
             [
                 (
@@ -3,6 +3,7 @@ import json
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
+from tradingagents.agents.utils.decision_block import DECISION_BLOCK_INSTRUCTIONS
 logger = get_logger("default")
 
 
@@ -51,7 +52,8 @@ def create_risk_manager(llm, memory):
 
 ---
 
-专注于可操作的见解和持续改进。建立在过去经验教训的基础上，批判性地评估所有观点，确保每个决策都能带来更好的结果。请用中文撰写所有分析内容和建议。"""
+专注于可操作的见解和持续改进。建立在过去经验教训的基础上，批判性地评估所有观点，确保每个决策都能带来更好的结果。请用中文撰写所有分析内容和建议。
+{DECISION_BLOCK_INSTRUCTIONS}"""
 
         # 📊 统计 prompt 大小
         prompt_length = len(prompt)
@@ -71,6 +71,10 @@ class AgentState(MessagesState):
     sentiment_tool_call_count: Annotated[int, "Social media analyst tool call counter"]
     fundamentals_tool_call_count: Annotated[int, "Fundamentals analyst tool call counter"]
 
+    # ⚡ 分析师数据预取（Data Prefetch 节点写入）
+    prefetched_data: Annotated[dict, "Datasets prefetched for each analyst"]
+    prefetch_stats: Annotated[dict, "Timing and LLM round-trip savings of the prefetch stage"]
+
     # researcher team discussion step
     investment_debate_state: Annotated[
         InvestDebateState, "Current state of the debate on if to invest or not"
@@ -1084,7 +1084,14 @@ class Toolkit:
 
             result_data = []
 
-            if is_china:
+            # 回测运行中：使用预加载价格面板截至交易日的切片，不请求数据源
+            from tradingagents.backtest.point_in_time import get_point_in_time_market_data
+            backtest_data = get_point_in_time_market_data(ticker, end_date)
+
+            if backtest_data:
+                result_data.append(f"## 回测时点行情数据\n{backtest_data}")
+
+            elif is_china:
                 # 中国A股：使用中国股票数据源
                 logger.info(f"🇨🇳 [统一市场工具] 处理A股市场数据...")
 
@@ -0,0 +1,136 @@
+"""
+分析师数据预取：在分析师节点之前并发获取各分析师所需的数据
+
+每个分析师的工具选择是固定的（市场→get_stock_market_data_unified，基本面→
+get_stock_fundamentals_unified，新闻→get_stock_news_unified，情绪→
+get_stock_sentiment_unified），参数也只取决于股票代码和交易日期。
+预取节点按与分析师相同的参数并发调用这些工具，结果写入 state["prefetched_data"]；
+分析师检测到可用的预取数据后直接基于数据做一次 LLM 调用，省去
+"LLM 选择工具 → 执行工具 → LLM 生成报告" 中的工具选择轮次。
+预取失败或数据不可用时，分析师回退到原有的工具调用流程。
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from tradingagents.utils.logging_init import get_logger
+
+logger = get_logger("agents")
+
+# 数据短于该长度视为不可用（与新闻分析师预处理模式的判断一致）
+PREFETCH_MIN_LENGTH = 100
+
+
+def get_model_info(llm) -> str:
+    """模型信息（统一新闻工具用于特殊处理）"""
+    try:
+        if hasattr(llm, 'model_name'):
+            return f"{llm.__class__.__name__}:{llm.model_name}"
+        return llm.__class__.__name__
+    except Exception:
+        return "Unknown"
+
+
+def fundamentals_start_date(trade_date: str) -> str:
+    """基本面分析固定取 10 天数据（处理周末/节假日/数据延迟）"""
+    try:
+        return (datetime.strptime(trade_date, "%Y-%m-%d") - timedelta(days=10)).strftime("%Y-%m-%d")
+    except Exception:
+        return (datetime.now() - timedelta(days=10)).strftime("%Y-%m-%d")
+
+
+def _build_fetchers(toolkit, llm, ticker: str, trade_date: str) -> Dict[str, Callable[[], Any]]:
+    """分析师类型 -> 数据获取函数（参数与各分析师的工具调用一致）"""
+
+    def _news():
+        from tradingagents.tools.unified_news_tool import create_unified_news_tool
+        news_tool = create_unified_news_tool(toolkit)
+        return news_tool(stock_code=ticker, max_news=10, model_info=get_model_info(llm))
+
+    return {
+        "market": lambda: toolkit.get_stock_market_data_unified.invoke({
+            "ticker": ticker, "start_date": trade_date, "end_date": trade_date,
+        }),
+        "fundamentals": lambda: toolkit.get_stock_fundamentals_unified.invoke({
+            "ticker": ticker,
+            "start_date": fundamentals_start_date(trade_date),
+            "end_date": trade_date,
+            "curr_date": trade_date,
+        }),
+        "news": _news,
+        "social": lambda: toolkit.get_stock_sentiment_unified.invoke({
+            "ticker": ticker, "curr_date": trade_date,
+        }),
+    }
+
+
+def is_usable(data: Any) -> bool:
+    return isinstance(data, str) and len(data.strip()) > PREFETCH_MIN_LENGTH and not data.lstrip().startswith("❌")
+
+
+def get_prefetched_data(state: Dict[str, Any], analyst_type: str) -> Optional[str]:
+    """分析师读取预取数据；没有或不可用时返回 None（走原有工具调用流程）"""
+    data = (state.get("prefetched_data") or {}).get(analyst_type)
+    return data if is_usable(data) else None
+
+
+def prefetch_analyst_data(toolkit, llm, ticker: str, trade_date: str,
+                          analyst_types: List[str], max_workers: int = 4) -> Dict[str, Any]:
+    """并发获取各分析师的数据，返回 {"prefetched_data": {...}, "prefetch_stats": {...}}"""
+    fetchers = _build_fetchers(toolkit, llm, ticker, trade_date)
+    selected = [a for a in analyst_types if a in fetchers]
+    timings: Dict[str, float] = {}
+
+    def _run(analyst_type: str):
+        start = time.time()
+        try:
+            return analyst_type, fetchers[analyst_type]()
+        except Exception as e:
+            logger.warning(f"⚠️ [数据预取] {analyst_type} 数据获取失败，分析师将回退到工具调用: {e}")
+            return analyst_type, None
+        finally:
+            timings[analyst_type] = time.time() - start
+
+    # 工作线程继承提交线程的上下文（回测时点数据、LLM缓存模式等 contextvar）
+    contexts = {a: contextvars.copy_context() for a in selected}
+    wall_start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(selected) or 1))) as pool:
+        results = dict(pool.map(lambda a: contexts[a].run(_run, a), selected))
+    wall = time.time() - wall_start
+
+    prefetched = {k: v for k, v in results.items() if v is not None}
+    usable = [k for k in selected if is_usable(prefetched.get(k))]
+    sequential = sum(timings.values())
+    stats = {
+        "analysts": selected,
+        "usable": usable,
+        "fetch_wall_seconds": round(wall, 2),
+        "fetch_sequential_seconds": round(sequential, 2),
+        "fetch_seconds_saved": round(max(0.0, sequential - wall), 2),
+        "dataset_seconds": {k: round(v, 2) for k, v in timings.items()},
+        # 每个使用预取数据的分析师省去一次工具选择 LLM 调用
+        "llm_round_trips_saved": len(usable),
+    }
+    logger.info(
+        f"⚡ [数据预取] {ticker} 完成: 可用 {len(usable)}/{len(selected)}，"
+        f"并发耗时 {wall:.2f}秒（串行 {sequential:.2f}秒），预计节省 LLM 调用 {len(usable)} 次"
+    )
+    return {"prefetched_data": prefetched, "prefetch_stats": stats}
+
+
+def create_data_prefetch(toolkit, llm, selected_analysts: List[str], max_workers: int = 4):
+    """创建数据预取节点（图的第一个节点）"""
+
+    def data_prefetch_node(state):
+        return prefetch_analyst_data(
+            toolkit, llm,
+            ticker=state["company_of_interest"],
+            trade_date=state["trade_date"],
+            analyst_types=list(selected_analysts),
+            max_workers=max_workers,
+        )
+
+    return data_prefetch_node
@@ -0,0 +1,80 @@
+"""
+结构化交易决策块
+
+风险经理（Risk Judge）在报告末尾输出一个 JSON 代码块，SignalProcessor 在本地解析并做
+schema 校验，无需再调用 LLM 从全文中提取决策；解析失败时才回退到 LLM 提取。
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+ACTION_MAP = {
+    '买入': '买入', '持有': '持有', '卖出': '卖出',
+    'buy': '买入', 'hold': '持有', 'sell': '卖出',
+    '购买': '买入', '保持': '持有', '出售': '卖出',
+    'purchase': '买入', 'keep': '持有', 'dispose': '卖出',
+}
+
+DECISION_BLOCK_INSTRUCTIONS = """
+**结构化决策（必须）：** 在报告最后单独输出以下 JSON 代码块（只包含这一个 JSON 对象，字段含义如下）：
+```json
+{"action": "买入/持有/卖出", "target_price": 目标价数字（使用该股票的交易货币）, "confidence": 0到1之间的置信度, "risk_score": 0到1之间的风险评分, "reasoning": "一句话决策理由"}
+```"""
+
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+
+
+class StructuredDecision(BaseModel):
+    """决策块 schema"""
+    action: str
+    target_price: float = Field(..., gt=0)
+    confidence: float = Field(0.7, ge=0, le=1)
+    risk_score: float = Field(0.5, ge=0, le=1)
+    reasoning: str = '基于综合分析的投资建议'
+
+    @field_validator('action', mode='before')
+    @classmethod
+    def _normalize_action(cls, value):
+        action = ACTION_MAP.get(str(value).strip().lower()) or ACTION_MAP.get(str(value).strip())
+        if action is None:
+            raise ValueError(f"无效的投资建议: {value}")
+        return action
+
+    @field_validator('target_price', mode='before')
+    @classmethod
+    def _clean_price(cls, value):
+        if isinstance(value, str):
+            cleaned = re.sub(r'[¥￥$元美港币,\s]', '', value)
+            return float(cleaned) if cleaned else None
+        return value
+
+    @field_validator('confidence', 'risk_score', mode='before')
+    @classmethod
+    def _percent_to_ratio(cls, value):
+        # 兼容 "75%" / 75 这类百分数写法
+        if isinstance(value, str):
+            value = float(value.strip().rstrip('%'))
+        if isinstance(value, (int, float)) and 1 < value <= 100:
+            return value / 100
+        return value
+
+
+def parse_decision_block(text: str) -> Optional[Dict[str, Any]]:
+    """从报告中解析最后一个通过校验的决策块，没有则返回 None"""
+    if not text:
+        return None
+    for block in reversed(_JSON_BLOCK_RE.findall(text)):
+        try:
+            data = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(data, dict) or 'action' not in data:
+            continue
+        try:
+            return StructuredDecision(**data).model_dump()
+        except (ValidationError, ValueError, TypeError):
+            continue
+    return None
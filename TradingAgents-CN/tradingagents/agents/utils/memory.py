@@ -6,6 +6,7 @@ from dashscope import TextEmbedding
 import os
 import threading
 import hashlib
+import uuid
 from typing import Dict, Optional
 
 # 导入统一日志系统
@@ -97,6 +98,9 @@ class ChromaDBManager:
 
 
 class FinancialSituationMemory:
+    # 批量embedding每次请求的最大文本数（DashScope text-embedding 单次最多10条）
+    EMBEDDING_BATCH_SIZE = 10
+
     def __init__(self, name, config):
         self.config = config
         self.llm_provider = config.get("llm_provider", "openai").lower()
@@ -348,6 +352,15 @@ class FinancialSituationMemory:
         logger.warning(f"⚠️ 强制截断：保留首尾关键信息，{len(text)}字符截断为{len(truncated)}字符")
         return truncated, True
 
+    def _uses_dashscope_embedding(self) -> bool:
+        """是否使用阿里百炼的嵌入模型（其余提供商使用OpenAI兼容接口）"""
+        return (self.llm_provider == "dashscope" or
+                self.llm_provider == "alibaba" or
+                self.llm_provider == "qianfan" or
+                (self.llm_provider == "google" and self.client is None) or
+                (self.llm_provider == "deepseek" and self.client is None) or
+                (self.llm_provider == "openrouter" and self.client is None))
+
     def get_embedding(self, text):
         """Get embedding for a text using the configured provider"""
 
@@ -396,12 +409,7 @@ class FinancialSituationMemory:
             'strategy': 'no_truncation_with_fallback'  # 标记策略
         }
 
-        if (self.llm_provider == "dashscope" or
-            self.llm_provider == "alibaba" or
-            self.llm_provider == "qianfan" or
-            (self.llm_provider == "google" and self.client is None) or
-            (self.llm_provider == "deepseek" and self.client is None) or
-            (self.llm_provider == "openrouter" and self.client is None)):
+        if self._uses_dashscope_embedding():
             # 使用阿里百炼的嵌入模型
             try:
                 # 导入DashScope模块
@@ -542,6 +550,43 @@ class FinancialSituationMemory:
                 logger.warning(f"⚠️ 记忆功能降级，返回空向量")
                 return [0.0] * 1024
 
+    def get_embeddings(self, texts):
+        """批量获取embedding：每批文本一次请求，批量请求失败时逐条降级到 get_embedding"""
+        texts = list(texts)
+        if len(texts) <= 1 or self.client == "DISABLED":
+            return [self.get_embedding(text) for text in texts]
+
+        # 空文本、超长文本等特殊情况沿用逐条处理逻辑（零向量/降级）
+        if any(
+            not text or not isinstance(text, str)
+            or (self.enable_embedding_length_check and len(text) > self.max_embedding_length)
+            for text in texts
+        ):
+            return [self.get_embedding(text) for text in texts]
+
+        try:
+            embeddings = []
+            for start in range(0, len(texts), self.EMBEDDING_BATCH_SIZE):
+                chunk = texts[start:start + self.EMBEDDING_BATCH_SIZE]
+                if self._uses_dashscope_embedding():
+                    if not getattr(dashscope, 'api_key', None):
+                        return [self.get_embedding(text) for text in texts]
+                    response = TextEmbedding.call(model=self.embedding, input=chunk)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{response.code} - {response.message}")
+                    items = sorted(response.output['embeddings'], key=lambda item: item.get('text_index', 0))
+                    embeddings.extend(item['embedding'] for item in items)
+                else:
+                    if self.client is None:
+                        return [self.get_embedding(text) for text in texts]
+                    response = self.client.embeddings.create(model=self.embedding, input=chunk)
+                    embeddings.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+            logger.debug(f"✅ {self.llm_provider} 批量embedding成功: {len(texts)}条")
+            return embeddings
+        except Exception as e:
+            logger.warning(f"⚠️ {self.llm_provider} 批量embedding失败，逐条降级: {str(e)}")
+            return [self.get_embedding(text) for text in texts]
+
     def get_embedding_config_status(self):
         """获取向量缓存配置状态"""
         return {
@@ -556,21 +601,25 @@ class FinancialSituationMemory:
         """获取最后处理的文本信息"""
         return getattr(self, '_last_text_info', None)
 
-    def add_situations(self, situations_and_advice):
-        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
+    def add_situations(self, situations_and_advice, embeddings=None):
+        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)
+
+        embeddings: 可选，预先计算好的 situation 向量（与 situations_and_advice 一一对应）；
+        不提供时一次批量请求计算全部向量。
+        """
 
         situations = []
         advice = []
         ids = []
-        embeddings = []
 
-        offset = self.situation_collection.count()
-
-        for i, (situation, recommendation) in enumerate(situations_and_advice):
+        # 不用 count() 推算序号：并发写入同一集合时序号会重复
+        for situation, recommendation in situations_and_advice:
             situations.append(situation)
             advice.append(recommendation)
-            ids.append(str(offset + i))
-            embeddings.append(self.get_embedding(situation))
+            ids.append(uuid.uuid4().hex)
+
+        if embeddings is None:
+            embeddings = self.get_embeddings(situations)
 
         self.situation_collection.add(
             documents=situations,
@@ -0,0 +1,16 @@
+"""
+多日回测：预加载价格面板、时点数据切片、并发执行与断点续跑
+"""
+
+from .point_in_time import get_point_in_time_market_data, point_in_time
+from .price_panel import PricePanel, load_price_panel
+from .runner import BacktestRunner, summarize
+
+__all__ = [
+    "BacktestRunner",
+    "PricePanel",
+    "get_point_in_time_market_data",
+    "load_price_panel",
+    "point_in_time",
+    "summarize",
+]
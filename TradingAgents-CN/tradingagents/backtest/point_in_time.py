@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+回测时点数据：回测运行期间，统一市场数据工具从预加载的价格面板取截至交易日的切片，
+不再逐日请求数据源，也不会读到交易日之后的数据。
+
+切片截止日期取工具参数 end_date 与当前回测交易日中较早的一个（LLM 传入更晚的日期也不会泄露未来数据）。
+"""
+
+import contextlib
+import contextvars
+from typing import Dict, Optional
+
+import pandas as pd
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+# (代码 -> PricePanel, 回测交易日)
+_backtest_context: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("backtest_context", default=None)
+
+
+@contextlib.contextmanager
+def point_in_time(panels: Dict[str, "PricePanel"], as_of: str):
+    """在当前上下文中启用回测时点数据"""
+    token = _backtest_context.set((panels, as_of))
+    try:
+        yield
+    finally:
+        _backtest_context.reset(token)
+
+
+def lookback_days() -> int:
+    """市场分析回溯天数（与实时分析的取数范围一致）"""
+    try:
+        from app.core.config import get_settings
+        return get_settings().MARKET_ANALYST_LOOKBACK_DAYS
+    except Exception:
+        return 30
+
+
+def get_point_in_time_market_data(ticker: str, end_date: Optional[str] = None) -> Optional[str]:
+    """回测中返回截至交易日的格式化行情与技术指标；不在回测中或没有该股票的面板时返回 None"""
+    context = _backtest_context.get()
+    if context is None:
+        return None
+    panels, as_of = context
+    panel = panels.get(ticker) or panels.get(str(ticker).upper())
+    if panel is None or panel.empty:
+        return None
+
+    cutoff = as_of
+    if end_date:
+        try:
+            # 按日期比较（LLM 传入的日期格式不一定是 YYYY-MM-DD，字符串比较不可靠）
+            if pd.Timestamp(end_date).normalize() < pd.Timestamp(as_of).normalize():
+                cutoff = pd.Timestamp(end_date).strftime("%Y-%m-%d")
+        except (ValueError, TypeError):
+            logger.warning(f"⚠️ [回测] 无法解析 end_date={end_date!r}，按交易日 {as_of} 截止")
+    data = panel.slice(cutoff, lookback_days=lookback_days())
+    if data.empty:
+        return None
+
+    from tradingagents.dataflows.data_source_manager import get_data_source_manager
+    start = data['date'].iloc[0].strftime("%Y-%m-%d")
+    end = data['date'].iloc[-1].strftime("%Y-%m-%d")
+    logger.info(f"⏪ [回测] {ticker} 使用时点数据: {start} ~ {end}（交易日 {as_of}）")
+    return get_data_source_manager()._format_stock_data_response(data, ticker, ticker, start, end)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+回测价格面板：每只股票一次性加载整个回测区间（含指标预热期和收益评估期）的日线数据，
+按交易日提供截至当日的时点切片（不含未来数据）。
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pandas as pd
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+
+def _to_timestamp(date) -> pd.Timestamp:
+    return pd.Timestamp(datetime.strptime(date, "%Y-%m-%d") if isinstance(date, str) else date).normalize()
+
+
+class PricePanel:
+    """单只股票的日线面板（列：date, open, high, low, close, vol, ...，按日期升序）"""
+
+    def __init__(self, ticker: str, data: pd.DataFrame):
+        self.ticker = ticker
+        data = data.copy()
+        data['date'] = pd.to_datetime(data['date']).dt.normalize()
+        self.data = data.sort_values('date').drop_duplicates('date', keep='last').reset_index(drop=True)
+
+    @property
+    def empty(self) -> bool:
+        return self.data.empty
+
+    def trading_dates(self, start_date: str, end_date: str) -> List[str]:
+        """区间内的交易日（以面板中实际存在的日期为准）"""
+        mask = (self.data['date'] >= _to_timestamp(start_date)) & (self.data['date'] <= _to_timestamp(end_date))
+        return [d.strftime("%Y-%m-%d") for d in self.data.loc[mask, 'date']]
+
+    def slice(self, as_of: str, lookback_days: Optional[int] = None) -> pd.DataFrame:
+        """截至 as_of（含）的数据；lookback_days 为回溯的自然日数"""
+        end = _to_timestamp(as_of)
+        mask = self.data['date'] <= end
+        if lookback_days is not None:
+            mask &= self.data['date'] >= end - pd.Timedelta(days=lookback_days)
+        return self.data.loc[mask].copy()
+
+    def close_on_or_before(self, date: str) -> Optional[float]:
+        rows = self.data.loc[self.data['date'] <= _to_timestamp(date), 'close']
+        return float(rows.iloc[-1]) if not rows.empty else None
+
+    def _forward_positions(self, date: str, horizon: int) -> Optional[tuple]:
+        positions = self.data.index[self.data['date'] <= _to_timestamp(date)]
+        if len(positions) == 0:
+            return None
+        start = positions[-1]
+        end = start + horizon
+        if end >= len(self.data):
+            return None
+        return start, end
+
+    def forward_date(self, date: str, horizon: int = 1) -> Optional[str]:
+        """date 之后第 horizon 个交易日（实际收益在该日收盘后才确定）"""
+        positions = self._forward_positions(date, horizon)
+        if positions is None:
+            return None
+        return self.data.loc[positions[1], 'date'].strftime("%Y-%m-%d")
+
+    def forward_return(self, date: str, horizon: int = 1) -> Optional[float]:
+        """从 date 收盘到之后第 horizon 个交易日收盘的实际收益率（仅用于回测评估）"""
+        positions = self._forward_positions(date, horizon)
+        if positions is None:
+            return None
+        start, end = positions
+        start_close = float(self.data.loc[start, 'close'])
+        if start_close == 0:
+            return None
+        return float(self.data.loc[end, 'close']) / start_close - 1
+
+
+def _yfinance_symbol(ticker: str, market_info: dict) -> str:
+    if market_info['is_hk']:
+        code = ticker.upper().replace('.HK', '')
+        return f"{int(code):04d}.HK" if code.isdigit() else f"{code}.HK"
+    return ticker.upper()
+
+
+def load_price_panel(ticker: str, start_date: str, end_date: str,
+                     warmup_days: Optional[int] = None, forward_days: int = 30) -> PricePanel:
+    """加载 [start_date - warmup_days, end_date + forward_days] 的日线数据
+
+    warmup_days 保证回测首日也有足够的历史数据计算指标（默认取市场分析回溯天数）；
+    forward_days 用于评估决策的实际收益。
+    """
+    from tradingagents.utils.stock_utils import StockUtils
+    from tradingagents.dataflows.data_source_manager import get_data_source_manager
+    from .point_in_time import lookback_days
+
+    if warmup_days is None:
+        warmup_days = lookback_days()
+
+    load_start = (_to_timestamp(start_date) - timedelta(days=warmup_days)).strftime("%Y-%m-%d")
+    load_end = min(_to_timestamp(end_date) + timedelta(days=forward_days), pd.Timestamp.now().normalize()).strftime("%Y-%m-%d")
+    market_info = StockUtils.get_market_info(ticker)
+    manager = get_data_source_manager()
+
+    if market_info['is_china']:
+        data = manager.get_stock_dataframe(ticker, load_start, load_end)
+    else:
+        import yfinance as yf
+        raw = yf.Ticker(_yfinance_symbol(ticker, market_info)).history(
+            start=load_start, end=(_to_timestamp(load_end) + timedelta(days=1)).strftime("%Y-%m-%d"), auto_adjust=False
+        )
+        raw = raw.reset_index().rename(columns={'Date': 'date'})
+        if not raw.empty:
+            raw['date'] = pd.to_datetime(raw['date']).dt.tz_localize(None)
+        data = manager._standardize_dataframe(raw)
+
+    if data is None or data.empty:
+        logger.warning(f"⚠️ [回测] {ticker} 价格面板为空: {load_start} ~ {load_end}")
+        return PricePanel(ticker, pd.DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'vol']))
+
+    if 'date' not in data.columns:
+        data = data.reset_index().rename(columns={data.index.name or 'index': 'date'})
+    logger.info(f"📈 [回测] {ticker} 价格面板加载完成: {len(data)}条 ({load_start} ~ {load_end})")
+    return PricePanel(ticker, data)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+多日回测：对 (股票列表, 日期区间) 逐交易日调用 TradingAgentsGraph.propagate
+
+- 每只股票只加载一次价格面板，分析时行情工具读取截至交易日的切片（不含未来数据）
+- 交易日按 max_concurrency 并发执行（受数据源/LLM 的调用预算约束），每个工作线程持有自己的图实例
+- 每个 (股票, 日期) 完成后追加写入 JSONL 检查点，中断后重跑会跳过已完成的条目
+- 决策与实际收益对比，并通过 reflect_and_remember 把带方向的收益反馈给记忆：
+  交易日 D 的收益在 D 之后第 horizon_days 个交易日收盘才确定，因此只有截至该日的所有条目都分析完后
+  才反思 D，反思按日期顺序在主线程串行执行（记忆集合是进程内共享的，写入不能并发）。
+  从检查点恢复的条目没有分析状态，不再反思
+
+用法：
+    runner = BacktestRunner(
+        graph_factory=lambda: TradingAgentsGraph(["market", "fundamentals"], config=config),
+        tickers=["600519", "AAPL"], start_date="2024-05-01", end_date="2024-05-31",
+        max_concurrency=2, checkpoint_path="results/backtest/run1.jsonl",
+    )
+    report = runner.run()
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tradingagents.utils.logging_manager import get_logger
+
+from .point_in_time import point_in_time
+from .price_panel import PricePanel, load_price_panel
+
+logger = get_logger('agents')
+
+# 决策动作对应的持仓方向
+ACTION_DIRECTIONS = {"买入": 1, "持有": 0, "卖出": -1}
+
+
+class BacktestRunner:
+    def __init__(
+        self,
+        graph_factory: Callable[[], Any],
+        tickers: List[str],
+        start_date: str,
+        end_date: str,
+        max_concurrency: int = 2,
+        checkpoint_path: Optional[str] = None,
+        horizon_days: int = 1,
+        reflect: bool = True,
+        panel_loader: Callable[..., PricePanel] = load_price_panel,
+    ):
+        self.graph_factory = graph_factory
+        self.tickers = list(tickers)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.max_concurrency = max(1, max_concurrency)
+        self.checkpoint_path = checkpoint_path
+        self.horizon_days = horizon_days
+        self.reflect = reflect
+        self.panel_loader = panel_loader
+
+        self.panels: Dict[str, PricePanel] = {}
+        self._local = threading.local()
+        self._checkpoint_lock = threading.Lock()
+        self._reflect_graph = None
+
+    # ------------------------------------------------------------------ 数据准备
+
+    def load_panels(self) -> Dict[str, PricePanel]:
+        for ticker in self.tickers:
+            if ticker not in self.panels:
+                self.panels[ticker] = self.panel_loader(
+                    ticker, self.start_date, self.end_date, forward_days=max(30, self.horizon_days * 3)
+                )
+        return self.panels
+
+    def build_tasks(self) -> List[Tuple[str, str]]:
+        """(股票, 交易日) 列表，交易日取自价格面板"""
+        tasks = []
+        for ticker in self.tickers:
+            dates = self.panels[ticker].trading_dates(self.start_date, self.end_date)
+            if not dates:
+                logger.warning(f"⚠️ [回测] {ticker} 在 {self.start_date} ~ {self.end_date} 内没有交易日数据，跳过")
+            tasks.extend((ticker, date) for date in dates)
+        return tasks
+
+    # ------------------------------------------------------------------ 检查点
+
+    def load_checkpoint(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        completed = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return completed
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if content and not content.endswith("\n"):
+            # 补上换行，避免后续追加的记录接在残行后面
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        for line in content.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能留下写了一半的最后一行
+                logger.warning("⚠️ [回测] 检查点中存在无法解析的行，已忽略")
+                continue
+            completed[(record["ticker"], record["date"])] = record
+        return completed
+
+    def _append_checkpoint(self, record: Dict[str, Any]) -> None:
+        if not self.checkpoint_path:
+            return
+        with self._checkpoint_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    # ------------------------------------------------------------------ 执行
+
+    def _graph(self):
+        """每个工作线程复用自己的图实例（图实例保存 curr_state，不能跨线程共享）"""
+        graph = getattr(self._local, "graph", None)
+        if graph is None:
+            graph = self.graph_factory()
+            self._local.graph = graph
+        return graph
+
+    def _run_one(self, ticker: str, date: str) -> Tuple[Dict[str, Any], Any]:
+        """分析一个 (股票, 交易日)，返回 (检查点记录, 分析状态)；反思由 run 在收益确定后统一执行"""
+        graph = self._graph()
+        start = time.time()
+        with point_in_time(self.panels, date):
+            final_state, decision = graph.propagate(ticker, date)
+
+        action = decision.get("action")
+        realized_return = self.panels[ticker].forward_return(date, self.horizon_days)
+        direction = ACTION_DIRECTIONS.get(action, 0)
+        position_return = direction * realized_return if realized_return is not None else None
+
+        record = {
+            "ticker": ticker,
+            "date": date,
+            "action": action,
+            "target_price": decision.get("target_price"),
+            "confidence": decision.get("confidence"),
+            "close": self.panels[ticker].close_on_or_before(date),
+            "realized_return": realized_return,
+            "position_return": position_return,
+            "elapsed": round(time.time() - start, 2),
+        }
+        return record, final_state
+
+    # ------------------------------------------------------------------ 反思
+
+    def _reflect_one(self, ticker: str, date: str, state: Any, position_return: float) -> None:
+        """用主线程专用的图实例，按当时的分析状态反思（只在主线程调用，记忆写入天然串行）"""
+        if self._reflect_graph is None:
+            self._reflect_graph = self.graph_factory()
+        graph = self._reflect_graph
+        graph.curr_state = state
+        try:
+            graph.reflect_and_remember(position_return, background=False)
+        except Exception as e:
+            logger.error(f"❌ [回测] {ticker} {date} 反思失败: {e}")
+
+    def _reflect_ready(self, waiting: List[Dict[str, Any]], open_by_date: Counter) -> List[Dict[str, Any]]:
+        """按日期顺序反思收益已确定、且不会泄露给未完成分析的条目，返回仍需等待的条目
+
+        条目在 realized_on（收益确定的交易日）之前以及当天的分析都完成后才可反思；
+        遇到第一个不可反思的条目即停止，保证反思严格按日期顺序写入记忆。
+        """
+        open_dates = [date for date, count in open_by_date.items() if count > 0]
+        first_open = min(open_dates) if open_dates else None
+        waiting = sorted(waiting, key=lambda item: (item["date"], item["ticker"]))
+        done = 0
+        for item in waiting:
+            if first_open is not None and (item["realized_on"] is None or item["realized_on"] >= first_open):
+                break
+            self._reflect_one(item["ticker"], item["date"], item["state"], item["position_return"])
+            done += 1
+        return waiting[done:]
+
+    def run(self) -> Dict[str, Any]:
+        self.load_panels()
+        tasks = self.build_tasks()
+        completed = self.load_checkpoint()
+        pending = [task for task in tasks if task not in completed]
+        logger.info(
+            f"🔁 [回测] 共 {len(tasks)} 个(股票,交易日)，已完成 {len(tasks) - len(pending)}，"
+            f"待执行 {len(pending)}，并发 {self.max_concurrency}"
+        )
+
+        # 按日期先后提交，线程池按提交顺序取任务，较早的交易日先完成、先反思
+        pending.sort(key=lambda task: (task[1], task[0]))
+        open_by_date = Counter(date for _, date in pending)
+        waiting: List[Dict[str, Any]] = []
+
+        results = {task: completed[task] for task in tasks if task in completed}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="backtest") as pool:
+            futures = {pool.submit(self._run_one, ticker, date): (ticker, date) for ticker, date in pending}
+            for future in as_completed(futures):
+                ticker, date = futures[future]
+                open_by_date[date] -= 1
+                try:
+                    record, state = future.result()
+                except Exception as e:
+                    # 失败的条目不写检查点，下次运行会重试
+                    logger.error(f"❌ [回测] {ticker} {date} 分析失败: {e}")
+                else:
+                    self._append_checkpoint(record)
+                    results[(ticker, date)] = record
+                    logger.info(
+                        f"✅ [回测] {ticker} {date}: {record['action']}，"
+                        f"实际收益 {record['realized_return'] if record['realized_return'] is not None else 'N/A'}"
+                    )
+                    if self.reflect and record["position_return"] is not None:
+                        waiting.append({
+                            "ticker": ticker,
+                            "date": date,
+                            "realized_on": self.panels[ticker].forward_date(date, self.horizon_days),
+                            "state": state,
+                            "position_return": record["position_return"],
+                        })
+                waiting = self._reflect_ready(waiting, open_by_date)
+
+        records = [results[task] for task in tasks if task in results]
+        return summarize(records, failed=len(tasks) - len(records))
+
+
+def summarize(records: List[Dict[str, Any]], failed: int = 0) -> Dict[str, Any]:
+    """决策与实际收益的汇总：方向命中率、策略累计收益、各动作的平均实际收益
+
+    累计收益在每只股票内按日期复利（by_ticker），整体累计收益为各股票累计收益的等权平均
+    （资金等分给各股票），不把不同股票的收益当作先后进行的交易连乘。
+    """
+    evaluated = [r for r in records if r.get("realized_return") is not None]
+    directional = [r for r in evaluated if ACTION_DIRECTIONS.get(r.get("action"), 0) != 0]
+    hits = [r for r in directional if r["position_return"] > 0]
+
+    by_ticker: Dict[str, Dict[str, Any]] = {}
+    for record in sorted(evaluated, key=lambda r: r["date"]):
+        stats = by_ticker.setdefault(record["ticker"], {"count": 0, "cumulative_return": 1.0})
+        stats["count"] += 1
+        stats["cumulative_return"] *= 1 + (record.get("position_return") or 0.0)
+    for stats in by_ticker.values():
+        stats["cumulative_return"] -= 1
+    cumulative = (
+        sum(stats["cumulative_return"] for stats in by_ticker.values()) / len(by_ticker) if by_ticker else 0.0
+    )
+
+    by_action: Dict[str, Dict[str, Any]] = {}
+    for record in evaluated:
+        stats = by_action.setdefault(record.get("action") or "未知", {"count": 0, "avg_realized_return": 0.0})
+        stats["count"] += 1
+        stats["avg_realized_return"] += record["realized_return"]
+    for stats in by_action.values():
+        stats["avg_realized_return"] /= stats["count"]
+
+    return {
+        "total": len(records),
+        "failed": failed,
+        "evaluated": len(evaluated),
+        "hit_rate": len(hits) / len(directional) if directional else None,
+        "cumulative_return": cumulative,
+        "by_ticker": by_ticker,
+        "by_action": by_action,
+        "records": records,
+    }
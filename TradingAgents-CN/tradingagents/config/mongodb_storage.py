@@ -10,6 +10,7 @@ from zoneinfo import ZoneInfo
 from typing import Dict, List, Optional, Any
 from dataclasses import asdict
 from .usage_models import UsageRecord
+from .usage_rollups import ROLLUP_COLLECTION, build_rollup_updates, rollup_index_specs
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -103,6 +104,10 @@ class MongoDBStorage:
             
             # 创建分析类型索引
             self.collection.create_index("analysis_type")
+
+            # 预聚合集合索引
+            for spec in rollup_index_specs():
+                self.db[ROLLUP_COLLECTION].create_index(spec["keys"], **spec["kwargs"])
             
         except Exception as e:
             logger.error(f"创建MongoDB索引失败: {e}")
@@ -132,6 +137,7 @@ class MongoDBStorage:
             result = self.collection.insert_one(record_dict)
 
             if result.inserted_id:
+                self._update_rollups(record_dict)
                 logger.info(f"✅ [MongoDB存储] 记录已保存: ID={result.inserted_id}, {record.provider}/{record.model_name}, ¥{record.cost:.4f}")
                 return True
             else:
@@ -144,6 +150,15 @@ class MongoDBStorage:
             logger.error(f"   堆栈: {traceback.format_exc()}")
             return False
     
+    def _update_rollups(self, record_dict: Dict[str, Any]) -> None:
+        """增量更新小时/天预聚合（失败不影响原始记录，夜间对账任务会修正）"""
+        try:
+            ops = build_rollup_updates(record_dict)
+            if ops:
+                self.db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.warning(f"⚠️ [MongoDB存储] 更新使用量预聚合失败: {e}")
+
     def load_usage_records(self, limit: int = 10000, days: int = None) -> List[UsageRecord]:
         """从MongoDB加载使用记录"""
         if not self._connected:
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Token 使用量预聚合（小时/天）
+- 每写入一条 token_usage 记录，同时对 token_usage_rollups 中对应的小时桶和天桶做 $inc upsert
+- 桶键直接取 ISO 时间戳字符串前缀：小时 "YYYY-MM-DDTHH"，天 "YYYY-MM-DD"（与原 by_date 的 timestamp[:10] 一致）
+- 同步（pymongo）与异步（motor）写入方共用本模块构造的更新操作
+"""
+
+from typing import Any, Dict, List
+
+ROLLUP_COLLECTION = "token_usage_rollups"
+GRANULARITY_HOUR = "hour"
+GRANULARITY_DAY = "day"
+
+# 回填状态标记：由它而不是预聚合集合是否为空来判断是否已回填（批量写入器的 $inc 可能先于回填落库）
+ROLLUP_STATE_COLLECTION = "token_usage_rollup_state"
+BACKFILL_STATE_ID = "backfill"
+BACKFILL_DONE = "done"
+BACKFILL_RUNNING = "running"
+# 认领后超过该时长仍未完成（进程中途退出），允许其他进程重新认领
+BACKFILL_CLAIM_TTL_SECONDS = 3600
+
+# 维度字段（与 bucket/granularity 一起构成唯一键）
+ROLLUP_DIMENSIONS = ("provider", "model_name", "currency")
+ROLLUP_METRICS = ("requests", "input_tokens", "output_tokens", "cost")
+
+
+def hour_bucket(timestamp: str) -> str:
+    return str(timestamp)[:13]
+
+
+def day_bucket(timestamp: str) -> str:
+    return str(timestamp)[:10]
+
+
+def rollup_key(granularity: str, bucket: str, provider: str, model_name: str, currency: str) -> Dict[str, Any]:
+    return {
+        "granularity": granularity,
+        "bucket": bucket,
+        "provider": provider,
+        "model_name": model_name,
+        "currency": currency,
+    }
+
+
+def build_rollup_updates(record: Dict[str, Any]) -> List[Any]:
+    """单条使用记录 -> 小时桶/天桶的 $inc upsert 操作（pymongo UpdateOne，可用于 motor bulk_write）"""
+    from pymongo import UpdateOne
+
+    timestamp = str(record.get("timestamp") or "")
+    if len(timestamp) < 13:
+        return []
+
+    provider = record.get("provider") or "unknown"
+    model_name = record.get("model_name") or "unknown"
+    currency = record.get("currency") or "CNY"
+    inc = {
+        "requests": 1,
+        "input_tokens": int(record.get("input_tokens") or 0),
+        "output_tokens": int(record.get("output_tokens") or 0),
+        "cost": float(record.get("cost") or 0.0),
+    }
+
+    return [
+        UpdateOne(rollup_key(GRANULARITY_HOUR, hour_bucket(timestamp), provider, model_name, currency),
+                  {"$inc": inc}, upsert=True),
+        UpdateOne(rollup_key(GRANULARITY_DAY, day_bucket(timestamp), provider, model_name, currency),
+                  {"$inc": inc}, upsert=True),
+    ]
+
+
+def rollup_index_specs() -> List[Dict[str, Any]]:
+    """索引定义：唯一键 + 按桶范围查询"""
+    return [
+        {
+            "keys": [("granularity", 1), ("bucket", 1), ("provider", 1), ("model_name", 1), ("currency", 1)],
+            "kwargs": {"unique": True, "name": "rollup_key_unique"},
+        },
+    ]
+
+
+def hourly_backfill_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """从原始 token_usage 记录聚合出小时桶（回填用）"""
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "bucket": {"$substrCP": ["$timestamp", 0, 13]},
+                    "provider": {"$ifNull": ["$provider", "unknown"]},
+                    "model_name": {"$ifNull": ["$model_name", "unknown"]},
+                    "currency": {"$ifNull": ["$currency", "CNY"]},
+                },
+                "requests": {"$sum": 1},
+                "input_tokens": {"$sum": {"$ifNull": ["$input_tokens", 0]}},
+                "output_tokens": {"$sum": {"$ifNull": ["$output_tokens", 0]}},
+                "cost": {"$sum": {"$ifNull": ["$cost", 0]}},
+            }
+        },
+    ]
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+批量分析共享上下文：同一批次内的市场级数据（全球/宏观新闻、Reddit 全球新闻、最新交易日等）
+只获取一次，批次内各股票的分析复用同一份结果
+
+- 批次上下文按 batch_id 注册在进程内；分析线程通过 batch_scope(batch_id) 进入批次
+- 被 @batch_shared 装饰的函数在批次内按 namespace + 参数记忆结果，并发的首次调用只由一个线程真正请求
+- 不在批次中时直接调用原函数，单股分析行为不变
+- 批次结束时 release_batch_context() 返回报告：共享命中次数、节省的调用与耗时，以及按逐股独立执行估算的耗时
+
+用法：
+    with batch_scope(batch_id):
+        trading_graph.propagate(symbol, analysis_date)
+"""
+
+import contextlib
+import contextvars
+import copy
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from tradingagents.dataflows.single_flight import make_key
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+# 批次上下文闲置超过该时间后回收（队列 worker 无法得知批次何时结束）
+BATCH_CONTEXT_IDLE_SECONDS = float(os.getenv("BATCH_CONTEXT_IDLE_SECONDS", "7200"))
+
+_current_batch: contextvars.ContextVar[Optional["BatchContext"]] = contextvars.ContextVar("batch_context", default=None)
+
+
+class _Entry:
+    __slots__ = ("event", "result", "error", "elapsed")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.elapsed = 0.0
+
+
+class BatchContext:
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self.stats = {
+            "fetches": 0, "shared_hits": 0, "fetch_seconds": 0.0, "seconds_saved": 0.0,
+            "tickers": 0, "ticker_seconds": 0.0,
+        }
+        self.namespaces: Dict[str, Dict[str, int]] = {}
+
+    def _bump(self, namespace: str, name: str, **deltas) -> None:
+        with self._lock:
+            for stat, delta in deltas.items():
+                self.stats[stat] += delta
+            counts = self.namespaces.setdefault(namespace, {"fetches": 0, "shared_hits": 0})
+            counts[name] += 1
+
+    def shared(self, namespace: str, key: str, fn: Callable[[], Any]) -> Any:
+        """批次内记忆：首次调用执行 fn，之后（包括并发等待者）直接返回同一结果；失败不缓存"""
+        self.last_used = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            leader = entry is None
+            if leader:
+                entry = _Entry()
+                self._entries[key] = entry
+
+        if not leader:
+            entry.event.wait()
+            if entry.error is not None:
+                raise entry.error
+            self._bump(namespace, "shared_hits", shared_hits=1, seconds_saved=entry.elapsed)
+            return entry.result if isinstance(entry.result, (str, bytes)) else copy.deepcopy(entry.result)
+
+        start = time.time()
+        try:
+            entry.result = fn()
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        finally:
+            entry.elapsed = time.time() - start
+            entry.event.set()
+        self._bump(namespace, "fetches", fetches=1, fetch_seconds=entry.elapsed)
+        return entry.result
+
+    def record_ticker(self, elapsed: float) -> None:
+        with self._lock:
+            self.stats["tickers"] += 1
+            self.stats["ticker_seconds"] += elapsed
+        self.last_used = time.time()
+
+    def report(self) -> Dict[str, Any]:
+        """批次报告：与逐股独立执行（每只股票各自获取市场级数据）对比"""
+        stats = dict(self.stats)
+        return {
+            "batch_id": self.batch_id,
+            "tickers": stats["tickers"],
+            "wall_seconds": round(time.time() - self.created_at, 2),
+            "shared_fetches": stats["fetches"],
+            "shared_hits": stats["shared_hits"],
+            "calls_saved": stats["shared_hits"],
+            "calls_independent_mode": stats["fetches"] + stats["shared_hits"],
+            "seconds_saved": round(stats["seconds_saved"], 2),
+            "ticker_seconds": round(stats["ticker_seconds"], 2),
+            "ticker_seconds_independent_mode": round(stats["ticker_seconds"] + stats["seconds_saved"], 2),
+            "by_namespace": {k: dict(v) for k, v in self.namespaces.items()},
+        }
+
+
+_registry_lock = threading.Lock()
+_batches: Dict[str, BatchContext] = {}
+
+
+def _evict_idle() -> None:
+    now = time.time()
+    for batch_id, context in list(_batches.items()):
+        if now - context.last_used > BATCH_CONTEXT_IDLE_SECONDS:
+            _batches.pop(batch_id, None)
+            logger.info(f"🧹 [批量共享] 回收闲置批次上下文: {batch_id}")
+
+
+def get_batch_context(batch_id: str) -> BatchContext:
+    with _registry_lock:
+        _evict_idle()
+        context = _batches.get(batch_id)
+        if context is None:
+            context = BatchContext(batch_id)
+            _batches[batch_id] = context
+            logger.info(f"📦 [批量共享] 创建批次上下文: {batch_id}")
+        return context
+
+
+def release_batch_context(batch_id: str) -> Optional[Dict[str, Any]]:
+    """结束批次，返回批次报告（批次不存在时返回 None）"""
+    with _registry_lock:
+        context = _batches.pop(batch_id, None)
+    if context is None:
+        return None
+    report = context.report()
+    logger.info(
+        f"📦 [批量共享] 批次 {batch_id} 完成: {report['tickers']}只股票，"
+        f"市场级数据获取 {report['shared_fetches']} 次（逐股模式需 {report['calls_independent_mode']} 次），"
+        f"节省 {report['seconds_saved']}s，分析耗时合计 {report['ticker_seconds']}s"
+        f"（逐股模式估算 {report['ticker_seconds_independent_mode']}s）"
+    )
+    return report
+
+
+def current_batch_context() -> Optional[BatchContext]:
+    return _current_batch.get()
+
+
+@contextlib.contextmanager
+def batch_scope(batch_id: Optional[str]):
+    """在当前线程上下文中进入批次；batch_id 为空时不做任何事"""
+    if not batch_id:
+        yield None
+        return
+    context = get_batch_context(batch_id)
+    token = _current_batch.set(context)
+    start = time.time()
+    try:
+        yield context
+    finally:
+        _current_batch.reset(token)
+        context.record_ticker(time.time() - start)
+
+
+def batch_shared(namespace: str):
+    """函数装饰器：批次内按 namespace + 绑定后的参数共享结果；不在批次中时直接调用"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            context = _current_batch.get()
+            if context is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k != "self"}
+            key = make_key(f"batch:{namespace}", params)
+            return context.shared(namespace, key, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
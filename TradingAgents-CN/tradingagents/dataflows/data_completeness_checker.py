@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Tuple, List
 import pandas as pd
 
+from tradingagents.dataflows.batch_context import batch_shared
+
 logger = logging.getLogger(__name__)
 
 
@@ -186,6 +188,7 @@ class DataCompletenessChecker:
             self.logger.error(f"❌ 解析数据失败: {e}")
             return None
     
+    @batch_shared("latest_trade_date")
     def _get_latest_trade_date(self, market: str = "CN") -> Optional[str]:
         """获取最新交易日"""
         try:
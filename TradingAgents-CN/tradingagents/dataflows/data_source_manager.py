@@ -24,6 +24,13 @@ logger = setup_dataflow_logging()
 # 导入统一数据源编码
 from tradingagents.constants import DataSourceCode
 
+# 跨进程并发请求合并
+from tradingagents.dataflows.single_flight import single_flight
+
+
+def _current_source_key(manager) -> Dict[str, Any]:
+    return {"source": manager.current_source.value}
+
 
 class ChinaDataSource(Enum):
     """
@@ -246,6 +253,7 @@ class DataSourceManager:
             # 恢复原始数据源
             self.current_source = original_source
 
+    @single_flight("fundamentals", extra_key=_current_source_key)
     def get_fundamentals_data(self, symbol: str) -> str:
         """
         获取基本面数据，支持多数据源和自动降级
@@ -326,6 +334,7 @@ class DataSourceManager:
         # 重定向到统一接口
         return self._get_tushare_fundamentals(symbol)
 
+    @single_flight("news", extra_key=_current_source_key)
     def get_news_data(self, symbol: str = None, hours_back: int = 24, limit: int = 20) -> List[Dict[str, Any]]:
         """
         获取新闻数据的统一接口，支持多数据源和自动降级
@@ -1028,6 +1037,7 @@ class DataSourceManager:
 
         return out
 
+    @single_flight("stock_data", extra_key=_current_source_key)
     def get_stock_data(self, symbol: str, start_date: str = None, end_date: str = None, period: str = "daily") -> str:
         """
         获取股票数据的统一接口，支持多周期数据
@@ -18,6 +18,9 @@ from .news.chinese_finance import get_chinese_social_sentiment
 
 from .providers.us import get_data_in_range
 
+# 批量分析时共享市场级数据
+from .batch_context import batch_shared
+
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_dataflow_logging
@@ -489,6 +492,7 @@ def get_simfin_income_statements(
     )
 
 
+@batch_shared("google_news")
 def get_google_news(
     query: Annotated[str, "Query to search with"],
     curr_date: Annotated[str, "Curr date in yyyy-mm-dd format"],
@@ -539,6 +543,7 @@ def get_google_news(
     return f"## {query.replace('+', ' ')} Google News, from {before} to {curr_date}:\n\n{news_str}"
 
 
+@batch_shared("reddit_global_news")
 def get_reddit_global_news(
     start_date: Annotated[str, "Start date in yyyy-mm-dd format"],
     look_back_days: Annotated[int, "how many days to look back"],
@@ -971,6 +976,7 @@ def get_stock_news_openai(ticker, curr_date):
     return response.output[1].content[0].text
 
 
+@batch_shared("global_news_openai")
 def get_global_news_openai(curr_date):
     config = get_config()
     client = OpenAI(base_url=config["backend_url"])
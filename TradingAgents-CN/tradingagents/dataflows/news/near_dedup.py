@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+新闻近似重复聚类：字符 shingle + MinHash + LSH 分桶
+
+转载的财经新闻标题往往只差标点或个别字（"贵州茅台一季度净利润同比增长15%" / "贵州茅台：一季度净利润同比增长15%！"），
+精确标题去重无法识别。这里只对标题计算 MinHash 签名（公告正文开头多为相同的免责声明，不参与比较），
+按 LSH 分桶找候选对，签名相似度达到阈值（默认 0.8）的归为同一簇。
+
+- 复杂度对条目数线性：每条新闻计算一次签名，候选只在同桶内产生
+- 默认 64 个哈希、16 个分桶 × 4 行：候选召回高，再用完整签名按阈值确认
+- 可按分区（如股票代码）聚类，不同分区的条目不会合并
+- 实时新闻聚合器每簇保留一条代表；NewsDataService 入库时只标注 cluster_id / cluster_rep，读取时折叠
+- 入库聚类会带上库中近期已标注的新闻一起比较，后续同步批次里的转载沿用已有 cluster_id
+"""
+
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+T = TypeVar("T")
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+
+_PRIME = np.uint64(4294967311)  # 大于 2^32 的素数
+_rng = np.random.RandomState(20240520)
+_A = _rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+
+# 去掉空白与标点，只保留文字和数字
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+@dataclass
+class NearDedupStats:
+    input_count: int = 0
+    kept_count: int = 0
+    removed_chars: int = 0
+
+    @property
+    def removed_count(self) -> int:
+        return self.input_count - self.kept_count
+
+    @property
+    def estimated_tokens_saved(self) -> int:
+        # 与适配器的保守估算一致：约 2 字符/token
+        return self.removed_chars // 2
+
+    def summary(self) -> str:
+        return (f"输入 {self.input_count} 条，保留 {self.kept_count} 条，合并近似重复 {self.removed_count} 条，"
+                f"减少约 {self.estimated_tokens_saved} tokens")
+
+
+def news_text(title: Optional[str]) -> str:
+    """用于相似度计算的文本：只用标题"""
+    return title or ""
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    normalized = _NON_WORD.sub("", text.lower())
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized} if normalized else set()
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash 签名；没有可用字符时返回 None（不参与聚类）"""
+    hashes = _shingle_hashes(text)
+    if hashes.size == 0:
+        return None
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def near_duplicate_clusters(
+    texts: Sequence[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    partitions: Optional[Sequence[Any]] = None,
+) -> List[int]:
+    """返回每条文本所属簇的代表下标（簇内最早出现的条目）；partitions[i] 不同的条目不会归为同一簇"""
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows = NUM_PERM // BANDS
+    signatures = [minhash_signature(text) for text in texts]
+    buckets: Dict[Tuple[Any, int, bytes], int] = {}
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            partition = partitions[i] if partitions is not None else None
+            key = (partition, band, signature[band * rows:(band + 1) * rows].tobytes())
+            j = buckets.setdefault(key, i)
+            if j == i:
+                continue
+            root_i, root_j = find(i), find(j)
+            if root_i == root_j:
+                continue
+            # 同桶只是候选，用完整签名估计 Jaccard 相似度再确认
+            if float(np.mean(signature == signatures[j])) >= threshold:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+    return [find(i) for i in range(len(texts))]
+
+
+def _pick_representatives(
+    items: Sequence[T], labels: Sequence[int], prefer: Optional[Callable[[T], Any]]
+) -> Dict[int, int]:
+    """簇标签 -> 代表下标；prefer(item) 越大越优先，不传时取最早出现的条目"""
+    representatives: Dict[int, int] = {}
+    for i, label in enumerate(labels):
+        current = representatives.get(label)
+        if current is None or (prefer is not None and prefer(items[i]) > prefer(items[current])):
+            representatives[label] = i
+    return representatives
+
+
+def dedupe_near_duplicates(
+    items: Sequence[T],
+    text_of: Callable[[T], str],
+    prefer: Optional[Callable[[T], Any]] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    partition_of: Optional[Callable[[T], Any]] = None,
+) -> Tuple[List[T], NearDedupStats]:
+    """每个近似重复簇保留一条代表，按簇首次出现的顺序返回
+
+    prefer(item) 越大越优先作为代表（例如相关性、正文长度）；不传时保留最早出现的条目。
+    """
+    texts = [text_of(item) for item in items]
+    partitions = [partition_of(item) for item in items] if partition_of is not None else None
+    labels = near_duplicate_clusters(texts, threshold, partitions)
+    representatives = _pick_representatives(items, labels, prefer)
+
+    kept_indexes = sorted(representatives.values(), key=lambda i: labels[i])
+    kept_set = set(kept_indexes)
+    stats = NearDedupStats(
+        input_count=len(items),
+        kept_count=len(kept_indexes),
+        removed_chars=sum(len(texts[i]) for i in range(len(items)) if i not in kept_set),
+    )
+    return [items[i] for i in kept_indexes], stats
+
+
+def _news_body(news: Dict[str, Any]) -> str:
+    return news.get("content") or news.get("summary") or ""
+
+
+def _news_identity(news: Dict[str, Any]) -> Tuple[str, str]:
+    return news.get("url") or "", news.get("title") or ""
+
+
+def cluster_news_dicts(
+    news_list: Sequence[Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+    existing: Optional[Sequence[Dict[str, Any]]] = None,
+) -> Tuple[List[Tuple[str, bool]], NearDedupStats]:
+    """新闻字典按股票代码分区、按标题聚类，不删除任何条目
+
+    返回与 news_list 对齐的 (cluster_id, is_representative)：cluster_id 由代表的 symbol/url/title 生成，
+    代表为正文最完整的一条。stats 中的“合并”条数与 tokens 指读取时折叠掉的部分。
+
+    existing 为库中近期已标注的新闻（symbol/title/url/cluster_id/cluster_rep），与本批一起比较但不返回：
+    - 与已有新闻同簇的条目沿用其 cluster_id，且不作为代表（已入库的代表保持不变）
+    - 同一条新闻（url + 标题相同）重复同步时原样沿用已有标注
+    """
+    existing = [doc for doc in (existing or []) if doc.get("cluster_id")]
+    stored = {_news_identity(doc): (doc["cluster_id"], doc.get("cluster_rep", True)) for doc in existing}
+    combined = list(existing) + list(news_list)
+    offset = len(existing)
+
+    texts = [news_text(news.get("title")) for news in combined]
+    labels = near_duplicate_clusters(texts, threshold, [news.get("symbol") for news in combined])
+
+    # 已入库的簇：簇标签为簇内最小下标，existing 排在前面，标签落在 existing 内即为已有簇
+    cluster_ids: Dict[int, str] = {label: existing[label]["cluster_id"] for label in labels if label < offset}
+    new_labels = [labels[offset + i] for i in range(len(news_list))]
+    fresh = [i for i, label in enumerate(new_labels) if label not in cluster_ids]
+    representatives = _pick_representatives(
+        [news_list[i] for i in fresh], [new_labels[i] for i in fresh], lambda news: len(_news_body(news))
+    )
+    rep_indexes = {fresh[i] for i in representatives.values()}
+    for label, i in representatives.items():
+        rep = news_list[fresh[i]]
+        key = f"{rep.get('symbol') or ''}|{rep.get('url') or ''}|{rep.get('title') or ''}"
+        cluster_ids[label] = hashlib.md5(key.encode("utf-8")).hexdigest()[:16]
+
+    result = []
+    for i, news in enumerate(news_list):
+        known = stored.get(_news_identity(news))
+        result.append(known if known is not None else (cluster_ids[new_labels[i]], i in rep_indexes))
+
+    collapsed = [i for i, (_, is_rep) in enumerate(result) if not is_rep]
+    stats = NearDedupStats(
+        input_count=len(news_list),
+        kept_count=len(news_list) - len(collapsed),
+        removed_chars=sum(len(texts[offset + i]) + len(_news_body(news_list[i])) for i in collapsed),
+    )
+    return result, stats
+
+
+def collapse_clusters(docs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """读取时折叠：同一 cluster_id 只保留排在最前的一条（未标注 cluster_id 的文档原样保留）"""
+    seen = set()
+    result = []
+    for doc in docs:
+        cluster_id = doc.get("cluster_id")
+        if cluster_id:
+            if cluster_id in seen:
+                continue
+            seen.add(cluster_id)
+        result.append(doc)
+    return result
@@ -6,16 +6,19 @@
 
 import requests
 import json
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import time
 import os
 from dataclasses import dataclass
 
 # 导入日志模块
 from tradingagents.config.runtime_settings import get_timezone_name
+from tradingagents.dataflows.news.near_dedup import dedupe_near_duplicates, news_text
 
 from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
@@ -37,7 +40,10 @@ class NewsItem:
 class RealtimeNewsAggregator:
     """实时新闻聚合器"""
 
-    def __init__(self):
+    # 相关性达到该分数的新闻计入提前返回的条数
+    HIGH_RELEVANCE_SCORE = 0.8
+
+    def __init__(self, source_timeouts: Optional[Dict[str, float]] = None, total_budget: Optional[float] = None):
         self.headers = {
             'User-Agent': 'TradingAgents-CN/1.0'
         }
@@ -47,10 +53,19 @@ class RealtimeNewsAggregator:
         self.alpha_vantage_key = os.getenv('ALPHA_VANTAGE_API_KEY')
         self.newsapi_key = os.getenv('NEWSAPI_KEY')
 
+        # 各新闻源的截止时间与整体时间预算（秒）；中文财经包含 AKShare + RSS 两步，给得更宽
+        self.default_source_timeout = float(os.getenv('NEWS_SOURCE_TIMEOUT_SECONDS', '8'))
+        self.source_timeouts = {'中文财经': self.default_source_timeout * 1.5}
+        self.source_timeouts.update(source_timeouts or {})
+        self.total_budget = total_budget if total_budget is not None else float(os.getenv('NEWS_TOTAL_BUDGET_SECONDS', '15'))
+        self.last_source_stats: Dict[str, Dict] = {}
+
     def get_realtime_stock_news(self, ticker: str, hours_back: int = 6, max_news: int = 10) -> List[NewsItem]:
         """
         获取实时股票新闻
-        优先级：专业API > 新闻API > 搜索引擎
+        各新闻源（FinnHub、Alpha Vantage、NewsAPI、中文财经）并发获取，每个源有独立的截止时间，
+        整体受 total_budget 约束；结果按到达顺序合并，高相关新闻凑满 max_news 条后提前返回。
+        各源的耗时、状态与贡献条数记录在 self.last_source_stats。
 
         Args:
             ticker: 股票代码
@@ -58,78 +73,78 @@ class RealtimeNewsAggregator:
             max_news: 最大新闻数量，默认10条
         """
         logger.info(f"[新闻聚合器] 开始获取 {ticker} 的实时新闻，回溯时间: {hours_back}小时")
-        start_time = datetime.now(ZoneInfo(get_timezone_name()))
+        start = time.monotonic()
         all_news = []
+        source_of = {}
 
-        # 1. FinnHub实时新闻 (最高优先级)
-        logger.info(f"[新闻聚合器] 尝试从 FinnHub 获取 {ticker} 的新闻")
-        finnhub_start = datetime.now(ZoneInfo(get_timezone_name()))
-        finnhub_news = self._get_finnhub_realtime_news(ticker, hours_back)
-        finnhub_time = (datetime.now(ZoneInfo(get_timezone_name())) - finnhub_start).total_seconds()
-
-        if finnhub_news:
-            logger.info(f"[新闻聚合器] 成功从 FinnHub 获取 {len(finnhub_news)} 条新闻，耗时: {finnhub_time:.2f}秒")
-        else:
-            logger.info(f"[新闻聚合器] FinnHub 未返回新闻，耗时: {finnhub_time:.2f}秒")
-
-        all_news.extend(finnhub_news)
-
-        # 2. Alpha Vantage新闻
-        logger.info(f"[新闻聚合器] 尝试从 Alpha Vantage 获取 {ticker} 的新闻")
-        av_start = datetime.now(ZoneInfo(get_timezone_name()))
-        av_news = self._get_alpha_vantage_news(ticker, hours_back)
-        av_time = (datetime.now(ZoneInfo(get_timezone_name())) - av_start).total_seconds()
-
-        if av_news:
-            logger.info(f"[新闻聚合器] 成功从 Alpha Vantage 获取 {len(av_news)} 条新闻，耗时: {av_time:.2f}秒")
-        else:
-            logger.info(f"[新闻聚合器] Alpha Vantage 未返回新闻，耗时: {av_time:.2f}秒")
-
-        all_news.extend(av_news)
-
-        # 3. NewsAPI (如果配置了)
-        if self.newsapi_key:
-            logger.info(f"[新闻聚合器] 尝试从 NewsAPI 获取 {ticker} 的新闻")
-            newsapi_start = datetime.now(ZoneInfo(get_timezone_name()))
-            newsapi_news = self._get_newsapi_news(ticker, hours_back)
-            newsapi_time = (datetime.now(ZoneInfo(get_timezone_name())) - newsapi_start).total_seconds()
-
-            if newsapi_news:
-                logger.info(f"[新闻聚合器] 成功从 NewsAPI 获取 {len(newsapi_news)} 条新闻，耗时: {newsapi_time:.2f}秒")
-            else:
-                logger.info(f"[新闻聚合器] NewsAPI 未返回新闻，耗时: {newsapi_time:.2f}秒")
-
-            all_news.extend(newsapi_news)
-        else:
+        sources = self._news_sources(ticker, hours_back)
+        stats = {name: {"status": "pending", "latency": None, "items": 0, "contributed": 0} for name in sources}
+        if not self.newsapi_key:
             logger.info(f"[新闻聚合器] NewsAPI 密钥未配置，跳过此新闻源")
 
-        # 4. 中文财经新闻源
-        logger.info(f"[新闻聚合器] 尝试获取 {ticker} 的中文财经新闻")
-        chinese_start = datetime.now(ZoneInfo(get_timezone_name()))
-        chinese_news = self._get_chinese_finance_news(ticker, hours_back)
-        chinese_time = (datetime.now(ZoneInfo(get_timezone_name())) - chinese_start).total_seconds()
-
-        if chinese_news:
-            logger.info(f"[新闻聚合器] 成功获取 {len(chinese_news)} 条中文财经新闻，耗时: {chinese_time:.2f}秒")
-        else:
-            logger.info(f"[新闻聚合器] 未获取到中文财经新闻，耗时: {chinese_time:.2f}秒")
-
-        all_news.extend(chinese_news)
+        # 工作线程继承调用方上下文（批次共享、回测时点等 contextvar）
+        executor = ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix="news-source")
+        futures = {}
+        for name, fetch in sources.items():
+            context = contextvars.copy_context()
+            futures[executor.submit(context.run, fetch)] = name
+        budget_deadline = start + self.total_budget
+        deadlines = {name: start + min(self.source_timeouts.get(name, self.default_source_timeout), self.total_budget)
+                     for name in sources}
+
+        pending = set(futures)
+        early_exit = False
+        try:
+            while pending:
+                now = time.monotonic()
+                # 超过各自截止时间的源不再等待
+                for future in [f for f in pending if deadlines[futures[f]] <= now]:
+                    pending.discard(future)
+                    future.cancel()
+                    stats[futures[future]]["status"] = "timeout"
+                    logger.warning(f"[新闻聚合器] {futures[future]} 超过截止时间 "
+                                   f"{deadlines[futures[future]] - start:.1f}秒，放弃等待")
+                if not pending or now >= budget_deadline:
+                    break
+
+                next_deadline = min([deadlines[futures[f]] for f in pending] + [budget_deadline])
+                done, pending = wait(pending, timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    stats[name]["latency"] = round(time.monotonic() - start, 3)
+                    try:
+                        items = future.result() or []
+                    except Exception as e:
+                        stats[name]["status"] = "error"
+                        logger.error(f"[新闻聚合器] {name} 新闻获取失败: {e}")
+                        continue
+                    stats[name]["status"] = "ok" if items else "empty"
+                    stats[name]["items"] = len(items)
+                    logger.info(f"[新闻聚合器] {name} 返回 {len(items)} 条新闻，耗时: {stats[name]['latency']:.2f}秒")
+                    for item in items:
+                        source_of[id(item)] = name
+                    all_news.extend(items)
+
+                if self._count_high_relevance(all_news) >= max_news and pending:
+                    early_exit = True
+                    logger.info(f"[新闻聚合器] 已获得 {max_news} 条高相关新闻，提前返回，"
+                                f"不再等待: {', '.join(futures[f] for f in pending)}")
+                    break
+
+            for future in pending:
+                future.cancel()
+                if stats[futures[future]]["status"] == "pending":
+                    stats[futures[future]]["status"] = "skipped" if early_exit else "timeout"
+        finally:
+            # 不等待仍在运行的请求（它们受各自的 HTTP 超时约束，结束后结果被丢弃）
+            executor.shutdown(wait=False, cancel_futures=True)
 
         # 去重和排序
         logger.info(f"[新闻聚合器] 开始对 {len(all_news)} 条新闻进行去重和排序")
-        dedup_start = datetime.now(ZoneInfo(get_timezone_name()))
         unique_news = self._deduplicate_news(all_news)
         sorted_news = sorted(unique_news, key=lambda x: x.publish_time, reverse=True)
-        dedup_time = (datetime.now(ZoneInfo(get_timezone_name())) - dedup_start).total_seconds()
-
-        # 记录去重结果
         removed_count = len(all_news) - len(unique_news)
-        logger.info(f"[新闻聚合器] 新闻去重完成，移除了 {removed_count} 条重复新闻，剩余 {len(sorted_news)} 条，耗时: {dedup_time:.2f}秒")
-
-        # 记录总体情况
-        total_time = (datetime.now(ZoneInfo(get_timezone_name())) - start_time).total_seconds()
-        logger.info(f"[新闻聚合器] {ticker} 的新闻聚合完成，总共获取 {len(sorted_news)} 条新闻，总耗时: {total_time:.2f}秒")
+        logger.info(f"[新闻聚合器] 新闻去重完成，移除了 {removed_count} 条重复新闻，剩余 {len(sorted_news)} 条")
 
         # 限制新闻数量为最新的max_news条
         if len(sorted_news) > max_news:
@@ -137,6 +152,21 @@ class RealtimeNewsAggregator:
             sorted_news = sorted_news[:max_news]
             logger.info(f"[新闻聚合器] 📰 新闻数量限制: 从{original_count}条限制为{max_news}条最新新闻")
 
+        for item in sorted_news:
+            name = source_of.get(id(item))
+            if name:
+                stats[name]["contributed"] += 1
+        self.last_source_stats = stats
+
+        total_time = time.monotonic() - start
+        summary = ", ".join(
+            f"{name}: {s['status']}/{s['latency'] if s['latency'] is not None else '-'}s/"
+            f"{s['items']}条/入选{s['contributed']}条"
+            for name, s in stats.items()
+        )
+        logger.info(f"[新闻聚合器] {ticker} 的新闻聚合完成，总共获取 {len(sorted_news)} 条新闻，"
+                    f"总耗时: {total_time:.2f}秒；各源: {summary}")
+
         # 记录一些新闻标题示例
         if sorted_news:
             sample_titles = [item.title for item in sorted_news[:3]]
@@ -144,6 +174,23 @@ class RealtimeNewsAggregator:
 
         return sorted_news
 
+    def _news_sources(self, ticker: str, hours_back: int) -> Dict[str, Callable[[], List[NewsItem]]]:
+        """本次要查询的新闻源（未配置密钥的源不提交）"""
+        sources = {}
+        if self.finnhub_key:
+            sources["FinnHub"] = lambda: self._get_finnhub_realtime_news(ticker, hours_back)
+        if self.alpha_vantage_key:
+            sources["Alpha Vantage"] = lambda: self._get_alpha_vantage_news(ticker, hours_back)
+        if self.newsapi_key:
+            sources["NewsAPI"] = lambda: self._get_newsapi_news(ticker, hours_back)
+        sources["中文财经"] = lambda: self._get_chinese_finance_news(ticker, hours_back)
+        return sources
+
+    def _count_high_relevance(self, news_items: List[NewsItem]) -> int:
+        titles = {item.title.lower().strip() for item in news_items
+                  if item.relevance_score >= self.HIGH_RELEVANCE_SCORE and len(item.title.strip()) > 10}
+        return len(titles)
+
     def _get_finnhub_realtime_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
         """获取FinnHub实时新闻"""
         if not self.finnhub_key:
@@ -163,7 +210,7 @@ class RealtimeNewsAggregator:
                 'token': self.finnhub_key
             }
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.default_source_timeout)
             response.raise_for_status()
 
             news_data = response.json()
@@ -208,7 +255,7 @@ class RealtimeNewsAggregator:
                 'limit': 50
             }
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.default_source_timeout)
             response.raise_for_status()
 
             data = response.json()
@@ -268,7 +315,7 @@ class RealtimeNewsAggregator:
                 'apiKey': self.newsapi_key
             }
 
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=self.default_source_timeout)
             response.raise_for_status()
 
             data = response.json()
@@ -569,39 +616,30 @@ class RealtimeNewsAggregator:
         return 0.3  # 默认相关性
 
     def _deduplicate_news(self, news_items: List[NewsItem]) -> List[NewsItem]:
-        """去重新闻"""
+        """去重新闻：过滤过短标题后按标题做近似重复聚类，每簇保留相关性最高的一条"""
         logger.info(f"[新闻去重] 开始对 {len(news_items)} 条新闻进行去重处理")
-        start_time = datetime.now(ZoneInfo(get_timezone_name()))
+        start_time = time.monotonic()
 
-        seen_titles = set()
-        unique_news = []
-        duplicate_count = 0
+        candidates = []
         short_title_count = 0
-
         for item in news_items:
-            # 简单的标题去重
-            title_key = item.title.lower().strip()
-
-            # 检查标题长度
-            if len(title_key) <= 10:
+            if len(item.title.strip()) <= 10:
                 logger.debug(f"[新闻去重] 跳过标题过短的新闻: '{item.title}'，来源: {item.source}")
                 short_title_count += 1
                 continue
+            candidates.append(item)
 
-            # 检查是否重复
-            if title_key in seen_titles:
-                logger.debug(f"[新闻去重] 检测到重复新闻: '{item.title[:50]}...'，来源: {item.source}")
-                duplicate_count += 1
-                continue
-
-            # 添加到结果集
-            seen_titles.add(title_key)
-            unique_news.append(item)
+        unique_news, dedup_stats = dedupe_near_duplicates(
+            candidates,
+            text_of=lambda item: news_text(item.title),
+            prefer=lambda item: (item.relevance_score, len(item.content or "")),
+        )
 
         # 记录去重结果
-        time_taken = (datetime.now(ZoneInfo(get_timezone_name())) - start_time).total_seconds()
+        time_taken = time.monotonic() - start_time
         logger.info(f"[新闻去重] 去重完成，原始新闻: {len(news_items)}条，去重后: {len(unique_news)}条，")
-        logger.info(f"[新闻去重] 去除重复: {duplicate_count}条，标题过短: {short_title_count}条，耗时: {time_taken:.2f}秒")
+        logger.info(f"[新闻去重] 近似重复: {dedup_stats.removed_count}条（约 {dedup_stats.estimated_tokens_saved} tokens），"
+                    f"标题过短: {short_title_count}条，耗时: {time_taken:.2f}秒")
 
         return unique_news
 
@@ -8,7 +8,7 @@ import time
 import json
 import os
 import pandas as pd
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
 from tradingagents.config.runtime_settings import get_int
@@ -666,10 +666,129 @@ import threading
 _akshare_hk_spot_lock = threading.Lock()
 
 
+def get_hk_spot_snapshot():
+    """
+    获取 AKShare 全市场港股实时行情（ak.stock_hk_spot，新浪接口）
+    🔥 使用全局缓存 + 线程锁，同一 TTL 内所有调用共享一次全市场请求
+
+    Returns:
+        pd.DataFrame: 全市场港股快照（列：代码、中文名称、最新价 等）
+    """
+    import akshare as ak
+    from datetime import datetime
+
+    # 🔥 使用互斥锁保护 AKShare API 调用（防止并发导致被封禁）
+    # 策略：
+    # 1. 尝试获取锁（最多等待 60 秒）
+    # 2. 获取锁后，先检查缓存是否已被其他线程更新
+    # 3. 如果缓存有效，直接使用；否则调用 API
+
+    thread_id = threading.current_thread().name
+    logger.info(f"🔒 [AKShare锁-{thread_id}] 尝试获取锁...")
+
+    # 尝试获取锁，最多等待 60 秒
+    lock_acquired = _akshare_hk_spot_lock.acquire(timeout=60)
+
+    if not lock_acquired:
+        # 超时，返回错误
+        logger.error(f"⏰ [AKShare锁-{thread_id}] 获取锁超时（60秒），放弃")
+        raise Exception("AKShare API 调用超时（其他线程占用）")
+
+    try:
+        logger.info(f"✅ [AKShare锁-{thread_id}] 已获取锁")
+
+        # 获取锁后，检查缓存是否已被其他线程更新
+        now = datetime.now()
+        cache = _akshare_hk_spot_cache
+
+        if cache['data'] is not None and cache['timestamp'] is not None:
+            elapsed = (now - cache['timestamp']).total_seconds()
+            if elapsed <= cache['ttl']:
+                # 缓存有效（可能是其他线程刚更新的）
+                logger.info(f"⚡ [AKShare缓存-{thread_id}] 使用缓存数据（{elapsed:.1f}秒前，可能由其他线程更新）")
+                return cache['data']
+            # 缓存过期，需要调用 API
+            logger.info(f"🔄 [AKShare缓存-{thread_id}] 缓存过期（{elapsed:.1f}秒前），调用 API 刷新")
+        else:
+            # 缓存为空，首次调用
+            logger.info(f"🔄 [AKShare缓存-{thread_id}] 首次获取港股数据")
+
+        df = ak.stock_hk_spot()
+        cache['data'] = df
+        cache['timestamp'] = now
+        logger.info(f"✅ [AKShare缓存-{thread_id}] 已缓存 {len(df)} 只港股数据")
+        return df
+
+    finally:
+        # 释放锁
+        _akshare_hk_spot_lock.release()
+        logger.info(f"🔓 [AKShare锁-{thread_id}] 已释放锁")
+
+
+def _hk_spot_row_to_info(symbol: str, row) -> Dict[str, Any]:
+    """全市场快照中的一行 -> 港股行情信息"""
+
+    # 辅助函数：安全转换数值
+    def safe_float(value):
+        try:
+            if value is None or value == '' or (isinstance(value, float) and value != value):  # NaN check
+                return None
+            return float(value)
+        except:
+            return None
+
+    def safe_int(value):
+        try:
+            if value is None or value == '' or (isinstance(value, float) and value != value):  # NaN check
+                return None
+            return int(value)
+        except:
+            return None
+
+    return {
+        'symbol': symbol,
+        'name': row['中文名称'],  # 新浪接口的列名
+        'price': safe_float(row.get('最新价')),
+        'open': safe_float(row.get('今开')),
+        'high': safe_float(row.get('最高')),
+        'low': safe_float(row.get('最低')),
+        'volume': safe_int(row.get('成交量')),
+        'change_percent': safe_float(row.get('涨跌幅')),
+        'currency': 'HKD',
+        'exchange': 'HKG',
+        'market': '港股',
+        'source': 'akshare_sina'
+    }
+
+
+def get_hk_stock_infos_akshare(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    批量获取港股行情：一次全市场快照，按代码取出各只股票
+
+    Args:
+        symbols: 港股代码列表
+
+    Returns:
+        Dict: {原始代码: 港股信息}，快照中没有的代码不在结果中
+    """
+    provider = get_improved_hk_provider()
+    df = get_hk_spot_snapshot()
+    if df is None or df.empty:
+        return {}
+
+    rows = df.drop_duplicates(subset=['代码']).set_index('代码', drop=False)
+    results = {}
+    for symbol in symbols:
+        normalized_symbol = provider._normalize_hk_symbol(symbol)
+        if normalized_symbol in rows.index:
+            results[symbol] = _hk_spot_row_to_info(symbol, rows.loc[normalized_symbol])
+    return results
+
+
 def get_hk_stock_info_akshare(symbol: str) -> Dict[str, Any]:
     """
     兼容性函数：直接使用 akshare 获取港股信息（避免循环调用）
-    🔥 使用全局缓存 + 线程锁，避免重复调用 ak.stock_hk_spot()
+    🔥 复用 get_hk_spot_snapshot 的全局缓存，避免重复调用 ak.stock_hk_spot()
 
     Args:
         symbol: 港股代码
@@ -678,102 +797,19 @@ def get_hk_stock_info_akshare(symbol: str) -> Dict[str, Any]:
         Dict: 港股信息
     """
     try:
-        import akshare as ak
-        from datetime import datetime
-
         # 标准化代码
         provider = get_improved_hk_provider()
         normalized_symbol = provider._normalize_hk_symbol(symbol)
 
         # 尝试从 akshare 获取实时行情
         try:
-            # 🔥 使用互斥锁保护 AKShare API 调用（防止并发导致被封禁）
-            # 策略：
-            # 1. 尝试获取锁（最多等待 60 秒）
-            # 2. 获取锁后，先检查缓存是否已被其他线程更新
-            # 3. 如果缓存有效，直接使用；否则调用 API
-
-            thread_id = threading.current_thread().name
-            logger.info(f"🔒 [AKShare锁-{thread_id}] 尝试获取锁...")
-
-            # 尝试获取锁，最多等待 60 秒
-            lock_acquired = _akshare_hk_spot_lock.acquire(timeout=60)
-
-            if not lock_acquired:
-                # 超时，返回错误
-                logger.error(f"⏰ [AKShare锁-{thread_id}] 获取锁超时（60秒），放弃")
-                raise Exception("AKShare API 调用超时（其他线程占用）")
-
-            try:
-                logger.info(f"✅ [AKShare锁-{thread_id}] 已获取锁")
-
-                # 获取锁后，检查缓存是否已被其他线程更新
-                now = datetime.now()
-                cache = _akshare_hk_spot_cache
-
-                if cache['data'] is not None and cache['timestamp'] is not None:
-                    elapsed = (now - cache['timestamp']).total_seconds()
-                    if elapsed <= cache['ttl']:
-                        # 缓存有效（可能是其他线程刚更新的）
-                        logger.info(f"⚡ [AKShare缓存-{thread_id}] 使用缓存数据（{elapsed:.1f}秒前，可能由其他线程更新）")
-                        df = cache['data']
-                    else:
-                        # 缓存过期，需要调用 API
-                        logger.info(f"🔄 [AKShare缓存-{thread_id}] 缓存过期（{elapsed:.1f}秒前），调用 API 刷新")
-                        df = ak.stock_hk_spot()
-                        cache['data'] = df
-                        cache['timestamp'] = now
-                        logger.info(f"✅ [AKShare缓存-{thread_id}] 已缓存 {len(df)} 只港股数据")
-                else:
-                    # 缓存为空，首次调用
-                    logger.info(f"🔄 [AKShare缓存-{thread_id}] 首次获取港股数据")
-                    df = ak.stock_hk_spot()
-                    cache['data'] = df
-                    cache['timestamp'] = now
-                    logger.info(f"✅ [AKShare缓存-{thread_id}] 已缓存 {len(df)} 只港股数据")
-
-            finally:
-                # 释放锁
-                _akshare_hk_spot_lock.release()
-                logger.info(f"🔓 [AKShare锁-{thread_id}] 已释放锁")
+            df = get_hk_spot_snapshot()
 
             # 从缓存的数据中查找目标股票
             if df is not None and not df.empty:
                 matched = df[df['代码'] == normalized_symbol]
                 if not matched.empty:
-                    row = matched.iloc[0]
-
-                    # 辅助函数：安全转换数值
-                    def safe_float(value):
-                        try:
-                            if value is None or value == '' or (isinstance(value, float) and value != value):  # NaN check
-                                return None
-                            return float(value)
-                        except:
-                            return None
-
-                    def safe_int(value):
-                        try:
-                            if value is None or value == '' or (isinstance(value, float) and value != value):  # NaN check
-                                return None
-                            return int(value)
-                        except:
-                            return None
-
-                    return {
-                        'symbol': symbol,
-                        'name': row['中文名称'],  # 新浪接口的列名
-                        'price': safe_float(row.get('最新价')),
-                        'open': safe_float(row.get('今开')),
-                        'high': safe_float(row.get('最高')),
-                        'low': safe_float(row.get('最低')),
-                        'volume': safe_int(row.get('成交量')),
-                        'change_percent': safe_float(row.get('涨跌幅')),
-                        'currency': 'HKD',
-                        'exchange': 'HKG',
-                        'market': '港股',
-                        'source': 'akshare_sina'
-                    }
+                    return _hk_spot_row_to_info(symbol, matched.iloc[0])
         except Exception as e:
             logger.debug(f"📊 [港股AKShare-新浪] 获取失败: {e}")
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+跨进程 single-flight：相同参数的并发数据获取只由一个调用者（leader）真正请求上游，其余等待并共享结果
+
+- 进程内快速路径：同一进程内的并发调用直接等待 leader 线程的结果（threading.Event）
+- 跨进程：Redis 租约（SET NX PX）选出 leader；leader 完成后把结果写入 Redis（短 TTL），
+  其他进程的调用者轮询结果键；租约消失但没有结果（leader 失败/进程退出）时重新竞争租约
+- Redis 不可用或 SINGLE_FLIGHT_ENABLED=false 时退化为仅进程内合并
+- 键：namespace + 规范化后的请求参数（代码大小写/空白、日期分隔符不影响键）
+
+用法：
+    @single_flight("stock_data", extra_key=lambda self: {"source": self.current_source.value})
+    def get_stock_data(self, symbol, start_date=None, end_date=None, period="daily"): ...
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+_KEY_PREFIX = "singleflight"
+
+# compare-and-delete：只释放自己持有的租约
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """规范化请求参数：字符串去空白，代码转大写，日期去掉分隔符"""
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, str):
+            value = value.strip()
+            if name in ("symbol", "code", "ticker", "stock_code"):
+                value = value.upper()
+            elif name.endswith("_date") or name == "date":
+                value = value.replace("-", "").replace("/", "")
+        normalized[name] = value
+    return normalized
+
+
+def make_key(namespace: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps(normalize_params(params), sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return f"{_KEY_PREFIX}:{namespace}:{digest}"
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "owner")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.owner = threading.get_ident()
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        lease_seconds: float = 60.0,
+        result_ttl_seconds: float = 10.0,
+        poll_interval: float = 0.05,
+        redis_client_getter: Optional[Callable[[], Any]] = None,
+        enabled: Optional[bool] = None,
+    ) -> None:
+        self.lease_ms = int(lease_seconds * 1000)
+        self.result_ttl_ms = int(result_ttl_seconds * 1000)
+        self.poll_interval = poll_interval
+        self._redis_getter = redis_client_getter or _default_redis_client
+        self.enabled = (os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() != "false") if enabled is None else enabled
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {"leader": 0, "shared_local": 0, "shared_remote": 0, "bypass": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+
+        # 1. 进程内：已有同键调用时等待其结果
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.owner == threading.get_ident():
+                # 同一线程重入（例如降级路径再次调用同一接口），直接执行避免自等待死锁
+                call = None
+                reentrant = True
+            else:
+                reentrant = False
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    leader = True
+                else:
+                    leader = False
+
+        if reentrant:
+            return fn()
+
+        if not leader:
+            call.event.wait()
+            self.stats["shared_local"] += 1
+            if call.error is not None:
+                raise call.error
+            # 可变结果（如新闻列表）复制一份，避免调用方之间互相影响
+            return call.result if isinstance(call.result, (str, bytes)) else copy.deepcopy(call.result)
+
+        # 2. 本进程的 leader：再通过 Redis 租约在集群内合并
+        try:
+            call.result = self._do_cluster(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def _do_cluster(self, key: str, fn: Callable[[], Any]) -> Any:
+        client = self._get_redis()
+        if client is None:
+            self.stats["leader"] += 1
+            return fn()
+
+        lease_key, result_key = f"{key}:lease", f"{key}:result"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lease_ms / 1000.0 + 5.0
+        interval = self.poll_interval
+
+        while True:
+            try:
+                cached = client.get(result_key)
+                if cached is not None:
+                    self.stats["shared_remote"] += 1
+                    logger.debug(f"⚡ [single-flight] 共享其他进程的结果: {key}")
+                    return pickle.loads(cached)
+                acquired = client.set(lease_key, token, nx=True, px=self.lease_ms)
+            except Exception as e:
+                logger.debug(f"[single-flight] Redis 不可用，直接请求: {e}")
+                self.stats["bypass"] += 1
+                return fn()
+
+            if acquired:
+                return self._lead(client, lease_key, result_key, token, fn)
+
+            if time.monotonic() >= deadline:
+                # leader 长时间未完成：不再等待，自行请求
+                self.stats["bypass"] += 1
+                return fn()
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+    def _lead(self, client, lease_key: str, result_key: str, token: str, fn: Callable[[], Any]) -> Any:
+        self.stats["leader"] += 1
+        try:
+            result = fn()
+            try:
+                client.set(result_key, pickle.dumps(result), px=self.result_ttl_ms)
+            except Exception as e:
+                logger.debug(f"[single-flight] 结果写入 Redis 失败（其他进程将自行请求）: {e}")
+            return result
+        finally:
+            try:
+                client.eval(_RELEASE_SCRIPT, 1, lease_key, token)
+            except Exception:
+                pass
+
+    def _get_redis(self):
+        try:
+            return self._redis_getter()
+        except Exception:
+            return None
+
+
+def _default_redis_client():
+    from tradingagents.config.database_manager import get_redis_client
+    return get_redis_client()
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight(
+            lease_seconds=float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "60")),
+            result_ttl_seconds=float(os.getenv("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "10")),
+        )
+    return _single_flight
+
+
+def single_flight(namespace: str, extra_key: Optional[Callable[[Any], Dict[str, Any]]] = None):
+    """方法装饰器：按 namespace + 绑定后的参数（不含 self）合并并发调用
+
+    extra_key(self) 返回影响结果但不在参数中的状态（例如当前数据源）。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k != "self"}
+            if extra_key is not None:
+                params.update(extra_key(self))
+            key = make_key(namespace, params)
+            return get_single_flight().do(key, lambda: func(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
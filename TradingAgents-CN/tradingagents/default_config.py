@@ -21,6 +21,12 @@ DEFAULT_CONFIG = {
     "online_tools": os.getenv("ONLINE_TOOLS_ENABLED", "false").lower() == "true",
     "online_news": os.getenv("ONLINE_NEWS_ENABLED", "true").lower() == "true", 
     "realtime_data": os.getenv("REALTIME_DATA_ENABLED", "false").lower() == "true",
+    # 分析师数据预取：分析前并发获取各分析师数据，分析师只需一次 LLM 调用
+    "analyst_data_prefetch": os.getenv("ANALYST_DATA_PREFETCH", "true").lower() == "true",
+    # 反思后台执行：reflect_and_remember 立即返回，反思在后台队列中完成（回测时不阻塞下一交易日）
+    "reflection_async": os.getenv("REFLECTION_ASYNC", "false").lower() == "true",
+    # LLM 响应缓存模式（off/readwrite/record/replay），None 表示沿用 LLM_CACHE_MODE 环境变量
+    "llm_cache_mode": None,
 
     # Note: Database and cache configuration is now managed by .env file and config.database_manager
     # No database/cache settings in default config to avoid configuration conflicts
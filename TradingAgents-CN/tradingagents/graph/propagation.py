@@ -49,6 +49,8 @@ class Propagator:
             "fundamentals_report": "",
             "sentiment_report": "",
             "news_report": "",
+            "prefetched_data": {},
+            "prefetch_stats": {},
         }
 
     def get_graph_args(self, use_progress_callback: bool = False) -> Dict[str, Any]:
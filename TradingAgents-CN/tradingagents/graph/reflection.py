@@ -1,6 +1,8 @@
 # TradingAgents/graph/reflection.py
 
-from typing import Dict, Any
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
 from langchain_openai import ChatOpenAI
 
 # 导入统一日志系统
@@ -8,6 +10,16 @@ from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
 
 
+# 反思组件：组件名 -> (反思标签, 从状态中取出该组件的分析/决策)
+REFLECTION_COMPONENTS = {
+    "bull": ("BULL", lambda state: state["investment_debate_state"]["bull_history"]),
+    "bear": ("BEAR", lambda state: state["investment_debate_state"]["bear_history"]),
+    "trader": ("TRADER", lambda state: state["trader_investment_plan"]),
+    "invest_judge": ("INVEST JUDGE", lambda state: state["investment_debate_state"]["judge_decision"]),
+    "risk_manager": ("RISK JUDGE", lambda state: state["risk_debate_state"]["judge_decision"]),
+}
+
+
 class Reflector:
     """Handles reflection on decisions and updating memory."""
 
@@ -74,6 +86,46 @@ Adhere strictly to these instructions, and ensure your output is detailed, accur
         result = self.quick_thinking_llm.invoke(messages).content
         return result
 
+    def reflect_all(
+        self, current_state, returns_losses, memories: Dict[str, Any], max_workers: Optional[int] = None
+    ) -> Dict[str, str]:
+        """并发完成各组件的反思，并批量写入记忆。
+
+        Args:
+            memories: 组件名（见 REFLECTION_COMPONENTS）-> 记忆对象；记忆为 None 的组件跳过
+
+        Returns:
+            组件名 -> 反思结果
+        """
+        components = [name for name, memory in memories.items() if memory is not None and name in REFLECTION_COMPONENTS]
+        if not components:
+            return {}
+
+        situation = self._extract_current_situation(current_state)
+
+        def _reflect(name):
+            label, get_report = REFLECTION_COMPONENTS[name]
+            return name, self._reflect_on_component(label, get_report(current_state), situation, returns_losses)
+
+        # 各组件的反思互不依赖，LLM 调用并发执行；每个线程各用一份调用方上下文（LLM 缓存模式等 contextvar）
+        contexts = {name: contextvars.copy_context() for name in components}
+        with ThreadPoolExecutor(max_workers=max_workers or len(components)) as pool:
+            results = dict(pool.map(lambda name: contexts[name].run(_reflect, name), components))
+
+        self._store_reflections(situation, results, memories)
+        return results
+
+    def _store_reflections(self, situation: str, results: Dict[str, str], memories: Dict[str, Any]):
+        """写入记忆：所有组件的 situation 相同，embedding 配置相同的记忆共用一次向量计算"""
+        embedding_cache = {}
+        for name, result in results.items():
+            memory = memories[name]
+            key = (getattr(memory, "llm_provider", None), getattr(memory, "embedding", None))
+            if key not in embedding_cache:
+                embedding_cache[key] = memory.get_embeddings([situation])
+            memory.add_situations([(situation, result)], embeddings=embedding_cache[key])
+        logger.info(f"🧠 [反思] 已写入 {len(results)} 个记忆库，向量计算 {len(embedding_cache)} 次")
+
     def reflect_bull_researcher(self, current_state, returns_losses, bull_memory):
         """Reflect on bull researcher's analysis and update memory."""
         situation = self._extract_current_situation(current_state)
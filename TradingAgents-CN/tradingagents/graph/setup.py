@@ -180,7 +180,16 @@ class GraphSetup:
         # Define edges
         # Start with the first analyst
         first_analyst = selected_analysts[0]
-        workflow.add_edge(START, f"{first_analyst.capitalize()} Analyst")
+        if self.config.get("analyst_data_prefetch", True):
+            # ⚡ 先并发预取各分析师数据，分析师拿到数据后只需一次 LLM 调用
+            workflow.add_node(
+                "Data Prefetch",
+                create_data_prefetch(self.toolkit, self.quick_thinking_llm, selected_analysts),
+            )
+            workflow.add_edge(START, "Data Prefetch")
+            workflow.add_edge("Data Prefetch", f"{first_analyst.capitalize()} Analyst")
+        else:
+            workflow.add_edge(START, f"{first_analyst.capitalize()} Analyst")
 
         # Connect analysts in sequence
         for i, analyst_type in enumerate(selected_analysts):
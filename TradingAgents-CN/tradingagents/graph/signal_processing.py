@@ -1,12 +1,38 @@
 # TradingAgents/graph/signal_processing.py
 
+import threading
+from collections import Counter
+
 from langchain_openai import ChatOpenAI
 
 # 导入统一日志系统和图处理模块日志装饰器
 from tradingagents.utils.logging_init import get_logger
 from tradingagents.utils.tool_logging import log_graph_module
+from tradingagents.agents.utils.decision_block import parse_decision_block
 logger = get_logger("graph.signal_processing")
 
+# 决策提取路径统计（进程级）：structured=本地解析决策块，llm=回退到 LLM 提取
+_decision_source_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _record_decision_source(source: str) -> None:
+    with _stats_lock:
+        _decision_source_stats[source] += 1
+
+
+def get_decision_source_stats() -> dict:
+    """决策提取统计：各路径次数与 LLM 回退率"""
+    with _stats_lock:
+        stats = dict(_decision_source_stats)
+    total = sum(stats.values())
+    return {
+        "total": total,
+        "structured": stats.get("structured", 0),
+        "llm": stats.get("llm", 0),
+        "fallback_rate": round(stats.get("llm", 0) / total, 4) if total else 0.0,
+    }
+
 
 class SignalProcessor:
     """Processes trading signals to extract actionable decisions."""
@@ -63,6 +89,19 @@ class SignalProcessor:
         logger.info(f"🔍 [SignalProcessor] 处理信号: 股票={stock_symbol}, 市场={market_info['market_name']}, 货币={currency}",
                    extra={'stock_symbol': stock_symbol, 'market': market_info['market_name'], 'currency': currency})
 
+        # ⚡ 优先本地解析风险经理输出的结构化决策块，省去一次 LLM 调用
+        structured = parse_decision_block(full_signal)
+        if structured is not None:
+            _record_decision_source("structured")
+            logger.info(f"⚡ [SignalProcessor] 使用结构化决策块: {structured}",
+                       extra={'action': structured['action'], 'target_price': structured['target_price'],
+                             'confidence': structured['confidence'], 'stock_symbol': stock_symbol})
+            return structured
+
+        _record_decision_source("llm")
+        logger.info(f"🔍 [SignalProcessor] 未找到有效的结构化决策块，回退到LLM提取 "
+                   f"(回退率: {get_decision_source_stats()['fallback_rate']:.1%})")
+
         messages = [
             (
                 "system",
@@ -1,5 +1,6 @@
 # TradingAgents/graph/trading_graph.py
 
+import contextvars
 import os
 from pathlib import Path
 import json
@@ -11,6 +12,7 @@ from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
 from tradingagents.llm_adapters import ChatDashScopeOpenAI, ChatGoogleOpenAI
+from tradingagents.llm_adapters.response_cache import llm_cache_mode
 
 from langgraph.prebuilt import ToolNode
 
@@ -35,7 +37,7 @@ from .conditional_logic import ConditionalLogic
 from .setup import GraphSetup
 from .propagation import Propagator
 from .reflection import Reflector
-from .signal_processing import SignalProcessor
+from .signal_processing import SignalProcessor, get_decision_source_stats
 
 
 def create_llm_by_provider(provider: str, model: str, backend_url: str, temperature: float, max_tokens: int, timeout: int, api_key: str = None):
@@ -820,6 +822,8 @@ class TradingAgentsGraph:
 
         self.propagator = Propagator()
         self.reflector = Reflector(self.quick_thinking_llm)
+        self._reflection_executor = None
+        self._pending_reflections = []
         self.signal_processor = SignalProcessor(self.quick_thinking_llm)
 
         # State tracking
@@ -897,6 +901,11 @@ class TradingAgentsGraph:
             progress_callback: Optional callback function for progress updates
             task_id: Optional task ID for tracking performance data
         """
+        # 本次运行的 LLM 响应缓存模式（None 时使用 LLM_CACHE_MODE）
+        with llm_cache_mode(self.config.get("llm_cache_mode")):
+            return self._propagate(company_name, trade_date, progress_callback, task_id)
+
+    def _propagate(self, company_name, trade_date, progress_callback=None, task_id=None):
 
         # 添加详细的接收日志
         logger.debug(f"🔍 [GRAPH DEBUG] ===== TradingAgentsGraph.propagate 接收参数 =====")
@@ -1049,6 +1058,15 @@ class TradingAgentsGraph:
         # 构建性能数据
         performance_data = self._build_performance_data(node_timings, total_elapsed)
 
+        # ⚡ 数据预取统计（节省的 LLM 调用次数与并发获取节省的时间）
+        prefetch_stats = final_state.get('prefetch_stats')
+        if prefetch_stats:
+            performance_data['prefetch'] = prefetch_stats
+            logger.info(
+                f"⚡ [数据预取] 节省 LLM 调用 {prefetch_stats.get('llm_round_trips_saved', 0)} 次，"
+                f"并发获取节省 {prefetch_stats.get('fetch_seconds_saved', 0)}秒"
+            )
+
         # 将性能数据添加到状态中
         final_state['performance_metrics'] = performance_data
 
@@ -1071,6 +1089,7 @@ class TradingAgentsGraph:
         # 处理决策并添加模型信息
         decision = self.process_signal(final_state["final_trade_decision"], company_name)
         decision['model_info'] = model_info
+        final_state['performance_metrics']['decision_extraction'] = get_decision_source_stats()
 
         # Return decision and processed signal
         return final_state, decision
@@ -1117,6 +1136,8 @@ class TradingAgentsGraph:
                 'Fundamentals Analyst': "💼 基本面分析师",
                 'News Analyst': "📰 新闻分析师",
                 'Social Analyst': "💬 社交媒体分析师",
+                # 数据预取节点（不发送进度更新）
+                'Data Prefetch': None,
                 # 工具节点（不发送进度更新，避免重复）
                 'tools_market': None,
                 'tools_fundamentals': None,
@@ -1186,8 +1207,8 @@ class TradingAgentsGraph:
             # 然后匹配分析师团队
             elif 'Analyst' in node_name:
                 analyst_nodes[node_name] = elapsed
-            # 工具节点
-            elif node_name.startswith('tools_'):
+            # 工具节点（含数据预取节点）
+            elif node_name.startswith('tools_') or node_name == 'Data Prefetch':
                 tool_nodes[node_name] = elapsed
             # 消息清理节点
             elif node_name.startswith('Msg Clear'):
@@ -1296,8 +1317,8 @@ class TradingAgentsGraph:
             # 然后匹配分析师团队
             elif 'Analyst' in node_name:
                 analyst_nodes.append((node_name, elapsed))
-            # 工具节点
-            elif node_name.startswith('tools_'):
+            # 工具节点（含数据预取节点）
+            elif node_name.startswith('tools_') or node_name == 'Data Prefetch':
                 tool_nodes.append((node_name, elapsed))
             # 消息清理节点
             elif node_name.startswith('Msg Clear'):
@@ -1393,23 +1414,60 @@ class TradingAgentsGraph:
         ) as f:
             json.dump(self.log_states_dict, f, indent=4)
 
-    def reflect_and_remember(self, returns_losses):
-        """Reflect on decisions and update memory based on returns."""
-        self.reflector.reflect_bull_researcher(
-            self.curr_state, returns_losses, self.bull_memory
-        )
-        self.reflector.reflect_bear_researcher(
-            self.curr_state, returns_losses, self.bear_memory
-        )
-        self.reflector.reflect_trader(
-            self.curr_state, returns_losses, self.trader_memory
-        )
-        self.reflector.reflect_invest_judge(
-            self.curr_state, returns_losses, self.invest_judge_memory
-        )
-        self.reflector.reflect_risk_manager(
-            self.curr_state, returns_losses, self.risk_manager_memory
+    def reflect_and_remember(self, returns_losses, background: Optional[bool] = None):
+        """Reflect on decisions and update memory based on returns.
+
+        五个组件的反思并发执行，记忆写入共用一次向量计算。
+        background=True（默认取配置 reflection_async）时提交到后台单线程队列后立即返回 Future，
+        反思按提交顺序执行；需要后续分析读到最新记忆时先调用 wait_for_reflections()，用完调用 close()。
+        后台反思在提交时的上下文中运行（LLM 缓存模式、回测时点等 contextvar 随之传入）。
+        """
+        memories = {
+            "bull": self.bull_memory,
+            "bear": self.bear_memory,
+            "trader": self.trader_memory,
+            "invest_judge": self.invest_judge_memory,
+            "risk_manager": self.risk_manager_memory,
+        }
+        if background is None:
+            background = self.config.get("reflection_async", False)
+        if not background:
+            return self.reflector.reflect_all(self.curr_state, returns_losses, memories)
+
+        if self._reflection_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._reflection_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reflection")
+        context = contextvars.copy_context()
+        future = self._reflection_executor.submit(
+            context.run, self.reflector.reflect_all, self.curr_state, returns_losses, memories
         )
+        self._pending_reflections.append(future)
+        return future
+
+    def wait_for_reflections(self, timeout: Optional[float] = None) -> int:
+        """等待后台反思完成（timeout 为总等待时长），返回本次等到结束的数量
+
+        失败的反思记录日志后忽略；超时仍未结束的反思留在队列中，下次调用继续等待。
+        """
+        from concurrent.futures import wait
+
+        pending = list(self._pending_reflections)
+        done, _ = wait(pending, timeout=timeout)
+        self._pending_reflections = [f for f in self._pending_reflections if f not in done]
+        for future in pending:
+            if future in done and not future.cancelled() and future.exception() is not None:
+                logger.error(f"❌ [反思] 后台反思失败: {future.exception()}")
+        return len(done)
+
+    def close(self, wait: bool = True) -> None:
+        """关闭后台反思线程；wait=False 时取消尚未开始的反思，不等待正在执行的反思"""
+        executor, self._reflection_executor = self._reflection_executor, None
+        if executor is None:
+            return
+        if wait:
+            self.wait_for_reflections()
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._pending_reflections = [f for f in self._pending_reflections if not f.done()]
 
     def process_signal(self, full_signal, stock_symbol=None):
         """Process a signal to extract the core decision."""
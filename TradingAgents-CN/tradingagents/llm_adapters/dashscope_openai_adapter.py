@@ -5,11 +5,13 @@
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional, Union, Sequence
 from langchain_openai import ChatOpenAI
 from langchain_core.tools import BaseTool
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from .response_cache import generate_with_cache, log_cache_hit
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -99,11 +101,20 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         api_base = getattr(self, 'base_url', None) or getattr(self, 'openai_api_base', None) or kwargs.get('base_url', 'unknown')
         logger.info(f"   API Base: {api_base}")
     
-    def _generate(self, *args, **kwargs):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
         """重写生成方法，添加 token 使用量追踪"""
         
-        # 调用父类的生成方法
-        result = super()._generate(*args, **kwargs)
+        start_time = time.time()
+
+        # 调用父类的生成方法（启用 LLM 响应缓存时先查缓存）
+        parent_generate = super()._generate
+        result, cache_entry = generate_with_cache(
+            self, messages, stop, kwargs,
+            lambda: parent_generate(messages, stop, run_manager, **kwargs)
+        )
+        if cache_entry is not None:
+            log_cache_hit(self, result, cache_entry, time.time() - start_time)
+            return result
         
         # 追踪 token 使用量
         try:
@@ -116,7 +127,7 @@ class ChatDashScopeOpenAI(ChatOpenAI):
                 
                 if input_tokens > 0 or output_tokens > 0:
                     # 生成会话ID
-                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
+                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(messages))%10000}")
                     analysis_type = kwargs.get('analysis_type', 'stock_analysis')
                     
                     # 使用 TokenTracker 记录使用量
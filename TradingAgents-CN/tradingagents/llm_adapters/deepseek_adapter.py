@@ -10,6 +10,8 @@ from langchain_core.outputs import ChatGeneration, ChatResult
 from langchain_openai import ChatOpenAI
 from langchain_core.callbacks import CallbackManagerForLLMRun
 
+from tradingagents.llm_adapters.response_cache import generate_with_cache, log_cache_hit
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_llm_logging
 
@@ -123,8 +125,15 @@ class ChatDeepSeek(ChatOpenAI):
         analysis_type = kwargs.pop('analysis_type', None)
 
         try:
-            # 调用父类方法生成响应
-            result = super()._generate(messages, stop, run_manager, **kwargs)
+            # 调用父类方法生成响应（启用 LLM 响应缓存时先查缓存）
+            parent_generate = super()._generate
+            result, cache_entry = generate_with_cache(
+                self, messages, stop, kwargs,
+                lambda: parent_generate(messages, stop, run_manager, **kwargs)
+            )
+            if cache_entry is not None:
+                log_cache_hit(self, result, cache_entry, time.time() - start_time)
+                return result
             
             # 提取token使用量
             input_tokens = 0
@@ -5,6 +5,7 @@ Google AI OpenAI兼容适配器
 """
 
 import os
+import time
 from typing import Any, Dict, List, Optional, Union, Sequence
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import BaseTool
@@ -12,6 +13,7 @@ from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, System
 from langchain_core.outputs import LLMResult
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from .response_cache import generate_with_cache, log_cache_hit
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -160,8 +162,14 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
         """重写生成方法，优化工具调用处理和内容格式"""
 
         try:
-            # 调用父类的生成方法
-            result = super()._generate(messages, stop, **kwargs)
+            start_time = time.time()
+
+            # 调用父类的生成方法（启用 LLM 响应缓存时先查缓存）
+            parent_generate = super()._generate
+            result, cache_entry = generate_with_cache(
+                self, messages, stop, kwargs,
+                lambda: parent_generate(messages, stop, **kwargs)
+            )
 
             # 优化返回内容格式
             # 注意：result.generations 是二维列表 [[ChatGeneration]]
@@ -178,7 +186,7 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
                             self._optimize_message_content(generation_list.message)
 
             # 追踪 token 使用量
-            self._track_token_usage(result, kwargs)
+            self._track_token_usage(result, kwargs, cache_entry=cache_entry, start_time=start_time)
 
             return result
 
@@ -258,9 +266,14 @@ class ChatGoogleOpenAI(ChatGoogleGenerativeAI):
         
         return enhanced_content
     
-    def _track_token_usage(self, result: LLMResult, kwargs: Dict[str, Any]):
-        """追踪 token 使用量"""
+    def _track_token_usage(self, result: LLMResult, kwargs: Dict[str, Any],
+                           cache_entry: Optional[Dict[str, Any]] = None, start_time: Optional[float] = None):
+        """追踪 token 使用量（缓存命中时记录节省的token和耗时）"""
         
+        if cache_entry is not None:
+            log_cache_hit(self, result, cache_entry, time.time() - (start_time or time.time()))
+            return
+
         try:
             # 从结果中提取 token 使用信息
             if hasattr(result, 'llm_output') and result.llm_output:
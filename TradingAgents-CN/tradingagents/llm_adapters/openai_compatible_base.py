@@ -11,6 +11,8 @@ from langchain_core.outputs import ChatResult
 from langchain_openai import ChatOpenAI
 from langchain_core.callbacks import CallbackManagerForLLMRun
 
+from tradingagents.llm_adapters.response_cache import generate_with_cache, log_cache_hit
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_llm_logging
 
@@ -166,16 +168,24 @@ class OpenAICompatibleBase(ChatOpenAI):
         # 记录开始时间
         start_time = time.time()
         
-        # 调用父类生成方法
-        result = super()._generate(messages, stop, run_manager, **kwargs)
+        # 调用父类生成方法（启用 LLM 响应缓存时先查缓存）
+        parent_generate = super()._generate
+        result, cache_entry = generate_with_cache(
+            self, messages, stop, kwargs,
+            lambda: parent_generate(messages, stop, run_manager, **kwargs)
+        )
         
         # 记录token使用
-        self._track_token_usage(result, kwargs, start_time)
+        self._track_token_usage(result, kwargs, start_time, cache_entry=cache_entry)
         
         return result
 
-    def _track_token_usage(self, result: ChatResult, kwargs: Dict, start_time: float):
-        """记录token使用量并输出日志"""
+    def _track_token_usage(self, result: ChatResult, kwargs: Dict, start_time: float,
+                           cache_entry: Optional[Dict[str, Any]] = None):
+        """记录token使用量并输出日志（缓存命中时记录节省的token和耗时）"""
+        if cache_entry is not None:
+            log_cache_hit(self, result, cache_entry, time.time() - start_time)
+            return
         if not TOKEN_TRACKING_ENABLED:
             return
         try:
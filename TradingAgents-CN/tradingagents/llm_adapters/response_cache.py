@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+LLM 响应缓存：相同请求（重跑同一股票/日期、失败重试、回测重放）直接返回缓存的响应
+
+- 键：provider + model + temperature + 规范化后的消息（去掉每次运行都会变化的消息/工具调用 ID）
+  + 工具 schema 哈希 + 其他生成参数
+- 后端：本地磁盘（按总大小淘汰最久未使用的条目）或 Redis（TTL 过期）
+- 模式（默认取 LLM_CACHE_MODE，单次运行可用 llm_cache_mode() 覆盖）：
+    off        不使用缓存（默认）
+    readwrite  命中直接返回，未命中调用模型并写入
+    record     总是调用模型并写入（刷新录制）
+    replay     只读：命中直接返回，未命中调用模型但不写入
+
+用法：
+    with llm_cache_mode("replay"):
+        graph.propagate("600519", "2024-05-20")
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tradingagents.utils.logging_manager import get_logger
+
+logger = get_logger('agents')
+
+CACHE_MODES = ("off", "readwrite", "record", "replay")
+
+_KEY_PREFIX = "llmcache"
+
+# 不影响模型输出的参数（token 统计用的自定义参数、回调管理器）
+_IGNORED_KWARGS = {"session_id", "analysis_type", "run_manager"}
+
+_run_mode: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_cache_mode", default=None)
+
+
+@contextlib.contextmanager
+def llm_cache_mode(mode: Optional[str]):
+    """在当前上下文（单次分析/回测运行）内覆盖缓存模式；mode 为 None 时沿用默认配置"""
+    if mode is not None and mode not in CACHE_MODES:
+        raise ValueError(f"不支持的LLM缓存模式: {mode}，可选: {', '.join(CACHE_MODES)}")
+    token = _run_mode.set(mode) if mode is not None else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _run_mode.reset(token)
+
+
+def current_cache_mode() -> str:
+    """当前生效的缓存模式：运行级覆盖优先，其次 LLM_CACHE_MODE"""
+    mode = _run_mode.get() or os.getenv("LLM_CACHE_MODE", "off").lower()
+    return mode if mode in CACHE_MODES else "off"
+
+
+def _normalize_message(message) -> Dict[str, Any]:
+    content = getattr(message, "content", message)
+    if isinstance(content, str):
+        content = content.strip()
+    normalized = {"type": getattr(message, "type", type(message).__name__), "content": content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        # 工具调用 ID 每次运行都不同，只保留名称和参数
+        normalized["tool_calls"] = [{"name": c.get("name"), "args": c.get("args")} for c in tool_calls]
+    name = getattr(message, "name", None)
+    if name:
+        normalized["name"] = name
+    return normalized
+
+
+def make_cache_key(provider: str, model: str, temperature: Any, messages: List[Any],
+                   stop: Optional[List[str]] = None, kwargs: Optional[Dict[str, Any]] = None) -> str:
+    kwargs = {k: v for k, v in (kwargs or {}).items() if k not in _IGNORED_KWARGS}
+    tools = kwargs.pop("tools", None)
+    tools_hash = hashlib.sha1(
+        json.dumps(tools, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest() if tools else None
+    payload = json.dumps({
+        "provider": provider,
+        "model": model,
+        "temperature": temperature,
+        "messages": [_normalize_message(m) for m in messages],
+        "stop": stop,
+        "tools": tools_hash,
+        "kwargs": kwargs,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{_KEY_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def usage_tokens(result) -> Tuple[int, int]:
+    """从 ChatResult 中取 (输入tokens, 输出tokens)"""
+    llm_output = getattr(result, "llm_output", None) or {}
+    token_usage = llm_output.get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0) or 0, token_usage.get("completion_tokens", 0) or 0
+    for generation in getattr(result, "generations", None) or []:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            return usage.get("input_tokens", 0) or 0, usage.get("output_tokens", 0) or 0
+    return 0, 0
+
+
+class DiskCacheBackend:
+    """本地磁盘后端：每个条目一个文件，总大小超过上限时按最近使用时间淘汰"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key: str) -> str:
+        digest = key.rsplit(":", 1)[-1]
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.pkl")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # 刷新最近使用时间
+            return data
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        with self._lock:
+            try:
+                self._total_bytes -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+            self._total_bytes += len(value)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目，直到总大小降到上限的 90%"""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+                removed += 1
+            except OSError:
+                continue
+        logger.info(f"🧹 [LLM缓存] 磁盘缓存超过上限，淘汰 {removed} 个条目")
+
+
+class RedisCacheBackend:
+    """Redis 后端：多进程/多节点共享，条目按 TTL 过期"""
+
+    def __init__(self, redis_client_getter: Callable[[], Any], ttl_seconds: int):
+        self._redis_getter = redis_client_getter
+        self.ttl_seconds = ttl_seconds
+
+    def _client(self):
+        try:
+            return self._redis_getter()
+        except Exception:
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            return client.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] Redis读取失败: {e}")
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        client = self._client()
+        if client is None:
+            return
+        try:
+            client.set(key, value, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] Redis写入失败: {e}")
+
+
+def _default_redis_client():
+    from tradingagents.config.database_manager import get_redis_client
+    return get_redis_client()
+
+
+class LLMResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "tokens_saved": 0, "seconds_saved": 0.0}
+
+    def _bump(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self.backend.get(key)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] 缓存条目损坏，忽略: {e}")
+            return None
+
+    def set(self, key: str, result, elapsed: float) -> None:
+        try:
+            self.backend.set(key, pickle.dumps({"result": result, "elapsed": elapsed, "created_at": time.time()}))
+            self._bump(writes=1)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] 写入失败: {e}")
+
+    def generate(self, llm, messages: List[Any], stop: Optional[List[str]], kwargs: Dict[str, Any],
+                 generate: Callable[[], Any]) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """按当前模式执行一次生成，返回 (ChatResult, 命中的缓存条目或 None)"""
+        mode = current_cache_mode()
+        if mode == "off":
+            return generate(), None
+
+        key = make_cache_key(
+            provider=getattr(llm, "provider_name", None) or llm.__class__.__name__,
+            model=getattr(llm, "model_name", None) or getattr(llm, "model", None),
+            temperature=getattr(llm, "temperature", None),
+            messages=messages, stop=stop, kwargs=kwargs,
+        )
+
+        if mode in ("readwrite", "replay"):
+            entry = self.get(key)
+            if entry is not None:
+                input_tokens, output_tokens = usage_tokens(entry["result"])
+                self._bump(hits=1, tokens_saved=input_tokens + output_tokens, seconds_saved=entry.get("elapsed", 0.0))
+                result = entry["result"].model_copy(deep=True)
+                for generation in result.generations:
+                    # 让 LangChain 为重放的消息分配新的运行 ID，避免与同一状态中的消息冲突
+                    if getattr(generation, "message", None) is not None:
+                        generation.message.id = None
+                return result, entry
+            self._bump(misses=1)
+
+        start = time.time()
+        result = generate()
+        if mode in ("readwrite", "record"):
+            self.set(key, result, time.time() - start)
+        return result, None
+
+
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        backend_name = os.getenv("LLM_CACHE_BACKEND", "disk").lower()
+        if backend_name == "redis":
+            backend = RedisCacheBackend(
+                _default_redis_client,
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            )
+        else:
+            backend = DiskCacheBackend(
+                os.getenv("LLM_CACHE_DIR", os.path.join("data", "cache", "llm_responses")),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            )
+        _response_cache = LLMResponseCache(backend)
+    return _response_cache
+
+
+def generate_with_cache(llm, messages: List[Any], stop: Optional[List[str]], kwargs: Dict[str, Any],
+                        generate: Callable[[], Any]) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """适配器 _generate 的缓存入口；缓存关闭或初始化出错时直接调用模型"""
+    if current_cache_mode() == "off":
+        return generate(), None
+    try:
+        cache = get_llm_response_cache()
+    except Exception as e:
+        logger.warning(f"⚠️ [LLM缓存] 初始化失败，直接调用模型: {e}")
+        return generate(), None
+    return cache.generate(llm, messages, stop, kwargs, generate)
+
+
+def log_cache_hit(llm, result, cache_entry: Dict[str, Any], elapsed: float) -> None:
+    """缓存命中时输出节省的 token 与耗时（供各适配器的 token 统计路径调用）"""
+    input_tokens, output_tokens = usage_tokens(result)
+    saved_seconds = max(0.0, cache_entry.get("elapsed", 0.0) - elapsed)
+    provider = getattr(llm, "provider_name", None) or llm.__class__.__name__
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", "unknown")
+    logger.info(
+        f"💾 [LLM缓存] 命中 - Provider: {provider}, Model: {model}, "
+        f"节省tokens: {input_tokens + output_tokens} (提示: {input_tokens}, 补全: {output_tokens}), "
+        f"节省耗时: {saved_seconds:.2f}s"
+    )
@@ -135,6 +135,8 @@ class UnifiedNewsAnalyzer:
 
             news_items = []
             for query in query_list:
+                # 近似重复新闻只取每簇代表（入库时标注 cluster_rep；历史数据无该字段）
+                query = {**query, 'cluster_rep': {'$ne': False}}
                 cursor = collection.find(query).sort('publish_time', -1).limit(max_news)
                 news_items = list(cursor)
                 if news_items:
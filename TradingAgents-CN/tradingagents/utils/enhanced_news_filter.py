@@ -4,8 +4,10 @@
 """
 
 import pandas as pd
+import os
 import re
 import logging
+import threading
 from typing import List, Dict, Tuple, Optional
 from datetime import datetime
 import numpy as np
@@ -15,6 +17,93 @@ from .news_filter import NewsRelevanceFilter, create_news_filter, get_company_na
 
 logger = logging.getLogger(__name__)
 
+SEMANTIC_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"  # 支持中文的轻量级模型
+CLASSIFICATION_MODEL_NAME = "uer/roberta-base-finetuned-chinanews-chinese"
+
+# 语义模型推理后端：torch（默认）、onnx（sentence-transformers 的 ONNX Runtime 后端）、
+# int8（torch 动态量化 Linear 层，CPU 上更快、精度损失很小）
+EMBEDDING_BACKEND = os.getenv("NEWS_FILTER_EMBEDDING_BACKEND", "torch").lower()
+ENCODE_BATCH_SIZE = int(os.getenv("NEWS_FILTER_BATCH_SIZE", "64"))
+
+# 进程级模型：每个进程只加载一次，所有过滤器实例共享
+_model_lock = threading.Lock()
+_sentence_model = None
+_sentence_model_loaded = False
+_classifier = None
+_classifier_loaded = False
+
+
+def _quantize_int8(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def get_sentence_model():
+    """共享的句向量模型；sentence-transformers 未安装或加载失败时返回 None"""
+    global _sentence_model, _sentence_model_loaded
+    if _sentence_model_loaded:
+        return _sentence_model
+    with _model_lock:
+        if _sentence_model_loaded:
+            return _sentence_model
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"[增强过滤器] 正在加载语义相似度模型 (后端: {EMBEDDING_BACKEND})...")
+            if EMBEDDING_BACKEND == "onnx":
+                try:
+                    _sentence_model = SentenceTransformer(SEMANTIC_MODEL_NAME, backend="onnx")
+                except Exception as e:
+                    logger.warning(f"[增强过滤器] ONNX 后端不可用，回退到 torch: {e}")
+                    _sentence_model = SentenceTransformer(SEMANTIC_MODEL_NAME, device="cpu")
+            elif EMBEDDING_BACKEND == "int8":
+                _sentence_model = _quantize_int8(SentenceTransformer(SEMANTIC_MODEL_NAME, device="cpu"))
+            else:
+                _sentence_model = SentenceTransformer(SEMANTIC_MODEL_NAME)
+            logger.info(f"[增强过滤器] ✅ 语义模型加载成功: {SEMANTIC_MODEL_NAME}")
+        except ImportError:
+            logger.warning("[增强过滤器] sentence-transformers未安装，跳过语义过滤")
+        except Exception as e:
+            logger.error(f"[增强过滤器] 语义模型初始化失败: {e}")
+        _sentence_model_loaded = True
+    return _sentence_model
+
+
+def get_classification_model():
+    """共享的本地分类模型，返回 (tokenizer, model)；不可用时返回 None"""
+    global _classifier, _classifier_loaded
+    if _classifier_loaded:
+        return _classifier
+    with _model_lock:
+        if _classifier_loaded:
+            return _classifier
+        try:
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+            logger.info("[增强过滤器] 正在加载本地分类模型...")
+            tokenizer = AutoTokenizer.from_pretrained(CLASSIFICATION_MODEL_NAME)
+            model = AutoModelForSequenceClassification.from_pretrained(CLASSIFICATION_MODEL_NAME)
+            model.eval()
+            if EMBEDDING_BACKEND == "int8":
+                model = _quantize_int8(model)
+            _classifier = (tokenizer, model)
+            logger.info(f"[增强过滤器] ✅ 分类模型加载成功: {CLASSIFICATION_MODEL_NAME}")
+        except ImportError:
+            logger.warning("[增强过滤器] transformers未安装，跳过本地模型分类")
+        except Exception as e:
+            logger.error(f"[增强过滤器] 本地分类模型初始化失败: {e}")
+        _classifier_loaded = True
+    return _classifier
+
+
+# 综合评分权重
+SCORE_WEIGHTS = {
+    'rule': 0.4,      # 规则过滤权重40%
+    'semantic': 0.35,  # 语义相似度权重35%
+    'classification': 0.25  # 分类模型权重25%
+}
+
+
 class EnhancedNewsFilter(NewsRelevanceFilter):
     """增强新闻过滤器，集成本地模型和多种过滤策略"""
     
@@ -32,7 +121,7 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
         self.use_semantic = use_semantic
         self.use_local_model = use_local_model
         
-        # 语义模型相关
+        # 语义模型相关（模型为进程级共享实例）
         self.sentence_model = None
         self.company_embedding = None
         
@@ -47,64 +136,80 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
             self._init_classification_model()
     
     def _init_semantic_model(self):
-        """初始化语义相似度模型"""
+        """获取共享语义模型，并预计算公司相关文本的（归一化）embedding"""
+        self.sentence_model = get_sentence_model()
+        if self.sentence_model is None:
+            self.use_semantic = False
+            return
         try:
-            logger.info("[增强过滤器] 正在加载语义相似度模型...")
-            
-            # 尝试使用sentence-transformers
-            try:
-                from sentence_transformers import SentenceTransformer
-                
-                # 使用轻量级中文模型
-                model_name = "paraphrase-multilingual-MiniLM-L12-v2"  # 支持中文的轻量级模型
-                self.sentence_model = SentenceTransformer(model_name)
-                
-                # 预计算公司相关的embedding
-                company_texts = [
-                    self.company_name,
-                    f"{self.company_name}股票",
-                    f"{self.company_name}公司",
-                    f"{self.stock_code}",
-                    f"{self.company_name}业绩",
-                    f"{self.company_name}财报"
-                ]
-                
-                self.company_embedding = self.sentence_model.encode(company_texts)
-                logger.info(f"[增强过滤器] ✅ 语义模型加载成功: {model_name}")
-                
-            except ImportError:
-                logger.warning("[增强过滤器] sentence-transformers未安装，跳过语义过滤")
-                self.use_semantic = False
-                
+            company_texts = [
+                self.company_name,
+                f"{self.company_name}股票",
+                f"{self.company_name}公司",
+                f"{self.stock_code}",
+                f"{self.company_name}业绩",
+                f"{self.company_name}财报"
+            ]
+            self.company_embedding = self._encode(company_texts)
         except Exception as e:
             logger.error(f"[增强过滤器] 语义模型初始化失败: {e}")
             self.use_semantic = False
     
     def _init_classification_model(self):
-        """初始化本地分类模型"""
+        """获取共享的本地分类模型"""
+        classifier = get_classification_model()
+        if classifier is None:
+            self.use_local_model = False
+            return
+        self.tokenizer, self.classification_model = classifier
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """批量编码，返回 L2 归一化后的向量（点积即余弦相似度）"""
+        embeddings = self.sentence_model.encode(
+            texts, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False
+        )
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def semantic_scores(self, titles: List[str], contents: List[str]) -> np.ndarray:
+        """一次编码全部候选新闻，与公司 embedding 做矩阵相似度，返回 0-100 评分"""
+        if not self.use_semantic or self.sentence_model is None or not titles:
+            return np.zeros(len(titles))
         try:
-            logger.info("[增强过滤器] 正在加载本地分类模型...")
-            
-            # 尝试使用transformers库的中文分类模型
-            try:
-                from transformers import AutoTokenizer, AutoModelForSequenceClassification
-                import torch
-                
-                # 使用轻量级中文文本分类模型
-                model_name = "uer/roberta-base-finetuned-chinanews-chinese"
-                
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.classification_model = AutoModelForSequenceClassification.from_pretrained(model_name)
-                
-                logger.info(f"[增强过滤器] ✅ 分类模型加载成功: {model_name}")
-                
-            except ImportError:
-                logger.warning("[增强过滤器] transformers未安装，跳过本地模型分类")
-                self.use_local_model = False
-                
+            texts = [f"{title} {content[:200]}" for title, content in zip(titles, contents)]
+            similarities = self._encode(texts) @ self.company_embedding.T
+            return np.clip(similarities.max(axis=1) * 100, 0, 100)
         except Exception as e:
-            logger.error(f"[增强过滤器] 本地分类模型初始化失败: {e}")
-            self.use_local_model = False
+            logger.error(f"[增强过滤器] 语义相似度计算失败: {e}")
+            return np.zeros(len(titles))
+
+    def classification_scores(self, titles: List[str], contents: List[str]) -> np.ndarray:
+        """本地模型批量分类，返回 0-100 的相关性评分"""
+        if not self.use_local_model or self.classification_model is None or not titles:
+            return np.zeros(len(titles))
+        try:
+            import torch
+
+            texts = [f"关于{self.company_name}({self.stock_code})的新闻: {title} {content[:300]}"
+                     for title, content in zip(titles, contents)]
+            scores = []
+            for start in range(0, len(texts), ENCODE_BATCH_SIZE):
+                inputs = self.tokenizer(
+                    texts[start:start + ENCODE_BATCH_SIZE],
+                    return_tensors="pt",
+                    truncation=True,
+                    padding=True,
+                    max_length=512
+                )
+                with torch.no_grad():
+                    probabilities = torch.softmax(self.classification_model(**inputs).logits, dim=-1)
+                # 假设第一个类别是"相关"，第二个是"不相关"（需根据具体模型调整）
+                scores.append(probabilities[:, 0].cpu().numpy())
+            return np.concatenate(scores) * 100
+        except Exception as e:
+            logger.error(f"[增强过滤器] 本地模型分类失败: {e}")
+            return np.zeros(len(titles))
     
     def calculate_semantic_similarity(self, title: str, content: str) -> float:
         """
@@ -117,36 +222,9 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
         Returns:
             float: 语义相似度评分 (0-100)
         """
-        if not self.use_semantic or self.sentence_model is None:
-            return 0
-        
-        try:
-            # 组合标题和内容的前200字符
-            text = f"{title} {content[:200]}"
-            
-            # 计算文本embedding
-            text_embedding = self.sentence_model.encode([text])
-            
-            # 计算与公司相关文本的相似度
-            similarities = []
-            for company_emb in self.company_embedding:
-                similarity = np.dot(text_embedding[0], company_emb) / (
-                    np.linalg.norm(text_embedding[0]) * np.linalg.norm(company_emb)
-                )
-                similarities.append(similarity)
-            
-            # 取最高相似度
-            max_similarity = max(similarities)
-            
-            # 转换为0-100评分
-            semantic_score = max(0, min(100, max_similarity * 100))
-            
-            logger.debug(f"[增强过滤器] 语义相似度评分: {semantic_score:.1f}")
-            return semantic_score
-            
-        except Exception as e:
-            logger.error(f"[增强过滤器] 语义相似度计算失败: {e}")
-            return 0
+        semantic_score = float(self.semantic_scores([title], [content])[0])
+        logger.debug(f"[增强过滤器] 语义相似度评分: {semantic_score:.1f}")
+        return semantic_score
     
     def classify_news_relevance(self, title: str, content: str) -> float:
         """
@@ -159,48 +237,9 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
         Returns:
             float: 分类相关性评分 (0-100)
         """
-        if not self.use_local_model or self.classification_model is None:
-            return 0
-        
-        try:
-            import torch
-            
-            # 构建分类文本
-            text = f"{title} {content[:300]}"
-            
-            # 添加公司信息作为上下文
-            context_text = f"关于{self.company_name}({self.stock_code})的新闻: {text}"
-            
-            # 分词和编码
-            inputs = self.tokenizer(
-                context_text,
-                return_tensors="pt",
-                truncation=True,
-                padding=True,
-                max_length=512
-            )
-            
-            # 模型推理
-            with torch.no_grad():
-                outputs = self.classification_model(**inputs)
-                logits = outputs.logits
-                
-                # 使用softmax获取概率分布
-                probabilities = torch.softmax(logits, dim=-1)
-                
-                # 假设第一个类别是"相关"，第二个是"不相关"
-                # 这里需要根据具体模型调整
-                relevance_prob = probabilities[0][0].item()  # 相关性概率
-                
-                # 转换为0-100评分
-                classification_score = relevance_prob * 100
-                
-                logger.debug(f"[增强过滤器] 分类模型评分: {classification_score:.1f}")
-                return classification_score
-                
-        except Exception as e:
-            logger.error(f"[增强过滤器] 本地模型分类失败: {e}")
-            return 0
+        classification_score = float(self.classification_scores([title], [content])[0])
+        logger.debug(f"[增强过滤器] 分类模型评分: {classification_score:.1f}")
+        return classification_score
     
     def calculate_enhanced_relevance_score(self, title: str, content: str) -> Dict[str, float]:
         """
@@ -234,11 +273,7 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
             scores['classification_score'] = 0
         
         # 4. 综合评分（加权平均）
-        weights = {
-            'rule': 0.4,      # 规则过滤权重40%
-            'semantic': 0.35,  # 语义相似度权重35%
-            'classification': 0.25  # 分类模型权重25%
-        }
+        weights = SCORE_WEIGHTS
         
         final_score = (
             weights['rule'] * rule_score +
@@ -270,27 +305,35 @@ class EnhancedNewsFilter(NewsRelevanceFilter):
         
         logger.info(f"[增强过滤器] 开始增强过滤，原始数量: {len(news_df)}条，最低评分阈值: {min_score}")
         
+        title_col = '新闻标题' if '新闻标题' in news_df.columns else ('标题' if '标题' in news_df.columns else None)
+        content_col = '新闻内容' if '新闻内容' in news_df.columns else ('内容' if '内容' in news_df.columns else None)
+        titles = news_df[title_col].fillna('').astype(str).tolist() if title_col else [''] * len(news_df)
+        contents = news_df[content_col].fillna('').astype(str).tolist() if content_col else [''] * len(news_df)
+
+        # 规则评分逐条计算；语义/分类模型对全部候选新闻批量推理
+        rule_scores = np.array([
+            NewsRelevanceFilter.calculate_relevance_score(self, title, content)
+            for title, content in zip(titles, contents)
+        ], dtype=float)
+        semantic = self.semantic_scores(titles, contents)
+        classification = self.classification_scores(titles, contents)
+        final = (SCORE_WEIGHTS['rule'] * rule_scores + SCORE_WEIGHTS['semantic'] * semantic
+                 + SCORE_WEIGHTS['classification'] * classification)
+
+        keep = final >= min_score
         filtered_news = []
-        
-        for idx, row in news_df.iterrows():
-            title = row.get('新闻标题', row.get('标题', ''))
-            content = row.get('新闻内容', row.get('内容', ''))
-            
-            # 计算增强评分
-            scores = self.calculate_enhanced_relevance_score(title, content)
-            
-            if scores['final_score'] >= min_score:
-                row_dict = row.to_dict()
-                row_dict.update(scores)  # 添加所有评分信息
-                filtered_news.append(row_dict)
-                
-                logger.debug(f"[增强过滤器] 保留新闻 (综合评分: {scores['final_score']:.1f}): {title[:50]}...")
-            else:
-                logger.debug(f"[增强过滤器] 过滤新闻 (综合评分: {scores['final_score']:.1f}): {title[:50]}...")
+        if keep.any():
+            filtered_news = news_df[keep].assign(
+                rule_score=rule_scores[keep],
+                semantic_score=semantic[keep],
+                classification_score=classification[keep],
+                final_score=final[keep],
+            )
+        logger.debug(f"[增强过滤器] 保留 {int(keep.sum())} 条，过滤 {int((~keep).sum())} 条")
         
         # 创建过滤后的DataFrame
-        if filtered_news:
-            filtered_df = pd.DataFrame(filtered_news)
+        if len(filtered_news):
+            filtered_df = filtered_news.reset_index(drop=True)
             # 按综合评分排序
             filtered_df = filtered_df.sort_values('final_score', ascending=False)
             logger.info(f"[增强过滤器] 增强过滤完成，保留 {len(filtered_df)}条 新闻")
@@ -21,6 +21,19 @@ except ImportError:
     logger.warning("pymongo未安装，MongoDB功能不可用")
 
 
+def _with_search_fields(document: Dict[str, Any]) -> Dict[str, Any]:
+    """附加报告列表关键词检索字段（与后端 report_search_service 一致）。
+
+    后端模块不可用时跳过：缺少 search_grams_v 的文档检索时走正则，并由后端启动时补齐。
+    """
+    try:
+        from app.services.report_search_service import build_search_fields
+    except ImportError:
+        return document
+    document.update(build_search_fields(document))
+    return document
+
+
 class MongoDBReportManager:
     """MongoDB报告管理器"""
     
@@ -191,7 +204,7 @@ class MongoDBReportManager:
             }
 
             # 插入文档
-            result = self.collection.insert_one(document)
+            result = self.collection.insert_one(_with_search_fields(document))
 
             if result.inserted_id:
                 logger.info(f"✅ 分析报告已保存到MongoDB: {analysis_id}")
@@ -413,7 +426,7 @@ class MongoDBReportManager:
             # 使用upsert操作，如果存在则更新，不存在则插入
             result = self.collection.replace_one(
                 {"analysis_id": report_data['analysis_id']},
-                report_data,
+                _with_search_fields(report_data),
                 upsert=True
             )
 
@@ -11,6 +11,8 @@ AI 日报简报生成器
   source ~/venv/automation/bin/activate
   python auto_import.py              # 默认最近 24h
   python auto_import.py --hours 48   # 最近 48h
+  python auto_import.py --workers 4  # 4 个公众号并发拉取（共享请求节奏）
+  python auto_import.py --refresh-accounts        # 忽略缓存的 fakeid/游标，全量重拉
   python auto_import.py --list-accounts          # 查看关注列表
   python auto_import.py --add-account "新账号"    # 添加公众号
   python auto_import.py --remove-account "旧账号" # 移除公众号
@@ -28,10 +30,14 @@ import json
 import re
 import shutil
 import sqlite3
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from difflib import SequenceMatcher
 from pathlib import Path
@@ -69,21 +75,31 @@ AI_TITLE_KEYWORDS = [
 ]
 
 SIMILARITY_THRESHOLD = 0.45
-API_DELAY = 1.5  # 秒，API 请求间隔
+API_DELAY = 1.5  # 秒，API 请求间隔（所有线程共享的节奏，不是每个线程各自间隔）
+FETCH_WORKERS = 3  # 并发拉取的公众号数
 SITE_DIR = KB_ROOT / "digest-site"
 
 READING_PROFILE_FILE = SCRIPT_DIR / "reading_profile.json"
 READING_LOG_FILE = LOG_DIR / "reading_log.jsonl"
 
+# 每个公众号的增量游标：fakeid、最新发布时间/消息 id、已拉到的近期文章
+ACCOUNT_STATE_FILE = SCRIPT_DIR / "account_state.json"
+STATE_RETENTION_HOURS = 24 * 7  # 近期文章在状态里保留多久
+FAKEID_MAX_FAILURES = 3  # 缓存的 fakeid 连续拉取失败这么多次后丢弃，下次运行重新搜索
+
 
 # ── 工具函数 ──────────────────────────────────────────────
+_log_lock = threading.Lock()
+
+
 def log(msg: str):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{ts}] {msg}"
-    print(line)
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(AUTO_IMPORT_LOG, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    with _log_lock:
+        print(line)
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(AUTO_IMPORT_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
 
 
 def notify(title: str, msg: str):
@@ -94,9 +110,30 @@ def notify(title: str, msg: str):
     )
 
 
+class _Pacer:
+    """多线程共享的请求节奏：相邻两次请求的发起时间至少间隔 interval 秒。"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+_exporter_pacer = _Pacer(API_DELAY)
+
+
 def _api_get(url: str, params: dict = None, headers: dict = None, retries: int = 3, timeout: int = 10) -> requests.Response:
-    """带指数退避重试的 API GET 请求，仅对超时/连接错误重试"""
+    """带指数退避重试的 API GET 请求，仅对超时/连接错误重试。所有请求共用 _exporter_pacer 的节奏"""
     for attempt in range(retries):
+        _exporter_pacer.wait()
         try:
             r = requests.get(url, params=params, headers=headers, timeout=timeout)
             r.raise_for_status()
@@ -125,6 +162,18 @@ def load_classification_rules() -> dict:
         return json.load(f)
 
 
+_ai_rule_keywords: list[str] | None = None
+
+
+def _get_ai_rule_keywords() -> list[str]:
+    """分类规则里「人工智能」类的关键词（小写），每次运行只读一次文件。"""
+    global _ai_rule_keywords
+    if _ai_rule_keywords is None:
+        rules = load_classification_rules()
+        _ai_rule_keywords = [kw.lower() for kw in rules["categories"].get("人工智能", {}).get("keywords", [])]
+    return _ai_rule_keywords
+
+
 def load_articles_index() -> dict:
     with open(ARTICLES_INDEX_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -239,8 +288,16 @@ def search_account(auth_key: str, keyword: str) -> dict | None:
     return None
 
 
-def fetch_account_articles(auth_key: str, fakeid: str, cutoff_ts: int) -> list[dict]:
-    """拉取某公众号自 cutoff_ts 以来的所有文章"""
+def fetch_account_articles(auth_key: str, fakeid: str, cutoff_ts: int,
+                           known_ts: int = None) -> tuple[list[dict], bool]:
+    """拉取某公众号自 cutoff_ts 以来的所有文章，返回 (文章, 是否完整)。
+
+    known_ts：本地已完整拉到的最新发布时间（游标）。给定时翻页到早于它的文章即停止，
+    只拉游标之后的新文章（同一时间戳的文章会重复返回，由调用方按 link 去重）。
+    翻页到早于停止时间的文章或列表末尾才算完整；中途请求/解析失败时返回已拉到的部分和 False，
+    调用方不能据此推进游标。
+    """
+    stop_ts = max(cutoff_ts, known_ts) if known_ts else cutoff_ts
     url = f"{EXPORTER_BASE}/api/web/mp/appmsgpublish"
     headers = {"X-Auth-Key": auth_key}
     articles = []
@@ -254,18 +311,22 @@ def fetch_account_articles(auth_key: str, fakeid: str, cutoff_ts: int) -> list[d
             data = r.json()
         except Exception as e:
             log(f"    page {begin // size + 1} 失败: {e}")
-            break
+            return articles, False
 
         # publish_page 是 JSON 字符串，需要二次解析
         publish_page_raw = data.get("publish_page", "")
         if not publish_page_raw:
+            ret = (data.get("base_resp") or {}).get("ret", 0)
+            if ret:
+                log(f"    page {begin // size + 1} 失败: ret={ret} {(data.get('base_resp') or {}).get('err_msg', '')}")
+                return articles, False
             break
 
         try:
             publish_page = json.loads(publish_page_raw) if isinstance(publish_page_raw, str) else publish_page_raw
         except json.JSONDecodeError:
             log(f"    publish_page 解析失败")
-            break
+            return articles, False
 
         publish_list = publish_page.get("publish_list", [])
         if not publish_list:
@@ -282,13 +343,14 @@ def fetch_account_articles(auth_key: str, fakeid: str, cutoff_ts: int) -> list[d
 
             for item in pub_info.get("appmsgex", []):
                 create_time = item.get("create_time", 0)
-                if create_time < cutoff_ts:
+                if create_time < stop_ts:
                     reached_cutoff = True
                     break
                 articles.append({
                     "title": item.get("title", ""),
                     "link": item.get("link", ""),
                     "create_time": create_time,
+                    "msgid": item.get("appmsgid", 0),
                     "digest": item.get("digest", ""),
                     "fakeid": fakeid,
                     "nickname": "",  # filled by caller
@@ -301,9 +363,8 @@ def fetch_account_articles(auth_key: str, fakeid: str, cutoff_ts: int) -> list[d
             break
 
         begin += size
-        time.sleep(API_DELAY)
 
-    return articles
+    return articles, True
 
 
 def get_followed_accounts() -> list[str]:
@@ -376,56 +437,174 @@ def sync_accounts_from_chrome() -> list[str]:
         return accounts
 
 
-def fetch_all_articles(auth_key: str, hours: int) -> list[dict]:
-    """拉取所有关注公众号的最新文章"""
+def load_account_state() -> dict:
+    """读取各公众号的增量游标（不存在或损坏时从空状态开始）"""
+    if ACCOUNT_STATE_FILE.exists():
+        try:
+            with open(ACCOUNT_STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            log(f"公众号游标读取失败，将全量拉取: {e}")
+    return {"accounts": {}}
+
+
+def save_account_state(state: dict):
+    state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    tmp_path = ACCOUNT_STATE_FILE.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(ACCOUNT_STATE_FILE)
+
+
+def _record_fetch_failure(name: str, entry: dict) -> dict:
+    """记一次拉取失败；缓存的 fakeid 连续失败达到上限时丢弃（可能已失效），游标保留"""
+    failures = entry.get("failures", 0) + 1
+    if failures < FAKEID_MAX_FAILURES or not entry.get("fakeid"):
+        return {**entry, "failures": failures}
+    log(f"  {name}: 缓存的 fakeid 连续 {failures} 次拉取失败，下次运行重新搜索")
+    return {k: v for k, v in entry.items() if k not in ("fakeid", "failures")}
+
+
+def _fetch_account_incremental(auth_key: str, name: str, entry: dict, cutoff_ts: int,
+                               retention_ts: int) -> tuple[list[dict], dict | None]:
+    """拉取单个公众号：有缓存的 fakeid 就不再搜索；游标覆盖到 cutoff_ts 时只拉游标之后的新文章。
+
+    返回 (cutoff_ts 以来的全部文章, 更新后的状态条目)；找不到公众号时状态条目为 None。
+    """
+    if entry.get("fakeid"):
+        account = {"fakeid": entry["fakeid"], "nickname": entry.get("nickname") or name}
+    else:
+        log(f"搜索: {name}")
+        account = search_account(auth_key, name)
+        if not account:
+            log(f"  未找到: {name}")
+            return [], None
+        log(f"  找到: {account['nickname']} ({account['fakeid'][:8]}...)")
+
+    # 状态里的文章只保证覆盖 covered_since 之后；要看的窗口更早时，这次全量翻到 cutoff_ts
+    covered = entry.get("covered_since", 0) and entry["covered_since"] <= cutoff_ts
+    known_ts = entry.get("last_publish_ts") if covered else None
+    fetched, complete = fetch_account_articles(auth_key, account["fakeid"], cutoff_ts, known_ts=known_ts)
+
+    # Fill in nickname
+    for a in fetched:
+        a["nickname"] = account["nickname"]
+
+    if not complete:
+        # 没翻到停止时间：游标、覆盖范围和缓存文章都保持原样，下次从原游标重新拉，不留缺口
+        by_link = {a["link"]: a for a in (entry.get("recent", []) if covered else [])}
+        by_link.update((a["link"], a) for a in fetched)
+        articles = sorted((a for a in by_link.values() if a["create_time"] >= cutoff_ts),
+                          key=lambda a: a["create_time"], reverse=True)
+        kept_entry = _record_fetch_failure(name, {**entry, "fakeid": account["fakeid"], "nickname": account["nickname"]})
+        log(f"  {account['nickname']}: {len(articles)} 篇（拉取不完整，保留原游标）")
+        return articles, kept_entry
+
+    by_link = {a["link"]: a for a in (entry.get("recent", []) if covered else [])}
+    new_count = sum(1 for a in fetched if a["link"] not in by_link)
+    by_link.update((a["link"], a) for a in fetched)
+    recent = sorted((a for a in by_link.values() if a["create_time"] >= retention_ts),
+                    key=lambda a: a["create_time"], reverse=True)
+
+    latest = recent[0] if recent else None
+    new_entry = {
+        "fakeid": account["fakeid"],
+        "nickname": account["nickname"],
+        "last_publish_ts": latest["create_time"] if latest else entry.get("last_publish_ts", 0),
+        "last_msgid": latest.get("msgid", 0) if latest else entry.get("last_msgid", 0),
+        "covered_since": max(retention_ts, min(cutoff_ts, entry.get("covered_since") or cutoff_ts)),
+        "fetched_at": int(time.time()),
+        "recent": recent,
+    }
+    articles = [a for a in recent if a["create_time"] >= cutoff_ts]
+    mode = "增量" if known_ts else "全量"
+    log(f"  {account['nickname']}: {len(articles)} 篇（{mode}，新拉到 {new_count} 篇）")
+    return articles, new_entry
+
+
+def fetch_all_articles(auth_key: str, hours: int, workers: int = FETCH_WORKERS,
+                       refresh: bool = False) -> list[dict]:
+    """拉取所有关注公众号的最新文章。
+
+    每个公众号的 fakeid 与游标持久化在 account_state.json，重复运行只拉游标之后的新文章；
+    多个公众号并发拉取（最多 workers 个），所有请求共享 API_DELAY 节奏。
+    refresh=True 时忽略已有状态：重新搜索 fakeid 并全量翻页。
+    """
+    now_ts = int(time.time())
     cutoff_ts = int((datetime.now() - timedelta(hours=hours)).timestamp())
-    all_articles = []
+    retention_ts = min(cutoff_ts, now_ts - STATE_RETENTION_HOURS * 3600)
 
     followed = get_followed_accounts()
     if not followed:
         return []
 
     log(f"关注列表 ({len(followed)}): {', '.join(followed)}")
+    state = {"accounts": {}} if refresh else load_account_state()
+    accounts_state = state.setdefault("accounts", {})
 
-    for name in followed:
-        log(f"搜索: {name}")
-        account = search_account(auth_key, name)
-        time.sleep(API_DELAY)
+    def fetch_one(name: str) -> tuple[str, list[dict], dict | None]:
+        try:
+            articles, entry = _fetch_account_incremental(
+                auth_key, name, accounts_state.get(name, {}), cutoff_ts, retention_ts)
+        except Exception as e:
+            log(f"  {name} 拉取失败: {e}")
+            entry = accounts_state.get(name)
+            return name, [], _record_fetch_failure(name, entry) if entry else None
+        return name, articles, entry
 
-        if not account:
-            log(f"  未找到: {name}")
-            continue
+    all_articles = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(fetch_one, followed))
 
-        log(f"  找到: {account['nickname']} ({account['fakeid'][:8]}...)")
-        articles = fetch_account_articles(auth_key, account["fakeid"], cutoff_ts)
+    for name, articles, entry in results:  # 按关注列表顺序汇总，与串行拉取的输出顺序一致
+        if entry is not None:
+            accounts_state[name] = entry
+        all_articles.extend(articles)
 
-        # Fill in nickname
-        for a in articles:
-            a["nickname"] = account["nickname"]
+    # 取消关注的公众号不再保留游标
+    for name in list(accounts_state):
+        if name not in followed:
+            del accounts_state[name]
 
-        log(f"  {account['nickname']}: {len(articles)} 篇")
-        all_articles.extend(articles)
-        time.sleep(API_DELAY)
+    try:
+        save_account_state(state)
+    except OSError as e:
+        log(f"公众号游标保存失败: {e}")
 
     return all_articles
 
 
 # ── AI 相关性判断 ─────────────────────────────────────────
+_AI_TITLE_KEYWORDS_LOWER = [kw.lower() for kw in AI_TITLE_KEYWORDS]
+
+
 def is_ai_related(title: str, digest: str) -> bool:
-    text = (title + " " + digest).lower()
     title_lower = title.lower()
+    if any(kw in title_lower for kw in _AI_TITLE_KEYWORDS_LOWER):
+        return True
 
-    for kw in AI_TITLE_KEYWORDS:
-        if kw.lower() in title_lower:
-            return True
-
-    rules = load_classification_rules()
-    ai_keywords = rules["categories"].get("人工智能", {}).get("keywords", [])
-    match_count = sum(1 for kw in ai_keywords if kw.lower() in text)
-    return match_count >= 2
+    text = (title + " " + digest).lower()
+    match_count = 0
+    for kw in _get_ai_rule_keywords():
+        if kw in text:
+            match_count += 1
+            if match_count >= 2:
+                return True
+    return False
 
 
 # ── 合并同类项 ────────────────────────────────────────────
+# 两两比较是 O(n²)：先用 MinHash/LSH（标题字符 2-gram）找候选对，只对候选做精确相似度判定。
+# 48 段 × 2 行：LSH 的 S 曲线拐点约在 2-gram Jaccard 0.14，同一事件的改写标题都会成为候选；
+# 只有半句相同、相似度刚过阈值的边缘对可能漏掉（benchmark_merge.py 实测召回约 98%）。
+# 候选的判定与 _title_similarity 完全一致。
+MINHASH_PERM = 96
+MINHASH_BANDS = 48
+_MINHASH_ROWS = MINHASH_PERM // MINHASH_BANDS
+_TITLE_WORD_RE = re.compile(r'[\u4e00-\u9fff]{2,}|[A-Za-z]{2,}')
+_shingle_hash_cache: dict[str, tuple] = {}
+
+
 def _clean_title(title: str) -> str:
     title = re.sub(r'[，。！？、：；\u201c\u201d\u2018\u2019【】《》（）\s|｜·…]', ' ', title)
     title = re.sub(r'[,.\\!?:;\'"()\[\]{}\\-]', ' ', title)
@@ -434,12 +613,40 @@ def _clean_title(title: str) -> str:
     return title.strip()
 
 
+def _title_features(title: str) -> tuple[str, set, Counter]:
+    """每个标题只清洗、分词一次：(清洗后标题, 词集合, 字符计数)。"""
+    cleaned = _clean_title(title)
+    return cleaned, set(_TITLE_WORD_RE.findall(cleaned)), Counter(cleaned)
+
+
+def _similarity_reaches(fa: tuple, fb: tuple, threshold: float) -> bool:
+    """精确判定 _title_similarity(a, b) >= threshold。
+
+    先看词 Jaccard；再用 SequenceMatcher 的两个上界（长度比、字符多重集重合度，
+    即 real_quick_ratio / quick_ratio，这里用预先算好的字符计数）提前排除，最后才算 ratio。
+    """
+    words_a, words_b = fa[1], fb[1]
+    if words_a and words_b:
+        union = len(words_a | words_b)
+        if union and len(words_a & words_b) / union >= threshold:
+            return True
+    total = len(fa[0]) + len(fb[0])
+    if not total or 2 * min(len(fa[0]), len(fb[0])) < threshold * total:
+        return False
+    chars_a, chars_b = fa[2], fb[2]
+    if len(chars_a) > len(chars_b):
+        chars_a, chars_b = chars_b, chars_a
+    overlap = sum(min(n, chars_b[ch]) for ch, n in chars_a.items() if ch in chars_b)
+    if 2 * overlap < threshold * total:
+        return False
+    return SequenceMatcher(None, fa[0], fb[0]).ratio() >= threshold
+
+
 def _title_similarity(a: str, b: str) -> float:
-    ca, cb = _clean_title(a), _clean_title(b)
-    ratio = SequenceMatcher(None, ca, cb).ratio()
+    fa, fb = _title_features(a), _title_features(b)
+    ratio = SequenceMatcher(None, fa[0], fb[0]).ratio()
 
-    words_a = set(re.findall(r'[\u4e00-\u9fff]{2,}|[A-Za-z]{2,}', ca))
-    words_b = set(re.findall(r'[\u4e00-\u9fff]{2,}|[A-Za-z]{2,}', cb))
+    words_a, words_b = fa[1], fb[1]
     if words_a and words_b:
         overlap = len(words_a & words_b)
         union = len(words_a | words_b)
@@ -449,21 +656,58 @@ def _title_similarity(a: str, b: str) -> float:
     return ratio
 
 
+def _shingle_hashes(shingle: str) -> tuple:
+    """一个 shingle 的 MINHASH_PERM 个 32 位哈希（shake_128 一次产出，结果按 shingle 缓存）。"""
+    hashes = _shingle_hash_cache.get(shingle)
+    if hashes is None:
+        digest = hashlib.shake_128(shingle.encode("utf-8")).digest(4 * MINHASH_PERM)
+        hashes = struct.unpack(f"<{MINHASH_PERM}I", digest)
+        _shingle_hash_cache[shingle] = hashes
+    return hashes
+
+
+def _minhash_signature(cleaned_title: str) -> list | None:
+    text = re.sub(r'\s+', '', cleaned_title.lower())
+    if not text:
+        return None
+    shingles = {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+    return list(map(min, zip(*(_shingle_hashes(sh) for sh in shingles))))
+
+
+def _lsh_candidates(signatures: list) -> list[set]:
+    """LSH 分桶：任一段签名完全相同的标题互为候选。返回每个标题的候选下标集合。"""
+    candidates = [set() for _ in signatures]
+    for band in range(MINHASH_BANDS):
+        lo = band * _MINHASH_ROWS
+        buckets = defaultdict(list)
+        for i, sig in enumerate(signatures):
+            if sig is not None:
+                buckets[tuple(sig[lo:lo + _MINHASH_ROWS])].append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                for i in members:
+                    candidates[i].update(members)
+    for i, cands in enumerate(candidates):
+        cands.discard(i)
+    return candidates
+
+
 def merge_similar_articles(articles: list[dict]) -> list[list[dict]]:
-    n = len(articles)
-    visited = [False] * n
-    groups = []
+    """按标题相似度合并同类项：按顺序取一篇作为组首，吸收其后所有相似且未归组的文章。"""
+    features = [_title_features(a["title"]) for a in articles]
+    candidates = _lsh_candidates([_minhash_signature(f[0]) for f in features])
 
-    for i in range(n):
+    visited = [False] * len(articles)
+    groups = []
+    for i, article in enumerate(articles):
         if visited[i]:
             continue
-        group = [articles[i]]
+        group = [article]
         visited[i] = True
-        for j in range(i + 1, n):
-            if visited[j]:
+        for j in sorted(candidates[i]):
+            if j <= i or visited[j]:
                 continue
-            sim = _title_similarity(articles[i]["title"], articles[j]["title"])
-            if sim >= SIMILARITY_THRESHOLD:
+            if _similarity_reaches(features[i], features[j], SIMILARITY_THRESHOLD):
                 group.append(articles[j])
                 visited[j] = True
         group.sort(key=lambda a: len(a.get("digest", "")), reverse=True)
@@ -1089,6 +1333,8 @@ def manage_accounts(args):
 def main():
     parser = argparse.ArgumentParser(description="AI 日报简报生成器")
     parser.add_argument("--hours", type=int, default=24, help="扫描最近 N 小时（默认 24）")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help=f"并发拉取的公众号数（默认 {FETCH_WORKERS}）")
+    parser.add_argument("--refresh-accounts", action="store_true", help="忽略缓存的 fakeid/游标，全量重拉")
     parser.add_argument("--list-accounts", action="store_true", help="列出关注的公众号")
     parser.add_argument("--add-account", type=str, help="添加公众号")
     parser.add_argument("--remove-account", type=str, help="移除公众号")
@@ -1167,7 +1413,10 @@ def main():
         sys.exit(1)
 
     # 3. 拉取所有公众号文章
-    raw_articles = fetch_all_articles(auth_key, args.hours)
+    fetch_start = time.time()
+    raw_articles = fetch_all_articles(auth_key, args.hours, workers=args.workers,
+                                      refresh=args.refresh_accounts)
+    log(f"拉取耗时 {time.time() - fetch_start:.1f}s")
     if not raw_articles:
         log("没有找到最近的文章，退出")
         return
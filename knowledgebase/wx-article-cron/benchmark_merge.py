@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+合并同类项基准：MinHash/LSH 候选 + 精确判定 vs 原来的两两比较
+
+用合成标题（知识库分句拼成事件标题，同一事件由不同公众号改写成 1~4 篇）测 merge_similar_articles 的耗时，
+并在 --brute-max 以内与 O(n²) 两两比较的分组结果对比（同组文章对的召回率、分组是否完全一致）。
+两两比较在 10k 篇时要跑 5000 万次 SequenceMatcher，超过 --brute-max 只按 n² 外推耗时。
+
+用法：
+  python benchmark_merge.py                      # 默认 1000,10000 篇
+  python benchmark_merge.py --sizes 500,2000 --brute-max 2000 --seed 7
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import auto_import
+
+PREFIXES = ["", "", "刚刚，", "独家｜", "深度：", "重磅！"]
+SUFFIXES = ["", "", "！", "，背后的真相", "，意味着什么", "，业内怎么看"]
+
+
+def load_clauses() -> list[str]:
+    """从知识库文章和历史简报里切出 8~30 字的中文分句，作为合成标题的素材。"""
+    clauses = set()
+    sources = list(auto_import.KNOWLEDGE_BASE_DIR.rglob("*.md")) + list(auto_import.DIGEST_DIR.glob("*.md"))
+    for path in sources:
+        for clause in re.split(r'[，。！？；：\n、（）()\u201c\u201d"|#>*\-\[\]]+', path.read_text(encoding="utf-8")):
+            clause = clause.strip()
+            if 8 <= len(clause) <= 30 and re.search(r'[\u4e00-\u9fff]{4}', clause):
+                clauses.add(clause)
+    return sorted(clauses)
+
+
+def _rewrite(title: str, rng: random.Random) -> str:
+    """模拟不同公众号改写同一事件：加前后缀、删掉几个字。"""
+    chars = list(title)
+    for _ in range(rng.randint(0, 2)):
+        if len(chars) > 10:
+            del chars[rng.randrange(len(chars))]
+    return rng.choice(PREFIXES) + "".join(chars) + rng.choice(SUFFIXES)
+
+
+def make_articles(n: int, seed: int, clauses: list[str]) -> list[dict]:
+    """每个事件 = 两个随机分句拼成的标题，由 1~4 个公众号各改写一次。"""
+    rng = random.Random(seed)
+    articles = []
+    story = 0
+    while len(articles) < n:
+        base = "，".join(rng.sample(clauses, 2))
+        for _ in range(min(rng.choice([1, 1, 1, 2, 2, 3, 4]), n - len(articles))):
+            articles.append({"title": _rewrite(base, rng), "digest": "x" * rng.randint(0, 80), "story": story})
+        story += 1
+    rng.shuffle(articles)
+    return articles
+
+
+def merge_bruteforce(articles: list[dict]) -> list[list[dict]]:
+    """原实现：每对文章都算一次 _title_similarity。"""
+    n = len(articles)
+    visited = [False] * n
+    groups = []
+    for i in range(n):
+        if visited[i]:
+            continue
+        group = [articles[i]]
+        visited[i] = True
+        for j in range(i + 1, n):
+            if visited[j]:
+                continue
+            if auto_import._title_similarity(articles[i]["title"], articles[j]["title"]) >= auto_import.SIMILARITY_THRESHOLD:
+                group.append(articles[j])
+                visited[j] = True
+        groups.append(group)
+    return groups
+
+
+def _pairs(groups: list[list[dict]]) -> set:
+    return {(a["id"], b["id"]) for g in groups for a in g for b in g if a["id"] < b["id"]}
+
+
+def _partition(groups: list[list[dict]]) -> set:
+    return {frozenset(a["id"] for a in g) for g in groups}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并同类项基准：LSH vs 两两比较")
+    parser.add_argument("--sizes", default="1000,10000", help="文章数，逗号分隔")
+    parser.add_argument("--brute-max", type=int, default=2000, help="不超过该篇数时实际运行两两比较并对比结果")
+    parser.add_argument("--seed", type=int, default=20260220)
+    args = parser.parse_args()
+
+    clauses = load_clauses()
+    if len(clauses) < 100:
+        sys.exit(f"知识库分句太少（{len(clauses)} 条），无法合成标题")
+
+    brute_rate = None  # 每对比较耗时（秒），用于外推
+    print(f"{'篇数':>7} | {'LSH 耗时':>9} | {'分组':>6} | {'两两比较耗时':>12} | {'同组对召回':>10} | {'分组一致':>8}")
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        articles = make_articles(n, args.seed, clauses)
+        for i, a in enumerate(articles):
+            a["id"] = i
+
+        auto_import._shingle_hash_cache.clear()
+        start = time.perf_counter()
+        groups = auto_import.merge_similar_articles([dict(a) for a in articles])
+        lsh_seconds = time.perf_counter() - start
+
+        if n <= args.brute_max:
+            start = time.perf_counter()
+            reference = merge_bruteforce(articles)
+            brute_seconds = time.perf_counter() - start
+            brute_rate = brute_seconds / max(1, n * (n - 1) / 2)
+            ref_pairs = _pairs(reference)
+            recall = len(_pairs(groups) & ref_pairs) / len(ref_pairs) if ref_pairs else 1.0
+            brute_col = f"{brute_seconds:>11.2f}s"
+            recall_col = f"{recall:>10.3f}"
+            same_col = f"{'是' if _partition(groups) == _partition(reference) else '否':>8}"
+        else:
+            estimate = f"~{brute_rate * n * (n - 1) / 2:.0f}s(外推)" if brute_rate else "-"
+            brute_col, recall_col, same_col = f"{estimate:>12}", f"{'-':>10}", f"{'-':>8}"
+
+        print(f"{n:>7} | {lsh_seconds:>8.2f}s | {len(groups):>6} | {brute_col} | {recall_col} | {same_col}")
+
+
+if __name__ == "__main__":
+    main()
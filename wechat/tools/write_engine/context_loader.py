@@ -5,32 +5,173 @@
 职责：读取方法论、人设、经验库、系列经验、素材，按 Pass 需求裁剪后返回。
 
 v2: 新增共享上下文层 + Pass 3.5 协商闭环所需的 assemble 方法。
+v3: 解析结果按源文件 (mtime, size) 缓存，文件没变就不再重读、重切分；
+    缓存是进程级共享的，批量调度时多篇文章共用（已发文章索引、方法论切片只算一次）；
+    每个 assemble_* 记录耗时与缓存命中，写作引擎结束时输出分 Pass 的上下文组装耗时。
 """
 
+import functools
 import json
+import logging
 import re
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 
+log = logging.getLogger("write_engine")
+
+# 素材目录里不算素材的文件（引擎各 Pass 的产出）
+NON_MATERIAL_FILES = (
+    "poll.md", "publish_guide.md", "review_report.md",
+    "factcheck_report.md", "consensus.md",
+    "verification_report.md", "description_options.md",
+    "consensus_doc.md", "orphaned_recommendations.md",
+    "title_options.md",
+)
+
+
+class SourceCache:
+    """解析结果缓存：以源文件的 (mtime_ns, size) 作为版本戳，任一源文件变化即失效。
+
+    线程安全；同一进程内的所有 ContextLoader 默认共用一个实例（见 get_source_cache）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def stamp(paths) -> tuple:
+        """源文件版本戳；不存在的文件记为 None，之后出现同样会失效。"""
+        result = []
+        for path in paths:
+            try:
+                st = path.stat()
+                result.append((str(path), st.st_mtime_ns, st.st_size))
+            except OSError:
+                result.append((str(path), None))
+        return tuple(result)
+
+    def get_or_build(self, key: tuple, paths, builder) -> tuple:
+        """返回 (value, 是否命中)。builder 在锁外执行，并发时最多重复算一次。"""
+        stamp = self.stamp(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1], True
+            self.misses += 1
+        value = builder()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_source_cache = None
+_source_cache_lock = threading.Lock()
+
+
+def get_source_cache() -> SourceCache:
+    """进程级共享的源文件缓存（单例）。"""
+    global _source_cache
+    if _source_cache is None:
+        with _source_cache_lock:
+            if _source_cache is None:
+                _source_cache = SourceCache()
+    return _source_cache
+
+
+def _timed_assembly(method):
+    """记录 assemble_* 的耗时与缓存命中，按 Pass 名汇总到 loader.timings。"""
+    name = method.__name__.removeprefix("assemble_").removesuffix("_context")
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        hits, misses = self._hits, self._misses
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stat = self.timings.setdefault(name, {"calls": 0, "seconds": 0.0, "hits": 0, "misses": 0})
+            stat["calls"] += 1
+            stat["seconds"] += time.perf_counter() - start
+            stat["hits"] += self._hits - hits
+            stat["misses"] += self._misses - misses
+
+    return wrapper
+
 
 class ContextLoader:
     """加载写作引擎所需的各类上下文。"""
 
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, cache: SourceCache = None):
         self.project_root = project_root
         self.wechat_dir = project_root / "wechat"
+        self.cache = cache or get_source_cache()
+        self.timings: dict[str, dict] = {}
+        self._hits = 0
+        self._misses = 0
+
+    # ── 缓存与耗时统计 ──────────────────────────────────
+
+    def _cached(self, key: tuple, paths, builder):
+        value, hit = self.cache.get_or_build(key, paths, builder)
+        if hit:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return value
+
+    @staticmethod
+    def _read(path: Path) -> str:
+        return path.read_text(encoding="utf-8") if path.exists() else ""
+
+    def timing_report(self) -> dict:
+        """各 Pass 上下文组装的调用次数、总耗时（ms）、缓存命中/未命中次数。"""
+        return {
+            name: {"calls": s["calls"], "total_ms": round(s["seconds"] * 1000, 1),
+                   "avg_ms": round(s["seconds"] * 1000 / s["calls"], 1),
+                   "cache_hits": s["hits"], "cache_misses": s["misses"]}
+            for name, s in self.timings.items()
+        }
+
+    def log_timing_summary(self):
+        if not self.timings:
+            return
+        total = sum(s["seconds"] for s in self.timings.values())
+        log.info(f"上下文组装: 共 {total * 1000:.0f}ms，缓存命中 {self._hits} 次 / 未命中 {self._misses} 次")
+        for name, s in self.timing_report().items():
+            log.info(f"  {name}: {s['calls']} 次, {s['total_ms']:.0f}ms (平均 {s['avg_ms']:.1f}ms), "
+                     f"命中 {s['cache_hits']} / 未命中 {s['cache_misses']}")
 
     # ── 基础加载方法 ────────────────────────────────────
 
+    @property
+    def _methodology_path(self) -> Path:
+        return self.wechat_dir / "内容方法论.md"
+
     def load_methodology(self) -> str:
         """读取完整内容方法论。"""
-        path = self.wechat_dir / "内容方法论.md"
-        if path.exists():
-            return path.read_text(encoding="utf-8")
-        return ""
+        path = self._methodology_path
+        return self._cached(("methodology",), [path], lambda: self._read(path))
 
     def load_methodology_section(self, section_name: str) -> str:
         """提取方法论中的特定章节。按 ## 标题切分。"""
+        return self._cached(("methodology_section", section_name), [self._methodology_path],
+                            lambda: self._build_methodology_section(section_name))
+
+    def _build_methodology_section(self, section_name: str) -> str:
         full = self.load_methodology()
         if not full:
             return ""
@@ -43,13 +184,17 @@ class ContextLoader:
     def load_persona(self, name: str) -> str:
         """读取人设档案。"""
         path = self.wechat_dir / "人设" / f"{name}.md"
-        if path.exists():
-            return path.read_text(encoding="utf-8")
-        return f"（未找到人设档案：{name}）"
+        return self._cached(("persona", name), [path],
+                            lambda: self._read(path) if path.exists() else f"（未找到人设档案：{name}）")
 
     def load_experience(self, max_entries: int = 20) -> str:
         """读取经验库最近 N 条。"""
         path = self.wechat_dir / "experience.jsonl"
+        return self._cached(("experience", max_entries), [path],
+                            lambda: self._build_experience(path, max_entries))
+
+    @staticmethod
+    def _build_experience(path: Path, max_entries: int) -> str:
         if not path.exists():
             return ""
         lines = path.read_text(encoding="utf-8").strip().split("\n")
@@ -71,74 +216,92 @@ class ContextLoader:
         if not series_name:
             return ""
         path = self.wechat_dir / "公众号已发" / series_name / "lessons.md"
-        if path.exists():
-            return path.read_text(encoding="utf-8")
-        return ""
+        return self._cached(("series_lessons", series_name), [path], lambda: self._read(path))
+
+    @staticmethod
+    def _is_published_article(md_file: Path) -> bool:
+        return not (md_file.name in ("lessons.md",) or md_file.name.endswith("-metrics.md"))
+
+    def _published_files(self) -> list:
+        published_dir = self.wechat_dir / "公众号已发"
+        if not published_dir.exists():
+            return []
+        return [md_file
+                for series_sub in sorted(published_dir.iterdir()) if series_sub.is_dir()
+                for md_file in sorted(series_sub.glob("*.md")) if self._is_published_article(md_file)]
+
+    def load_published_index(self) -> list:
+        """已发文章索引：[(系列名, 文件名, 前 10 行预览, 全文)]。
+
+        所有系列共用一份，任一已发文章增删改时整体重建；各 (系列, 人设) 的续恰摘要都从这里切。
+        """
+        files = self._published_files()
+        return self._cached(("published_index",), files, lambda: [
+            (md_file.parent.name, md_file.name,
+             "\n".join(content.strip().split("\n")[:10]), content)
+            for md_file in files
+            for content in (md_file.read_text(encoding="utf-8"),)
+        ])
 
     def load_series_articles_summary(self, series_name: str,
                                       persona_name: str = None) -> str:
         """读取系列已发文章 + 同人设跨系列文章，用于续恰。"""
+        files = self._published_files()
+        return self._cached(("series_summary", series_name, persona_name), files,
+                            lambda: self._build_series_summary(series_name, persona_name))
+
+    def _build_series_summary(self, series_name: str, persona_name: str) -> str:
+        index = self.load_published_index()
         result = []
 
         # 1) 按系列查：公众号已发/{series_name}/
+        seen_files = set()
         if series_name:
-            series_dir = self.wechat_dir / "公众号已发" / series_name
-            if series_dir.exists():
-                for md_file in sorted(series_dir.glob("*.md")):
-                    if md_file.name in ("lessons.md",) or md_file.name.endswith("-metrics.md"):
-                        continue
-                    content = md_file.read_text(encoding="utf-8")
-                    lines = content.strip().split("\n")
-                    preview = "\n".join(lines[:10])
-                    result.append(f"### [系列:{series_name}] {md_file.name}\n{preview}\n")
+            for series, name, preview, _ in index:
+                if series == series_name:
+                    result.append(f"### [系列:{series_name}] {name}\n{preview}\n")
+                    seen_files.add(name)
 
         # 2) 按人设查：扫描所有已发目录，找 publish_guide 或文末署名匹配人设的文章
         if persona_name:
-            published_dir = self.wechat_dir / "公众号已发"
-            seen_files = {r.split("] ")[-1].split("\n")[0] for r in result}  # 去重
-            if published_dir.exists():
-                for series_sub in sorted(published_dir.iterdir()):
-                    if not series_sub.is_dir():
-                        continue
-                    for md_file in sorted(series_sub.glob("*.md")):
-                        if md_file.name in seen_files:
-                            continue
-                        if md_file.name in ("lessons.md",) or md_file.name.endswith("-metrics.md"):
-                            continue
-                        content = md_file.read_text(encoding="utf-8")
-                        # 检查文章是否由该人设执笔（署名行或内容提及）
-                        if persona_name in content:
-                            lines = content.strip().split("\n")
-                            preview = "\n".join(lines[:10])
-                            result.append(
-                                f"### [同人设:{persona_name}, 系列:{series_sub.name}] "
-                                f"{md_file.name}\n{preview}\n")
-                            seen_files.add(md_file.name)
+            for series, name, preview, content in index:
+                if name in seen_files:  # 去重
+                    continue
+                # 检查文章是否由该人设执笔（署名行或内容提及）
+                if persona_name in content:
+                    result.append(
+                        f"### [同人设:{persona_name}, 系列:{series}] "
+                        f"{name}\n{preview}\n")
+                    seen_files.add(name)
 
         if not result:
             return "（无已发文章可供续恰对比）"
         return "\n".join(result)
 
-    def load_materials(self, topic_dir: Path) -> str:
-        """读取选题目录下的所有素材。"""
+    def precompute_series_summaries(self, pairs) -> int:
+        """批量调度前预热：[(series, persona)] 的续恰摘要各算一次，后续文章直接命中缓存。"""
+        pairs = set(pairs)
+        for series_name, persona_name in pairs:
+            self.load_series_articles_summary(series_name, persona_name)
+        return len(pairs)
+
+    @staticmethod
+    def _material_files(topic_dir: Path) -> list:
         materials_dir = topic_dir / "素材"
         if not materials_dir.exists():
             materials_dir = topic_dir
+        return [
+            md_file for md_file in sorted(materials_dir.rglob("*.md"))
+            if not (md_file.name.startswith("article") or md_file.name.startswith("iteration_")
+                    or md_file.name in NON_MATERIAL_FILES)
+        ]
 
-        result = []
-        for md_file in sorted(materials_dir.rglob("*.md")):
-            if md_file.name.startswith("article") or md_file.name.startswith("iteration_") or md_file.name in (
-                "poll.md", "publish_guide.md", "review_report.md",
-                "factcheck_report.md", "consensus.md",
-                "verification_report.md", "description_options.md",
-                "consensus_doc.md", "orphaned_recommendations.md",
-                "title_options.md",
-            ):
-                continue
-            content = md_file.read_text(encoding="utf-8")
-            result.append(f"\n--- 素材：{md_file.name} ---\n{content}")
-
-        return "\n".join(result) if result else "（未找到素材文件）"
+    def load_materials(self, topic_dir: Path) -> str:
+        """读取选题目录下的所有素材。"""
+        files = self._material_files(topic_dir)
+        return self._cached(("materials", str(topic_dir)), files, lambda: "\n".join(
+            f"\n--- 素材：{md_file.name} ---\n{md_file.read_text(encoding='utf-8')}" for md_file in files
+        ) or "（未找到素材文件）")
 
     # ── 共享上下文层 ────────────────────────────────────
 
@@ -152,6 +315,11 @@ class ContextLoader:
                 return materials[:max_chars] + "\n\n[...素材摘要已截断...]"
             return materials
 
+        return self._cached(("materials_summary", str(dr_path), max_chars), [dr_path],
+                            lambda: self._build_materials_summary(dr_path, max_chars))
+
+    @staticmethod
+    def _build_materials_summary(dr_path: Path, max_chars: int) -> str:
         content = dr_path.read_text(encoding="utf-8")
 
         # 优先提取核心段落
@@ -187,6 +355,11 @@ class ContextLoader:
 
     def load_persona_summary(self, name: str, max_lines: int = 50) -> str:
         """读取人设摘要（前 max_lines 行），用于共享上下文。"""
+        path = self.wechat_dir / "人设" / f"{name}.md"
+        return self._cached(("persona_summary", name, max_lines), [path],
+                            lambda: self._build_persona_summary(name, max_lines))
+
+    def _build_persona_summary(self, name: str, max_lines: int) -> str:
         full = self.load_persona(name)
         lines = full.strip().split("\n")
         if len(lines) <= max_lines:
@@ -195,6 +368,10 @@ class ContextLoader:
 
     def load_methodology_core(self, max_chars: int = 2000) -> str:
         """提取方法论核心：铁律 + 写作规则 + Review 铁律。"""
+        return self._cached(("methodology_core", max_chars), [self._methodology_path],
+                            lambda: self._build_methodology_core(max_chars))
+
+    def _build_methodology_core(self, max_chars: int) -> str:
         full = self.load_methodology()
         if not full:
             return ""
@@ -233,6 +410,9 @@ class ContextLoader:
         提取 '🔺 **Review 铁律' 开始到该 blockquote 结束的内容，
         加上 '自我 Review 框架：三层恰' 段落。
         """
+        return self._cached(("review_checklist",), [self._methodology_path], self._build_review_checklist)
+
+    def _build_review_checklist(self) -> str:
         full = self.load_methodology()
         if not full:
             return ""
@@ -277,18 +457,25 @@ class ContextLoader:
         if not materials_dir.exists():
             return "（未找到竞品文章素材）"
 
+        # 跳过非公众号目录（如 英文源）
+        sources = [
+            (subdir.name, sorted(subdir.glob("*.md")))
+            for subdir in sorted(materials_dir.iterdir())
+            if subdir.is_dir() and subdir.name not in ("英文源", "en_sources")
+        ]
+        files = [md_file for _, md_files in sources for md_file in md_files]
+        return self._cached(("competitor_articles", str(topic_dir), max_chars_per_article, max_total_chars),
+                            files, lambda: self._build_competitor_articles(
+                                sources, max_chars_per_article, max_total_chars))
+
+    @staticmethod
+    def _build_competitor_articles(sources: list, max_chars_per_article: int,
+                                   max_total_chars: int) -> str:
         result = []
         total_chars = 0
 
-        for subdir in sorted(materials_dir.iterdir()):
-            if not subdir.is_dir():
-                continue
-            # 跳过非公众号目录（如 英文源）
-            if subdir.name in ("英文源", "en_sources"):
-                continue
-
-            source_name = subdir.name
-            for md_file in sorted(subdir.glob("*.md")):
+        for source_name, md_files in sources:
+            for md_file in md_files:
                 if total_chars >= max_total_chars:
                     break
                 content = md_file.read_text(encoding="utf-8")
@@ -357,6 +544,7 @@ class ContextLoader:
 
     # ── Pass 1-4 上下文组装 ────────────────────────────
 
+    @_timed_assembly
     def assemble_pass1_context(self, topic_dir: Path, persona_name: str,
                                 series_name: str = None) -> dict:
         """组装 Pass 1 写作Agent 所需的全部上下文。"""
@@ -370,6 +558,7 @@ class ContextLoader:
             "MATERIALS": self.load_materials(topic_dir),
         }
 
+    @_timed_assembly
     def assemble_pass2_context(self, topic_dir: Path, article_draft: str,
                                 persona_name: str) -> dict:
         """组装 Pass 2 事实核查Agent 所需的上下文。"""
@@ -379,6 +568,7 @@ class ContextLoader:
             "MATERIALS": self.load_materials(topic_dir),
         }
 
+    @_timed_assembly
     def assemble_pass3_context(self, topic_dir: Path, article_factchecked: str,
                                 persona_name: str, series_name: str = None,
                                 max_series_context_chars: int = 3000) -> dict:
@@ -397,6 +587,7 @@ class ContextLoader:
             "REVIEW_CHECKLIST": self.load_review_checklist(),
         }
 
+    @_timed_assembly
     def assemble_pass4_context(self, topic_dir: Path, article_draft: str,
                                 factcheck_report: str, review_report: str,
                                 latest_article: str, consensus_doc: str,
@@ -413,6 +604,7 @@ class ContextLoader:
 
     # ── Pass 3.5 协商闭环上下文组装 ────────────────────
 
+    @_timed_assembly
     def assemble_write_respond_context(self, topic_dir: Path, review_report: str,
                                         article_factchecked: str, consensus_doc: str,
                                         persona_name: str) -> dict:
@@ -425,6 +617,7 @@ class ContextLoader:
             "PERSONA": self.load_persona(persona_name),
         }
 
+    @_timed_assembly
     def assemble_fact_respond_context(self, topic_dir: Path, review_report: str,
                                        article_factchecked: str, consensus_doc: str,
                                        persona_name: str) -> dict:
@@ -437,6 +630,7 @@ class ContextLoader:
             "MATERIALS": self.load_materials_summary(topic_dir),  # Token 优化：只传素材摘要
         }
 
+    @_timed_assembly
     def assemble_consensus_evaluate_context(self, topic_dir: Path, review_report: str,
                                               article_factchecked: str,
                                               consensus_doc: str,
@@ -449,6 +643,7 @@ class ContextLoader:
             "CONSENSUS_DOC": consensus_doc,
         }
 
+    @_timed_assembly
     def assemble_revision_context(self, topic_dir: Path, article_factchecked: str,
                                     consensus_doc: str, persona_name: str) -> dict:
         """组装 Writing Agent 按共识执行写作类修改的上下文。"""
@@ -459,6 +654,7 @@ class ContextLoader:
             "PERSONA": self.load_persona(persona_name),
         }
 
+    @_timed_assembly
     def assemble_fact_revision_context(self, topic_dir: Path, article_after_write_revision: str,
                                          consensus_doc: str, persona_name: str) -> dict:
         """组装 Fact Agent 按共识执行事实类修改的上下文。"""
@@ -469,6 +665,7 @@ class ContextLoader:
             "MATERIALS": self.load_materials_summary(topic_dir),  # Token 优化：只传素材摘要
         }
 
+    @_timed_assembly
     def assemble_verification_context(self, article_before: str, article_after: str,
                                         consensus_doc: str, change_list: str,
                                         topic_dir: Path, persona_name: str) -> dict:
@@ -483,6 +680,7 @@ class ContextLoader:
 
     # ── Pass 5 迭代求导上下文组装 ────────────────────────
 
+    @_timed_assembly
     def assemble_pass5_weakness_context(self, topic_dir: Path, article: str,
                                          persona_name: str) -> dict:
         """组装 Pass 5a 证据硬度审计的上下文。"""
@@ -492,6 +690,7 @@ class ContextLoader:
             "MATERIALS": self.load_materials(topic_dir),
         }
 
+    @_timed_assembly
     def assemble_pass5_research_context(self, topic_dir: Path, article: str,
                                           weakness: str, persona_name: str) -> dict:
         """组装 Pass 5b 定向调研的上下文。"""
@@ -502,6 +701,7 @@ class ContextLoader:
             "MATERIALS_SUMMARY": self.load_materials_summary(topic_dir),
         }
 
+    @_timed_assembly
     def assemble_pass5_rewrite_context(self, topic_dir: Path, article: str,
                                          weakness: str, research: str,
                                          persona_name: str) -> dict:
@@ -514,6 +714,7 @@ class ContextLoader:
             "PERSONA": self.load_persona(persona_name),
         }
 
+    @_timed_assembly
     def assemble_pass5_compare_context(self, topic_dir: Path, prev: str,
                                          curr: str, persona_name: str) -> dict:
         """组装 Pass 5d 版本对比的上下文。"""
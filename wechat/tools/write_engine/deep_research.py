@@ -37,11 +37,14 @@ DEFAULT_TOOLS = "WebSearch,WebFetch,Read"
 DEFAULT_TIMEOUT = 600
 DEFAULT_MAX_ROUNDS = 5
 DEFAULT_MIN_NEW_ENTITIES = 2
+# 实体提取默认本地完成（词典 + 正则）；开启后再用 haiku 补充一次（多一次 LLM 往返）
+DEFAULT_ENTITY_LLM_REFINE = False
 
 
 def _load_model_config():
     global DEFAULT_MODEL, DEFAULT_SEARCH_MODEL, DEFAULT_EFFORT, DEFAULT_SEARCH_EFFORT
     global DEFAULT_TOOLS, DEFAULT_TIMEOUT, DEFAULT_MAX_ROUNDS, DEFAULT_MIN_NEW_ENTITIES
+    global DEFAULT_ENTITY_LLM_REFINE
     try:
         import yaml
         with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -63,6 +66,8 @@ def _load_model_config():
             DEFAULT_MAX_ROUNDS = dr["max_rounds"]
         if dr.get("min_new_entities"):
             DEFAULT_MIN_NEW_ENTITIES = dr["min_new_entities"]
+        if "entity_llm_refine" in dr:
+            DEFAULT_ENTITY_LLM_REFINE = bool(dr["entity_llm_refine"])
     except Exception:
         pass
 
@@ -190,6 +195,9 @@ def build_research_prompt(topic: str, existing_materials: str) -> str:
 
 ## 潜在配图素材
 （截图/数据图/对比图的建议，标注来源URL）
+
+## 实体清单
+（素材涉及的公司/人物/产品/技术名称，每行一个，格式：`- 实体名`）
 """
 
 
@@ -235,7 +243,35 @@ def build_followup_prompt(topic: str, accumulated_summary: str,
 """
 
 
-def extract_entities(text: str) -> set:
+def new_entity_extractor():
+    """为单个选题创建本地实体提取器：共享只读的项目词典，学到的实体只属于本选题（调度器多线程安全）。"""
+    from entity_extractor import LocalEntityExtractor, get_project_gazetteer
+    return LocalEntityExtractor(get_project_gazetteer(PROJECT_ROOT))
+
+
+def extract_entities(text: str, llm_refine: bool = None, extractor=None) -> tuple:
+    """从素材文本中提取实体名（公司/人物/产品/技术），返回 (确认的实体, 候选实体)。
+
+    默认本地提取（知识库/人设/历史 entity_list 词典 + 拉丁名正则 + 素材自带的实体列表），
+    不再每轮起一个 claude -p 进程；llm_refine=True 时再用 haiku 补充，结果算作确认的实体并学进本选题的词典。
+    只有确认的实体计入收敛判断、写入 entity_list.txt；正则候选只用于后续轮次的 prompt。
+    extractor 为本选题的提取器（跨轮次累积学到的实体）；不传时临时创建一个。
+    """
+    if llm_refine is None:
+        llm_refine = DEFAULT_ENTITY_LLM_REFINE
+    if extractor is None:
+        extractor = new_entity_extractor()
+    confirmed, candidates = extractor.extract(text)
+    log.info(f"  本地提取到 {len(confirmed)} 个实体, {len(candidates)} 个候选")
+    if llm_refine:
+        refined = extract_entities_llm(text)
+        extractor.learn(refined)
+        confirmed |= refined
+        candidates -= refined
+    return confirmed, candidates
+
+
+def extract_entities_llm(text: str) -> set:
     """调用 haiku 从素材文本中提取实体名（公司/人物/产品/技术）。"""
     from engine import run_claude_with_retry
 
@@ -258,8 +294,7 @@ def extract_entities(text: str) -> set:
     ]
     result = run_claude_with_retry(cmd, prompt, timeout=120, max_retries=2, logger=log)
     if result is None or result.returncode != 0 or not result.stdout.strip():
-        # fallback: 简单正则提取（不依赖 LLM）
-        log.warning("  实体提取 LLM 失败，使用 fallback")
+        log.warning("  实体提取 LLM 失败，仅使用本地提取结果")
         return set()
 
     entities = set()
@@ -465,7 +500,8 @@ def _run_search_round(topic: str, prompt: str, round_num: int,
 
 def run_research(topic_dir: Path, topic: str = None, model: str = DEFAULT_MODEL,
                  effort: str = DEFAULT_EFFORT, max_rounds: int = DEFAULT_MAX_ROUNDS,
-                 min_new_entities: int = DEFAULT_MIN_NEW_ENTITIES) -> bool:
+                 min_new_entities: int = DEFAULT_MIN_NEW_ENTITIES,
+                 llm_entities: bool = None) -> bool:
     """执行深度素材采集（迭代收敛搜索）。"""
     topic_dir = Path(topic_dir).resolve()
     if not topic_dir.exists():
@@ -498,13 +534,14 @@ def run_research(topic_dir: Path, topic: str = None, model: str = DEFAULT_MODEL,
         return False
 
     all_rounds = [materials]
-    entities = extract_entities(materials)
-    log.info(f"  [Round 1] 实体: {len(entities)} 个")
+    extractor = new_entity_extractor()
+    entities, candidates = extract_entities(materials, llm_refine=llm_entities, extractor=extractor)
+    log.info(f"  [Round 1] 实体: {len(entities)} 个, 候选: {len(candidates)} 个")
 
     # ── Iterative rounds: 基于实体清单继续深挖 ──
     for round_num in range(2, max_rounds + 1):
         followup_prompt = build_followup_prompt(
-            topic, materials, entities, round_num
+            topic, materials, entities | candidates, round_num
         )
         new_materials = _run_search_round(
             topic, followup_prompt, round_num=round_num,
@@ -514,7 +551,8 @@ def run_research(topic_dir: Path, topic: str = None, model: str = DEFAULT_MODEL,
             log.info(f"  [Round {round_num}] 搜索失败，停止迭代")
             break
 
-        new_entities = extract_entities(new_materials)
+        new_entities, new_candidates = extract_entities(new_materials, llm_refine=llm_entities, extractor=extractor)
+        # 只有确认的实体计入收敛；正则候选噪声多，计入的话每个选题都会跑满 max_rounds
         added = new_entities - entities
 
         # 备用判断：新增材料长度 < 上一轮的 10%
@@ -531,6 +569,7 @@ def run_research(topic_dir: Path, topic: str = None, model: str = DEFAULT_MODEL,
 
         log.info(f"  [Round {round_num}] 新实体: {sorted(added)}")
         entities |= new_entities
+        candidates = (candidates | new_candidates) - entities
         all_rounds.append(new_materials)
         # 更新累积素材供下一轮使用
         materials = merge_materials(all_rounds, topic)
@@ -572,10 +611,13 @@ def run_research(topic_dir: Path, topic: str = None, model: str = DEFAULT_MODEL,
     output_path.write_text(output, encoding="utf-8")
     log.info(f"  ✅ 素材报告已保存: {output_path} ({len(output)} chars)")
 
-    # 保存实体清单（便于调试和复盘）
+    # 保存实体清单（便于调试和复盘）。entity_list.txt 会被项目词典读回，只写确认的实体；
+    # 正则候选单独保存，词典不读
     entity_path = materials_dir / "entity_list.txt"
     entity_path.write_text("\n".join(sorted(entities)), encoding="utf-8")
-    log.info(f"  实体清单已保存: {entity_path} ({len(entities)} 个)")
+    candidate_path = materials_dir / "entity_candidates.txt"
+    candidate_path.write_text("\n".join(sorted(candidates - entities)), encoding="utf-8")
+    log.info(f"  实体清单已保存: {entity_path} ({len(entities)} 个, 另有 {len(candidates - entities)} 个候选)")
 
     # 统计素材质量指标
     url_count = output.count("http")
@@ -613,6 +655,8 @@ def main():
                         help=f"最大迭代轮数 (默认: {DEFAULT_MAX_ROUNDS})")
     parser.add_argument("--min-new-entities", type=int, default=DEFAULT_MIN_NEW_ENTITIES,
                         help=f"收敛阈值 (默认: {DEFAULT_MIN_NEW_ENTITIES})")
+    parser.add_argument("--llm-entities", action="store_true", default=None,
+                        help="本地实体提取后再用 haiku 补充（默认只用本地提取）")
 
     args = parser.parse_args()
     success = run_research(
@@ -622,6 +666,7 @@ def main():
         effort=args.effort,
         max_rounds=args.max_rounds,
         min_new_entities=args.min_new_entities,
+        llm_entities=args.llm_entities,
     )
     sys.exit(0 if success else 1)
 
@@ -14,6 +14,8 @@
   Pass 4.5: 标题优化Agent — 标题备选 + 简介评估，注入 publish_guide
 
 每个 Pass 是一次独立的 claude -p 调用，Pass 间通过文件通信。
+每个 Pass 的输出按输入内容哈希缓存在选题目录 .pass_cache/ 下，重跑时输入未变的 Pass 直接复用，
+pass_manifest.json 记录本次各 Pass 是复用还是重算。
 
 使用：
   python engine.py --topic-dir wechat/公众号选题/2026-02-25|Anthropic蒸馏门 --persona 大史
@@ -21,9 +23,11 @@
   python engine.py --topic-dir ... --persona 大史 --pass 2  # 只跑单个 pass（调试用）
   python engine.py --topic-dir ... --persona 大史 --iterate  # 启用迭代求导
   python engine.py --topic-dir ... --persona 大史 --pass 5 --iterate --max-iterations 1  # 只跑迭代
+  python engine.py --topic-dir ... --persona 大史 --no-cache  # 忽略 Pass 缓存，全部重算
 """
 
 import argparse
+import contextvars
 import logging
 import os
 import re
@@ -38,6 +42,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 from context_loader import ContextLoader
 from image_collector import collect_images
+from pass_memo import PassMemo
 
 # ── 配置 ────────────────────────────────────────────
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent  # nuwa-project/
@@ -226,6 +231,16 @@ def _is_rate_limited(stderr: str, returncode: int = 0) -> bool:
     return any(ind in stderr_lower for ind in indicators)
 
 
+# 批量调度时由 scheduler.py 设置：所有 claude -p 调用共享并发槽位与限流冷却（为 None 时各自独立重试）
+_claude_gate = None
+
+
+def set_claude_gate(gate):
+    """设置/清除共享的 claude -p 调用闸门（见 scheduler.SharedClaudeGate）。"""
+    global _claude_gate
+    _claude_gate = gate
+
+
 def run_claude_with_retry(cmd: list[str], prompt: str, timeout: int,
                           max_retries: int = 3, wait_seconds: int = 60,
                           cooldown_seconds: int = 300,
@@ -237,10 +252,29 @@ def run_claude_with_retry(cmd: list[str], prompt: str, timeout: int,
     全部失败后进入冷却（cooldown_seconds，默认5分钟），然后再试一轮。
 
     超时使用 Popen + 进程组杀掉，确保子进程也被终止。
+
+    批量调度（set_claude_gate）时：每次调用先占用共享并发槽位；限流等待改为登记到共享冷却，
+    所有 worker 一起退避，而不是各自 sleep 后继续撞限流。
     """
     _log = logger or logging.getLogger("write_engine")
+    gate = _claude_gate
 
     def _try_once():
+        if gate is None:
+            return _run_subprocess()
+        with gate.slot():
+            result = _run_subprocess()
+        if result is not None and result.returncode == 0:
+            gate.report_success()
+        return result
+
+    def _wait(seconds: int):
+        if gate is None:
+            time.sleep(seconds)
+        else:
+            gate.backoff(seconds)
+
+    def _run_subprocess():
         try:
             # 去掉 CLAUDECODE 环境变量，允许在 Claude Code 会话内嵌套调用
             env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
@@ -280,12 +314,12 @@ def run_claude_with_retry(cmd: list[str], prompt: str, timeout: int,
             return result
         if attempt < max_retries:
             _log.warning(f"限流等待 {wait_seconds}s... (重试 {attempt}/{max_retries})")
-            time.sleep(wait_seconds)
+            _wait(wait_seconds)
 
     # 短间隔用尽，进入冷却
     minutes = cooldown_seconds / 60
     _log.warning(f"短间隔重试 {max_retries} 次用尽，冷却 {minutes:.0f}min...")
-    time.sleep(cooldown_seconds)
+    _wait(cooldown_seconds)
 
     # 第二轮：冷却后再试一轮
     for attempt in range(1, max_retries + 1):
@@ -296,7 +330,7 @@ def run_claude_with_retry(cmd: list[str], prompt: str, timeout: int,
             return result
         if attempt < max_retries:
             _log.warning(f"冷却后重试 {wait_seconds}s... (重试 {attempt}/{max_retries})")
-            time.sleep(wait_seconds)
+            _wait(wait_seconds)
 
     _log.error("两轮重试均失败，放弃")
     return None
@@ -329,6 +363,38 @@ def run_claude(prompt: str, model: str, tools: str,
     return result.stdout.strip()
 
 
+# ── Pass 输出记忆化 ──────────────────────────────────
+
+# 当前选题的 Pass 缓存（run_engine 设置，按线程隔离以支持批量并发）；为 None 时不缓存（如单独调用某个 run_pass*）
+_pass_memo: contextvars.ContextVar = contextvars.ContextVar("pass_memo", default=None)
+
+
+def run_memoized_pass(step: str, template: str, context: dict, model: str, tools: str,
+                      effort: str = "high", timeout: int = 900) -> str:
+    """填充模板并调用 claude -p；输入（模板/上下文/模型/effort/工具）未变时直接复用上次输出。
+
+    Args:
+        step: Pass 标识，写入 pass_manifest.json（如 "pass2"、"pass3b_evaluate#r1"）
+    """
+    prompt = fill_template(template, context)
+    memo = _pass_memo.get()
+    if memo is None:
+        return run_claude(prompt, model, tools, effort=effort, timeout=timeout)
+
+    key = memo.key(template, context, model, effort, tools)
+    cached = memo.get(key)
+    if cached is not None:
+        log.info(f"♻️ {step} 输入未变化，复用缓存输出 ({len(cached)} chars)")
+        memo.record(step, key, "reused", cached, 0)
+        return cached
+
+    start = time.time()
+    output = run_claude(prompt, model, tools, effort=effort, timeout=timeout)
+    memo.put(key, output)
+    memo.record(step, key, "computed" if output else "failed", output, time.time() - start)
+    return output
+
+
 # ── 输出解析 ─────────────────────────────────────────
 
 def parse_delimited_output(output: str, delimiters: list[str]) -> dict:
@@ -374,10 +440,11 @@ def run_pass1(ctx: ContextLoader, topic_dir: Path, persona: str,
 
     template = load_prompt_template("1")
     context = ctx.assemble_pass1_context(topic_dir, persona, series)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PER_PASS[1],
-                        effort=EFFORT_PER_PASS[1], timeout=TIMEOUT_PER_PASS.get(1, 900))
+    output = run_memoized_pass(
+        "pass1", template, context, model, TOOLS_PER_PASS[1],
+        effort=EFFORT_PER_PASS[1], timeout=TIMEOUT_PER_PASS.get(1, 900)
+    )
 
     if output:
         out_path = topic_dir / "article_draft.md"
@@ -400,10 +467,11 @@ def run_pass2(ctx: ContextLoader, topic_dir: Path, article_draft: str,
 
     template = load_prompt_template("2")
     context = ctx.assemble_pass2_context(topic_dir, article_draft, persona)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PER_PASS[2],
-                        effort=EFFORT_PER_PASS[2], timeout=TIMEOUT_PER_PASS.get(2, 1200))
+    output = run_memoized_pass(
+        "pass2", template, context, model, TOOLS_PER_PASS[2],
+        effort=EFFORT_PER_PASS[2], timeout=TIMEOUT_PER_PASS.get(2, 1200)
+    )
 
     if not output:
         log.error("Pass 2 失败: 无输出")
@@ -440,10 +508,11 @@ def run_pass3(ctx: ContextLoader, topic_dir: Path, article_factchecked: str,
 
     template = load_prompt_template("3")
     context = ctx.assemble_pass3_context(topic_dir, article_factchecked, persona, series)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PER_PASS[3],
-                        effort=EFFORT_PER_PASS[3], timeout=TIMEOUT_PER_PASS.get(3, 1200))
+    output = run_memoized_pass(
+        "pass3", template, context, model, TOOLS_PER_PASS[3],
+        effort=EFFORT_PER_PASS[3], timeout=TIMEOUT_PER_PASS.get(3, 1200)
+    )
 
     if not output:
         log.error("Pass 3 失败: 无输出")
@@ -639,9 +708,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
             context = ctx.assemble_write_respond_context(
                 topic_dir, review_report, article_factchecked, consensus_doc, persona
             )
-            prompt = fill_template(template, context)
-            write_response = run_claude(
-                prompt, model, TOOLS_PASS3B["write_respond"],
+            write_response = run_memoized_pass(
+                f"pass3b_write_respond#r{round_num}", template, context, model, TOOLS_PASS3B["write_respond"],
                 effort=EFFORT_PASS3B["write_respond"]
             )
             parts = parse_delimited_output(write_response, ["WRITE_RESPONSE"])
@@ -659,9 +727,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
             context = ctx.assemble_fact_respond_context(
                 topic_dir, review_report, article_factchecked, consensus_doc, persona
             )
-            prompt = fill_template(template, context)
-            fact_response = run_claude(
-                prompt, model, TOOLS_PASS3B["fact_respond"],
+            fact_response = run_memoized_pass(
+                f"pass3b_fact_respond#r{round_num}", template, context, model, TOOLS_PASS3B["fact_respond"],
                 effort=EFFORT_PASS3B["fact_respond"]
             )
             parts = parse_delimited_output(fact_response, ["FACT_RESPONSE"])
@@ -678,9 +745,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
         context = ctx.assemble_consensus_evaluate_context(
             topic_dir, review_report, article_factchecked, consensus_doc, persona
         )
-        prompt = fill_template(template, context)
-        evaluate_output = run_claude(
-            prompt, model, TOOLS_PASS3B["evaluate"],
+        evaluate_output = run_memoized_pass(
+            f"pass3b_evaluate#r{round_num}", template, context, model, TOOLS_PASS3B["evaluate"],
             effort=EFFORT_PASS3B["evaluate"]
         )
         parts = parse_delimited_output(evaluate_output, ["CONSENSUS_UPDATE"])
@@ -712,9 +778,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
         context = ctx.assemble_revision_context(
             topic_dir, current_article, consensus_doc, persona
         )
-        prompt = fill_template(template, context)
-        revise_output = run_claude(
-            prompt, model, TOOLS_PASS3B["revise"],
+        revise_output = run_memoized_pass(
+            "pass3b_revise", template, context, model, TOOLS_PASS3B["revise"],
             effort=EFFORT_PASS3B["revise"]
         )
         parts = parse_delimited_output(revise_output, ["REVISED_ARTICLE", "CHANGE_LIST"])
@@ -735,9 +800,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
         context = ctx.assemble_fact_revision_context(
             topic_dir, current_article, consensus_doc, persona
         )
-        prompt = fill_template(template, context)
-        fact_revise_output = run_claude(
-            prompt, model, TOOLS_PASS3B["fact_revise"],
+        fact_revise_output = run_memoized_pass(
+            "pass3b_fact_revise", template, context, model, TOOLS_PASS3B["fact_revise"],
             effort=EFFORT_PASS3B["fact_revise"]
         )
         parts = parse_delimited_output(fact_revise_output, ["REVISED_ARTICLE", "CHANGE_LIST"])
@@ -760,9 +824,8 @@ def run_consensus_loop(ctx: ContextLoader, topic_dir: Path,
         article_factchecked, current_article, consensus_doc,
         combined_change_list, topic_dir, persona
     )
-    prompt = fill_template(template, context)
-    verify_output = run_claude(
-        prompt, model, TOOLS_PASS3B["verify"],
+    verify_output = run_memoized_pass(
+        "pass3b_verify", template, context, model, TOOLS_PASS3B["verify"],
         effort=EFFORT_PASS3B["verify"]
     )
     parts = parse_delimited_output(verify_output, ["VERIFICATION", "VERIFIED_ARTICLE"])
@@ -797,11 +860,12 @@ def run_pass5_weakness(ctx: ContextLoader, topic_dir: Path, article: str,
 
     template = load_prompt_template("pass5_weakness")
     context = ctx.assemble_pass5_weakness_context(topic_dir, article, persona)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PASS5["weakness"],
-                        effort=EFFORT_PASS5["weakness"],
-                        timeout=TIMEOUT_PASS5.get("weakness", 600))
+    output = run_memoized_pass(
+        f"pass5_weakness#v{version}", template, context, model, TOOLS_PASS5["weakness"],
+        effort=EFFORT_PASS5["weakness"],
+        timeout=TIMEOUT_PASS5.get("weakness", 600)
+    )
 
     if not output:
         log.error(f"  5a 失败: 无输出")
@@ -825,11 +889,12 @@ def run_pass5_targeted_research(ctx: ContextLoader, topic_dir: Path,
 
     template = load_prompt_template("pass5_targeted_research")
     context = ctx.assemble_pass5_research_context(topic_dir, article, weakness, persona)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PASS5["targeted_research"],
-                        effort=EFFORT_PASS5["targeted_research"],
-                        timeout=TIMEOUT_PASS5.get("targeted_research", 1200))
+    output = run_memoized_pass(
+        f"pass5_targeted_research#v{version}", template, context, model, TOOLS_PASS5["targeted_research"],
+        effort=EFFORT_PASS5["targeted_research"],
+        timeout=TIMEOUT_PASS5.get("targeted_research", 1200)
+    )
 
     if not output:
         log.error(f"  5b 失败: 无输出")
@@ -856,11 +921,11 @@ def run_pass5_rewrite(ctx: ContextLoader, topic_dir: Path,
     context = ctx.assemble_pass5_rewrite_context(
         topic_dir, article, weakness, research, persona
     )
-    prompt = fill_template(template, context)
-
-    output = run_claude(prompt, model, TOOLS_PASS5["rewrite"],
-                        effort=EFFORT_PASS5["rewrite"],
-                        timeout=TIMEOUT_PASS5.get("rewrite", 900))
+    output = run_memoized_pass(
+        f"pass5_rewrite#v{version}", template, context, model, TOOLS_PASS5["rewrite"],
+        effort=EFFORT_PASS5["rewrite"],
+        timeout=TIMEOUT_PASS5.get("rewrite", 900)
+    )
 
     if not output:
         log.error(f"  5c 失败: 无输出")
@@ -885,11 +950,12 @@ def run_pass5_compare(ctx: ContextLoader, topic_dir: Path,
 
     template = load_prompt_template("pass5_compare")
     context = ctx.assemble_pass5_compare_context(topic_dir, prev, curr, persona)
-    prompt = fill_template(template, context)
 
-    output = run_claude(prompt, model, TOOLS_PASS5["compare"],
-                        effort=EFFORT_PASS5["compare"],
-                        timeout=TIMEOUT_PASS5.get("compare", 600))
+    output = run_memoized_pass(
+        f"pass5_compare#v{v_prev}", template, context, model, TOOLS_PASS5["compare"],
+        effort=EFFORT_PASS5["compare"],
+        timeout=TIMEOUT_PASS5.get("compare", 600)
+    )
 
     if not output:
         log.error(f"  5d 失败: 无输出")
@@ -1018,10 +1084,10 @@ def run_pass4(ctx: ContextLoader, topic_dir: Path, article_draft: str,
         topic_dir, article_draft, factcheck_report, review_report,
         latest_article, consensus_doc, persona
     )
-    prompt = fill_template(template, context)
-
-    output = run_claude(prompt, model, TOOLS_PER_PASS[4],
-                        effort=EFFORT_PER_PASS[4], timeout=TIMEOUT_PER_PASS.get(4, 600))
+    output = run_memoized_pass(
+        "pass4", template, context, model, TOOLS_PER_PASS[4],
+        effort=EFFORT_PER_PASS[4], timeout=TIMEOUT_PER_PASS.get(4, 600)
+    )
 
     if not output:
         log.error("Pass 4 失败: 无输出")
@@ -1139,14 +1205,13 @@ def run_pass4b(topic_dir: Path, force_title: str = None):
         "DESCRIPTION_OPTIONS": description_options or "（无简介备选）",
         "CURRENT_TITLE": current_title or "（无标题）",
     }
-    prompt = fill_template(template, context)
-
     model = CONFIG_PASS4B["model"]
     effort = CONFIG_PASS4B["effort"]
     tools = CONFIG_PASS4B["tools"]
     timeout = CONFIG_PASS4B["timeout"]
 
-    output = run_claude(prompt, model, tools, effort=effort, timeout=timeout)
+    output = run_memoized_pass("pass4b", template, context, model, tools,
+                               effort=effort, timeout=timeout)
 
     if not output:
         log.error("Pass 4.5 失败: 无输出")
@@ -1422,17 +1487,41 @@ def run_engine(topic_dir: Path, persona: str, series: str = None,
                model: str = DEFAULT_MODEL, start_pass: int = 1,
                iterate: bool = False, max_iterations: int = None,
                consensus_rounds: int = None,
-               skip_title: bool = False, force_title: str = None):
+               skip_title: bool = False, force_title: str = None,
+               refresh_cache: bool = False):
     """
     执行完整写作引擎流程。
 
     Pass 1 → Pass 2 → Pass 3 (纯 Review) → Pass 3.5 (协商闭环) → [Pass 5 迭代求导] → Pass 4 → Pass 4.5 (标题优化) → 后处理
+
+    失败后直接重跑即可续跑：已成功且输入未变的 Pass 命中缓存，不再调用 claude -p。
+    refresh_cache=True 时忽略已有缓存、全部重算。
     """
     topic_dir = Path(topic_dir).resolve()
     if not topic_dir.exists():
         log.error(f"选题目录不存在: {topic_dir}")
         return False
 
+    memo = PassMemo(topic_dir, refresh=refresh_cache)
+    token = _pass_memo.set(memo)
+    ctx = ContextLoader(PROJECT_ROOT)
+    try:
+        return _run_engine(ctx, topic_dir, persona, series, model, start_pass, iterate,
+                           max_iterations, consensus_rounds, skip_title, force_title)
+    finally:
+        ctx.log_timing_summary()
+        memo.extra["context_assembly"] = ctx.timing_report()
+        memo.write_manifest()
+        summary = memo.summary()
+        log.info(f"Pass 缓存: 复用 {summary['reused']} 个，重算 {summary['computed']} 个，"
+                 f"失败 {summary['failed']} 个 → {topic_dir / 'pass_manifest.json'}")
+        _pass_memo.reset(token)
+
+
+def _run_engine(ctx: ContextLoader, topic_dir: Path, persona: str, series: str, model: str,
+                start_pass: int, iterate: bool, max_iterations: int, consensus_rounds: int,
+                skip_title: bool, force_title: str) -> bool:
+
     log.info(f"写作引擎启动")
     log.info(f"  选题目录: {topic_dir}")
     log.info(f"  人设: {persona}")
@@ -1445,8 +1534,6 @@ def run_engine(topic_dir: Path, persona: str, series: str = None,
         _max_iter = max_iterations or ITERATION_CONFIG.get("max_iterations", 2)
         log.info(f"  迭代求导: 开启 (最多 {_max_iter} 轮)")
 
-    ctx = ContextLoader(PROJECT_ROOT)
-
     # ── Pass 1: 写作 ──
     if start_pass <= 1:
         article_draft = run_pass1(ctx, topic_dir, persona, series, model)
@@ -1642,6 +1729,8 @@ def main():
                         help="跳过 Pass 4.5 标题优化")
     parser.add_argument("--title", default=None,
                         help="强制指定标题（跳过 LLM，直接写入 publish_guide）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="忽略 Pass 输出缓存，全部重新调用 claude -p")
 
     args = parser.parse_args()
     success = run_engine(
@@ -1655,6 +1744,7 @@ def main():
         consensus_rounds=args.consensus_rounds,
         skip_title=args.skip_title,
         force_title=args.title,
+        refresh_cache=args.no_cache,
     )
     sys.exit(0 if success else 1)
 
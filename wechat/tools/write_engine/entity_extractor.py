@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+本地实体提取：替代 deep_research 每轮一次的 haiku 实体提取调用。
+
+三路合并：
+  1. 词典匹配（Aho-Corasick，大小写敏感）：知识库文章标签/作者、人设文件、历史选题的 entity_list.txt
+  2. 拉丁名正则：公司/产品/模型名（OpenAI、GPT-4o、DeepSeek-R1、Claude 3.5 Sonnet、H100），
+     过滤网页样板词（Accessed、Read More、See Figure 3、Subscribe、30B…）、链接标题与 URL、
+     年份/编号、句中也以小写出现的普通词（Complete、Employment、Archive）
+  3. 素材中模型自己列出的实体（"### 新发现实体" 下的 `- 实体名` 行）
+
+第 1、3 路（以及可选的 LLM 补充）是确认的实体，计入收敛判断并写入 entity_list.txt；
+第 2 路只是候选，不计入收敛、不学习，也不写进会被词典读回的文件。只有第 3 路会学进词典，
+后续轮次里同名实体也能被匹配到。项目词典在进程内构建一次后只读，可被多个线程共享；
+学到的实体只属于单个选题的 LocalEntityExtractor。纯 Python 实现，不依赖额外包。
+"""
+
+import json
+import logging
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger("deep_research")
+
+# 过于泛化、不作为实体的词（小写比较）
+STOPWORDS = {
+    "a", "an", "the", "this", "that", "these", "those", "and", "or", "but", "for", "with", "from",
+    "in", "on", "at", "to", "of", "by", "as", "is", "are", "was", "were", "be", "it", "its",
+    "we", "our", "you", "your", "they", "their", "he", "she", "his", "her", "i", "my",
+    "however", "meanwhile", "according", "also", "after", "before", "while", "when", "what",
+    "why", "how", "who", "where", "which", "if", "then", "than", "so", "not", "no", "yes",
+    "new", "latest", "update", "report", "source", "sources", "news", "data", "key", "note",
+    "round", "summary", "table", "url", "http", "https", "www", "com", "pdf", "html",
+    "ai", "ml", "llm", "llms", "api", "ceo", "cto", "cfo", "ipo", "gdp", "usd", "rmb", "us", "uk",
+    "q1", "q2", "q3", "q4", "h1", "h2", "jan", "feb", "mar", "apr", "may", "jun", "jul",
+    "aug", "sep", "oct", "nov", "dec", "january", "february", "march", "april", "june",
+    "july", "august", "september", "october", "november", "december",
+}
+
+# 首字母大写时常被误当作专有名词的普通词（标题、句首、引语里常见；小写比较，仅对单词名生效）
+COMMON_WORDS = {
+    "act", "affect", "agent", "archive", "chief", "college", "complete", "defense", "department",
+    "employment", "gender", "generative", "government", "hardware", "initiative", "jobs", "legal",
+    "master", "military", "ministry", "office", "plus", "skills", "software", "today", "tomorrow",
+    "training", "war", "warfare", "will", "work", "yesterday", "yet", "chess", "centre", "playing",
+}
+# 普通词常见后缀（Employment、Prohibition、Playing、Generative），仅对单词名生效
+_COMMON_SUFFIX = re.compile(r"(?:ing|ed|tion|sion|ment|ness|ity|ive|ly)$")
+
+# 网页/论文样板词：正则常把它们当成专有名词（小写比较，整名匹配；单词同时作为多词名的断点）
+BOILERPLATE = {
+    "accessed", "retrieved", "archived", "published", "updated", "posted", "annual", "information",
+    "read more", "learn more", "click here", "see more", "show more", "subscribe", "sign up", "sign in",
+    "log in", "login", "share", "download", "print", "advertisement", "sponsored", "related", "more",
+    "home", "menu", "search", "about", "about us", "contact", "contact us", "privacy policy",
+    "terms of use", "terms of service", "cookie policy", "all rights reserved", "copyright",
+    "press release", "newsletter", "center", "overview", "introduction", "conclusion", "abstract",
+    "references", "appendix", "image", "photo", "credit", "getty images", "next", "previous", "back",
+    "read", "click", "here", "see", "learn", "show", "sign",
+}
+# 样板模式：图表/章节引用、带量级后缀的纯数字（30B、1.5T）
+_BOILERPLATE_PATTERNS = (
+    re.compile(r"^(?:see\s+)?(?:figure|fig|table|chart|exhibit|section|page|chapter|step|part|appendix)\b",
+               re.IGNORECASE),
+    re.compile(r"^\d+(?:\.\d+)?[kmbt]?$", re.IGNORECASE),
+)
+
+# 拉丁名提取前去掉的内容：URL、域名与文件名；Markdown 链接只保留标题里 ":" 前的来源名
+_URL = re.compile(
+    r"https?://\S+|\bwww\.\S+"
+    r"|\b[\w-]+(?:\.[\w-]+)*\.(?:com|org|net|edu|gov|io|ai|cn|work|html?|pdf|php|aspx?)\b",
+    re.IGNORECASE,
+)
+_MD_LINK = re.compile(r"\[([^\]\n]*)\]\([^)\n]*\)")
+# 名字末尾的年份和单个数字（Jobs 2026、GPT 1/10、IDC 7厂商）不属于名字
+_TRAILING_NUMBER = re.compile(r"^(?:\d|(?:19|20)\d\d)$")
+# 只有数字和连接符的 token（2018-2024、3.5）不能作为名字开头
+_NUMERIC = re.compile(r"^[\d.\-/]+$")
+
+MIN_CJK_LEN = 2
+MAX_ENTITY_LEN = 40
+
+# 拉丁名：首字母大写 / 含数字 / 驼峰的词，允许 - . 连接，允许后接大写或数字开头的词组成多词名
+_LATIN_TOKEN = r"[A-Za-z][A-Za-z0-9]*(?:[-.][A-Za-z0-9]+)*"
+_LATIN_NAME = re.compile(
+    rf"(?<![A-Za-z0-9])({_LATIN_TOKEN}(?:[ ](?:[A-Z0-9][A-Za-z0-9]*(?:[-.][A-Za-z0-9]+)*))*)(?![A-Za-z0-9])"
+)
+_LISTED_ENTITY = re.compile(r"^\s*[-*]\s+`?\*{0,2}([^`*\n]+?)\*{0,2}`?\s*$")
+# 列表项末尾的括号注释："Maxim Massenkoff (Anthropic经济学家)" → Maxim Massenkoff
+_TRAILING_NOTE = re.compile(r"\s*[（(][^（()）]*[）)]\s*$")
+
+
+def _is_ascii_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _looks_like_name(token: str) -> bool:
+    """单个拉丁词是否像专有名词：首字母大写、含数字或驼峰（iPhone / o1 / H100）。"""
+    if token.lower() in STOPWORDS or len(token) < 2 or _NUMERIC.match(token):
+        return False
+    has_digit = any(c.isdigit() for c in token)
+    # URL slug / 编号（ai-in-financial-services、w31161、nnTKyi3XuZ8）
+    if token.count("-") >= 2 and token.islower():
+        return False
+    if has_digit and (token[0].islower() and len(token) > 3 or len(token) > 15):
+        return False
+    return token[0].isupper() or any(c.isdigit() for c in token) or any(c.isupper() for c in token[1:])
+
+
+def is_boilerplate(name: str) -> bool:
+    lowered = name.lower()
+    return lowered in BOILERPLATE or any(p.match(name) for p in _BOILERPLATE_PATTERNS)
+
+
+def _at_sentence_start(text: str, pos: int) -> bool:
+    before = text[:pos].rstrip(" ")
+    return not before or before[-1] in "\n.!?:。！？：>#*-|\"'“‘（("
+
+
+def _strip_links(text: str) -> str:
+    def _link_source(match):
+        title = match.group(1)
+        for sep in (":", "："):
+            if sep in title:
+                return " " + title.split(sep, 1)[0] + " "
+        return " " + title + " "
+    return _URL.sub(" ", _MD_LINK.sub(_link_source, text))
+
+
+def _is_common_word(name: str, lower_words: set) -> bool:
+    """单个首字母大写的普通英文词：在常见词表里、带普通词后缀，或文中也以小写形式出现。"""
+    if " " in name or not name[1:].islower():
+        return False
+    lowered = name.lower()
+    return lowered in COMMON_WORDS or bool(_COMMON_SUFFIX.search(lowered)) or lowered in lower_words
+
+
+def extract_latin_names(text: str) -> set:
+    """正则提取拉丁字母的公司/产品/模型名。
+
+    多词名在停用词和样板词处断开（"The OpenAI CEO Sam Altman" → OpenAI、Sam Altman）；
+    句首只有首字母大写的单词（"However"、"Metadata"）无法和专有名词区分，跳过。
+    链接标题（多是新闻标题）只保留来源名，URL 与文件名整体去掉；单个首字母大写的普通词不算。
+    """
+    text = _strip_links(text)
+    lower_words = set(re.findall(r"(?<![A-Za-z])[a-z]{3,}(?![A-Za-z])", text))
+    names = set()
+    for match in _LATIN_NAME.finditer(text):
+        sentence_start = _at_sentence_start(text, match.start(1))
+        run: list[str] = []
+        first_run = True
+        for word in match.group(1).split(" ") + [None]:
+            if (word is not None and word.lower() not in STOPWORDS and word.lower() not in BOILERPLATE
+                    and (run or _looks_like_name(word))):
+                run.append(word)
+                continue
+            while run and _TRAILING_NUMBER.match(run[-1]):
+                run.pop()
+            if run:
+                name = " ".join(run).strip(".-")
+                plain_word = len(run) == 1 and name[1:].islower()
+                if (2 <= len(name) <= MAX_ENTITY_LEN and not name.isdigit() and not is_boilerplate(name)
+                        and not (plain_word and first_run and sentence_start)
+                        and not _is_common_word(name, lower_words)):
+                    names.add(name)
+                run = []
+            first_run = False
+    return names
+
+
+def parse_listed_entities(text: str) -> set:
+    """解析 "### 新发现实体" 之类小节（含其下的分组小标题）下的 `- 实体名` 列表，去掉末尾的括号注释。"""
+    entities = set()
+    section_level = None
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            level = len(stripped) - len(stripped.lstrip("#"))
+            if "实体" in stripped:
+                section_level = level
+            elif section_level is not None and level <= section_level:
+                section_level = None
+            continue
+        if section_level is None:
+            continue
+        match = _LISTED_ENTITY.match(line)
+        if match:
+            entity = _TRAILING_NOTE.sub("", match.group(1)).strip()
+            if (2 <= len(entity) <= MAX_ENTITY_LEN and entity.lower() not in STOPWORDS
+                    and not is_boilerplate(entity)):
+                entities.add(entity)
+    return entities
+
+
+class AhoCorasick:
+    """多模式串匹配自动机（大小写敏感）。"""
+
+    def __init__(self):
+        self._goto: list[dict] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: str):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(value)
+        self._built = False
+
+    def build(self):
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = candidate if candidate != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+        self._built = True
+
+    def iter_matches(self, text: str):
+        """产出 (start, end, value)，end 为开区间。"""
+        if not self._built:
+            self.build()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for value in self._output[node]:
+                yield i + 1 - len(value), i + 1, value
+
+
+class EntityGazetteer:
+    """实体词典 + Aho-Corasick 匹配（大小写敏感：center 不会命中 Center）；
+    拉丁名检查词边界，避免 Meta 命中 Metadata。add 与 match 不可并发调用，共享前先 build()。"""
+
+    def __init__(self, names=()):
+        self._automaton = AhoCorasick()
+        self._names: set[str] = set()
+        self.add(names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def add(self, names) -> int:
+        """加入新实体，返回实际新增数量。"""
+        added = 0
+        for name in names:
+            name = (name or "").strip()
+            if name in self._names or name.lower() in STOPWORDS or is_boilerplate(name) or len(name) > MAX_ENTITY_LEN:
+                continue
+            if len(name) < (2 if name.isascii() else MIN_CJK_LEN):
+                continue
+            self._names.add(name)
+            self._automaton.add(name, name)
+            added += 1
+        return added
+
+    def build(self) -> "EntityGazetteer":
+        """预先构建自动机（之后只读匹配，可被多个线程共享）。"""
+        self._automaton.build()
+        return self
+
+    def match(self, text: str) -> set:
+        """最长匹配优先：被更长实体覆盖的短实体不计（阿里巴巴 不再额外命中 阿里）。"""
+        spans = []
+        for start, end, key in self._automaton.iter_matches(text):
+            if _is_ascii_word_char(key[0]) and start > 0 and _is_ascii_word_char(text[start - 1]):
+                continue
+            if _is_ascii_word_char(key[-1]) and end < len(text) and _is_ascii_word_char(text[end]):
+                continue
+            spans.append((start, -end, key))
+
+        found = set()
+        covered_until = -1
+        for start, neg_end, key in sorted(spans):
+            if -neg_end <= covered_until:
+                continue
+            covered_until = -neg_end
+            found.add(key)
+        return found
+
+    @classmethod
+    def from_project(cls, project_root: Path) -> "EntityGazetteer":
+        """从知识库索引、人设文件、历史 entity_list.txt 构建词典（entity_candidates.txt 里的正则候选不读）。"""
+        project_root = Path(project_root)
+        names: set = set()
+
+        kb_index = project_root / "knowledgebase" / "knowledge_base" / "_index"
+        # 分类关键词（AI、模型、商业…）是泛化词，文章标签里出现时不收进词典
+        generic = set()
+        try:
+            rules = json.loads((kb_index / "classification_rules.json").read_text(encoding="utf-8"))
+            for category in rules.get("categories", {}).values():
+                generic.update(k.lower() for k in category.get("keywords", []))
+        except (OSError, ValueError):
+            pass
+        try:
+            index = json.loads((kb_index / "articles_index.json").read_text(encoding="utf-8"))
+            for article in index.get("articles", []):
+                names.update(t for t in article.get("tags", []) if t.lower() not in generic)
+                if article.get("author"):
+                    names.add(article["author"])
+                names |= extract_latin_names(article.get("title", ""))
+        except (OSError, ValueError):
+            pass
+
+        for persona_file in (project_root / "wechat" / "人设").glob("*.md"):
+            try:
+                names |= extract_latin_names(persona_file.read_text(encoding="utf-8"))
+            except OSError:
+                continue
+
+        entity_lists = 0
+        for entity_file in (project_root / "wechat").rglob("entity_list.txt"):
+            try:
+                names.update(line.strip() for line in entity_file.read_text(encoding="utf-8").splitlines())
+                entity_lists += 1
+            except OSError:
+                continue
+
+        gazetteer = cls(names).build()
+        log.info(f"  实体词典: {len(gazetteer)} 个（含 {entity_lists} 份历史 entity_list）")
+        return gazetteer
+
+
+_project_gazetteer: EntityGazetteer = None
+_project_gazetteer_lock = threading.Lock()
+
+
+def get_project_gazetteer(project_root: Path) -> EntityGazetteer:
+    """进程内共享的项目词典（只构建一次，构建后只读）。"""
+    global _project_gazetteer
+    with _project_gazetteer_lock:
+        if _project_gazetteer is None:
+            _project_gazetteer = EntityGazetteer.from_project(project_root)
+        return _project_gazetteer
+
+
+class LocalEntityExtractor:
+    """单个选题的实体提取器：共享的只读项目词典 + 本选题学到的实体 + 拉丁名正则 + 列表解析。
+
+    只学习素材中显式列出的实体（以及调用方通过 learn 传入的 LLM 结果），正则命中不学习。
+    """
+
+    def __init__(self, gazetteer: EntityGazetteer = None):
+        self.gazetteer = gazetteer or EntityGazetteer().build()
+        self.learned = EntityGazetteer()
+
+    def extract(self, text: str) -> tuple:
+        """返回 (确认的实体, 候选实体)：确认 = 词典命中 + 素材列出的实体；候选 = 其余的正则命中。"""
+        listed = parse_listed_entities(text)
+        confirmed = self.gazetteer.match(text) | self.learned.match(text) | listed
+        candidates = extract_latin_names(text) - confirmed
+        self.learn(listed)
+        return confirmed, candidates
+
+    def learn(self, entities) -> int:
+        return self.learned.add(entities)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pass 输出记忆化：按 (prompt 模板, 组装后的上下文, 模型, effort, 工具) 的内容哈希缓存 claude -p 输出。
+
+重跑同一选题时，输入没有变化的 Pass 直接复用上次输出，只重算输入变化的 Pass 及其下游
+（下游 Pass 的上下文里包含上游输出，上游一变哈希自然跟着变）。替代手工的 --pass N 断点续跑脚本。
+
+文件布局（选题目录下）：
+  .pass_cache/<sha256>.txt  — 每次成功调用的原始输出（不用 .md，避免被当作素材读入）
+  pass_manifest.json        — 本次运行每个 Pass 的状态（reused / computed / failed）、耗时、输出长度，
+                              以及 extra 中的附加统计（如 context_assembly：各 Pass 上下文组装耗时）
+
+使用：
+  memo = PassMemo(topic_dir)            # refresh=True 时忽略已有缓存、全部重算（仍会写入新缓存）
+  key = memo.key(template, context, model, effort, tools)
+  output = memo.get(key)
+  memo.put(key, output); memo.record("pass1", key, "computed", output, seconds)
+  memo.write_manifest()
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+
+CACHE_DIR_NAME = ".pass_cache"
+MANIFEST_NAME = "pass_manifest.json"
+
+# 不参与哈希的上下文字段：每天都会变、但不影响 Pass 输出的内容（如写作日期）
+VOLATILE_CONTEXT_KEYS = {"DATE"}
+
+log = logging.getLogger("write_engine")
+
+
+class PassMemo:
+    """单个选题目录的 Pass 输出缓存 + 运行清单。"""
+
+    def __init__(self, topic_dir: Path, refresh: bool = False):
+        self.topic_dir = Path(topic_dir)
+        self.cache_dir = self.topic_dir / CACHE_DIR_NAME
+        self.refresh = refresh
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.entries: list[dict] = []
+        self.extra: dict = {}
+
+    @staticmethod
+    def key(template: str, context: dict, model: str, effort: str, tools: str) -> str:
+        """内容哈希：模板 + 上下文（按 key 排序，去掉易变字段）+ 模型参数。"""
+        stable_context = {k: str(v) for k, v in sorted(context.items())
+                          if k not in VOLATILE_CONTEXT_KEYS}
+        payload = json.dumps(
+            {"template": template, "context": stable_context,
+             "model": model, "effort": effort, "tools": tools},
+            ensure_ascii=False, sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.txt"
+
+    def get(self, key: str) -> str | None:
+        """命中返回缓存输出；refresh 模式或未命中返回 None。"""
+        if self.refresh:
+            return None
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError as e:
+            log.warning(f"读取 Pass 缓存失败 ({path.name}): {e}")
+            return None
+
+    def put(self, key: str, output: str):
+        """写入缓存（先写临时文件再原子替换，进程中断不会留下半截输出）。空输出不缓存。"""
+        if not output:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(".tmp")
+            tmp_path.write_text(output, encoding="utf-8")
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            log.warning(f"写入 Pass 缓存失败: {e}")
+
+    def record(self, step: str, key: str, status: str, output: str, seconds: float):
+        """记录一次 Pass 调用并立即刷新清单（中途失败也能看到已完成的部分）。"""
+        self.entries.append({
+            "step": step,
+            "status": status,
+            "key": key[:16],
+            "chars": len(output or ""),
+            "seconds": round(seconds, 1),
+        })
+        self.write_manifest()
+
+    def summary(self) -> dict:
+        counts = {"reused": 0, "computed": 0, "failed": 0}
+        for entry in self.entries:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def write_manifest(self):
+        manifest = {
+            "started_at": self.started_at,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "refresh": self.refresh,
+            "summary": self.summary(),
+            "passes": self.entries,
+            **self.extra,
+        }
+        try:
+            (self.topic_dir / MANIFEST_NAME).write_text(
+                json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        except OSError as e:
+            log.warning(f"写入 Pass 清单失败: {e}")
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+降临派手记 · 批量写稿调度器
+
+替代 run_batch_*.sh：在一个进程内调度多篇文章的 deep_research → engine 流程。
+
+- 每篇文章一个编排线程，按原有顺序执行各 Pass（Pass 之间有数据依赖）
+- 所有文章的 claude -p 调用共享一个有界 worker 池（--workers），槽位优先分配给进度靠后（接近完成）的文章
+- 共享限流状态：任一调用撞到限流，所有 worker 一起进入冷却；连续限流次数越多等待越久（指数退避，封顶 max_wait）
+- 已有 素材/deep_research.md 的选题默认跳过调研；写作引擎的 Pass 缓存（pass_memo）让失败后的重跑直接续上
+- 上下文源文件缓存（context_loader.SourceCache）进程内共享：方法论/人设/已发文章索引全批次只解析一次，
+  各 (系列, 人设) 的续恰摘要在启动时预热
+
+使用：
+  python scheduler.py --jobs batch.yaml --workers 3
+  python scheduler.py --job "wechat/公众号选题/2026-03-01|Agent创业壁垒::罗辑" \\
+                      --job "wechat/公众号选题/2026-03-01|OpenClaw算力涟漪::智子::涟漪" --model sonnet
+
+batch.yaml：
+  model: sonnet
+  workers: 3
+  articles:
+    - topic_dir: wechat/公众号选题/2026-03-01|Anthropic-Skill转向
+      persona: 丁仪
+      series: 技术祛魅
+    - topic_dir: wechat/公众号选题/2026-03-01|Agent创业壁垒
+      persona: 罗辑
+      research: false
+
+本地联调：把一个假的 claude 可执行文件放到 PATH 最前面（读 stdin，按需输出或返回 429），
+配合 --base-wait 0.1 --max-wait 1 即可在秒级验证并发与共享冷却。
+"""
+
+import argparse
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# 添加 parent 到 path 以便直接运行
+sys.path.insert(0, str(Path(__file__).parent))
+import deep_research
+import engine
+from context_loader import ContextLoader, get_source_cache
+
+log = logging.getLogger("write_engine")
+
+# 进度里程碑：越靠后的文件存在，说明文章越接近完成
+STAGE_FILES = [
+    "素材/deep_research.md",
+    "article_draft.md",
+    "article_factchecked.md",
+    "review_report.md",
+    "article_reviewed.md",
+    "article.md",
+]
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+
+@dataclass
+class ArticleJob:
+    topic_dir: Path
+    persona: str
+    series: str = None
+    research: bool = True
+    label: str = ""
+    status: str = "pending"  # pending / research / writing / done / failed
+    completed_calls: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    def __post_init__(self):
+        self.topic_dir = Path(self.topic_dir).resolve()
+        if not self.label:
+            self.label = self.topic_dir.name.split("|")[-1]
+
+    def progress(self) -> int:
+        """进度分：已完成的里程碑（权重大）+ 本次已完成的 claude 调用数。"""
+        stages = sum(1 for name in STAGE_FILES if (self.topic_dir / name).exists())
+        return stages * 100 + self.completed_calls
+
+
+class SharedClaudeGate:
+    """所有 worker 共享的 claude -p 调用闸门：有界并发槽位 + 优先级 + 共享限流冷却。"""
+
+    def __init__(self, max_workers: int = 2, base_wait: float = 60, max_wait: float = 300):
+        self.max_workers = max_workers
+        self.base_wait = base_wait
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._free = max_workers
+        self._waiting: list[tuple] = []  # 小顶堆：(-进度分, 排队序号)
+        self._seq = itertools.count()
+        self._cooldown_until = 0.0
+        self._streak = 0  # 连续限流次数（任一 worker 成功即清零）
+        self.stats = {"calls": 0, "rate_limits": 0, "cooldown_seconds": 0.0, "peak_running": 0}
+
+    @contextmanager
+    def slot(self):
+        """占用一个调用槽位：冷却期内不发起新调用；槽位按文章进度优先分配。"""
+        job = _current_job.get()
+        entry = (-job.progress() if job else 0, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                remaining = self._cooldown_until - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                elif self._free > 0 and self._waiting[0] == entry:
+                    heapq.heappop(self._waiting)
+                    self._free -= 1
+                    running = self.max_workers - self._free
+                    self.stats["peak_running"] = max(self.stats["peak_running"], running)
+                    # 还有空闲槽位时唤醒下一个排队者
+                    self._cond.notify_all()
+                    break
+                else:
+                    self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free += 1
+                self.stats["calls"] += 1
+                if job:
+                    job.completed_calls += 1
+                self._cond.notify_all()
+
+    def backoff(self, requested_seconds: float = None):
+        """登记一次限流并等待共享冷却结束。
+
+        等待时长由共享退避策略决定（所有 worker 的连续限流次数共同累加），
+        不使用单次调用传入的 wait_seconds/cooldown_seconds。
+        """
+        with self._cond:
+            self._streak += 1
+            self.stats["rate_limits"] += 1
+            wait = min(self.max_wait, self.base_wait * 2 ** (self._streak - 1))
+            now = time.monotonic()
+            until = now + wait
+            if until > self._cooldown_until:
+                self.stats["cooldown_seconds"] += until - max(now, self._cooldown_until)
+                self._cooldown_until = until
+                log.warning(f"⏸ 共享冷却 {wait:.0f}s（连续限流 {self._streak} 次，所有 worker 暂停发起新调用）")
+            self._cond.notify_all()
+            while (remaining := self._cooldown_until - time.monotonic()) > 0:
+                self._cond.wait(remaining)
+
+    def report_success(self):
+        with self._cond:
+            self._streak = 0
+
+
+class _JobLogFilter(logging.Filter):
+    """日志前缀加上当前文章标签，便于区分并发输出。"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        job = _current_job.get()
+        if job is not None and not getattr(record, "_job_tagged", False):
+            record.msg = f"[{job.label}] {record.msg}"
+            record._job_tagged = True
+        return True
+
+
+class BatchScheduler:
+    def __init__(self, jobs: list[ArticleJob], max_workers: int = 2, model: str = engine.DEFAULT_MODEL,
+                 research_model: str = None, iterate: bool = False, force_research: bool = False,
+                 base_wait: float = 60, max_wait: float = 300):
+        self.jobs = jobs
+        self.model = model
+        self.research_model = research_model or model
+        self.iterate = iterate
+        self.force_research = force_research
+        self.gate = SharedClaudeGate(max_workers, base_wait=base_wait, max_wait=max_wait)
+
+    def run(self) -> list[ArticleJob]:
+        log.info(f"批量调度启动: {len(self.jobs)} 篇文章, {self.gate.max_workers} 个 worker, 模型 {self.model}")
+        log_filter = _JobLogFilter()
+        handlers = logging.getLogger().handlers
+        for handler in handlers:
+            handler.addFilter(log_filter)
+        engine.set_claude_gate(self.gate)
+
+        start = time.time()
+        warmed = ContextLoader(engine.PROJECT_ROOT).precompute_series_summaries(
+            (job.series, job.persona) for job in self.jobs)
+        log.info(f"上下文缓存预热: {warmed} 组 (系列, 人设) 续恰摘要, 耗时 {time.time() - start:.2f}s")
+        threads = [threading.Thread(target=self._run_job, args=(job,), name=f"article-{job.label}")
+                   for job in self.jobs]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            engine.set_claude_gate(None)
+            for handler in handlers:
+                handler.removeFilter(log_filter)
+
+        self._log_summary(time.time() - start)
+        return self.jobs
+
+    def _run_job(self, job: ArticleJob):
+        _current_job.set(job)
+        start = time.time()
+        try:
+            research_done = (job.topic_dir / "素材" / "deep_research.md").exists()
+            if job.research and (self.force_research or not research_done):
+                job.status = "research"
+                if not deep_research.run_research(job.topic_dir, model=self.research_model):
+                    job.status, job.error = "failed", "深度调研失败"
+                    return
+            job.status = "writing"
+            ok = engine.run_engine(job.topic_dir, job.persona, job.series,
+                                   model=self.model, iterate=self.iterate)
+            job.status = "done" if ok else "failed"
+            if not ok:
+                job.error = "写作引擎未产出全部交付物"
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            log.exception(f"文章执行异常: {e}")
+        finally:
+            job.seconds = time.time() - start
+
+    def _log_summary(self, elapsed: float):
+        stats = self.gate.stats
+        log.info("=" * 50)
+        log.info(f"批量调度完成: 耗时 {elapsed / 60:.1f}min, claude 调用 {stats['calls']} 次, "
+                 f"并发峰值 {stats['peak_running']}, 限流 {stats['rate_limits']} 次, "
+                 f"共享冷却 {stats['cooldown_seconds']:.0f}s")
+        cache = get_source_cache()
+        log.info(f"上下文源文件缓存: {len(cache)} 项, 命中 {cache.hits} 次, 未命中 {cache.misses} 次")
+        for job in self.jobs:
+            mark = "✅" if job.status == "done" else "❌"
+            detail = f" — {job.error}" if job.error else ""
+            log.info(f"  {mark} {job.label}: {job.status}, {job.completed_calls} 次调用, "
+                     f"{job.seconds / 60:.1f}min{detail}")
+
+
+def parse_job_spec(spec: str) -> ArticleJob:
+    """"<topic_dir>::<persona>[::<series>]" → ArticleJob（目录名里本身有 |，所以用 :: 分隔）。"""
+    parts = spec.split("::")
+    if len(parts) < 2:
+        raise ValueError(f"--job 格式应为 <topic_dir>::<persona>[::<series>]: {spec}")
+    return ArticleJob(topic_dir=parts[0], persona=parts[1], series=parts[2] if len(parts) > 2 and parts[2] else None)
+
+
+def load_jobs_file(path: Path) -> tuple[list[ArticleJob], dict]:
+    import yaml
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    jobs = [
+        ArticleJob(topic_dir=item["topic_dir"], persona=item["persona"], series=item.get("series"),
+                   research=item.get("research", True), label=item.get("label", ""))
+        for item in config.get("articles", [])
+    ]
+    return jobs, config
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="降临派手记 · 批量写稿调度器",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--jobs", type=Path, default=None, help="批量任务 YAML（articles 列表）")
+    parser.add_argument("--job", action="append", default=[],
+                        help="单篇任务 <topic_dir>::<persona>[::<series>]，可重复")
+    parser.add_argument("--workers", type=int, default=None, help="claude -p 并发上限（默认 2）")
+    parser.add_argument("--model", default=None, help=f"写作模型 (默认: {engine.DEFAULT_MODEL})")
+    parser.add_argument("--research-model", default=None, help="调研审计模型（默认同 --model）")
+    parser.add_argument("--iterate", action="store_true", help="启用 Pass 5 迭代求导")
+    parser.add_argument("--force-research", action="store_true", help="已有 deep_research.md 也重新调研")
+    parser.add_argument("--base-wait", type=float, default=60, help="共享限流退避起步秒数")
+    parser.add_argument("--max-wait", type=float, default=300, help="共享限流退避上限秒数")
+    parser.add_argument("--report", type=Path, default=None, help="结果汇总输出 JSON 路径")
+    args = parser.parse_args()
+
+    jobs, config = load_jobs_file(args.jobs) if args.jobs else ([], {})
+    jobs += [parse_job_spec(spec) for spec in args.job]
+    if not jobs:
+        parser.error("至少需要 --jobs 或 --job")
+
+    scheduler = BatchScheduler(
+        jobs,
+        max_workers=args.workers or config.get("workers", 2),
+        model=args.model or config.get("model", engine.DEFAULT_MODEL),
+        research_model=args.research_model or config.get("research_model"),
+        iterate=args.iterate or config.get("iterate", False),
+        force_research=args.force_research,
+        base_wait=args.base_wait,
+        max_wait=args.max_wait,
+    )
+    results = scheduler.run()
+
+    if args.report:
+        args.report.write_text(json.dumps([
+            {"topic_dir": str(j.topic_dir), "label": j.label, "status": j.status,
+             "calls": j.completed_calls, "seconds": round(j.seconds, 1), "error": j.error}
+            for j in results
+        ], ensure_ascii=False, indent=2), encoding="utf-8")
+
+    sys.exit(0 if all(j.status == "done" for j in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
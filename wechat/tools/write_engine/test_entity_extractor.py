@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+本地实体提取测试：用仓库里真实的 deep_research.md 验证拉丁名正则的噪声过滤、
+收敛只计确认的实体，以及 entity_list.txt 只保存确认的实体（词典读回时不会学到正则候选）。
+
+运行：cd wechat/tools/write_engine && python -m pytest -q test_entity_extractor.py
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+import deep_research
+from entity_extractor import EntityGazetteer, LocalEntityExtractor, extract_latin_names, parse_listed_entities
+
+WECHAT_DIR = Path(__file__).resolve().parent.parent.parent
+RESEARCH_FILES = sorted(WECHAT_DIR.rglob("deep_research.md"))
+JOBS_RESEARCH = WECHAT_DIR / "公众号已发" / "2026-03-11|AI就业冲击" / "素材" / "deep_research.md"
+
+needs_research = pytest.mark.skipif(not JOBS_RESEARCH.exists(), reason="缺少真实素材文件")
+
+
+def _rounds(path: Path) -> list:
+    text = path.read_text(encoding="utf-8")
+    return [r for r in re.split(r"^## 第 \d+ 轮素材\s*$", text, flags=re.M) if r.strip()]
+
+
+@needs_research
+def test_latin_names_skip_noise_in_real_research():
+    names = set()
+    for path in RESEARCH_FILES:
+        names |= extract_latin_names(path.read_text(encoding="utf-8"))
+
+    # 评审中在真实素材里看到的噪声：年份区间、普通词、带编号的片段、新闻标题、URL slug
+    noise = {"2018-2024", "Complete", "Employment", "Yesterday", "Archive", "GPT 1", "IDC 7",
+             "OpenAI Quietly Deletes Ban", "Has Zero Impact", "Yet Uses",
+             "ai-in-financial-services-survey-2026", "w31161", "www.4cornerresources.com"}
+    assert not names & noise
+    for name in names:
+        assert not re.fullmatch(r"[\d\s.\-/]+", name), name
+        assert "/" not in name and not name.endswith((".html", ".pdf")), name
+        assert not (name.count("-") >= 2 and name.islower()), name
+
+    assert {"OpenAI", "Goldman Sachs", "Yale Budget Lab", "Demis Hassabis", "Kimi K2.5"} <= names
+
+
+def test_listed_entities_keep_grouped_sections_and_drop_notes():
+    text = ("## 新发现的实体清单\n\n### 学术与研究机构\n- Maxim Massenkoff (Anthropic经济学家)\n"
+            "- NBER (National Bureau of Economic Research)\n\n### 金融与企业\n- Goldman Sachs\n\n"
+            "## 第3轮迭代检索总结\n- Anthropic\n")
+    assert parse_listed_entities(text) == {"Maxim Massenkoff", "NBER", "Goldman Sachs"}
+
+
+@needs_research
+def test_convergence_counts_only_confirmed_entities():
+    extractor = LocalEntityExtractor()
+    seen = set()
+    for text in _rounds(JOBS_RESEARCH):
+        confirmed, candidates = extractor.extract(text)
+        assert not confirmed & candidates
+        seen |= confirmed
+
+    # 同样的素材再来一轮：候选依旧很多，但确认的实体没有新增，研究可以收敛
+    confirmed, candidates = extractor.extract(JOBS_RESEARCH.read_text(encoding="utf-8"))
+    assert candidates
+    assert confirmed - seen == set()
+
+
+@needs_research
+def test_entity_list_keeps_only_confirmed_entities(tmp_path, monkeypatch):
+    rounds = _rounds(JOBS_RESEARCH)
+    calls = []
+
+    def fake_search(topic, prompt, round_num, model, effort):
+        calls.append(round_num)
+        return rounds[min(round_num, len(rounds)) - 1]
+
+    monkeypatch.setattr(deep_research, "_run_search_round", fake_search)
+    monkeypatch.setattr(deep_research, "merge_materials", lambda all_rounds, topic: "\n\n".join(all_rounds))
+    monkeypatch.setattr(deep_research, "run_audit", lambda topic, output, model: None)
+    monkeypatch.setattr(deep_research, "new_entity_extractor", LocalEntityExtractor)
+
+    topic_dir = tmp_path / "wechat" / "公众号选题" / "2026-03-11|AI就业冲击"
+    topic_dir.mkdir(parents=True)
+    assert deep_research.run_research(topic_dir, topic="AI就业冲击", max_rounds=6, llm_entities=False)
+
+    # 第 3 份素材之后重复最后一轮，确认的实体不再增加 → 收敛，不会跑满 6 轮
+    assert calls == [1, 2, 3, 4]
+    materials = topic_dir / "素材"
+    listed = set()
+    for text in rounds:
+        listed |= parse_listed_entities(text)
+    entity_list = set((materials / "entity_list.txt").read_text(encoding="utf-8").splitlines())
+    candidates = set((materials / "entity_candidates.txt").read_text(encoding="utf-8").splitlines())
+    assert entity_list == listed
+    assert candidates and not entity_list & candidates
+
+    # 项目词典只读回 entity_list.txt，下一次运行不会学到正则候选
+    gazetteer = EntityGazetteer.from_project(tmp_path)
+    assert all(name in gazetteer for name in listed)
+    assert not any(name in gazetteer for name in candidates)
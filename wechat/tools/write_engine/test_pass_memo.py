@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Pass 输出记忆化测试：内容哈希的稳定性与敏感性、refresh 跳过缓存、清单写入，
+以及 run_memoized_pass 在输入不变时复用输出、输入变化时重新调用。
+
+运行：cd wechat/tools/write_engine && python -m pytest -q test_pass_memo.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+import engine
+from pass_memo import MANIFEST_NAME, PassMemo
+
+TEMPLATE = "选题 {{TOPIC}}\n日期 {{DATE}}\n{{MATERIALS}}"
+CONTEXT = {"TOPIC": "世界模型", "DATE": "2026-03-01", "MATERIALS": "素材A"}
+ARGS = ("opus", "high", "Read")
+
+
+def test_key_is_stable_and_ignores_volatile_date():
+    key = PassMemo.key(TEMPLATE, CONTEXT, *ARGS)
+
+    assert key == PassMemo.key(TEMPLATE, dict(reversed(list(CONTEXT.items()))), *ARGS)
+    assert len(key) == 64
+    # 写作日期每天都变，但不影响输出，不参与哈希
+    assert key == PassMemo.key(TEMPLATE, dict(CONTEXT, DATE="2026-03-02"), *ARGS)
+
+
+@pytest.mark.parametrize("template, context, args", [
+    (TEMPLATE + "\n补充要求", CONTEXT, ARGS),
+    (TEMPLATE, dict(CONTEXT, MATERIALS="素材B"), ARGS),
+    (TEMPLATE, dict(CONTEXT, PERSONA="罗辑"), ARGS),
+    (TEMPLATE, CONTEXT, ("sonnet", "high", "Read")),
+    (TEMPLATE, CONTEXT, ("opus", "medium", "Read")),
+    (TEMPLATE, CONTEXT, ("opus", "high", "Read,WebSearch")),
+])
+def test_changed_prompt_or_input_misses_cache(tmp_path, template, context, args):
+    memo = PassMemo(tmp_path)
+    memo.put(PassMemo.key(TEMPLATE, CONTEXT, *ARGS), "旧输出")
+
+    key = PassMemo.key(template, context, *args)
+    assert key != PassMemo.key(TEMPLATE, CONTEXT, *ARGS)
+    assert memo.get(key) is None
+
+
+def test_put_get_refresh_and_manifest(tmp_path):
+    key = PassMemo.key(TEMPLATE, CONTEXT, *ARGS)
+    memo = PassMemo(tmp_path)
+    memo.put(key, "")
+    assert memo.get(key) is None  # 空输出不缓存
+    memo.put(key, "输出")
+    assert memo.get(key) == "输出"
+    assert not list((tmp_path / ".pass_cache").glob("*.tmp"))
+
+    # refresh 忽略已有缓存（put 仍然写入新缓存）
+    refreshed = PassMemo(tmp_path, refresh=True)
+    assert refreshed.get(key) is None
+    refreshed.put(key, "新输出")
+    assert PassMemo(tmp_path).get(key) == "新输出"
+
+    memo.extra["context_assembly"] = {"pass1": 0.5}
+    memo.record("pass1", key, "reused", "输出", 0)
+    memo.record("pass2", key, "computed", "新输出", 12.34)
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["summary"] == {"reused": 1, "computed": 1, "failed": 0}
+    assert manifest["refresh"] is False
+    assert manifest["passes"][1] == {"step": "pass2", "status": "computed", "key": key[:16],
+                                     "chars": 3, "seconds": 12.3}
+    assert manifest["context_assembly"] == {"pass1": 0.5}
+
+
+def test_run_memoized_pass_reuses_until_inputs_change(tmp_path, monkeypatch):
+    prompts = []
+
+    def fake_claude(prompt, model, tools, effort="high", timeout=900):
+        prompts.append(prompt)
+        return f"输出{len(prompts)}"
+
+    monkeypatch.setattr(engine, "run_claude", fake_claude)
+
+    def run(memo, context):
+        token = engine._pass_memo.set(memo)
+        try:
+            return engine.run_memoized_pass("pass1", TEMPLATE, context, "opus", "Read")
+        finally:
+            engine._pass_memo.reset(token)
+
+    assert run(PassMemo(tmp_path), CONTEXT) == "输出1"
+    assert run(PassMemo(tmp_path), dict(CONTEXT, DATE="2026-03-09")) == "输出1"
+    assert run(PassMemo(tmp_path), dict(CONTEXT, MATERIALS="素材B")) == "输出2"
+    assert run(PassMemo(tmp_path, refresh=True), CONTEXT) == "输出3"
+    assert len(prompts) == 3 and "素材B" in prompts[1]
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["refresh"] is True
+    assert [(p["step"], p["status"]) for p in manifest["passes"]] == [("pass1", "computed")]
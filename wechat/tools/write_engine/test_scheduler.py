@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+批量调度器联调测试：PATH 最前面放一个假的 claude（读 stdin、记录起止时间、回显选题名），
+验证共享闸门的并发上限，以及并发文章之间 Pass 缓存（_pass_memo）互不串用。
+
+运行：cd wechat/tools/write_engine && python -m pytest -q test_scheduler.py
+"""
+
+import json
+import os
+import stat
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+import engine
+import scheduler
+
+STUB_CLAUDE = """#!{python}
+import os, sys, time
+prompt = sys.stdin.read()
+with open(os.environ["STUB_CLAUDE_LOG"], "a", encoding="utf-8") as f:
+    f.write(f"start {{time.monotonic()}}\\n")
+time.sleep(0.2)
+with open(os.environ["STUB_CLAUDE_LOG"], "a", encoding="utf-8") as f:
+    f.write(f"end {{time.monotonic()}}\\n")
+print("OUT " + prompt.strip().splitlines()[0])
+"""
+
+PASSES = ["pass1", "pass2", "pass3"]
+
+
+@pytest.fixture
+def stub_claude(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    claude = bin_dir / "claude"
+    claude.write_text(STUB_CLAUDE.format(python=sys.executable), encoding="utf-8")
+    claude.chmod(claude.stat().st_mode | stat.S_IXUSR)
+    call_log = tmp_path / "claude_calls.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("STUB_CLAUDE_LOG", str(call_log))
+    return call_log
+
+
+@pytest.fixture
+def fake_passes(monkeypatch):
+    """用三个串行 Pass 替换真实写作流程；run_engine 本身（PassMemo 的设置与清理）保持不变。"""
+    seen = []
+    lock = threading.Lock()
+
+    def _run_engine(ctx, topic_dir, persona, series, model, *args):
+        for step in PASSES:
+            memo = engine._pass_memo.get()
+            with lock:
+                seen.append((topic_dir, memo.topic_dir if memo else None))
+            output = engine.run_memoized_pass(step, "选题 {{TOPIC}} {{STEP}}\n{{PERSONA}}",
+                                              {"TOPIC": topic_dir.name, "STEP": step, "PERSONA": persona},
+                                              model, "Read")
+            if output != f"OUT 选题 {topic_dir.name} {step}":
+                return False
+        return True
+
+    monkeypatch.setattr(engine, "_run_engine", _run_engine)
+    return seen
+
+
+def _max_overlap(call_log: Path) -> int:
+    events = []
+    for line in call_log.read_text(encoding="utf-8").splitlines():
+        kind, stamp = line.split()
+        events.append((float(stamp), 0 if kind == "end" else 1))
+    running = peak = 0
+    for _, delta in sorted(events):
+        running += 1 if delta else -1
+        peak = max(peak, running)
+    return peak
+
+
+def _jobs(tmp_path, count):
+    jobs = []
+    for i in range(count):
+        topic_dir = tmp_path / f"2026-03-01|选题{i}"
+        topic_dir.mkdir()
+        jobs.append(scheduler.ArticleJob(topic_dir=topic_dir, persona="罗辑", research=False))
+    return jobs
+
+
+def test_gate_bounds_concurrency_and_memo_is_per_topic(tmp_path, stub_claude, fake_passes):
+    jobs = _jobs(tmp_path, 4)
+    batch = scheduler.BatchScheduler(jobs, max_workers=2, base_wait=0.1, max_wait=1)
+    batch.run()
+
+    assert [job.status for job in jobs] == ["done"] * 4
+    assert batch.gate.stats["calls"] == len(jobs) * len(PASSES)
+    assert batch.gate.stats["peak_running"] == 2
+    assert _max_overlap(stub_claude) == 2
+
+    # 每个线程看到的都是自己选题的 PassMemo，缓存与清单只包含本选题的输出
+    assert len(fake_passes) == len(jobs) * len(PASSES)
+    assert all(memo_dir == topic_dir for topic_dir, memo_dir in fake_passes)
+    for job in jobs:
+        manifest = json.loads((job.topic_dir / "pass_manifest.json").read_text(encoding="utf-8"))
+        assert [(e["step"], e["status"]) for e in manifest["passes"]] == [(s, "computed") for s in PASSES]
+        outputs = {p.read_text(encoding="utf-8") for p in (job.topic_dir / ".pass_cache").glob("*.txt")}
+        assert outputs == {f"OUT 选题 {job.topic_dir.name} {step}" for step in PASSES}
+
+    # 重跑全部命中各自的缓存，不再调用 claude
+    rerun = scheduler.BatchScheduler(jobs, max_workers=2, base_wait=0.1, max_wait=1)
+    rerun.run()
+    assert [job.status for job in jobs] == ["done"] * 4
+    assert rerun.gate.stats["calls"] == 0
+    assert engine._pass_memo.get() is None